@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark device listing with lazy records against eager JSON decoding.
+
+Builds a temporary database of scanned devices, each with a realistic
+device_info blob, and reports for the whole inventory and for one API
+page: the time to read the devices the old way (json.loads on every row),
+as DeviceRecords, and as DeviceRecords that are then encoded as an API
+response with and without decoding device_info. Decode times for the json
+module and orjson (when installed) are reported too.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from utils import records
+from utils.database import DEVICE_FIELDS, NetworkDatabase
+from utils.records import encode_json
+
+def make_devices(count):
+    """Return 'count' scanned devices with a few open ports each."""
+    services = [(22, 'ssh', 'OpenSSH 8.9p1 Ubuntu 3ubuntu0.6'), (80, 'http', 'nginx 1.24.0'),
+                (443, 'https', 'nginx 1.24.0'), (3389, 'ms-wbt-server', 'Microsoft Terminal Services'),
+                (5432, 'postgresql', 'PostgreSQL DB 15.4')]
+    return [{
+        'ip': f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}",
+        'mac': f"02:00:{i >> 16 & 255:02x}:{i >> 8 & 255:02x}:{i & 255:02x}:01",
+        'hostname': f"host-{i}.corp.example",
+        'os': 'Linux 5.15' if i % 3 else 'Windows Server 2019',
+        'status': 'up',
+        'latency_ms': 1.5 + i % 7,
+        'ports': [{'port': port, 'protocol': 'tcp', 'state': 'open', 'service': service, 'version': version}
+                  for port, service, version in services[i % 3:i % 3 + 3]],
+    } for i in range(count)]
+
+def eager_devices(database, limit=None):
+    """Read devices the way get_devices did before records: decode every device_info."""
+    columns = ', '.join(DEVICE_FIELDS.values())
+    sql = f'SELECT {columns} FROM devices ORDER BY scan_timestamp DESC, id DESC'
+    if limit:
+        sql += f' LIMIT {int(limit)}'
+    devices = []
+    for row in database._connection().execute(sql):
+        device = dict(zip(DEVICE_FIELDS, row))
+        device['device_info'] = json.loads(device['device_info']) if device['device_info'] else {}
+        devices.append(device)
+    return devices
+
+def timed(function, repeat=3):
+    """Run a function 'repeat' times and return (last result, best elapsed seconds)."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+def benchmark(database, page):
+    """
+    Time reading and encoding the inventory and one page of it.
+
+    Returns:
+        list: (label, seconds) pairs for the report.
+    """
+    results = []
+    _, seconds = timed(lambda: eager_devices(database))
+    results.append(('all devices, eager json.loads', seconds))
+    _, seconds = timed(database.get_devices)
+    results.append(('all devices, DeviceRecord', seconds))
+    _, seconds = timed(lambda: [device.ip for device in database.get_devices()])
+    results.append(('all devices, DeviceRecord, ips only', seconds))
+    _, seconds = timed(lambda: [device['device_info']['ports'] for device in database.get_devices()])
+    results.append(('all devices, DeviceRecord, device_info read', seconds))
+    _, seconds = timed(lambda: json.dumps({'devices': eager_devices(database)}))
+    results.append(('all devices, eager decode + json.dumps', seconds))
+    _, seconds = timed(lambda: encode_json({'devices': database.get_devices()}))
+    results.append(('all devices, encode_json (no decode)', seconds))
+
+    _, seconds = timed(lambda: json.dumps({'devices': eager_devices(database, page)}), repeat=20)
+    results.append((f'page of {page}, eager decode + json.dumps', seconds))
+    _, seconds = timed(lambda: encode_json({'devices': database.query_devices(limit=page)[0]}), repeat=20)
+    results.append((f'page of {page}, query_devices + encode_json', seconds))
+
+    blobs = [row[0] for row in database._connection().execute('SELECT device_info FROM devices')]
+    _, seconds = timed(lambda: [json.loads(blob) for blob in blobs])
+    results.append(('decode all blobs, json', seconds))
+    if records.orjson is not None:
+        _, seconds = timed(lambda: [records.orjson.loads(blob) for blob in blobs])
+        results.append(('decode all blobs, orjson', seconds))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark device listing with lazy device records')
+    parser.add_argument('--devices', type=int, default=100000, help='Devices in the benchmark database')
+    parser.add_argument('--page', type=int, default=500, help='Page size of the API listing benchmark')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database = NetworkDatabase(os.path.join(directory, 'benchmark.db'))
+        devices = make_devices(args.devices)
+        for start in range(0, len(devices), 10000):
+            database.save_devices(devices[start:start + 10000])
+
+        print(f"{args.devices} devices, orjson {'installed' if records.orjson is not None else 'not installed'}")
+        header = f"{'operation':<46} {'ms':>10}"
+        print(header)
+        print('-' * len(header))
+        for label, seconds in benchmark(database, args.page):
+            print(f"{label:<46} {seconds * 1000:>10.1f}")
+        database.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark NetworkBlocker against the simulated firewall backend.
+
+Runs without root or a real firewall. For each blocklist size it reports
+the time and firewall commands needed to block the list in one batch and
+one address at a time, lookup cost in the blocker, per-packet rule
+evaluations for chain-style and set-style firewalls, and the cost of an
+idempotent restore.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from modules.firewall_backends import SimulatedBackend
+from modules.network_blocker import NetworkBlocker
+
+def make_addresses(count):
+    """Return 'count' distinct, non-adjacent IPv4 host addresses."""
+    return [f"10.{i // 32768}.{(i // 128) % 256}.{(i % 128) * 2}" for i in range(count)]
+
+def make_blocker(directory, mode, latency):
+    """Create a blocker with its own blocklist file and a simulated backend."""
+    path = os.path.join(directory, f"blocked_{mode}_{time.monotonic_ns()}.json")
+    return NetworkBlocker(blocked_ips_file=path, backend=SimulatedBackend(mode, latency))
+
+def timed(function, *args):
+    """Run a function and return (result, elapsed seconds)."""
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+def benchmark(size, mode, latency, directory):
+    """
+    Benchmark one blocklist size against one simulated firewall mode.
+
+    Returns:
+        dict: Measurements for the report.
+    """
+    addresses = make_addresses(size)
+    results = {'size': size, 'mode': mode}
+
+    blocker = make_blocker(directory, mode, latency)
+    _, results['batch_seconds'] = timed(blocker.block_many, addresses)
+    results['batch_commands'] = blocker.backend.commands
+
+    single = make_blocker(directory, mode, latency)
+    sample = addresses[:min(size, 500)]
+    _, elapsed = timed(lambda: [single.block_ip(address) for address in sample])
+    results['single_ms_per_op'] = elapsed / len(sample) * 1000
+
+    probes = addresses[::max(1, size // 1000)] + ['192.168.1.1'] * 100
+    _, elapsed = timed(lambda: [blocker.is_ip_blocked(address) for address in probes])
+    results['lookup_us'] = elapsed / len(probes) * 1e6
+
+    backend = blocker.backend
+    backend.evaluations = 0
+    for address in probes:
+        backend.match(address)
+    results['evaluations_per_packet'] = backend.evaluations / len(probes)
+
+    commands = backend.commands
+    _, results['restore_seconds'] = timed(blocker.restore_blocked_ips)
+    results['restore_commands'] = backend.commands - commands
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark network blocking with a simulated firewall')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000],
+                        help='Blocklist sizes to benchmark')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Simulated seconds per firewall command')
+    args = parser.parse_args()
+
+    header = (f"{'size':>8} {'mode':>6} {'batch s':>9} {'cmds':>5} {'single ms/op':>13} "
+              f"{'lookup us':>10} {'evals/pkt':>10} {'restore s':>10} {'cmds':>5}")
+    print(header)
+    print('-' * len(header))
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            for mode in ('chain', 'set'):
+                r = benchmark(size, mode, args.latency, directory)
+                print(f"{r['size']:>8} {r['mode']:>6} {r['batch_seconds']:>9.4f} {r['batch_commands']:>5} "
+                      f"{r['single_ms_per_op']:>13.3f} {r['lookup_us']:>10.2f} "
+                      f"{r['evaluations_per_packet']:>10.1f} {r['restore_seconds']:>10.4f} "
+                      f"{r['restore_commands']:>5}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Network Management Tool - Auto Defense Module
+
+This module blocks traffic sources automatically when their packet rates
+exceed configurable limits. SourceRateTracker keeps a fixed-size record per
+source (two-bucket sliding window counters plus a small bitmap of
+destination ports), so memory per tracked source is constant and idle
+sources are evicted in least-recently-seen order. AutoDefense feeds the
+offenders to NetworkBlocker as time-limited blocks, one batch per flush
+interval. The capturing host's own addresses and its gateways are never
+blocked, as sniffing also sees the host's outgoing traffic.
+"""
+
+import logging
+import math
+import time
+from collections import OrderedDict
+
+from .prefix_set import PrefixSet
+
+# Bits in the per-window destination port bitmap (linear counting)
+PORT_BITMAP_BITS = 256
+
+class SourceWindow:
+    """Counters of one source for the current and previous window."""
+
+    __slots__ = ('window_start', 'packets', 'syns', 'ports', 'prev_packets', 'prev_syns', 'prev_ports',
+                 'last_seen', 'reported')
+
+    def __init__(self, now):
+        self.window_start = now
+        self.packets = self.syns = self.ports = 0
+        self.prev_packets = self.prev_syns = self.prev_ports = 0
+        self.last_seen = now
+        self.reported = False
+
+class SourceRateTracker:
+    """Sliding-window packet, SYN and destination port counters per source."""
+
+    def __init__(self, window=10, packet_limit=50000, syn_limit=1000, port_limit=100,
+                 idle_timeout=60, max_sources=100000):
+        """
+        Initialize the tracker.
+
+        Args:
+            window (float): Window length in seconds.
+            packet_limit (int): Packets per window that flag a source (flood).
+            syn_limit (int): TCP SYNs per window that flag a source (SYN flood).
+            port_limit (int): Distinct destination ports per window that flag
+                a source (port sweep).
+            idle_timeout (float): Seconds after which a silent source is forgotten.
+            max_sources (int): Most sources tracked at once; the least recently
+                seen are evicted first.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.window = window
+        self.packet_limit = packet_limit
+        self.syn_limit = syn_limit
+        self.port_limit = port_limit
+        self.idle_timeout = idle_timeout
+        self.max_sources = max_sources
+        self._sources = OrderedDict()
+
+    def __len__(self):
+        return len(self._sources)
+
+    @staticmethod
+    def _distinct(bitmap):
+        """Estimate the number of distinct ports recorded in a bitmap."""
+        zeros = PORT_BITMAP_BITS - bin(bitmap).count('1')
+        if zeros == 0:
+            return PORT_BITMAP_BITS * math.log(PORT_BITMAP_BITS)
+        return -PORT_BITMAP_BITS * math.log(zeros / PORT_BITMAP_BITS)
+
+    def observe(self, source, dport=None, syn=False, now=None):
+        """
+        Count one packet from a source.
+
+        Args:
+            source (str): Source address.
+            dport (int): Destination port (optional).
+            syn (bool): True for a TCP SYN without ACK.
+            now (float): Packet timestamp (defaults to the current time).
+
+        Returns:
+            str: 'syn-flood', 'port-sweep' or 'flood' when the source crosses
+                a limit (reported once per window), None otherwise.
+        """
+        now = time.time() if now is None else now
+        state = self._sources.get(source)
+        if state is None:
+            state = self._sources[source] = SourceWindow(now)
+            if len(self._sources) > self.max_sources:
+                self._sources.popitem(last=False)
+        else:
+            self._sources.move_to_end(source)
+            elapsed = now - state.window_start
+            if elapsed >= self.window:
+                if elapsed >= 2 * self.window:
+                    state.prev_packets = state.prev_syns = state.prev_ports = 0
+                else:
+                    state.prev_packets, state.prev_syns, state.prev_ports = state.packets, state.syns, state.ports
+                state.packets = state.syns = state.ports = 0
+                state.window_start = now - elapsed % self.window
+                state.reported = False
+        state.last_seen = now
+        state.packets += 1
+        if syn:
+            state.syns += 1
+        if dport is not None:
+            state.ports |= 1 << (dport % PORT_BITMAP_BITS)
+
+        if state.reported:
+            return None
+        # The previous window counts in proportion to how much of it still
+        # overlaps the sliding window ending now
+        weight = 1 - (now - state.window_start) / self.window
+        reason = None
+        if state.syns + state.prev_syns * weight >= self.syn_limit:
+            reason = 'syn-flood'
+        elif dport is not None and self._distinct(state.ports | state.prev_ports) >= self.port_limit:
+            reason = 'port-sweep'
+        elif state.packets + state.prev_packets * weight >= self.packet_limit:
+            reason = 'flood'
+        if reason:
+            state.reported = True
+        return reason
+
+    def prune(self, now=None):
+        """
+        Forget sources that have been silent for longer than the idle timeout.
+
+        Sources are kept in least-recently-seen order, so this stops at the
+        first active one.
+
+        Args:
+            now (float): Reference time (defaults to the current time).
+
+        Returns:
+            int: The number of sources removed.
+        """
+        now = time.time() if now is None else now
+        removed = 0
+        while self._sources:
+            source, state = next(iter(self._sources.items()))
+            if now - state.last_seen < self.idle_timeout:
+                break
+            del self._sources[source]
+            removed += 1
+        return removed
+
+class AutoDefense:
+    """Turns rate-limit violations into batched, time-limited blocks."""
+
+    def __init__(self, blocker, tracker=None, block_ttl=600, flush_interval=1.0, allowlist=()):
+        """
+        Initialize auto defense.
+
+        Args:
+            blocker (NetworkBlocker): Blocker that applies the blocks.
+            tracker (SourceRateTracker): Rate tracker (defaults to one with
+                default limits).
+            block_ttl (float): Seconds each automatic block lasts.
+            flush_interval (float): Seconds between block batches.
+            allowlist (iterable): Addresses, CIDRs or ranges that are never blocked.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.blocker = blocker
+        self.tracker = tracker if tracker is not None else SourceRateTracker()
+        self.block_ttl = block_ttl
+        self.flush_interval = flush_interval
+        self.allowlist = PrefixSet(allowlist)
+        # Sources still under an automatic block, and when each block ends (oldest first)
+        self.blocked = {}
+        self._blocked_until = OrderedDict()
+        self._pending = {}
+        self._last_flush = None
+
+    def observe(self, source, dport=None, syn=False, size=0, now=None):
+        """
+        Handle one captured packet; usable as a monitor_network_traffic callback.
+
+        Args:
+            source (str): Source address.
+            dport (int): Destination port (optional).
+            syn (bool): True for a TCP SYN without ACK.
+            size (int): Packet size in bytes.
+            now (float): Packet timestamp (defaults to the current time).
+        """
+        now = time.time() if now is None else now
+        reason = self.tracker.observe(source, dport, syn, now)
+        if reason and source not in self._pending and source not in self.allowlist:
+            self._pending[source] = reason
+        if self._last_flush is None:
+            self._last_flush = now
+        elif now - self._last_flush >= self.flush_interval:
+            self.flush(now)
+
+    def flush(self, now=None):
+        """
+        Block the pending offenders in one batch and prune idle sources.
+
+        Args:
+            now (float): Reference time (defaults to the current time).
+
+        Returns:
+            list: The sources that were blocked.
+        """
+        now = time.time() if now is None else now
+        self._last_flush = now
+        self.tracker.prune(now)
+        self._prune_blocked(now)
+        pending, self._pending = self._pending, {}
+        batch = [source for source in pending if not self.blocker.is_ip_blocked(source)]
+        if not batch:
+            return []
+        for source in batch:
+            self.logger.warning(f"Auto-blocking {source} for {self.block_ttl} seconds ({pending[source]})")
+        if not self.blocker.block_many(batch, ttl=self.block_ttl):
+            self.logger.error(f"Failed to auto-block {len(batch)} sources")
+            return []
+        for source in batch:
+            self.blocked[source] = pending[source]
+            self._blocked_until[source] = now + self.block_ttl
+        return batch
+
+    def _prune_blocked(self, now):
+        """Forget blocked sources whose block has expired."""
+        while self._blocked_until:
+            source, until = next(iter(self._blocked_until.items()))
+            if until > now:
+                break
+            del self._blocked_until[source]
+            del self.blocked[source]
+
+    def run(self, scanner, interface, duration=None):
+        """
+        Capture traffic on an interface and block offending sources.
+
+        The interface's own addresses and gateways are added to the
+        allowlist first, so the host's outgoing traffic cannot block itself.
+
+        Args:
+            scanner (NetworkScanner): Scanner providing the packet capture.
+            interface (str): The network interface to watch.
+            duration (int): Seconds to run (optional; default until interrupted).
+
+        Returns:
+            dict: Traffic statistics, with the sources still blocked under 'auto_blocked'.
+        """
+        local = scanner.get_local_addresses(interface)
+        if local:
+            self.logger.info(f"Never blocking local addresses of {interface}: {', '.join(local)}")
+            self.allowlist.update(local)
+        self.logger.info(f"Auto defense watching {interface}")
+        try:
+            stats = scanner.monitor_network_traffic(interface, duration=duration, packet_callback=self.observe)
+        finally:
+            self.flush()
+        stats['auto_blocked'] = dict(self.blocked)
+        return stats
@@ -0,0 +1,191 @@
+"""
+Network Management Tool - Blocklist Journal Module
+
+This module persists the blocklist as a snapshot plus an append-only journal.
+Each block or unblock appends one fsync'd line to the journal, so a mutation
+costs one small write regardless of blocklist size. The journal is folded
+into a new snapshot once it grows past a threshold; snapshots are written to
+a temporary file, fsync'd and renamed into place, so a crash leaves either
+the old or the new snapshot, never a partial one.
+
+Snapshot format (blocked_ips.json):
+    {"version": 2, "seq": 42, "entries": ["10.0.0.0/24", ...]}
+The network blocker adds "permanent" (entries blocked without a TTL) and
+"expiries" ({entry: expiry timestamp}) so time-limited blocks survive
+restarts. A plain JSON list (the original format) is still accepted as a
+snapshot.
+
+Journal format (blocked_ips.json.journal), one JSON object per line:
+    {"seq": 43, "op": "block", "entries": ["10.0.0.1"]}
+Ops are "block" (with "expires" for time-limited blocks), "unblock" and
+"expire".
+Only records with a seq above the snapshot's are replayed.
+"""
+
+import json
+import logging
+import os
+import tempfile
+
+SNAPSHOT_VERSION = 2
+
+class BlocklistJournal:
+    """Snapshot plus append-only journal storage for the blocklist."""
+
+    def __init__(self, snapshot_path, compact_threshold=1000):
+        """
+        Initialize the journal.
+
+        Args:
+            snapshot_path (str): Path of the snapshot file; the journal lives
+                next to it with a '.journal' suffix.
+            compact_threshold (int): Journal records after which compaction is due.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.snapshot_path = snapshot_path
+        self.journal_path = snapshot_path + ".journal"
+        self.compact_threshold = compact_threshold
+        self.seq = 0
+        self.snapshot_extra = {}
+        self._journal_records = 0
+
+    @staticmethod
+    def _fsync_directory(path):
+        """fsync a directory so a rename inside it is durable (POSIX only)."""
+        if os.name != 'posix':
+            return
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _read_snapshot(self):
+        """
+        Read the snapshot file.
+
+        Returns:
+            dict: The snapshot, with 'seq' and 'entries' keys. A missing file
+                is an empty snapshot and a legacy list has seq 0.
+        """
+        if not os.path.exists(self.snapshot_path):
+            return {'seq': 0, 'entries': []}
+        with open(self.snapshot_path, 'r') as f:
+            data = json.load(f)
+        if isinstance(data, list):
+            return {'seq': 0, 'entries': data}
+        if data.get('version', SNAPSHOT_VERSION) > SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported blocklist snapshot version: {data.get('version')}")
+        return data
+
+    def load(self):
+        """
+        Load the snapshot and the journal records written after it.
+
+        A torn final journal line (from a crash mid-append) is dropped and
+        truncated away so later appends start on a clean line.
+
+        Returns:
+            tuple: (snapshot dict, list of journal records to replay in order).
+        """
+        snapshot = self._read_snapshot()
+        self.seq = snapshot.get('seq', 0)
+        self.snapshot_extra = {key: value for key, value in snapshot.items()
+                               if key not in ('version', 'seq', 'entries')}
+        records = []
+        self._journal_records = 0
+
+        if os.path.exists(self.journal_path):
+            good_offset = 0
+            with open(self.journal_path, 'rb') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        self.logger.warning("Ignoring torn record at the end of the blocklist journal")
+                        break
+                    good_offset += len(line)
+                    self._journal_records += 1
+                    if record.get('seq', 0) > snapshot.get('seq', 0):
+                        records.append(record)
+                        self.seq = max(self.seq, record['seq'])
+            if good_offset < os.path.getsize(self.journal_path):
+                with open(self.journal_path, 'r+b') as f:
+                    f.truncate(good_offset)
+
+        self.logger.info(f"Loaded blocklist snapshot (seq {snapshot.get('seq', 0)}) "
+                         f"and {len(records)} journal records")
+        return snapshot, records
+
+    def append(self, op, entries, **fields):
+        """
+        Append one record to the journal and fsync it.
+
+        Args:
+            op (str): The operation, e.g. 'block' or 'unblock'.
+            entries (list): The entries the operation applies to.
+            **fields: Extra fields stored with the record.
+
+        Returns:
+            bool: True if the record is durable, False otherwise.
+        """
+        record = dict(fields, seq=self.seq + 1, op=op, entries=list(entries))
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.journal_path)), exist_ok=True)
+            with open(self.journal_path, 'a') as f:
+                f.write(json.dumps(record, separators=(',', ':')) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self.seq += 1
+            self._journal_records += 1
+            return True
+        except Exception as e:
+            self.logger.error(f"Error appending to blocklist journal: {e}")
+            return False
+
+    def needs_compaction(self):
+        """Return True when the journal has grown past the compaction threshold."""
+        return self._journal_records >= self.compact_threshold
+
+    def compact(self, entries, **fields):
+        """
+        Write a new snapshot atomically and empty the journal.
+
+        If the process dies after the rename but before the journal is
+        truncated, the leftover records have seq <= the snapshot's and are
+        skipped on the next load.
+
+        Args:
+            entries (list): The complete current blocklist.
+            **fields: Extra top-level fields stored in the snapshot.
+
+        Returns:
+            bool: True if the snapshot was written, False otherwise.
+        """
+        directory = os.path.dirname(os.path.abspath(self.snapshot_path))
+        snapshot = dict(fields, version=SNAPSHOT_VERSION, seq=self.seq, entries=list(entries))
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.blocked_ips.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(snapshot, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.snapshot_path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self._fsync_directory(directory)
+
+            with open(self.journal_path, 'w') as f:
+                f.flush()
+                os.fsync(f.fileno())
+            self._journal_records = 0
+            self.snapshot_extra = dict(fields)
+            self.logger.info(f"Compacted blocklist journal into snapshot (seq {self.seq}, {len(snapshot['entries'])} entries)")
+            return True
+        except Exception as e:
+            self.logger.error(f"Error writing blocklist snapshot: {e}")
+            return False
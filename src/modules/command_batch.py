@@ -0,0 +1,133 @@
+"""
+Network Management Tool - Command Batch Module
+
+This module runs a sequence of shell commands on a device over a single SSH
+exec channel. The commands are sent as one script, and sentinel markers in
+the output split it back into per-command output and exit status.
+"""
+
+import logging
+import re
+import secrets
+import shlex
+
+class BatchCommandRunner:
+    """Run several commands over one SSH channel with per-command results."""
+
+    def __init__(self, ssh_client, sudo_password=None, timeout=60):
+        """
+        Initialize the batch runner.
+
+        Args:
+            ssh_client (paramiko.SSHClient): Connected SSH client.
+            sudo_password (str): Password used to authenticate sudo once per batch (optional).
+            timeout (float): Channel timeout in seconds for the whole batch.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.ssh_client = ssh_client
+        self.sudo_password = sudo_password
+        self.timeout = timeout
+
+    @staticmethod
+    def _normalize(commands, sudo):
+        """Return (command, use_sudo) pairs from strings or pairs."""
+        return [command if isinstance(command, tuple) else (command, sudo) for command in commands]
+
+    def build_script(self, commands, token, sudo=False, stop_on_error=False):
+        """
+        Build the POSIX shell script for a batch.
+
+        Every command runs in a subshell (so 'exit' only ends that command)
+        with stdin from /dev/null (so it cannot consume the script itself)
+        and stderr merged into stdout, between BEGIN/END markers; the END
+        marker carries the command's exit status. When any command needs
+        sudo, sudo is authenticated once up front and the commands then run
+        with 'sudo -n'.
+
+        Args:
+            commands (list): Command strings or (command, use_sudo) pairs.
+            token (str): Random token making the markers unique to this batch.
+            sudo (bool): Default sudo setting for plain command strings.
+            stop_on_error (bool): Stop the batch at the first non-zero exit status.
+
+        Returns:
+            str: The script.
+        """
+        commands = self._normalize(commands, sudo)
+        lines = []
+
+        if any(use_sudo for _, use_sudo in commands):
+            if self.sudo_password is not None:
+                # printf is a shell builtin, so the password never appears in a process list
+                authenticate = f"printf '%s\\n' {shlex.quote(self.sudo_password)} | sudo -S -p '' -v"
+            else:
+                authenticate = "sudo -n -v"
+            lines.append(f"{authenticate} >/dev/null 2>&1 || {{ printf '\\n%s\\n' '__NMT_{token}_SUDO_FAILED__'; exit 126; }}")
+
+        for index, (command, use_sudo) in enumerate(commands):
+            if use_sudo:
+                command = f"sudo -n sh -c {shlex.quote(command)}"
+            lines.append(f"printf '\\n%s\\n' '__NMT_{token}_BEGIN_{index}__'")
+            lines.append(f"( {command}\n) </dev/null 2>&1")
+            lines.append(f"nmt_rc=$?; printf '\\n%s %d\\n' '__NMT_{token}_END_{index}__' \"$nmt_rc\"")
+            if stop_on_error:
+                lines.append('[ "$nmt_rc" -eq 0 ] || exit "$nmt_rc"')
+
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def parse_output(output, token, commands):
+        """
+        Split batch output into per-command results.
+
+        Args:
+            output (str): Combined output of the batch script.
+            token (str): The token used when building the script.
+            commands (list): The (command, use_sudo) pairs of the batch.
+
+        Returns:
+            list: One dict per command with 'command', 'output' and 'exit_status'
+                (None for commands that did not run).
+        """
+        results = [{'command': command, 'output': '', 'exit_status': None} for command, _ in commands]
+        pattern = re.compile(rf"\n?__NMT_{token}_BEGIN_(\d+)__\n(.*?)\n__NMT_{token}_END_\1__ (-?\d+)\n",
+                             re.DOTALL)
+        for match in pattern.finditer(output):
+            index = int(match.group(1))
+            if index < len(results):
+                results[index]['output'] = match.group(2)
+                results[index]['exit_status'] = int(match.group(3))
+        return results
+
+    def run(self, commands, sudo=False, stop_on_error=False):
+        """
+        Run a batch of commands over one exec channel.
+
+        Args:
+            commands (list): Command strings or (command, use_sudo) pairs.
+            sudo (bool): Default sudo setting for plain command strings.
+            stop_on_error (bool): Stop the batch at the first non-zero exit status.
+
+        Returns:
+            list: One dict per command with 'command', 'output' and 'exit_status'.
+                If sudo authentication fails, no command runs and every
+                result carries an 'error' key.
+        """
+        commands = self._normalize(commands, sudo)
+        token = secrets.token_hex(8)
+        script = self.build_script(commands, token, stop_on_error=stop_on_error)
+
+        self.logger.info(f"Running batch of {len(commands)} commands over one channel")
+        stdin, stdout, _ = self.ssh_client.exec_command("sh -s", timeout=self.timeout)
+        stdin.write(script)
+        stdin.flush()
+        stdin.channel.shutdown_write()
+        output = stdout.read().decode(errors='replace').replace('\r\n', '\n')
+        stdout.channel.recv_exit_status()
+
+        results = self.parse_output(output, token, commands)
+        if f"__NMT_{token}_SUDO_FAILED__" in output:
+            self.logger.error("sudo authentication failed; no commands were run")
+            for result in results:
+                result['error'] = 'sudo authentication failed'
+        return results
@@ -0,0 +1,367 @@
+"""
+Network Management Tool - Configuration Backup Module
+
+This module provides a content-addressed, compressed store for device
+configuration backups. Configuration files are streamed from devices in
+chunks, hashed and compressed on the fly, and stored once no matter how many
+devices or days share the same content. Manifests and objects older than a
+retention cutoff can be garbage-collected.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shlex
+import tempfile
+from datetime import datetime, timezone
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; gzip is always available
+    zstandard = None
+
+# Configuration files collected when no explicit list is given
+DEFAULT_CONFIG_PATHS = [
+    '/etc/network/interfaces',
+    '/etc/netplan/01-netcfg.yaml',
+    '/etc/hosts',
+    '/etc/hostname',
+    '/etc/resolv.conf',
+    '/etc/ssh/sshd_config',
+]
+
+# Size of each chunk read from or written to a device
+CHUNK_SIZE = 64 * 1024
+
+class ConfigBackupStore:
+    """Content-addressed local store for compressed configuration backups."""
+
+    def __init__(self, root=None, codec=None):
+        """
+        Initialize the backup store.
+
+        Args:
+            root (str): Directory holding the store (default: 'backups' in the project root).
+            codec (str): 'zstd' or 'gzip'. Defaults to zstd when the zstandard
+                package is installed, otherwise gzip.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.root = root or os.path.join(os.path.dirname(__file__), "..", "..", "backups")
+        if codec is None:
+            codec = 'zstd' if zstandard is not None else 'gzip'
+        if codec == 'zstd' and zstandard is None:
+            raise ValueError("zstd compression requires the 'zstandard' package")
+        if codec not in ('zstd', 'gzip'):
+            raise ValueError(f"Unsupported backup codec: {codec}")
+        self.codec = codec
+        self.objects_dir = os.path.join(self.root, "objects")
+        self.manifests_dir = os.path.join(self.root, "manifests")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.manifests_dir, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Objects
+    # ------------------------------------------------------------------
+
+    def _object_path(self, digest, codec):
+        """Return the on-disk path of an object."""
+        extension = 'zst' if codec == 'zstd' else 'gz'
+        return os.path.join(self.objects_dir, digest[:2], f"{digest[2:]}.{extension}")
+
+    def find_object(self, digest):
+        """
+        Locate a stored object.
+
+        Args:
+            digest (str): The SHA-256 hex digest of the uncompressed content.
+
+        Returns:
+            tuple: (path, codec) of the stored object, or None if it is not stored.
+        """
+        for codec in ('zstd', 'gzip'):
+            path = self._object_path(digest, codec)
+            if os.path.exists(path):
+                return path, codec
+        return None
+
+    def put_stream(self, chunks):
+        """
+        Store content from an iterable of byte chunks.
+
+        The content is hashed and compressed while it streams into a
+        temporary file; if an object with the same digest already exists the
+        temporary file is discarded, so identical content is stored once.
+
+        Args:
+            chunks (iterable): Byte chunks making up the content.
+
+        Returns:
+            tuple: (digest, size) of the uncompressed content.
+        """
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.objects_dir, prefix=".incoming-")
+        try:
+            with os.fdopen(fd, 'wb') as raw:
+                if self.codec == 'zstd':
+                    writer = zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=False)
+                else:
+                    writer = gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6, mtime=0)
+                with writer:
+                    for chunk in chunks:
+                        hasher.update(chunk)
+                        size += len(chunk)
+                        writer.write(chunk)
+
+            digest = hasher.hexdigest()
+            found = self.find_object(digest)
+            if found is not None:
+                os.remove(tmp_path)
+                # A reused object counts as new, so garbage collection keeps it
+                os.utime(found[0])
+                self.logger.debug(f"Object {digest[:12]} already stored")
+            else:
+                final_path = self._object_path(digest, self.codec)
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(tmp_path, final_path)
+            return digest, size
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def open_object(self, digest):
+        """
+        Open a stored object for streaming, decompressed reads.
+
+        Args:
+            digest (str): The SHA-256 hex digest of the content.
+
+        Returns:
+            file: A binary file-like object yielding the uncompressed content.
+        """
+        found = self.find_object(digest)
+        if found is None:
+            raise FileNotFoundError(f"Backup object {digest} not found")
+        path, codec = found
+        if codec == 'zstd':
+            if zstandard is None:
+                raise ValueError("Reading zstd backups requires the 'zstandard' package")
+            return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+        return gzip.open(path, 'rb')
+
+    def iter_object(self, digest, chunk_size=CHUNK_SIZE):
+        """
+        Iterate over the uncompressed content of an object in chunks.
+
+        Args:
+            digest (str): The SHA-256 hex digest of the content.
+            chunk_size (int): Size of each chunk.
+
+        Yields:
+            bytes: Content chunks.
+        """
+        with self.open_object(digest) as reader:
+            while True:
+                chunk = reader.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    # ------------------------------------------------------------------
+    # Manifests
+    # ------------------------------------------------------------------
+
+    def _device_dir(self, ip_address):
+        """Return the manifest directory for a device."""
+        return os.path.join(self.manifests_dir, ip_address.replace(':', '_'))
+
+    def save_manifest(self, ip_address, files):
+        """
+        Record a backup snapshot for a device.
+
+        Args:
+            ip_address (str): The IP address of the device.
+            files (dict): Mapping of remote path to object metadata
+                ({'sha256', 'size', 'mtime'}).
+
+        Returns:
+            str: Path to the saved manifest file.
+        """
+        created = datetime.now(timezone.utc)
+        manifest = {
+            'device': ip_address,
+            'created': created.isoformat(),
+            'files': files
+        }
+        device_dir = self._device_dir(ip_address)
+        os.makedirs(device_dir, exist_ok=True)
+        path = os.path.join(device_dir, created.strftime("%Y%m%dT%H%M%S%fZ") + ".json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+        self.logger.info(f"Saved backup manifest for {ip_address}: {path}")
+        return path
+
+    def list_manifests(self, ip_address):
+        """
+        List the backup manifests of a device, oldest first.
+
+        Args:
+            ip_address (str): The IP address of the device.
+
+        Returns:
+            list: Paths of manifest files.
+        """
+        device_dir = self._device_dir(ip_address)
+        if not os.path.isdir(device_dir):
+            return []
+        return [os.path.join(device_dir, name) for name in sorted(os.listdir(device_dir))
+                if name.endswith('.json')]
+
+    def load_manifest(self, path):
+        """
+        Load a manifest file.
+
+        Args:
+            path (str): Path to the manifest file.
+
+        Returns:
+            dict: The manifest.
+        """
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def latest_manifest(self, ip_address):
+        """
+        Load the most recent manifest of a device.
+
+        Args:
+            ip_address (str): The IP address of the device.
+
+        Returns:
+            dict: The manifest, or None if the device has no backups.
+        """
+        manifests = self.list_manifests(ip_address)
+        return self.load_manifest(manifests[-1]) if manifests else None
+
+    # ------------------------------------------------------------------
+    # Garbage collection
+    # ------------------------------------------------------------------
+
+    def collect_garbage(self, before, keep=()):
+        """
+        Delete manifests and objects older than a cutoff that are no longer needed.
+
+        For each device, manifests created before the cutoff are deleted
+        except the newest of them, which holds the configuration as it was
+        at the cutoff. Objects are then deleted unless a remaining manifest
+        or 'keep' references them, or they were stored or reused after the
+        cutoff (so a backup in progress never loses its objects).
+
+        Args:
+            before (datetime or str): Cutoff time.
+            keep (iterable): Digests to keep regardless of the manifests.
+
+        Returns:
+            dict: Numbers of deleted 'manifests' and 'objects'.
+        """
+        if isinstance(before, str):
+            before = datetime.fromisoformat(before)
+        if before.tzinfo is None:
+            before = before.replace(tzinfo=timezone.utc)
+        before = before.astimezone(timezone.utc)
+        cutoff = before.isoformat()
+        referenced = set(keep)
+        manifests = objects = 0
+
+        for name in sorted(os.listdir(self.manifests_dir)):
+            expired = []
+            for path in self.list_manifests(name.replace('_', ':')):
+                manifest = self.load_manifest(path)
+                if manifest['created'] < cutoff:
+                    expired.append(path)
+                else:
+                    referenced.update(entry['sha256'] for entry in manifest['files'].values())
+            if expired:
+                referenced.update(entry['sha256'] for entry in self.load_manifest(expired[-1])['files'].values())
+            for path in expired[:-1]:
+                os.remove(path)
+                manifests += 1
+
+        for prefix in os.listdir(self.objects_dir):
+            directory = os.path.join(self.objects_dir, prefix)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                digest = prefix + name.split('.', 1)[0]
+                if digest in referenced or os.path.getmtime(path) >= before.timestamp():
+                    continue
+                os.remove(path)
+                objects += 1
+
+        self.logger.info(f"Garbage-collected {manifests} manifests and {objects} objects older than {cutoff}")
+        return {'manifests': manifests, 'objects': objects}
+
+def iter_remote_file(ssh_client, sftp, path, chunk_size=CHUNK_SIZE):
+    """
+    Stream a remote file over SFTP, falling back to an exec channel.
+
+    Args:
+        ssh_client (paramiko.SSHClient): Connected SSH client.
+        sftp (paramiko.SFTPClient): SFTP client, or None if SFTP is unavailable.
+        path (str): Remote file path.
+        chunk_size (int): Size of each chunk.
+
+    Yields:
+        bytes: File content chunks.
+    """
+    if sftp is not None:
+        with sftp.open(path, 'rb') as remote:
+            remote.prefetch()
+            while True:
+                chunk = remote.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        return
+
+    _, stdout, stderr = ssh_client.exec_command(f"cat -- {shlex.quote(path)}")
+    while True:
+        chunk = stdout.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+    if stdout.channel.recv_exit_status() != 0:
+        raise IOError(f"Could not read {path}: {stderr.read().decode(errors='replace').strip()}")
+
+def write_remote_file(ssh_client, sftp, path, chunks):
+    """
+    Stream content to a remote file, replacing it atomically where possible.
+
+    Args:
+        ssh_client (paramiko.SSHClient): Connected SSH client.
+        sftp (paramiko.SFTPClient): SFTP client, or None if SFTP is unavailable.
+        path (str): Remote file path.
+        chunks (iterable): Byte chunks to write.
+    """
+    staging_path = f"{path}.nmt-restore"
+    if sftp is not None:
+        with sftp.open(staging_path, 'wb') as remote:
+            remote.set_pipelined(True)
+            for chunk in chunks:
+                remote.write(chunk)
+        sftp.posix_rename(staging_path, path)
+        return
+
+    quoted, staging = shlex.quote(path), shlex.quote(staging_path)
+    stdin, stdout, stderr = ssh_client.exec_command(f"cat > {staging} && mv -f -- {staging} {quoted}")
+    for chunk in chunks:
+        stdin.write(chunk)
+    stdin.channel.shutdown_write()
+    if stdout.channel.recv_exit_status() != 0:
+        raise IOError(f"Could not write {path}: {stderr.read().decode(errors='replace').strip()}")
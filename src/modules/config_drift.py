@@ -0,0 +1,522 @@
+"""
+Network Management Tool - Configuration Drift Module
+
+This module tracks how device configurations change across backups. Each
+backed-up file is kept as a chain of line-level deltas anchored by periodic
+full snapshots, and every change is indexed by the configuration section it
+touched so that "which devices changed X since Y" is a single index lookup.
+With a retention period, sync() and apply_retention() prune older history
+and garbage-collect the backups it no longer needs.
+"""
+
+import difflib
+import json
+import logging
+import os
+import sqlite3
+import zlib
+from datetime import datetime, timedelta, timezone
+
+# Days of configuration history and backups kept by the device manager
+DEFAULT_RETENTION_DAYS = 365
+
+class ConfigDriftEngine:
+    """Delta-based configuration history and drift index built on backup manifests."""
+
+    def __init__(self, store, db_path=None, keyframe_interval=30, retention_days=None):
+        """
+        Initialize the drift engine.
+
+        Args:
+            store (ConfigBackupStore): The backup store holding configuration content.
+            db_path (str): Path to the drift history database (default: 'drift.db' in the store).
+            keyframe_interval (int): Number of revisions between full snapshots.
+            retention_days (float): Days of history and backups kept; older
+                ones are pruned by sync() and apply_retention() (None keeps
+                them forever).
+        """
+        self.logger = logging.getLogger(__name__)
+        self.store = store
+        self.db_path = db_path or os.path.join(store.root, "drift.db")
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.retention_days = retention_days
+        self.init_database()
+
+    def _connect(self):
+        """Open a connection to the drift database."""
+        return sqlite3.connect(self.db_path)
+
+    def init_database(self):
+        """Initialize the drift database with required tables and indexes."""
+        conn = self._connect()
+        try:
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS revisions (
+                    device TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    created TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    payload BLOB NOT NULL,
+                    PRIMARY KEY (device, path, version)
+                );
+
+                CREATE TABLE IF NOT EXISTS changes (
+                    section TEXT NOT NULL,
+                    created TEXT NOT NULL,
+                    device TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    version INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_changes_section_created ON changes (section, created);
+                CREATE INDEX IF NOT EXISTS idx_changes_device_created ON changes (device, created);
+
+                CREATE TABLE IF NOT EXISTS ingested (
+                    device TEXT PRIMARY KEY,
+                    created TEXT NOT NULL
+                );
+            ''')
+            conn.commit()
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Deltas and sections
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def compute_delta(old_lines, new_lines):
+        """
+        Compute a line-level delta between two versions of a file.
+
+        Args:
+            old_lines (list): Lines of the previous version.
+            new_lines (list): Lines of the new version.
+
+        Returns:
+            list: [start, end, replacement_lines] operations against old_lines.
+        """
+        matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+        return [[i1, i2, new_lines[j1:j2]]
+                for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != 'equal']
+
+    @staticmethod
+    def apply_delta(old_lines, delta):
+        """
+        Apply a delta produced by compute_delta.
+
+        Args:
+            old_lines (list): Lines of the previous version.
+            delta (list): Delta operations.
+
+        Returns:
+            list: Lines of the new version.
+        """
+        lines = list(old_lines)
+        # Apply from the end so earlier offsets stay valid
+        for start, end, replacement in reversed(delta):
+            lines[start:end] = replacement
+        return lines
+
+    @staticmethod
+    def _section_headers(lines):
+        """
+        Map each line to the configuration section it belongs to.
+
+        A section starts at any non-blank, non-comment line without leading
+        indentation (e.g. 'interface Gi0/1', 'auto eth0', '[Match]', 'network:').
+
+        Returns:
+            list: Section header for each line ('' before the first header).
+        """
+        headers = []
+        current = ''
+        for line in lines:
+            stripped = line.strip()
+            if stripped and not line[0].isspace() and not stripped.startswith(('#', '!', ';')):
+                current = stripped[:200]
+            headers.append(current)
+        return headers
+
+    def _changed_sections(self, old_lines, new_lines, delta):
+        """Return the set of sections touched by a delta."""
+        old_headers = self._section_headers(old_lines)
+        new_headers = self._section_headers(new_lines)
+        sections = set()
+        offset = 0
+        for start, end, replacement in delta:
+            sections.update(old_headers[start:end])
+            new_start = start + offset
+            sections.update(new_headers[new_start:new_start + len(replacement)])
+            offset += len(replacement) - (end - start)
+        return sections or {''}
+
+    # ------------------------------------------------------------------
+    # Revisions
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _encode(value):
+        return zlib.compress(json.dumps(value, separators=(',', ':')).encode('utf-8'))
+
+    @staticmethod
+    def _decode(payload):
+        return json.loads(zlib.decompress(payload).decode('utf-8'))
+
+    def _materialize(self, conn, device, path, version):
+        """
+        Rebuild the lines of a revision from its nearest full snapshot.
+
+        Returns:
+            list: Lines of the revision, or None if it does not exist.
+        """
+        keyframe = conn.execute('''
+            SELECT version FROM revisions
+            WHERE device = ? AND path = ? AND version <= ? AND kind = 'full'
+            ORDER BY version DESC LIMIT 1
+        ''', (device, path, version)).fetchone()
+        if keyframe is None:
+            return None
+
+        lines = None
+        for kind, payload in conn.execute('''
+            SELECT kind, payload FROM revisions
+            WHERE device = ? AND path = ? AND version BETWEEN ? AND ?
+            ORDER BY version
+        ''', (device, path, keyframe[0], version)):
+            value = self._decode(payload)
+            lines = value if kind == 'full' else self.apply_delta(lines, value)
+        return lines
+
+    def _read_lines(self, digest):
+        """Read a stored object as a list of text lines."""
+        content = b''.join(self.store.iter_object(digest))
+        return content.decode('utf-8', errors='replace').splitlines()
+
+    def record_file(self, device, path, digest, created):
+        """
+        Record a backed-up file as the next revision of its history.
+
+        Args:
+            device (str): The device IP address.
+            path (str): The configuration file path.
+            digest (str): SHA-256 digest of the content in the backup store.
+            created (str): ISO-8601 timestamp of the backup.
+
+        Returns:
+            int: The new version number, or None if the content did not change.
+        """
+        conn = self._connect()
+        try:
+            last = conn.execute('''
+                SELECT version, sha256 FROM revisions
+                WHERE device = ? AND path = ? ORDER BY version DESC LIMIT 1
+            ''', (device, path)).fetchone()
+            if last is not None and last[1] == digest:
+                return None
+
+            new_lines = self._read_lines(digest)
+            version = 1 if last is None else last[0] + 1
+
+            if last is None:
+                kind, value = 'full', new_lines
+                sections = set(self._section_headers(new_lines)) or {''}
+            else:
+                old_lines = self._materialize(conn, device, path, last[0])
+                delta = self.compute_delta(old_lines, new_lines)
+                sections = self._changed_sections(old_lines, new_lines, delta)
+                last_full = conn.execute('''
+                    SELECT MAX(version) FROM revisions WHERE device = ? AND path = ? AND kind = 'full'
+                ''', (device, path)).fetchone()[0]
+                if version - last_full >= self.keyframe_interval:
+                    kind, value = 'full', new_lines
+                else:
+                    kind, value = 'delta', delta
+
+            conn.execute('''
+                INSERT INTO revisions (device, path, version, created, kind, sha256, payload)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (device, path, version, created, kind, digest, self._encode(value)))
+            conn.executemany('''
+                INSERT INTO changes (section, created, device, path, version) VALUES (?, ?, ?, ?, ?)
+            ''', [(section, created, device, path, version) for section in sections])
+            conn.commit()
+            self.logger.info(f"Recorded {path} on {device} as version {version} "
+                             f"({kind}, {len(sections)} sections changed)")
+            return version
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def ingest_manifest(self, manifest):
+        """
+        Record every file of a backup manifest.
+
+        Retention is not applied here, as it scans the whole store; see
+        apply_retention.
+
+        Args:
+            manifest (dict): A manifest loaded from the backup store.
+
+        Returns:
+            dict: Mapping of changed paths to their new version numbers.
+        """
+        device, created = manifest['device'], manifest['created']
+        changed = {}
+        for path, entry in sorted(manifest['files'].items()):
+            version = self.record_file(device, path, entry['sha256'], created)
+            if version is not None:
+                changed[path] = version
+
+        conn = self._connect()
+        try:
+            conn.execute('''
+                INSERT INTO ingested (device, created) VALUES (?, ?)
+                ON CONFLICT(device) DO UPDATE SET created = excluded.created
+                WHERE excluded.created > ingested.created
+            ''', (device, created))
+            conn.commit()
+        finally:
+            conn.close()
+        return changed
+
+    def sync(self, devices=None):
+        """
+        Ingest backup manifests that have not been recorded yet.
+
+        Args:
+            devices (list): Device IP addresses to sync (default: every device in the store).
+
+        Returns:
+            int: Number of manifests ingested.
+        """
+        if devices is None:
+            devices = [name.replace('_', ':') for name in sorted(os.listdir(self.store.manifests_dir))]
+
+        conn = self._connect()
+        try:
+            ingested = dict(conn.execute('SELECT device, created FROM ingested'))
+        finally:
+            conn.close()
+
+        count = 0
+        for device in devices:
+            for manifest_path in self.store.list_manifests(device):
+                manifest = self.store.load_manifest(manifest_path)
+                if manifest['created'] > ingested.get(device, ''):
+                    self.ingest_manifest(manifest)
+                    count += 1
+        # Retention runs once per pass, after every listed manifest was read
+        if count:
+            self.apply_retention()
+        self.logger.info(f"Ingested {count} backup manifests into drift history")
+        return count
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _timestamp(value):
+        """Normalize a datetime or ISO string to the stored timestamp format."""
+        if value is None or isinstance(value, str):
+            return value
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc).isoformat()
+
+    def changed_devices(self, section, since=None, until=None):
+        """
+        Find devices whose configuration changed in a section.
+
+        Args:
+            section (str): Section header, e.g. 'interface GigabitEthernet0/1'. A
+                trailing '*' matches every section starting with the prefix.
+            since (datetime or str): Only changes at or after this time.
+            until (datetime or str): Only changes before this time.
+
+        Returns:
+            list: Dictionaries with 'device', 'path', 'section', 'version' and 'created'.
+        """
+        if section.endswith('*'):
+            prefix = section[:-1]
+            clauses, params = ['section >= ? AND section < ?'], [prefix, prefix + '\U0010ffff']
+        else:
+            clauses, params = ['section = ?'], [section]
+        if since is not None:
+            clauses.append('created >= ?')
+            params.append(self._timestamp(since))
+        if until is not None:
+            clauses.append('created < ?')
+            params.append(self._timestamp(until))
+
+        conn = self._connect()
+        try:
+            rows = conn.execute(f'''
+                SELECT device, path, section, version, created FROM changes
+                WHERE {' AND '.join(clauses)}
+                ORDER BY created DESC
+            ''', params).fetchall()
+        finally:
+            conn.close()
+
+        return [{'device': row[0], 'path': row[1], 'section': row[2], 'version': row[3], 'created': row[4]}
+                for row in rows]
+
+    def history(self, device, path):
+        """
+        List the recorded revisions of a file.
+
+        Args:
+            device (str): The device IP address.
+            path (str): The configuration file path.
+
+        Returns:
+            list: Dictionaries with 'version', 'created', 'kind' and 'sha256'.
+        """
+        conn = self._connect()
+        try:
+            rows = conn.execute('''
+                SELECT version, created, kind, sha256 FROM revisions
+                WHERE device = ? AND path = ? ORDER BY version
+            ''', (device, path)).fetchall()
+        finally:
+            conn.close()
+        return [{'version': row[0], 'created': row[1], 'kind': row[2], 'sha256': row[3]} for row in rows]
+
+    def get_revision(self, device, path, version):
+        """
+        Rebuild the content of a revision.
+
+        Args:
+            device (str): The device IP address.
+            path (str): The configuration file path.
+            version (int): The version number.
+
+        Returns:
+            list: Lines of the revision, or None if it does not exist.
+        """
+        conn = self._connect()
+        try:
+            return self._materialize(conn, device, path, version)
+        finally:
+            conn.close()
+
+    def diff(self, device, path, from_version=None, to_version=None):
+        """
+        Produce a unified diff between two revisions of a file.
+
+        Args:
+            device (str): The device IP address.
+            path (str): The configuration file path.
+            from_version (int): Older version (default: the one before to_version).
+            to_version (int): Newer version (default: the latest version).
+
+        Returns:
+            list: Unified diff lines (empty if either revision is missing).
+        """
+        if to_version is None:
+            revisions = self.history(device, path)
+            if not revisions:
+                return []
+            to_version = revisions[-1]['version']
+        if from_version is None:
+            from_version = to_version - 1
+
+        old_lines = self.get_revision(device, path, from_version) or []
+        new_lines = self.get_revision(device, path, to_version)
+        if new_lines is None:
+            return []
+        return list(difflib.unified_diff(old_lines, new_lines, f"{path}@{from_version}",
+                                         f"{path}@{to_version}", lineterm=''))
+
+    # ------------------------------------------------------------------
+    # Retention
+    # ------------------------------------------------------------------
+
+    def prune(self, before, vacuum=True):
+        """
+        Drop history older than a cutoff while keeping every file reconstructible.
+
+        For each file, the newest revision older than the cutoff is rewritten
+        as a full snapshot and becomes the new base of the chain; everything
+        before it, and change index entries older than the cutoff, are deleted.
+
+        Args:
+            before (datetime or str): Cutoff time.
+            vacuum (bool): Whether to reclaim disk space afterwards.
+
+        Returns:
+            int: Number of revisions removed.
+        """
+        cutoff = self._timestamp(before)
+        conn = self._connect()
+        removed = 0
+        try:
+            # A file with a single old revision already starts from a full snapshot
+            bases = conn.execute('''
+                SELECT device, path, MAX(version) FROM revisions
+                WHERE created < ? GROUP BY device, path HAVING COUNT(*) > 1
+            ''', (cutoff,)).fetchall()
+
+            for device, path, base_version in bases:
+                lines = self._materialize(conn, device, path, base_version)
+                conn.execute('''
+                    UPDATE revisions SET kind = 'full', payload = ?
+                    WHERE device = ? AND path = ? AND version = ?
+                ''', (self._encode(lines), device, path, base_version))
+                removed += conn.execute('''
+                    DELETE FROM revisions WHERE device = ? AND path = ? AND version < ?
+                ''', (device, path, base_version)).rowcount
+
+            conn.execute('DELETE FROM changes WHERE created < ?', (cutoff,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        if vacuum and removed:
+            conn = self._connect()
+            try:
+                conn.execute('VACUUM')
+            finally:
+                conn.close()
+
+        self.logger.info(f"Pruned {removed} revisions older than {cutoff}")
+        return removed
+
+    def apply_retention(self, now=None):
+        """
+        Prune history older than the retention period and collect unneeded backups.
+
+        This reads every manifest and walks the object store, so it belongs
+        in a periodic maintenance pass rather than after each backup.
+
+        Backup objects holding the content of a full snapshot in the history
+        are kept, as are those of every remaining manifest.
+
+        Args:
+            now (datetime): Reference time (defaults to the current time).
+
+        Returns:
+            dict: Numbers of removed 'revisions', 'manifests' and 'objects',
+                or None if no retention period is set.
+        """
+        if self.retention_days is None:
+            return None
+        cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=self.retention_days)
+        removed = self.prune(cutoff, vacuum=False)
+
+        conn = self._connect()
+        try:
+            keyframes = [row[0] for row in conn.execute("SELECT DISTINCT sha256 FROM revisions WHERE kind = 'full'")]
+        finally:
+            conn.close()
+        result = self.store.collect_garbage(cutoff, keep=keyframes)
+        result['revisions'] = removed
+        return result
@@ -166,7 +166,7 @@ class InteractiveDashboard:
         if auth_method == "password":
             username = Prompt.ask("Enter username")
             password = Prompt.ask("Enter password", password=True)
-            self.manager.manage_device(ip_address, username, password)
+            self.manager.manage_device(ip_address, username, password, device_info)
         elif auth_method == "key":
             username = Prompt.ask("Enter username", default="admin")
             ssh_key_path = Prompt.ask("Enter path to SSH private key (or press Enter for auto-detection)", default="")
@@ -62,9 +62,10 @@ class EnhancedTerminalDashboard:
             self.console.print("6. Security Scan")
             self.console.print("7. Block Device Access")
             self.console.print("8. Unblock Device Access")
-            self.console.print("9. Exit")
+            self.console.print("9. Blocked Address Activity")
+            self.console.print("10. Exit")
             
-            choice = Prompt.ask("\nSelect an option", choices=["1", "2", "3", "4", "5", "6", "7", "8", "9"])
+            choice = Prompt.ask("\nSelect an option", choices=["1", "2", "3", "4", "5", "6", "7", "8", "9", "10"])
             
             if choice == '1':
                 self._show_network_overview()
@@ -83,6 +84,8 @@ class EnhancedTerminalDashboard:
             elif choice == '8':
                 self._unblock_device_access()
             elif choice == '9':
+                self._show_block_activity()
+            elif choice == '10':
                 self.console.print("[yellow]Exiting dashboard.[/yellow]")
                 break
     
@@ -359,7 +362,7 @@ class EnhancedTerminalDashboard:
             ) as progress:
                 progress.add_task(description="Managing device...", total=None)
                 time.sleep(2)  # Simulate management time
-                self.manager.manage_device(ip_address, username, password)
+                self.manager.manage_device(ip_address, username, password, device_info)
         elif auth_method == "key":
             username = Prompt.ask("Enter username", default="admin")
             ssh_key_path = Prompt.ask("Enter path to SSH private key (or press Enter for auto-detection)", default="")
@@ -536,6 +539,44 @@ class EnhancedTerminalDashboard:
         
         Prompt.ask("\nPress Enter to continue")
 
+    def _show_block_activity(self):
+        """Show blocked addresses sorted by dropped traffic, with an option to prune idle ones."""
+        self.console.print("\n[bold blue]Blocked Address Activity[/bold blue]")
+        self.console.print("=" * 50)
+        
+        blocker = self.manager.network_blocker
+        stats = blocker.get_block_stats()
+        if not stats:
+            self.console.print("[yellow]No addresses are blocked.[/yellow]")
+            Prompt.ask("\nPress Enter to continue")
+            return
+        
+        table = Table(show_header=True, header_style="bold magenta")
+        table.add_column("Blocked Entry", min_width=18)
+        table.add_column("Packets", justify="right")
+        table.add_column("Bytes", justify="right")
+        table.add_column("Idle", justify="right")
+        table.add_column("Expires", min_width=19)
+        
+        for stat in stats:
+            idle = stat['idle_seconds']
+            table.add_row(
+                stat['entry'],
+                "N/A" if stat['packets'] is None else str(stat['packets']),
+                "N/A" if stat['bytes'] is None else str(stat['bytes']),
+                "N/A" if idle is None else f"{int(idle)}s",
+                time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(stat['expires'])) if stat['expires'] else "Never"
+            )
+        
+        self.console.print(table)
+        self.console.print(f"\n[green]{len(stats)} blocked entries.[/green]")
+        
+        prune_choice = Prompt.ask("\nPrune entries idle for at least N hours (or 'back' to return)", default="back")
+        if prune_choice.replace('.', '', 1).isdigit() and float(prune_choice) > 0:
+            pruned = blocker.prune_stale_blocks(float(prune_choice) * 3600)
+            self.console.print(f"[green]Pruned {len(pruned)} idle entries.[/green]")
+            Prompt.ask("\nPress Enter to continue")
+
 if __name__ == '__main__':
     from scanner import NetworkScanner
     from manager import DeviceManager
@@ -0,0 +1,145 @@
+"""
+Network Management Tool - Expiry Scheduler Module
+
+This module provides ExpiryScheduler, which fires a callback when keys reach
+their expiry time. All keys share one min-heap and one background thread, so
+tens of thousands of short-lived entries cost O(log n) each to schedule and
+entries that expire together are handed to the callback as one batch.
+"""
+
+import heapq
+import logging
+import threading
+import time
+
+class ExpiryScheduler:
+    """Single-thread, heap-based expiry of keyed entries with batched callbacks."""
+
+    def __init__(self, callback, retry_interval=30, batch_window=1.0):
+        """
+        Initialize the scheduler.
+
+        Args:
+            callback (callable): Called with a list of expired keys. It returns
+                the keys it could not handle, which are retried later.
+            retry_interval (float): Seconds before retrying keys the callback returned.
+            batch_window (float): Keys expiring within this many seconds of the
+                first due key are included in the same batch.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.callback = callback
+        self.retry_interval = retry_interval
+        self.batch_window = batch_window
+        self._expiries = {}
+        self._heap = []
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def schedule(self, key, expires_at):
+        """
+        Set or replace the expiry time of a key.
+
+        Args:
+            key (str): The key.
+            expires_at (float): Expiry as a Unix timestamp.
+        """
+        with self._condition:
+            self._expiries[key] = expires_at
+            # Superseded heap items are skipped lazily when they surface
+            heapq.heappush(self._heap, (expires_at, key))
+            if self._heap[0] == (expires_at, key):
+                self._condition.notify()
+
+    def cancel(self, key):
+        """Stop tracking a key. Returns True if it was scheduled."""
+        with self._condition:
+            return self._expiries.pop(key, None) is not None
+
+    def get(self, key):
+        """Return the expiry timestamp of a key, or None."""
+        with self._condition:
+            return self._expiries.get(key)
+
+    def pending(self):
+        """Return a copy of the {key: expires_at} mapping."""
+        with self._condition:
+            return dict(self._expiries)
+
+    def __contains__(self, key):
+        with self._condition:
+            return key in self._expiries
+
+    def __len__(self):
+        with self._condition:
+            return len(self._expiries)
+
+    def _pop_due_locked(self, now):
+        """Pop the keys due by 'now' plus the batch window. The lock must be held."""
+        due = []
+        limit = now + self.batch_window if self._heap and self._heap[0][0] <= now else now
+        while self._heap and self._heap[0][0] <= limit:
+            expires_at, key = heapq.heappop(self._heap)
+            if self._expiries.get(key) == expires_at:
+                del self._expiries[key]
+                due.append(key)
+        return due
+
+    def pop_due(self, now=None):
+        """
+        Remove and return every key that has expired.
+
+        Args:
+            now (float): Reference time (defaults to the current time).
+
+        Returns:
+            list: The expired keys, earliest first.
+        """
+        with self._condition:
+            return self._pop_due_locked(time.time() if now is None else now)
+
+    def start(self):
+        """Start the background expiry thread if it is not running."""
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="expiry-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background expiry thread."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        """Background loop: sleep until the earliest expiry, then fire one batch."""
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    # Drop superseded items so the head is a live expiry
+                    while self._heap and self._expiries.get(self._heap[0][1]) != self._heap[0][0]:
+                        heapq.heappop(self._heap)
+                    delay = self._heap[0][0] - time.time() if self._heap else None
+                    if delay is not None and delay <= 0:
+                        break
+                    self._condition.wait(delay)
+                if self._stopped:
+                    return
+                due = self._pop_due_locked(time.time())
+
+            if not due:
+                continue
+            self.logger.info(f"Expiring {len(due)} entries")
+            try:
+                failed = self.callback(due) or []
+            except Exception as e:
+                self.logger.error(f"Error expiring entries: {e}")
+                failed = due
+            retry_at = time.time() + self.retry_interval
+            for key in failed:
+                self.schedule(key, retry_at)
@@ -0,0 +1,1287 @@
+"""
+Firewall Backends Module
+
+This module provides the firewall backends used by NetworkBlocker. Every
+backend implements the FirewallBackend interface: iptables, ipset and
+nftables on Linux, netsh on Windows, pf on macOS, and an in-memory simulated
+firewall for tests and benchmarks that need neither root nor a real firewall.
+
+Set-based backends (ipset, nftables) keep blocked addresses in a kernel hash
+set referenced by one constant rule per chain, so blocking and unblocking are
+O(1) set operations and packet matching cost does not grow with the
+blocklist. The per-address iptables backend remains as a fallback. Bulk
+changes go through iptables-restore, ipset restore or nft -f so a whole batch
+costs one process and is applied as a single transaction. Backends can also
+read the live ruleset once and reconcile it with the desired blocklist.
+"""
+
+import bisect
+import ipaddress
+import json
+import logging
+import math
+import os
+import platform
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+
+from .prefix_set import PrefixSet
+
+# A DROP rule as printed by iptables-save, e.g. "-A INPUT -s 10.0.0.1/32 -j DROP"
+IPTABLES_RULE = re.compile(r'^-A (\S+) (-s|-d) (\S+) -j DROP$')
+
+# A netsh rule name written by the blocker, e.g. "Rule Name:   Block 10.0.0.1 Out"
+NETSH_RULE_NAME = re.compile(r'^Rule Name:\s+Block (\S+?)( Out)?\s*$')
+
+# Blocked-traffic counters of one address in 'pfctl -T show -v' output
+PF_BLOCK_COUNTERS = re.compile(r'^(?:In|Out)/Block:\s+\[\s*Packets:\s*(\d+)\s+Bytes:\s*(\d+)\s*\]')
+
+# Startup scripts are written to the project root
+STARTUP_SCRIPT_DIR = os.path.join(os.path.dirname(__file__), "..", "..")
+
+# Bit of CAP_NET_ADMIN in the capability masks of /proc/<pid>/status
+CAP_NET_ADMIN = 12
+
+def has_net_admin():
+    """
+    Check whether the process may administer the network stack (Linux).
+
+    Uses the effective UID and the CapEff mask in /proc/self/status, so no
+    firewall command is run.
+
+    Returns:
+        bool: True if the process is root or holds CAP_NET_ADMIN, None if
+            this cannot be determined (e.g. not Linux).
+    """
+    if not hasattr(os, 'geteuid'):
+        return None
+    if os.geteuid() == 0:
+        return True
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('CapEff:'):
+                    return bool(int(line.split()[1], 16) >> CAP_NET_ADMIN & 1)
+    except (OSError, ValueError):
+        return None
+    return False
+
+def normalize_prefix(text):
+    """Return a prefix in the blocker's canonical form (bare address for hosts)."""
+    return PrefixSet.format(ipaddress.ip_network(text, strict=False))
+
+class FirewallBackend(ABC):
+    """
+    Interface implemented by every firewall backend.
+
+    Subclasses implement block() and unblock(); batch operations, prefix
+    changes and reconciliation have generic defaults that backends with a
+    batch interface override.
+    """
+
+    name = 'base'
+    # Cheap command whose success shows the process may change the firewall
+    PRIVILEGE_PROBE = None
+    # Linux backends cannot work without root or CAP_NET_ADMIN
+    NEEDS_NET_ADMIN = False
+
+    def __init__(self):
+        """Initialize the backend."""
+        self.logger = logging.getLogger(__name__)
+
+    def _run(self, cmd, description, input_text=None, quiet=False):
+        """
+        Run a firewall command.
+
+        Args:
+            cmd (list): The command to execute.
+            description (str): Description of the command for logging.
+            input_text (str): Text passed on stdin (optional).
+            quiet (bool): Log failures at debug level (for probes expected to fail).
+
+        Returns:
+            bool: True if the command succeeded, False otherwise.
+        """
+        try:
+            if not quiet:
+                self.logger.info(f"Executing {description}: {' '.join(cmd)}")
+            result = subprocess.run(cmd, input=input_text, capture_output=True, text=True)
+            if result.returncode == 0:
+                return True
+            if quiet:
+                self.logger.debug(f"{description} failed: {result.stderr.strip()}")
+            else:
+                self.logger.error(f"Failed to execute {description}. Error: {result.stderr}")
+                print(f"Error executing {description}: {result.stderr}")
+            return False
+        except Exception as e:
+            self.logger.error(f"Exception while executing {description}: {e}")
+            print(f"Exception while executing {description}: {e}")
+            return False
+
+    def _capture(self, cmd, description):
+        """
+        Run a read-only command and return its output.
+
+        Args:
+            cmd (list): The command to execute.
+            description (str): Description of the command for logging.
+
+        Returns:
+            str: The command's stdout, or None if it failed.
+        """
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            if result.returncode == 0:
+                return result.stdout
+            self.logger.warning(f"Failed to execute {description}. Error: {result.stderr.strip()}")
+        except Exception as e:
+            self.logger.warning(f"Exception while executing {description}: {e}")
+        return None
+
+    @staticmethod
+    def _family(address):
+        """Return 4 or 6 for an address or network string."""
+        return ipaddress.ip_network(address, strict=False).version
+
+    @classmethod
+    def available(cls):
+        """Return True if the backend's tools are installed."""
+        return False
+
+    def check_privileges(self):
+        """
+        Check whether the process may change this firewall.
+
+        Linux backends are ruled out without running anything when the
+        process has neither root nor CAP_NET_ADMIN.
+
+        Returns:
+            bool: True if the privilege probe command succeeded.
+        """
+        if self.NEEDS_NET_ADMIN and has_net_admin() is False:
+            return False
+        if self.PRIVILEGE_PROBE is None:
+            return True
+        return self._capture(self.PRIVILEGE_PROBE, f"{self.name} privilege check") is not None
+
+    def prepare(self):
+        """
+        Create any sets, tables and rules the backend needs.
+
+        Returns:
+            bool: True if the backend is ready to use.
+        """
+        return True
+
+    def persist(self, addresses):
+        """
+        Make the permanent blocklist survive a reboot.
+
+        Startup scripts are rewritten from 'addresses' on every call, so
+        unblocked entries do not come back and the script does not grow.
+        Backends whose state is rebuilt from the blocklist by
+        restore_blocked_ips need nothing here.
+
+        Args:
+            addresses (list): Every permanently blocked prefix.
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+        return True
+
+    @abstractmethod
+    def block(self, address):
+        """Block an address. Returns True on success."""
+
+    @abstractmethod
+    def unblock(self, address):
+        """Unblock an address. Returns True on success."""
+
+    def block_many(self, addresses):
+        """
+        Block several addresses in one transaction.
+
+        The default implementation blocks one address at a time; backends
+        with a batch interface override it.
+
+        Args:
+            addresses (list): Validated addresses to block.
+
+        Returns:
+            bool: True if every address was blocked.
+        """
+        return all([self.block(address) for address in addresses])
+
+    def unblock_many(self, addresses):
+        """
+        Unblock several addresses in one transaction.
+
+        Args:
+            addresses (list): Validated addresses to unblock.
+
+        Returns:
+            bool: True if every address was unblocked.
+        """
+        return all([self.unblock(address) for address in addresses])
+
+    def apply(self, added, removed):
+        """
+        Apply a prefix set change: block 'added', then unblock 'removed'.
+
+        Blocking first means aggregated prefixes never leave a gap while
+        their old sub-prefixes are being removed.
+
+        Args:
+            added (list): Prefixes to block.
+            removed (list): Prefixes to unblock.
+
+        Returns:
+            bool: True if the whole change was applied.
+        """
+        if added and not self.block_many(added):
+            return False
+        return not removed or self.unblock_many(removed)
+
+    def read_installed(self):
+        """
+        Read the prefixes currently installed in the firewall.
+
+        Returns:
+            Counter: {prefix: copies}, or None if the live state cannot be read.
+        """
+        return None
+
+    def read_counters(self):
+        """
+        Read the packet and byte counters of the installed prefixes in one call.
+
+        Returns:
+            dict: {prefix: (packets, bytes)} summed over every rule or set
+                element of the prefix, or None if the backend has no counters.
+        """
+        return None
+
+    def reconcile(self, desired):
+        """
+        Make the live firewall match the desired prefixes with a minimal change.
+
+        The live state is read once, diffed against 'desired', and only the
+        difference is applied, so the cost follows the drift rather than the
+        size of the blocklist, and running it twice changes nothing.
+
+        Args:
+            desired (list): Every prefix that should be blocked.
+
+        Returns:
+            tuple: (added, removed) prefixes, or None if the live state could
+                not be read or the change could not be applied.
+        """
+        installed = self.read_installed()
+        if installed is None:
+            return None
+        desired_set = set(desired)
+        added = [prefix for prefix in desired if prefix not in installed]
+        removed = sorted(prefix for prefix in installed if prefix not in desired_set)
+        if (added or removed) and not self.apply(added, removed):
+            return None
+        return added, removed
+
+    @classmethod
+    def _by_family(cls, addresses):
+        """Group addresses into {4: [...], 6: [...]}, dropping empty families."""
+        groups = {4: [], 6: []}
+        for address in addresses:
+            groups[cls._family(address)].append(address)
+        return {family: group for family, group in groups.items() if group}
+
+class IptablesBackend(FirewallBackend):
+    """One DROP rule per address and chain (linear match cost)."""
+
+    name = 'iptables'
+    # Lists at most one rule, unlike 'iptables -L' which prints every chain
+    PRIVILEGE_PROBE = ['iptables', '-S', 'INPUT', '1']
+    NEEDS_NET_ADMIN = True
+    CHAINS = [('INPUT', '-s'), ('OUTPUT', '-d'), ('FORWARD', '-s')]
+
+    @classmethod
+    def available(cls):
+        return shutil.which('iptables') is not None
+
+    def _rules(self, address):
+        """Return (chain, direction flag) pairs used for an address."""
+        return self.CHAINS
+
+    def block(self, address):
+        tool = 'ip6tables' if self._family(address) == 6 else 'iptables'
+        rules = self._rules(address)
+        chain, flag = rules[0]
+        if not self._run([tool, '-A', chain, flag, address, '-j', 'DROP'],
+                         f"Linux iptables {chain} rule for {address}"):
+            return False
+        # Outgoing and forwarded traffic are best effort, as before
+        for chain, flag in rules[1:]:
+            self._run([tool, '-A', chain, flag, address, '-j', 'DROP'],
+                      f"Linux iptables {chain} rule for {address}")
+        return True
+
+    def unblock(self, address):
+        tool = 'ip6tables' if self._family(address) == 6 else 'iptables'
+        success = True
+        for chain, flag in self._rules(address):
+            cmd = [tool, '-D', chain, flag, address, '-j', 'DROP']
+            if not self._run(cmd, f"Linux iptables delete rule: {' '.join(cmd)}"):
+                self.logger.warning(f"Failed to execute: Linux iptables delete rule: {' '.join(cmd)}")
+                success = False
+        return success
+
+    def persist(self, addresses):
+        try:
+            # For Linux, we'll save the rules to iptables-persistent or create a startup script
+            if shutil.which('iptables-save'):
+                # Save current iptables rules
+                self._run(['iptables-save'], "iptables rules save")
+                self.logger.info("Saved iptables rules to persistent storage")
+            else:
+                # Create a startup script
+                startup_script = os.path.join(STARTUP_SCRIPT_DIR, "restore_blocked_ips.sh")
+                script_content = "#!/bin/bash\n"
+                for address in addresses:
+                    script_content += f"""iptables -A INPUT -s {address} -j DROP
+iptables -A OUTPUT -d {address} -j DROP
+iptables -A FORWARD -s {address} -j DROP
+"""
+                with open(startup_script, 'w') as f:
+                    f.write(script_content)
+                os.chmod(startup_script, 0o755)
+            return True
+        except Exception as e:
+            self.logger.error(f"Error creating Linux startup script: {e}")
+            return False
+
+    def _read_rules(self):
+        """
+        Read the installed blocker rules with one iptables-save per family.
+
+        DROP rules of the exact shape this backend writes (INPUT -s, OUTPUT -d,
+        FORWARD -s) are treated as managed by the blocker.
+
+        Returns:
+            Counter: {(chain, flag, prefix): copies}, or None if the ruleset
+                cannot be read.
+        """
+        rules = Counter()
+        for tool in ('iptables-save', 'ip6tables-save'):
+            if tool == 'ip6tables-save' and shutil.which(tool) is None:
+                continue
+            output = self._capture([tool, '-t', 'filter'], f"{tool} read")
+            if output is None:
+                if tool == 'iptables-save':
+                    return None
+                continue
+            for line in output.splitlines():
+                match = IPTABLES_RULE.match(line.strip())
+                if match and (match.group(1), match.group(2)) in self.CHAINS:
+                    rules[(match.group(1), match.group(2), normalize_prefix(match.group(3)))] += 1
+        return rules
+
+    def read_counters(self):
+        # 'iptables -vnxL' prints exact counters for every rule in one call:
+        # "pkts bytes target prot opt in out source destination [matches]"
+        counters = {}
+        columns = {'-s': -2, '-d': -1}
+        rules = dict(self.CHAINS)
+        for tool in ('iptables', 'ip6tables'):
+            if tool == 'ip6tables' and shutil.which(tool) is None:
+                continue
+            output = self._capture([tool, '-t', 'filter', '-vnxL'], f"{tool} counters")
+            if output is None:
+                if tool == 'iptables':
+                    return None
+                continue
+            chain = None
+            for line in output.splitlines():
+                parts = line.split()
+                if parts[:1] == ['Chain']:
+                    chain = parts[1]
+                    continue
+                # ip6tables leaves the 'opt' column empty, so rules have 8 or 9
+                # fields; anything longer carries extra matches and is not ours
+                if (chain not in rules or len(parts) not in (8, 9) or parts[2] != 'DROP'
+                        or parts[3] not in ('all', '0') or not parts[0].isdigit()):
+                    continue
+                try:
+                    prefix = normalize_prefix(parts[columns[rules[chain]]])
+                except ValueError:
+                    continue
+                packets, size = counters.get(prefix, (0, 0))
+                counters[prefix] = (packets + int(parts[0]), size + int(parts[1]))
+        return counters
+
+    def _ruleset(self, changes):
+        """Build iptables-restore input for (action, chain, flag, prefix) changes."""
+        lines = ['*filter']
+        lines += [f"{action} {chain} {flag} {prefix} -j DROP" for action, chain, flag, prefix in changes]
+        lines.append('COMMIT')
+        return '\n'.join(lines) + '\n'
+
+    def _commit(self, changes):
+        """
+        Apply rule changes with iptables-restore.
+
+        Each address family is one iptables-restore transaction. If the IPv6
+        transaction fails after the IPv4 one was committed, the IPv4 change
+        is reverted so the batch is all-or-nothing.
+
+        Args:
+            changes (list): (action, chain, flag, prefix) tuples, action being '-A' or '-D'.
+
+        Returns:
+            bool: True if the whole batch was applied.
+        """
+        inverse = {'-A': '-D', '-D': '-A'}
+        groups = {4: [], 6: []}
+        for change in changes:
+            groups[self._family(change[3])].append(change)
+
+        applied = []
+        for family, group in groups.items():
+            if not group:
+                continue
+            tool = 'ip6tables-restore' if family == 6 else 'iptables-restore'
+            if self._run([tool, '--noflush'], f"{tool} batch of {len(group)} rule changes",
+                         input_text=self._ruleset(group)):
+                applied.append((tool, group))
+                continue
+            for applied_tool, applied_group in applied:
+                rollback = [(inverse[action], chain, flag, prefix)
+                            for action, chain, flag, prefix in reversed(applied_group)]
+                self._run([applied_tool, '--noflush'], f"{applied_tool} rollback",
+                          input_text=self._ruleset(rollback))
+            return False
+        return True
+
+    def block_many(self, addresses):
+        # Rules that are already installed are not added again
+        installed = self._read_rules() or Counter()
+        changes = [('-A', chain, flag, address) for address in addresses
+                   for chain, flag in self._rules(address) if not installed[(chain, flag, address)]]
+        return not changes or self._commit(changes)
+
+    def unblock_many(self, addresses):
+        installed = self._read_rules()
+        if installed is None:
+            # The ruleset cannot be read, so delete one copy of each rule
+            changes = [('-D', chain, flag, address) for address in addresses
+                       for chain, flag in self._rules(address)]
+            if self._commit(changes):
+                return True
+            # A delete transaction fails as a whole if any rule is already gone;
+            # fall back to removing what is there, one address at a time
+            self.logger.warning("Batch rule removal failed, removing addresses individually")
+            return super().unblock_many(addresses)
+
+        # Every installed copy is deleted, so duplicates cannot keep an address blocked
+        changes = [('-D', chain, flag, address) for address in addresses
+                   for chain, flag in self._rules(address)
+                   for _ in range(installed[(chain, flag, address)])]
+        return not changes or self._commit(changes)
+
+    def apply(self, added, removed):
+        # Additions and removals share one iptables-restore transaction, so
+        # an aggregate and the sub-prefixes it replaces swap atomically
+        installed = self._read_rules()
+        if installed is None:
+            return super().apply(added, removed)
+        changes = [('-A', chain, flag, address) for address in added
+                   for chain, flag in self._rules(address) if not installed[(chain, flag, address)]]
+        changes += [('-D', chain, flag, address) for address in removed
+                    for chain, flag in self._rules(address)
+                    for _ in range(installed[(chain, flag, address)])]
+        return not changes or self._commit(changes)
+
+    def reconcile(self, desired):
+        installed = self._read_rules()
+        if installed is None:
+            return None
+        wanted = {(chain, flag, prefix) for prefix in desired for chain, flag in self._rules(prefix)}
+
+        changes = [('-A',) + rule for rule in sorted(wanted) if not installed[rule]]
+        for rule, copies in installed.items():
+            # Stale rules go entirely; wanted rules keep exactly one copy
+            extra = copies - (1 if rule in wanted else 0)
+            changes.extend([('-D',) + rule] * extra)
+
+        if changes and not self._commit(changes):
+            return None
+        desired = set(desired)
+        added = sorted({prefix for action, _, _, prefix in changes if action == '-A'})
+        removed = sorted({prefix for action, _, _, prefix in changes
+                          if action == '-D' and prefix not in desired})
+        return added, removed
+
+class SetBackend(FirewallBackend):
+    """
+    Base of the set-based backends.
+
+    Hosts that ran the per-address iptables backend may still carry its
+    DROP rules, which would keep dropping an address after it leaves the
+    set. They are moved into the set on the first reconcile; until then,
+    removing a prefix also deletes its legacy rules.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._legacy = IptablesBackend()
+        self._legacy_migrated = False
+
+    def _legacy_rules(self, prefixes=None):
+        """
+        Read the DROP rules left by the per-address iptables backend.
+
+        Args:
+            prefixes (list): Only return rules of these prefixes (optional).
+
+        Returns:
+            Counter: {(chain, flag, prefix): copies}, or None if the ruleset
+                cannot be read.
+        """
+        if not IptablesBackend.available():
+            return Counter()
+        rules = self._legacy._read_rules()
+        if rules is None or prefixes is None:
+            return rules
+        prefixes = set(prefixes)
+        return Counter({rule: copies for rule, copies in rules.items() if rule[2] in prefixes})
+
+    def _delete_legacy(self, rules):
+        """Delete every copy of the given legacy rules in one transaction."""
+        changes = [('-D',) + rule for rule, copies in sorted(rules.items()) for _ in range(copies)]
+        return not changes or self._legacy._commit(changes)
+
+    def _remove_legacy(self, prefixes):
+        """
+        Delete the legacy iptables rules of prefixes leaving the set.
+
+        Args:
+            prefixes (list): Prefixes that were just unblocked.
+
+        Returns:
+            bool: True if no legacy rule of the prefixes is left.
+        """
+        if self._legacy_migrated or not prefixes:
+            return True
+        rules = self._legacy_rules(prefixes)
+        return rules is not None and self._delete_legacy(rules)
+
+    def migrate_legacy_rules(self):
+        """
+        Move the per-address iptables DROP rules into the set.
+
+        The prefixes are added to the set before their rules are deleted,
+        so they stay blocked throughout.
+
+        Returns:
+            list: The imported prefixes, or None if the migration failed.
+        """
+        rules = self._legacy_rules()
+        if rules is None:
+            return None
+        prefixes = sorted({prefix for _, _, prefix in rules})
+        if prefixes:
+            if not self.block_many(prefixes) or not self._delete_legacy(rules):
+                return None
+            self.logger.info(f"Moved {len(prefixes)} prefixes from legacy iptables rules into the {self.name} set")
+        self._legacy_migrated = True
+        return prefixes
+
+    def reconcile(self, desired):
+        # Imported prefixes that are not in 'desired' are removed below like any stale entry
+        if not self._legacy_migrated and self.migrate_legacy_rules() is None:
+            return None
+        return super().reconcile(desired)
+
+class IpsetBackend(SetBackend):
+    """ipset hash:net sets referenced by one iptables rule per chain."""
+
+    name = 'ipset'
+    PRIVILEGE_PROBE = ['iptables', '-S', 'INPUT', '1']
+    NEEDS_NET_ADMIN = True
+    SET_NAMES = {4: 'nmt_blocked', 6: 'nmt_blocked6'}
+
+    @classmethod
+    def available(cls):
+        return shutil.which('ipset') is not None and shutil.which('iptables') is not None
+
+    def prepare(self):
+        for family, set_name in self.SET_NAMES.items():
+            tool = 'ip6tables' if family == 6 else 'iptables'
+            if family == 6 and shutil.which(tool) is None:
+                continue
+            inet = 'inet6' if family == 6 else 'inet'
+            if not self._run(['ipset', 'create', set_name, 'hash:net', 'family', inet, 'counters', '-exist'],
+                             f"ipset create {set_name}"):
+                return False
+            for chain, direction in (('INPUT', 'src'), ('OUTPUT', 'dst'), ('FORWARD', 'src')):
+                rule = [chain, '-m', 'set', '--match-set', set_name, direction, '-j', 'DROP']
+                if not self._run([tool, '-C'] + rule, f"{tool} check {chain} set rule", quiet=True):
+                    if not self._run([tool, '-I'] + rule, f"{tool} {chain} set rule for {set_name}"):
+                        return False
+        return True
+
+    def block(self, address):
+        set_name = self.SET_NAMES[self._family(address)]
+        return self._run(['ipset', 'add', set_name, address, '-exist'], f"ipset add {address}")
+
+    def unblock(self, address):
+        set_name = self.SET_NAMES[self._family(address)]
+        return (self._run(['ipset', 'del', set_name, address, '-exist'], f"ipset del {address}")
+                and self._remove_legacy([address]))
+
+    def _read_sets(self):
+        """
+        Read both sets with 'ipset save'.
+
+        Returns:
+            list: (prefix, packets, bytes) per element, with zero counters for
+                sets created without them, or None if the sets cannot be read.
+        """
+        elements = []
+        for family, set_name in self.SET_NAMES.items():
+            output = self._capture(['ipset', 'save', set_name], f"ipset save {set_name}")
+            if output is None:
+                if family == 4:
+                    return None
+                continue
+            for line in output.splitlines():
+                parts = line.split()
+                if len(parts) >= 3 and parts[0] == 'add' and parts[1] == set_name:
+                    # e.g. "add nmt_blocked 10.0.0.1 packets 12 bytes 720"
+                    options = dict(zip(parts[3::2], parts[4::2]))
+                    elements.append((normalize_prefix(parts[2]),
+                                     int(options.get('packets', 0)), int(options.get('bytes', 0))))
+        return elements
+
+    def read_installed(self):
+        elements = self._read_sets()
+        if elements is None:
+            return None
+        return Counter(prefix for prefix, _, _ in elements)
+
+    def read_counters(self):
+        elements = self._read_sets()
+        if elements is None:
+            return None
+        return {prefix: (packets, size) for prefix, packets, size in elements}
+
+    def _restore(self, addresses, action):
+        """Apply 'add' or 'del' for many addresses with one 'ipset restore'."""
+        lines = [f"{action} {self.SET_NAMES[self._family(address)]} {address}" for address in addresses]
+        return self._run(['ipset', 'restore', '-exist'], f"ipset {action} batch of {len(lines)} addresses",
+                         input_text='\n'.join(lines) + '\n')
+
+    def block_many(self, addresses):
+        return self._restore(addresses, 'add')
+
+    def unblock_many(self, addresses):
+        return self._restore(addresses, 'del') and self._remove_legacy(addresses)
+
+    def apply(self, added, removed):
+        lines = [f"add {self.SET_NAMES[self._family(address)]} {address}" for address in added]
+        lines += [f"del {self.SET_NAMES[self._family(address)]} {address}" for address in removed]
+        if not lines:
+            return True
+        return (self._run(['ipset', 'restore', '-exist'], f"ipset batch of {len(lines)} changes",
+                          input_text='\n'.join(lines) + '\n')
+                and self._remove_legacy(removed))
+
+class NftablesBackend(SetBackend):
+    """nftables interval sets in a dedicated table with one rule per chain."""
+
+    name = 'nftables'
+    PRIVILEGE_PROBE = ['nft', 'list', 'tables']
+    NEEDS_NET_ADMIN = True
+    TABLE = 'nmt_blocker'
+    SET_NAMES = {4: 'blocked_v4', 6: 'blocked_v6'}
+
+    @classmethod
+    def available(cls):
+        return shutil.which('nft') is not None
+
+    def prepare(self):
+        # Chains are flushed and refilled so rules never stack; the sets
+        # (and the addresses in them) are left untouched.
+        script = f"""add table inet {self.TABLE}
+add set inet {self.TABLE} blocked_v4 {{ type ipv4_addr; flags interval; counter; }}
+add set inet {self.TABLE} blocked_v6 {{ type ipv6_addr; flags interval; counter; }}
+add chain inet {self.TABLE} input {{ type filter hook input priority -10; policy accept; }}
+add chain inet {self.TABLE} output {{ type filter hook output priority -10; policy accept; }}
+add chain inet {self.TABLE} forward {{ type filter hook forward priority -10; policy accept; }}
+flush chain inet {self.TABLE} input
+flush chain inet {self.TABLE} output
+flush chain inet {self.TABLE} forward
+add rule inet {self.TABLE} input ip saddr @blocked_v4 drop
+add rule inet {self.TABLE} input ip6 saddr @blocked_v6 drop
+add rule inet {self.TABLE} output ip daddr @blocked_v4 drop
+add rule inet {self.TABLE} output ip6 daddr @blocked_v6 drop
+add rule inet {self.TABLE} forward ip saddr @blocked_v4 drop
+add rule inet {self.TABLE} forward ip6 saddr @blocked_v6 drop
+"""
+        return self._run(['nft', '-f', '-'], f"nftables table {self.TABLE} setup", input_text=script)
+
+    def block(self, address):
+        set_name = self.SET_NAMES[self._family(address)]
+        return self._run(['nft', 'add', 'element', 'inet', self.TABLE, set_name, f'{{ {address} }}'],
+                         f"nftables add {address}")
+
+    def unblock(self, address):
+        set_name = self.SET_NAMES[self._family(address)]
+        cmd = ['nft', 'delete', 'element', 'inet', self.TABLE, set_name, f'{{ {address} }}']
+        # Deleting an element that is not in the set fails; that still means "not blocked"
+        if not (self._run(cmd, f"nftables delete {address}", quiet=True)
+                or self._run(['nft', 'list', 'set', 'inet', self.TABLE, set_name], "nftables set check", quiet=True)):
+            return False
+        return self._remove_legacy([address])
+
+    def _read_sets(self):
+        """
+        Read both sets with 'nft -j list set'.
+
+        Returns:
+            list: (prefixes, counter dict) per element, or None if the sets
+                cannot be read.
+        """
+        elements = []
+        for set_name in self.SET_NAMES.values():
+            output = self._capture(['nft', '-j', 'list', 'set', 'inet', self.TABLE, set_name],
+                                   f"nftables list set {set_name}")
+            if output is None:
+                return None
+            try:
+                objects = json.loads(output).get('nftables', [])
+            except ValueError:
+                self.logger.warning(f"Unreadable nftables JSON for set {set_name}")
+                return None
+            for obj in objects:
+                for element in obj.get('set', {}).get('elem', []):
+                    counter = {}
+                    if isinstance(element, dict) and 'elem' in element:
+                        # Elements carrying counters or timeouts are wrapped
+                        counter = element['elem'].get('counter', {})
+                        element = element['elem'].get('val')
+                    elements.append((self._parse_element(element), counter))
+        return elements
+
+    def read_installed(self):
+        elements = self._read_sets()
+        if elements is None:
+            return None
+        return Counter(prefix for prefixes, _ in elements for prefix in prefixes)
+
+    def read_counters(self):
+        elements = self._read_sets()
+        if elements is None:
+            return None
+        counters = {}
+        for prefixes, counter in elements:
+            for index, prefix in enumerate(prefixes):
+                # A range spanning several prefixes has one counter; it is
+                # reported on the first prefix so totals stay correct
+                counters[prefix] = ((counter.get('packets', 0), counter.get('bytes', 0)) if index == 0
+                                    else (0, 0))
+        return counters
+
+    @staticmethod
+    def _parse_element(element):
+        """Return the prefixes of one element of 'nft -j list set' output."""
+        if isinstance(element, dict) and 'elem' in element:
+            element = element['elem'].get('val')
+        if isinstance(element, str):
+            return [normalize_prefix(element)]
+        if isinstance(element, dict) and 'prefix' in element:
+            return [normalize_prefix(f"{element['prefix']['addr']}/{element['prefix']['len']}")]
+        if isinstance(element, dict) and 'range' in element:
+            first, last = (ipaddress.ip_address(address) for address in element['range'])
+            return [PrefixSet.format(network) for network in ipaddress.summarize_address_range(first, last)]
+        return []
+
+    def _elements(self, verb, addresses):
+        """Build 'add element' / 'delete element' lines, one per family set."""
+        return [f"{verb} element inet {self.TABLE} {self.SET_NAMES[family]} {{ {', '.join(group)} }}"
+                for family, group in self._by_family(addresses).items()]
+
+    def block_many(self, addresses):
+        # 'nft -f' applies the whole file as one transaction
+        script = '\n'.join(self._elements('add', addresses)) + '\n'
+        return self._run(['nft', '-f', '-'], f"nftables add batch of {len(addresses)} addresses",
+                         input_text=script)
+
+    def unblock_many(self, addresses):
+        # Adding before deleting makes the delete succeed for addresses that
+        # are already absent, without breaking the single transaction
+        script = '\n'.join(self._elements('add', addresses) + self._elements('delete', addresses)) + '\n'
+        return (self._run(['nft', '-f', '-'], f"nftables delete batch of {len(addresses)} addresses",
+                          input_text=script)
+                and self._remove_legacy(addresses))
+
+    def apply(self, added, removed):
+        # Interval sets reject overlapping elements, so sub-prefixes replaced
+        # by an aggregate are deleted before it is added, in one transaction
+        lines = self._elements('delete', removed) + self._elements('add', added)
+        if not lines:
+            return True
+        return (self._run(['nft', '-f', '-'], f"nftables batch of {len(added) + len(removed)} changes",
+                          input_text='\n'.join(lines) + '\n')
+                and self._remove_legacy(removed))
+
+class NetshBackend(FirewallBackend):
+    """Windows Firewall rules named "Block <prefix>" and "Block <prefix> Out"."""
+
+    name = 'netsh'
+    PRIVILEGE_PROBE = ['netsh', 'advfirewall', 'show', 'currentprofile', 'state']
+
+    @classmethod
+    def available(cls):
+        return shutil.which('netsh') is not None
+
+    @staticmethod
+    def _add_commands(address):
+        return [f'advfirewall firewall add rule name="Block {address}" dir=in action=block remoteip={address}',
+                f'advfirewall firewall add rule name="Block {address} Out" dir=out action=block remoteip={address}']
+
+    @staticmethod
+    def _delete_commands(address):
+        # 'delete rule name=' removes every rule with that name
+        return [f'advfirewall firewall delete rule name="Block {address}"',
+                f'advfirewall firewall delete rule name="Block {address} Out"']
+
+    def _run_batch(self, commands, description):
+        """
+        Run many netsh commands in one netsh process using 'netsh -f'.
+
+        Args:
+            commands (list): netsh commands without the leading 'netsh'.
+            description (str): Description of the batch for logging.
+
+        Returns:
+            bool: True if the batch was successful, False otherwise.
+        """
+        if not commands:
+            return True
+        fd, script_path = tempfile.mkstemp(suffix='.netsh')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write('\n'.join(commands) + '\n')
+            return self._run(['netsh', '-f', script_path], description)
+        finally:
+            os.remove(script_path)
+
+    def block(self, address):
+        return self._run_batch(self._add_commands(address), f"Windows firewall block rules for {address}")
+
+    def unblock(self, address):
+        return self._run_batch(self._delete_commands(address), f"Windows firewall delete rules for {address}")
+
+    def apply(self, added, removed):
+        # New rules are added before old ones are deleted so there is no gap
+        commands = [command for address in added for command in self._add_commands(address)]
+        commands += [command for address in removed for command in self._delete_commands(address)]
+        return self._run_batch(commands, f"Windows firewall batch of {len(added)} blocks and {len(removed)} unblocks")
+
+    def block_many(self, addresses):
+        return self.apply(addresses, [])
+
+    def unblock_many(self, addresses):
+        return self.apply([], addresses)
+
+    def _read_rules(self):
+        """
+        Read the blocker's rules with one netsh call.
+
+        Returns:
+            Counter: {(prefix, direction): copies} with direction 'in' or 'out',
+                or None if the rules cannot be read.
+        """
+        output = self._capture(['netsh', 'advfirewall', 'firewall', 'show', 'rule', 'name=all'],
+                               "Windows firewall rule listing")
+        if output is None:
+            return None
+        rules = Counter()
+        for line in output.splitlines():
+            match = NETSH_RULE_NAME.match(line.strip())
+            if not match:
+                continue
+            try:
+                prefix = normalize_prefix(match.group(1))
+            except ValueError:
+                continue
+            rules[(prefix, 'out' if match.group(2) else 'in')] += 1
+        return rules
+
+    def read_installed(self):
+        rules = self._read_rules()
+        if rules is None:
+            return None
+        installed = Counter()
+        for (prefix, _), copies in rules.items():
+            installed[prefix] = max(installed[prefix], copies)
+        return installed
+
+    def reconcile(self, desired):
+        # Prefixes with a missing or duplicated rule are deleted by name and
+        # added once; prefixes that are no longer wanted lose their rules
+        rules = self._read_rules()
+        if rules is None:
+            return None
+        installed = {prefix for prefix, _ in rules}
+        desired_set = set(desired)
+        repair = [prefix for prefix in desired if rules[(prefix, 'in')] != 1 or rules[(prefix, 'out')] != 1]
+        removed = sorted(installed - desired_set)
+
+        commands = []
+        for address in removed + [prefix for prefix in repair if prefix in installed]:
+            commands.extend(self._delete_commands(address))
+        for address in repair:
+            commands.extend(self._add_commands(address))
+        if not self._run_batch(commands, f"Windows firewall reconcile of {len(commands)} rules"):
+            return None
+        return [prefix for prefix in repair if prefix not in installed], removed
+
+    def persist(self, addresses):
+        try:
+            # Windows firewall rules are persistent by default
+            # But we'll also create a startup script to ensure rules are re-added
+            startup_script = os.path.join(STARTUP_SCRIPT_DIR, "restore_blocked_ips.bat")
+            with open(startup_script, 'w') as f:
+                for address in addresses:
+                    for command in self._add_commands(address):
+                        f.write(f'netsh {command}\n')
+            self.logger.info(f"Wrote {len(addresses)} IPs to Windows startup script")
+            return True
+        except Exception as e:
+            self.logger.error(f"Error creating Windows startup script: {e}")
+            return False
+
+class PfBackend(FirewallBackend):
+    """pf table <nmt_blocked> referenced by one block rule per direction (macOS/BSD)."""
+
+    name = 'pf'
+    # Status only; '-sr' would print the whole ruleset
+    PRIVILEGE_PROBE = ['pfctl', '-s', 'info']
+    TABLE = 'nmt_blocked'
+
+    @classmethod
+    def available(cls):
+        return shutil.which('pfctl') is not None
+
+    def prepare(self):
+        rules = (f"table <{self.TABLE}> persist counters\n"
+                 f"block in from <{self.TABLE}> to any\n"
+                 f"block out from any to <{self.TABLE}>\n")
+        return self._run(['pfctl', '-f', '-'], "macOS pf blocklist rules", input_text=rules)
+
+    def _table(self, command, addresses, description):
+        return self._run(['pfctl', '-t', self.TABLE, '-T', command] + list(addresses), description)
+
+    def block(self, address):
+        return self.block_many([address])
+
+    def unblock(self, address):
+        return self.unblock_many([address])
+
+    def block_many(self, addresses):
+        return self._table('add', addresses, f"macOS pf table add of {len(addresses)} addresses")
+
+    def unblock_many(self, addresses):
+        return self._table('delete', addresses, f"macOS pf table delete of {len(addresses)} addresses")
+
+    def read_installed(self):
+        output = self._capture(['pfctl', '-t', self.TABLE, '-T', 'show'], "macOS pf table listing")
+        if output is None:
+            return None
+        return Counter(normalize_prefix(line.strip()) for line in output.splitlines() if line.strip())
+
+    def read_counters(self):
+        # '-T show -v' prints each address followed by indented counter lines,
+        # e.g. "In/Block:    [ Packets: 3    Bytes: 180    ]"
+        output = self._capture(['pfctl', '-t', self.TABLE, '-T', 'show', '-v'], "macOS pf table counters")
+        if output is None:
+            return None
+        counters = {}
+        prefix = None
+        for line in output.splitlines():
+            text = line.strip()
+            match = PF_BLOCK_COUNTERS.match(text)
+            if not match:
+                try:
+                    prefix = normalize_prefix(text)
+                    counters[prefix] = (0, 0)
+                except ValueError:
+                    pass
+            elif prefix is not None:
+                packets, size = counters[prefix]
+                counters[prefix] = (packets + int(match.group(1)), size + int(match.group(2)))
+        return counters
+
+    def reconcile(self, desired):
+        installed = self.read_installed()
+        if installed is None:
+            return None
+        desired_set = set(desired)
+        added = [prefix for prefix in desired if prefix not in installed]
+        removed = sorted(prefix for prefix in installed if prefix not in desired_set)
+        # 'replace' swaps the whole table contents atomically
+        if (added or removed) and not self._table('replace', desired, "macOS pf table replace"):
+            return None
+        return added, removed
+
+    def persist(self, addresses):
+        try:
+            startup_script = os.path.join(STARTUP_SCRIPT_DIR, "restore_blocked_ips.sh")
+            with open(startup_script, 'w') as f:
+                for address in addresses:
+                    f.write(f"pfctl -t {self.TABLE} -T add {address}\n")
+            os.chmod(startup_script, 0o755)
+            self.logger.info(f"Wrote {len(addresses)} IPs to macOS startup script")
+            return True
+        except Exception as e:
+            self.logger.error(f"Error creating macOS startup script: {e}")
+            return False
+
+class SimulatedBackend(FirewallBackend):
+    """
+    In-memory firewall for tests and benchmarks.
+
+    'chain' mode models per-rule firewalls (iptables, netsh): a packet is
+    compared with each rule in turn, so lookup cost grows linearly with the
+    number of rules. 'set' mode models ipset, nftables and pf tables: one
+    rule refers to a set whose lookup cost grows with log2 of its size.
+    Every call that a real backend would make as a process is counted in
+    'commands' and can be given a simulated latency.
+    """
+
+    name = 'simulated'
+
+    def __init__(self, mode='chain', command_latency=0.0):
+        """
+        Initialize the simulated firewall.
+
+        Args:
+            mode (str): 'chain' or 'set'.
+            command_latency (float): Seconds added per simulated command.
+        """
+        super().__init__()
+        if mode not in ('chain', 'set'):
+            raise ValueError(f"Unknown simulation mode: {mode}")
+        self.mode = mode
+        self.command_latency = command_latency
+        self.installed = Counter()
+        self.commands = 0
+        self.evaluations = 0
+        self.hits = {}
+        self._chain = None
+        self._lookup = None
+
+    @classmethod
+    def available(cls):
+        return True
+
+    def _command(self):
+        """Account for one firewall command."""
+        self.commands += 1
+        if self.command_latency:
+            time.sleep(self.command_latency)
+        self._chain = None
+        self._lookup = None
+
+    def block(self, address):
+        return self.block_many([address])
+
+    def unblock(self, address):
+        return self.unblock_many([address])
+
+    def block_many(self, addresses):
+        return self.apply(addresses, [])
+
+    def unblock_many(self, addresses):
+        return self.apply([], addresses)
+
+    def apply(self, added, removed):
+        self._command()
+        for address in added:
+            if not self.installed[address]:
+                self.installed[address] = 1
+        for address in removed:
+            self.installed.pop(address, None)
+            self.hits.pop(address, None)
+        return True
+
+    def read_installed(self):
+        self._command()
+        return Counter(self.installed)
+
+    def read_counters(self):
+        self._command()
+        return {prefix: self.hits.get(prefix, (0, 0)) for prefix in self.installed}
+
+    def match(self, address, size=0):
+        """
+        Evaluate a packet from an address against the simulated ruleset.
+
+        Args:
+            address (str): Source address of the packet.
+            size (int): Packet size in bytes, added to the matching counter.
+
+        Returns:
+            bool: True if the packet would be dropped. The number of rule or
+                set comparisons made is added to 'evaluations'.
+        """
+        network = self._find(ipaddress.ip_address(address))
+        if network is None:
+            return False
+        prefix = PrefixSet.format(network)
+        packets, total = self.hits.get(prefix, (0, 0))
+        self.hits[prefix] = (packets + 1, total + size)
+        return True
+
+    def _find(self, address):
+        """Return the installed network that drops an address, or None."""
+        if self.mode == 'chain':
+            if self._chain is None:
+                self._chain = [ipaddress.ip_network(prefix) for prefix, copies in self.installed.items()
+                               for _ in range(copies)]
+            for network in self._chain:
+                self.evaluations += 1
+                if network.version == address.version and address in network:
+                    return network
+            return None
+
+        if self._lookup is None:
+            networks = sorted((ipaddress.ip_network(prefix) for prefix in self.installed),
+                              key=lambda network: (network.version, network.network_address))
+            self._lookup = ([(network.version, int(network.network_address)) for network in networks], networks)
+        starts, networks = self._lookup
+        self.evaluations += 1 + math.ceil(math.log2(len(networks) + 1))
+        index = bisect.bisect_right(starts, (address.version, int(address))) - 1
+        if index < 0 or networks[index].version != address.version or address not in networks[index]:
+            return None
+        return networks[index]
+
+# Preference order for Linux: set-based backends first, per-rule iptables last
+LINUX_BACKENDS = [IpsetBackend, NftablesBackend, IptablesBackend]
+
+BACKENDS = {backend.name: backend for backend in
+            (IptablesBackend, IpsetBackend, NftablesBackend, NetshBackend, PfBackend, SimulatedBackend)}
+
+_capabilities = None
+_capabilities_lock = threading.Lock()
+
+def platform_backends(system=None):
+    """Return the backend classes for a platform, in preference order."""
+    system = system or platform.system()
+    if system == "Windows":
+        return [NetshBackend]
+    if system == "Linux":
+        return LINUX_BACKENDS
+    return [PfBackend]
+
+def get_capabilities(refresh=False):
+    """
+    Probe once per process which firewall backends are usable.
+
+    The probe uses the effective UID and CAP_NET_ADMIN before running any
+    command, and then one cheap command per installed backend. The result
+    is cached; pass refresh=True after privileges or installed tools change.
+
+    Args:
+        refresh (bool): Probe again instead of returning the cached result.
+
+    Returns:
+        dict: {'euid': int or None, 'net_admin': bool or None,
+            'backends': {name: privileged}, 'privileged': bool,
+            'checked_at': timestamp}. 'backends' lists the installed
+            backends of this platform in preference order.
+    """
+    global _capabilities
+    with _capabilities_lock:
+        if _capabilities is None or refresh:
+            logger = logging.getLogger(__name__)
+            backends = {}
+            for backend_class in platform_backends():
+                if backend_class.available():
+                    backends[backend_class.name] = backend_class().check_privileges()
+            _capabilities = {
+                'euid': os.geteuid() if hasattr(os, 'geteuid') else None,
+                'net_admin': has_net_admin(),
+                'backends': backends,
+                'privileged': any(backends.values()),
+                'checked_at': time.time(),
+            }
+            logger.info(f"Firewall capabilities: {_capabilities}")
+        return dict(_capabilities, backends=dict(_capabilities['backends']))
+
+def select_linux_backend(refresh=False):
+    """
+    Pick and prepare the best available Linux firewall backend.
+
+    Backends are tried in LINUX_BACKENDS order; one is used if its tools
+    are installed, the process may change it (see get_capabilities), and its
+    sets and rules can be prepared.
+
+    Args:
+        refresh (bool): Re-run the capability probe first.
+
+    Returns:
+        FirewallBackend: A prepared backend. Falls back to IptablesBackend if
+            no set-based backend can be prepared.
+    """
+    logger = logging.getLogger(__name__)
+    capabilities = get_capabilities(refresh)
+    for backend_class in LINUX_BACKENDS:
+        if not capabilities['backends'].get(backend_class.name):
+            continue
+        backend = backend_class()
+        if backend.prepare():
+            logger.info(f"Using {backend.name} firewall backend")
+            return backend
+        logger.warning(f"Could not prepare {backend.name} firewall backend, trying the next one")
+    return IptablesBackend()
+
+def select_backend(name=None, refresh=False):
+    """
+    Create the firewall backend for this system, or a named one.
+
+    Args:
+        name (str): Backend name from BACKENDS (optional; by default the
+            backend is chosen from the platform).
+        refresh (bool): Re-run the capability probe first.
+
+    Returns:
+        FirewallBackend: The backend.
+
+    Raises:
+        ValueError: If the name is unknown.
+    """
+    if name is not None:
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown firewall backend: {name}")
+        backend = BACKENDS[name]()
+        backend.prepare()
+        return backend
+
+    system = platform.system()
+    if system == "Windows":
+        return NetshBackend()
+    if system == "Linux":
+        return select_linux_backend(refresh)
+    backend = PfBackend()
+    if get_capabilities(refresh)['backends'].get(backend.name):
+        backend.prepare()
+    return backend
@@ -0,0 +1,351 @@
+"""
+Network Management Tool - Interface Profiles Module
+
+This module picks the right interface and command set for controlling a
+device's network interface. Candidate profiles (iproute2, nmcli, ifconfig,
+netsh, Cisco IOS) are chosen from the fingerprinted OS, and a one-time,
+cached inventory of the device tells which tools exist and which interface
+carries the device's address.
+"""
+
+import logging
+import re
+import threading
+import time
+
+from .command_batch import BatchCommandRunner
+
+# Command sets for each supported platform. '{iface}' is replaced with the
+# interface name. 'shell' selects how the commands are sent: 'posix' runs
+# them as one batch, 'cmd' runs each over an exec channel, 'ios' sends them
+# through an interactive CLI session.
+PROFILES = {
+    'iproute2': {
+        'shell': 'posix',
+        'tool': 'ip',
+        'inspect': 'ip -o link show dev {iface}',
+        'disable': ['ip link set dev {iface} down'],
+        'enable': ['ip link set dev {iface} up'],
+        'sudo': True,
+    },
+    'nmcli': {
+        'shell': 'posix',
+        'tool': 'nmcli',
+        'inspect': 'nmcli -t -f GENERAL.DEVICE,GENERAL.STATE device show {iface}',
+        'disable': ['nmcli device disconnect {iface}'],
+        'enable': ['nmcli device connect {iface}'],
+        'sudo': True,
+    },
+    'ifconfig': {
+        'shell': 'posix',
+        'tool': 'ifconfig',
+        'inspect': 'ifconfig {iface}',
+        'disable': ['ifconfig {iface} down'],
+        'enable': ['ifconfig {iface} up'],
+        'sudo': True,
+    },
+    'netsh': {
+        'shell': 'cmd',
+        'tool': 'netsh',
+        'inspect': 'netsh interface show interface name="{iface}"',
+        'disable': ['netsh interface set interface name="{iface}" admin=disabled'],
+        'enable': ['netsh interface set interface name="{iface}" admin=enabled'],
+        'sudo': False,
+    },
+    'cisco_ios': {
+        'shell': 'ios',
+        'tool': None,
+        'inspect': 'show interfaces {iface}',
+        'disable': ['configure terminal', 'interface {iface}', 'shutdown', 'end'],
+        'enable': ['configure terminal', 'interface {iface}', 'no shutdown', 'end'],
+        'sudo': False,
+    },
+}
+
+# Inventory batch run once per POSIX device
+POSIX_INVENTORY = [
+    'command -v ip nmcli ifconfig',
+    'ip -o addr show 2>/dev/null || ifconfig -a',
+    'ip -o route show default 2>/dev/null || netstat -rn',
+    'nmcli -t -f DEVICE,STATE device 2>/dev/null',
+]
+
+WINDOWS_INVENTORY = 'netsh interface ipv4 show addresses'
+IOS_INVENTORY = 'show ip interface brief'
+
+def candidate_profiles(os_name):
+    """
+    Return the profiles worth trying for a fingerprinted OS, best first.
+
+    Args:
+        os_name (str): OS string from fingerprint_device (e.g. 'Linux 5.4', 'Cisco IOS 15.2').
+
+    Returns:
+        list: Profile names.
+    """
+    os_name = (os_name or '').lower()
+    if 'windows' in os_name:
+        return ['netsh']
+    if 'cisco' in os_name or 'ios' in os_name.split():
+        return ['cisco_ios']
+    if any(name in os_name for name in ('mac os', 'macos', 'darwin', 'bsd')):
+        return ['ifconfig']
+    return ['nmcli', 'iproute2', 'ifconfig']
+
+def _parse_posix_addresses(output):
+    """Map interface names to IPv4 addresses from 'ip -o addr' or 'ifconfig -a' output."""
+    addresses = {}
+    current = None
+    for line in output.splitlines():
+        match = re.match(r'^\d+:\s+([^\s:@]+)', line)
+        if match:
+            # ip -o addr: one line per address, prefixed with the interface
+            current = match.group(1)
+        elif line and not line[0].isspace():
+            # ifconfig: unindented line starts an interface block
+            current = re.split(r'[:\s]', line, maxsplit=1)[0]
+        if current is None:
+            continue
+        addresses.setdefault(current, [])
+        for address in re.findall(r'\binet (?:addr:)?(\d+\.\d+\.\d+\.\d+)', line):
+            addresses[current].append(address)
+    return addresses
+
+def _parse_default_interface(output):
+    """Return the interface of the default route from 'ip route' or 'netstat -rn' output."""
+    for line in output.splitlines():
+        match = re.search(r'\bdev\s+(\S+)', line)
+        if line.startswith('default') and match:
+            return match.group(1)
+        fields = line.split()
+        if fields and fields[0] in ('default', '0.0.0.0') and len(fields) > 3:
+            return fields[-1]
+    return None
+
+def _parse_windows_addresses(output):
+    """Map interface names to IPv4 addresses from 'netsh interface ipv4 show addresses'."""
+    addresses = {}
+    current = None
+    for line in output.splitlines():
+        match = re.search(r'interface "([^"]+)"', line)
+        if match:
+            current = match.group(1)
+            addresses[current] = []
+            continue
+        match = re.search(r'IP Address:\s+(\d+\.\d+\.\d+\.\d+)', line)
+        if current and match:
+            addresses[current].append(match.group(1))
+    return addresses
+
+def _parse_ios_addresses(output):
+    """Map interface names to IPv4 addresses from 'show ip interface brief'."""
+    addresses = {}
+    for line in output.splitlines():
+        fields = line.split()
+        if len(fields) >= 2 and re.match(r'\d+\.\d+\.\d+\.\d+$', fields[1]):
+            addresses[fields[0]] = [fields[1]]
+    return addresses
+
+def run_ios_commands(ssh_client, commands, timeout=20):
+    """
+    Send commands through an interactive Cisco IOS session.
+
+    Args:
+        ssh_client (paramiko.SSHClient): Connected SSH client.
+        commands (list): CLI lines to send.
+        timeout (float): Seconds to wait for the session to go quiet.
+
+    Returns:
+        str: Combined session output.
+    """
+    shell = ssh_client.invoke_shell()
+    shell.settimeout(timeout)
+    output = []
+    try:
+        shell.send('terminal length 0\n')
+        for command in commands:
+            shell.send(command + '\n')
+        shell.send('exit\n')
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            chunk = shell.recv(65536)
+            if not chunk:
+                break
+            output.append(chunk.decode(errors='replace'))
+    except Exception:
+        pass
+    finally:
+        shell.close()
+    return ''.join(output)
+
+class InterfaceProfileResolver:
+    """Resolve and cache the interface control profile for each device."""
+
+    def __init__(self, cache_ttl=3600):
+        """
+        Initialize the resolver.
+
+        Args:
+            cache_ttl (float): Seconds a device inventory stays valid.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.cache_ttl = cache_ttl
+        # ip_address -> (plan, resolved_at)
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self, ip_address=None):
+        """
+        Forget cached inventories.
+
+        Args:
+            ip_address (str): Only forget this device. Forgets everything if None.
+        """
+        with self._lock:
+            if ip_address is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(ip_address, None)
+
+    def _inventory_posix(self, ssh_client, sudo_password):
+        """Collect tools, addresses and default route from a POSIX host."""
+        runner = BatchCommandRunner(ssh_client, sudo_password=sudo_password)
+        tools, addresses, routes, nm_devices = runner.run(POSIX_INVENTORY)
+        if tools['exit_status'] is None:
+            return None
+        available = {line.strip().rsplit('/', 1)[-1] for line in tools['output'].splitlines() if line.strip()}
+        managed = {line.split(':')[0] for line in nm_devices['output'].splitlines()
+                   if line.endswith(':connected')}
+        return {
+            'tools': available,
+            'addresses': _parse_posix_addresses(addresses['output']),
+            'default_interface': _parse_default_interface(routes['output']),
+            'nm_managed': managed,
+        }
+
+    def _inventory_exec(self, ssh_client, command, parser):
+        """Collect addresses from a non-POSIX host with one exec channel."""
+        try:
+            _, stdout, _ = ssh_client.exec_command(command, timeout=15)
+            addresses = parser(stdout.read().decode(errors='replace'))
+        except Exception as e:
+            self.logger.debug(f"Inventory command '{command}' failed: {e}")
+            return None
+        if not addresses:
+            return None
+        return {'tools': set(), 'addresses': addresses, 'default_interface': None, 'nm_managed': set()}
+
+    def _choose(self, ip_address, candidates, inventory):
+        """Pick the interface and profile from an inventory."""
+        interface = next((name for name, addrs in inventory['addresses'].items() if ip_address in addrs),
+                         None) or inventory['default_interface']
+        if interface is None:
+            interface = next((name for name in inventory['addresses'] if name not in ('lo', 'lo0')), None)
+        if interface is None:
+            return None
+
+        for name in candidates:
+            profile = PROFILES[name]
+            if profile['shell'] != 'posix':
+                return {'profile': name, 'interface': interface}
+            if profile['tool'] not in inventory['tools']:
+                continue
+            if name == 'nmcli' and interface not in inventory['nm_managed']:
+                # NetworkManager does not own this interface; use the kernel tools
+                continue
+            return {'profile': name, 'interface': interface}
+        return None
+
+    def resolve(self, ssh_client, ip_address, os_name=None, sudo_password=None):
+        """
+        Determine how to control a device's network interface.
+
+        The inventory is collected once per device and cached; later calls
+        return the cached plan without touching the device.
+
+        Args:
+            ssh_client (paramiko.SSHClient): Connected SSH client.
+            ip_address (str): The IP address of the device.
+            os_name (str): OS string from fingerprint_device (optional).
+            sudo_password (str): Password for sudo (optional).
+
+        Returns:
+            dict: {'profile', 'interface'}, or None if no profile fits.
+        """
+        with self._lock:
+            cached = self._cache.get(ip_address)
+        if cached is not None and time.monotonic() - cached[1] <= self.cache_ttl:
+            return cached[0]
+
+        candidates = candidate_profiles(os_name)
+        shells = {PROFILES[name]['shell'] for name in candidates}
+        inventory = None
+        if 'posix' in shells:
+            inventory = self._inventory_posix(ssh_client, sudo_password)
+        if inventory is None and ('cmd' in shells or not os_name or os_name == 'Unknown'):
+            inventory = self._inventory_exec(ssh_client, WINDOWS_INVENTORY, _parse_windows_addresses)
+            if inventory is not None:
+                candidates = ['netsh']
+        if inventory is None and ('ios' in shells or not os_name or os_name == 'Unknown'):
+            inventory = self._inventory_exec(ssh_client, IOS_INVENTORY, _parse_ios_addresses)
+            if inventory is not None:
+                candidates = ['cisco_ios']
+        if inventory is None:
+            self.logger.warning(f"Could not collect an interface inventory from {ip_address}")
+            return None
+
+        plan = self._choose(ip_address, candidates, inventory)
+        if plan is not None:
+            self.logger.info(f"Resolved {ip_address} to profile {plan['profile']} on {plan['interface']}")
+            with self._lock:
+                self._cache[ip_address] = (plan, time.monotonic())
+        return plan
+
+    def execute(self, ssh_client, plan, action='disable', sudo_password=None):
+        """
+        Run a profile action (with inspect and verify steps where possible).
+
+        Args:
+            ssh_client (paramiko.SSHClient): Connected SSH client.
+            plan (dict): Plan returned by resolve().
+            action (str): 'disable' or 'enable'.
+            sudo_password (str): Password for sudo (optional).
+
+        Returns:
+            list: One dict per step with 'command', 'output' and 'exit_status'.
+        """
+        profile = PROFILES[plan['profile']]
+        inspect = profile['inspect'].format(iface=plan['interface'])
+        steps = [command.format(iface=plan['interface']) for command in profile[action]]
+
+        if profile['shell'] == 'posix':
+            runner = BatchCommandRunner(ssh_client, sudo_password=sudo_password)
+            commands = [(inspect, False)] + [(step, profile['sudo']) for step in steps] + [(inspect, False)]
+            return runner.run(commands, stop_on_error=True)
+
+        if profile['shell'] == 'ios':
+            output = run_ios_commands(ssh_client, steps)
+            failed = '% Invalid' in output or '% Incomplete' in output
+            return [{'command': '; '.join(steps), 'output': output, 'exit_status': 1 if failed else 0}]
+
+        results = []
+        for command in [inspect] + steps:
+            _, stdout, _ = ssh_client.exec_command(command, timeout=30)
+            output = stdout.read().decode(errors='replace')
+            results.append({'command': command, 'output': output,
+                            'exit_status': stdout.channel.recv_exit_status()})
+            if results[-1]['exit_status'] != 0:
+                break
+        return results
+
+_default_resolver = InterfaceProfileResolver()
+
+def get_resolver():
+    """
+    Return the process-wide interface profile resolver.
+
+    Returns:
+        InterfaceProfileResolver: The shared resolver, whose inventory cache
+            outlives individual DeviceManager instances.
+    """
+    return _default_resolver
@@ -9,7 +9,13 @@ import logging
 import paramiko
 import os
 import socket
-from .network_blocker import NetworkBlocker
+from .network_blocker import get_blocker
+from .reachability import get_prober
+from .ssh_sessions import SSHSessionPool
+from .config_backup import ConfigBackupStore, DEFAULT_CONFIG_PATHS, iter_remote_file, write_remote_file
+from .config_drift import ConfigDriftEngine, DEFAULT_RETENTION_DAYS
+from .command_batch import BatchCommandRunner
+from .interface_profiles import get_resolver
 
 class DeviceManager:
     """Device manager for accessing and managing network devices."""
@@ -20,7 +26,16 @@ class DeviceManager:
         # Cache for hostname resolutions to avoid repeated DNS lookups
         self._hostname_cache = {}
         # Initialize network blocker
-        self.network_blocker = NetworkBlocker()
+        self.network_blocker = get_blocker()
+        # Shared reachability prober (results are cached process-wide for a short TTL)
+        self.reachability = get_prober()
+        # Per-OS interface control profiles (inventories are cached process-wide)
+        self.interface_profiles = get_resolver()
+        # Long-lived SSH sessions reused across operations on the same device
+        self.ssh_pool = SSHSessionPool(self._open_ssh_client)
+        # Configuration backup store and drift history (created on first use)
+        self._backup_store = None
+        self._drift_engine = None
     
     def _resolve_hostname(self, ip_address):
         """
@@ -162,7 +177,90 @@ class DeviceManager:
         self.logger.warning(f"No SSH key found for {ip_address}")
         return None
     
-    def manage_device(self, ip_address, username, password):
+    def _disable_interface(self, ssh, ip_address, sudo_password=None, device_info=None):
+        """
+        Disable a device's network interface over an open SSH connection.
+        
+        The interface and command set (iproute2, nmcli, ifconfig, netsh or
+        Cisco IOS) are resolved from the fingerprinted OS and a cached
+        interface inventory. On POSIX hosts the inspect, disable and verify
+        steps run as one batch over a single channel.
+        
+        Args:
+            ssh (paramiko.SSHClient): Connected SSH client.
+            ip_address (str): The IP address of the device.
+            sudo_password (str): Password for sudo (optional; key-based sessions use 'sudo -n').
+            device_info (dict): Device information from fingerprinting (optional).
+            
+        Returns:
+            bool: True if the interface was disabled, False otherwise.
+        """
+        os_name = device_info.get('os') if device_info else None
+        plan = self.interface_profiles.resolve(ssh, ip_address, os_name, sudo_password=sudo_password)
+        if plan is None:
+            self.logger.error(f"Could not determine how to control interfaces on {ip_address}")
+            print(f"Error: Could not determine the network interface or tools on {ip_address}")
+            return False
+        
+        self.logger.info(f"Disabling interface {plan['interface']} on {ip_address} using {plan['profile']}")
+        results = self.interface_profiles.execute(ssh, plan, 'disable', sudo_password=sudo_password)
+        
+        if any(result.get('error') for result in results):
+            self.logger.error(f"Authentication error managing device {ip_address}: {results[0]['error']}")
+            print("Error: Authentication failed")
+            return False
+        if results[0]['exit_status'] is None:
+            self.logger.error(f"Could not run commands on {ip_address}: no shell output received")
+            print(f"Error: Could not run commands on {ip_address}")
+            return False
+        failed = next((result for result in results if result['exit_status'] not in (0, None)), None)
+        if failed is not None:
+            # The cached inventory may be stale (renamed interface, removed tool)
+            self.interface_profiles.invalidate(ip_address)
+            self.logger.error(f"Error managing device {ip_address}: {failed['command']}: {failed['output']}")
+            print(f"Error: {failed['output']}")
+            return False
+        
+        # A missing exit status means the session dropped as the interface went down
+        self.logger.info(f"Successfully managed device {ip_address}")
+        if results[-1]['exit_status'] is not None:
+            self.logger.info(f"Interface state after disable: {results[-1]['output']}")
+        print(f"Device {ip_address} network interface {plan['interface']} disabled successfully.")
+        return True
+
+    def run_command_batch(self, ip_address, username, commands, password=None, ssh_key_path=None,
+                          sudo=False, stop_on_error=False):
+        """
+        Run several commands on a device over one pooled session and channel.
+        
+        Args:
+            ip_address (str): The IP address of the device.
+            username (str): The username for SSH access.
+            commands (list): Command strings or (command, use_sudo) pairs.
+            password (str): The password for SSH access and sudo (optional).
+            ssh_key_path (str): Path to the SSH private key file (optional, auto-detected).
+            sudo (bool): Run plain command strings with sudo.
+            stop_on_error (bool): Stop at the first command with a non-zero exit status.
+            
+        Returns:
+            list: One dict per command with 'command', 'output' and 'exit_status',
+                or an empty list if the batch could not be run.
+        """
+        self.logger.info(f"Running {len(commands)} commands on {ip_address}")
+        
+        try:
+            with self.ssh_pool.session(ip_address, username, password=password, ssh_key_path=ssh_key_path) as ssh:
+                runner = BatchCommandRunner(ssh, sudo_password=password)
+                return runner.run(commands, sudo=sudo, stop_on_error=stop_on_error)
+        except paramiko.AuthenticationException as e:
+            self.logger.error(f"Authentication failed for device {ip_address}: {e}")
+            print("Error: Authentication failed. Please check your credentials.")
+        except Exception as e:
+            self.logger.error(f"Error running commands on device {ip_address}: {e}")
+            print(f"Error running commands on device: {e}")
+        return []
+
+    def manage_device(self, ip_address, username, password, device_info=None):
         """
         Manage a device by temporarily disabling its network interface.
         
@@ -170,29 +268,15 @@ class DeviceManager:
             ip_address (str): The IP address of the device to manage.
             username (str): The username for SSH access.
             password (str): The password for SSH access.
+            device_info (dict): Device information from fingerprinting, used to pick
+                the interface commands (optional).
         """
         self.logger.info(f"Managing device: {ip_address}")
         
         try:
-            # First, check if the device is reachable
-            self.logger.info(f"Checking if device {ip_address} is reachable...")
-            import socket
-            import time
-            
-            # Try to ping the device first
-            try:
-                # Set a short timeout for the ping check
-                socket.setdefaulttimeout(3)
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                result = sock.connect_ex((ip_address, 22))  # Check SSH port
-                sock.close()
-                
-                if result != 0:
-                    self.logger.warning(f"Device {ip_address} may not be reachable on SSH port 22")
-                    print(f"Warning: Device {ip_address} may not be reachable on SSH port 22")
-            except Exception as ping_error:
-                self.logger.warning(f"Could not check reachability of {ip_address}: {ping_error}")
-                print(f"Warning: Could not check reachability of {ip_address}")
+            # First, check if the device is reachable (cached results are reused)
+            if not self.is_device_reachable(ip_address, port=22, timeout=3):
+                print(f"Warning: Device {ip_address} may not be reachable on SSH port 22")
             
             # Establish SSH connection
             ssh = paramiko.SSHClient()
@@ -200,35 +284,8 @@ class DeviceManager:
             self.logger.info(f"Attempting to connect to {ip_address} with username {username}")
             ssh.connect(ip_address, username=username, password=password, timeout=10)
             
-            # Command to disable network interface (example)
-            # NOTE: This is a placeholder - actual implementation would need
-            # to determine the correct interface and use appropriate commands
-            command = "sudo ifconfig eth0 down"
-            
-            self.logger.info(f"Executing command: {command}")
-            # Execute command with sudo password
-            stdin, stdout, stderr = ssh.exec_command(f"echo {password} | sudo -S {command}", get_pty=True)
-            
-            # Check for errors
-            error = stderr.read().decode()
-            if error and "sorry, you must have a tty to run sudo" in error:
-                self.logger.info("Trying alternative sudo method due to TTY requirement")
-                # Try alternative method for sudo
-                stdin, stdout, stderr = ssh.exec_command(command)
-                stdin.write(password + '\n')
-                stdin.flush()
-                error = stderr.read().decode()
-            
-            if error and "password" in error.lower():
-                self.logger.error(f"Authentication error managing device {ip_address}: {error}")
-                print("Error: Authentication failed")
-            elif error:
-                self.logger.error(f"Error managing device {ip_address}: {error}")
-                print(f"Error: {error}")
-            else:
-                output = stdout.read().decode()
-                self.logger.info(f"Successfully managed device {ip_address}")
-                print(f"Device {ip_address} network interface disabled successfully.")
+            # Resolve the interface profile, then inspect, disable and verify it
+            self._disable_interface(ssh, ip_address, sudo_password=password, device_info=device_info)
             
             # Close connection
             ssh.close()
@@ -291,24 +348,9 @@ class DeviceManager:
             return
         
         try:
-            # First, check if the device is reachable
-            self.logger.info(f"Checking if device {ip_address} is reachable...")
-            import socket
-            
-            # Try to ping the device first
-            try:
-                # Set a short timeout for the ping check
-                socket.setdefaulttimeout(3)
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                result = sock.connect_ex((ip_address, 22))  # Check SSH port
-                sock.close()
-                
-                if result != 0:
-                    self.logger.warning(f"Device {ip_address} may not be reachable on SSH port 22")
-                    print(f"Warning: Device {ip_address} may not be reachable on SSH port 22")
-            except Exception as ping_error:
-                self.logger.warning(f"Could not check reachability of {ip_address}: {ping_error}")
-                print(f"Warning: Could not check reachability of {ip_address}")
+            # First, check if the device is reachable (cached results are reused)
+            if not self.is_device_reachable(ip_address, port=22, timeout=3):
+                print(f"Warning: Device {ip_address} may not be reachable on SSH port 22")
             
             # Establish SSH connection with key authentication
             ssh = paramiko.SSHClient()
@@ -322,22 +364,8 @@ class DeviceManager:
             self.logger.info(f"Attempting to connect to {ip_address} with username {username} using key authentication")
             ssh.connect(ip_address, username=username, pkey=private_key, timeout=10)
             
-            # Command to disable network interface
-            command = "sudo ifconfig eth0 down"
-            
-            self.logger.info(f"Executing command: {command}")
-            # Execute command
-            stdin, stdout, stderr = ssh.exec_command(command, get_pty=True)
-            
-            # Check for errors
-            error = stderr.read().decode()
-            if error:
-                self.logger.error(f"Error managing device {ip_address}: {error}")
-                print(f"Error: {error}")
-            else:
-                output = stdout.read().decode()
-                self.logger.info(f"Successfully managed device {ip_address}")
-                print(f"Device {ip_address} network interface disabled successfully.")
+            # Resolve the interface profile, then inspect, disable and verify it
+            self._disable_interface(ssh, ip_address, device_info=device_info)
             
             # Close connection
             ssh.close()
@@ -423,17 +451,7 @@ class DeviceManager:
         self.logger.info(f"Checking if device {ip_address} is reachable on port {port}")
         
         try:
-            import socket
-            
-            # Set timeout
-            socket.setdefaulttimeout(timeout)
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            
-            # Try to connect
-            result = sock.connect_ex((ip_address, port))
-            sock.close()
-            
-            if result == 0:
+            if self.reachability.check(ip_address, port, timeout=timeout):
                 self.logger.info(f"Device {ip_address} is reachable on port {port}")
                 return True
             else:
@@ -444,13 +462,60 @@ class DeviceManager:
             self.logger.error(f"Error checking reachability of {ip_address}: {e}")
             return False
 
-    def block_device_network_access(self, ip_address, network_gateway="192.168.1.1"):
+    def check_devices_reachable(self, targets, timeout=5):
+        """
+        Check many devices concurrently.
+        
+        Args:
+            targets (iterable): IP addresses, or (ip_address, port) pairs. Bare
+                addresses are checked on port 22.
+            timeout (int): Connection timeout in seconds for each probe.
+            
+        Returns:
+            dict: Mapping of (ip_address, port) to True if reachable, False otherwise.
+        """
+        pairs = [target if isinstance(target, tuple) else (target, 22) for target in targets]
+        self.logger.info(f"Checking reachability of {len(pairs)} targets")
+        
+        try:
+            return self.reachability.check_many(pairs, timeout=timeout)
+        except Exception as e:
+            self.logger.error(f"Error checking reachability of {len(pairs)} targets: {e}")
+            return {(ip, int(port)): False for ip, port in pairs}
+
+    def _report_reachability(self, ip_address, action):
+        """
+        Report device reachability for a block or unblock without waiting on the network.
+        
+        A fresh cached result is reported immediately; otherwise a probe is
+        started in the background and its result is only logged.
+        
+        Args:
+            ip_address (str): The IP address of the device.
+            action (str): The action being performed ('blocked' or 'unblocked').
+        """
+        if '/' in ip_address or '-' in ip_address:
+            # CIDRs and ranges have no single host to probe
+            return
+        
+        def report(reachable):
+            if not reachable:
+                self.logger.warning(f"Device {ip_address} is not reachable, but will still be {action}")
+        
+        cached = self.reachability.get_cached(ip_address, 22)
+        if cached is None:
+            self.reachability.check_in_background(ip_address, 22, callback=report, timeout=3)
+        elif not cached:
+            report(cached)
+
+    def block_device_network_access(self, ip_address, network_gateway="192.168.1.1", ttl=None):
         """
         Block a device's network access by adding it to a firewall block list.
         
         Args:
             ip_address (str): The IP address of the device to block.
             network_gateway (str): The network gateway IP address.
+            ttl (float): Seconds until the block expires (optional, default permanent).
             
         Returns:
             bool: True if blocking was successful, False otherwise.
@@ -459,13 +524,11 @@ class DeviceManager:
         
         try:
             # Even if device is not reachable, we should still block it to prevent future access
-            # Check if device is reachable (for informational purposes only)
-            if not self.is_device_reachable(ip_address, port=22, timeout=3):
-                self.logger.info(f"Device {ip_address} is not reachable, but will still be blocked")
-                print(f"Device {ip_address} is not reachable, but will still be blocked to prevent future access")
+            # Reachability is informational only, so never wait on it here
+            self._report_reachability(ip_address, 'blocked')
             
             # Use the NetworkBlocker to block the IP
-            success = self.network_blocker.block_ip(ip_address)
+            success = self.network_blocker.block_ip(ip_address, ttl=ttl)
             
             if success:
                 self.logger.info(f"Successfully blocked device {ip_address} from accessing the network.")
@@ -497,10 +560,8 @@ class DeviceManager:
         
         try:
             # Even if device is not reachable, we should still unblock it to restore future access
-            # Check if device is reachable (for informational purposes only)
-            if not self.is_device_reachable(ip_address, port=22, timeout=3):
-                self.logger.info(f"Device {ip_address} is not reachable, but will still be unblocked")
-                print(f"Device {ip_address} is not reachable, but will still be unblocked to restore future access")
+            # Reachability is informational only, so never wait on it here
+            self._report_reachability(ip_address, 'unblocked')
             
             # Use the NetworkBlocker to unblock the IP
             success = self.network_blocker.unblock_ip(ip_address)
@@ -520,6 +581,224 @@ class DeviceManager:
             print(f"Error unblocking device {ip_address}: {e}")
             return False
 
+    def _open_ssh_client(self, ip_address, username, password=None, ssh_key_path=None, timeout=10):
+        """
+        Open an authenticated SSH connection to a device.
+        
+        Key authentication is preferred; when neither a password nor a key
+        path is given, a key is auto-detected for the device.
+        
+        Args:
+            ip_address (str): The IP address of the device.
+            username (str): The username for SSH access.
+            password (str): The password for SSH access (optional).
+            ssh_key_path (str): Path to the SSH private key file (optional).
+            timeout (int): Connection timeout in seconds.
+            
+        Returns:
+            paramiko.SSHClient: A connected client.
+        """
+        if ssh_key_path is None and password is None:
+            ssh_key_path = self._detect_ssh_key_for_device(ip_address)
+            if ssh_key_path is None:
+                raise paramiko.AuthenticationException(f"No SSH key or password available for {ip_address}")
+        
+        ssh = paramiko.SSHClient()
+        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        if ssh_key_path:
+            private_key = paramiko.RSAKey.from_private_key_file(ssh_key_path)
+            ssh.connect(ip_address, username=username, pkey=private_key, timeout=timeout)
+        else:
+            ssh.connect(ip_address, username=username, password=password, timeout=timeout)
+        return ssh
+
+    def _get_backup_store(self):
+        """
+        Return the configuration backup store, creating it on first use.
+        
+        Returns:
+            ConfigBackupStore: The backup store.
+        """
+        if self._backup_store is None:
+            self._backup_store = ConfigBackupStore()
+        return self._backup_store
+
+    def _get_drift_engine(self):
+        """
+        Return the configuration drift engine, creating it on first use.
+        
+        Returns:
+            ConfigDriftEngine: The drift engine for the backup store.
+        """
+        if self._drift_engine is None:
+            self._drift_engine = ConfigDriftEngine(self._get_backup_store(),
+                                                   retention_days=DEFAULT_RETENTION_DAYS)
+        return self._drift_engine
+
+    def apply_config_retention(self):
+        """
+        Prune configuration history and backups past the retention period.
+        
+        Returns:
+            dict: Numbers of removed 'revisions', 'manifests' and 'objects'.
+        """
+        return self._get_drift_engine().apply_retention()
+
+    def get_configuration_drift(self, ip_address, path):
+        """
+        Show how a device's configuration file changed in its most recent backup.
+        
+        Args:
+            ip_address (str): The IP address of the device.
+            path (str): The configuration file path.
+            
+        Returns:
+            list: Unified diff lines between the last two recorded revisions.
+        """
+        try:
+            return self._get_drift_engine().diff(ip_address, path)
+        except Exception as e:
+            self.logger.error(f"Error computing configuration drift for {ip_address}: {e}")
+            return []
+
+    def backup_device_configuration(self, ip_address, username, ssh_key_path=None, password=None, config_paths=None):
+        """
+        Back up a device's configuration files into the local backup store.
+        
+        Files are streamed over SFTP (or an exec channel when SFTP is not
+        available) and compressed while they are read. Content already in the
+        store is not stored again, and files whose size and modification time
+        match the previous backup are not transferred at all.
+        
+        Args:
+            ip_address (str): The IP address of the device.
+            username (str): The username for SSH access.
+            ssh_key_path (str): Path to the SSH private key file (optional, auto-detected).
+            password (str): The password for SSH access (optional).
+            config_paths (list): Remote files to back up (default: common network config files).
+            
+        Returns:
+            str: Path to the backup manifest, or None if nothing was backed up.
+        """
+        self.logger.info(f"Backing up configuration for device {ip_address}")
+        store = self._get_backup_store()
+        config_paths = config_paths or DEFAULT_CONFIG_PATHS
+        previous = store.latest_manifest(ip_address)
+        previous_files = previous['files'] if previous else {}
+        auth = {'password': password, 'ssh_key_path': ssh_key_path}
+        files = {}
+        
+        try:
+            with self.ssh_pool.session(ip_address, username, **auth) as ssh:
+                sftp = self.ssh_pool.get_sftp(ip_address, username, **auth)
+                
+                for path in config_paths:
+                    try:
+                        mtime = None
+                        if sftp is not None:
+                            stat = sftp.stat(path)
+                            mtime = stat.st_mtime
+                            known = previous_files.get(path)
+                            if (known and known.get('size') == stat.st_size and known.get('mtime') == mtime
+                                    and store.find_object(known['sha256']) is not None):
+                                files[path] = known
+                                self.logger.info(f"{path} unchanged on {ip_address}, skipping transfer")
+                                continue
+                        
+                        digest, size = store.put_stream(iter_remote_file(ssh, sftp, path))
+                        files[path] = {'sha256': digest, 'size': size, 'mtime': mtime}
+                        self.logger.info(f"Backed up {path} from {ip_address} ({size} bytes)")
+                    except IOError as e:
+                        self.logger.warning(f"Skipping {path} on {ip_address}: {e}")
+            
+            if not files:
+                self.logger.error(f"No configuration files could be backed up from {ip_address}")
+                print(f"Error: No configuration files could be backed up from {ip_address}")
+                return None
+            
+            manifest_path = store.save_manifest(ip_address, files)
+            
+            # Record the backup in the drift history (failures here must not lose the backup)
+            try:
+                changed = self._get_drift_engine().ingest_manifest(store.load_manifest(manifest_path))
+                if changed:
+                    self.logger.info(f"Configuration drift on {ip_address}: {sorted(changed)}")
+            except Exception as e:
+                self.logger.warning(f"Could not record configuration drift for {ip_address}: {e}")
+            
+            return manifest_path
+            
+        except paramiko.AuthenticationException as e:
+            self.logger.error(f"Authentication failed backing up device {ip_address}: {e}")
+            print("Error: Authentication failed. Please check your credentials or SSH keys.")
+        except paramiko.SSHException as e:
+            self.logger.error(f"SSH error backing up device {ip_address}: {e}")
+            print(f"Error: SSH connection error: {e}")
+        except Exception as e:
+            self.logger.error(f"Error backing up device {ip_address}: {e}")
+            print(f"Error backing up device configuration: {e}")
+        return None
+
+    def restore_device_configuration(self, ip_address, username, backup_file, ssh_key_path=None, password=None):
+        """
+        Restore a device's configuration files from a backup manifest.
+        
+        Stored objects are decompressed and streamed back over the pooled
+        session; each file is written to a staging path and renamed into place.
+        
+        Args:
+            ip_address (str): The IP address of the device.
+            username (str): The username for SSH access.
+            backup_file (str): Path to the backup manifest returned by backup_device_configuration.
+            ssh_key_path (str): Path to the SSH private key file (optional, auto-detected).
+            password (str): The password for SSH access (optional).
+            
+        Returns:
+            bool: True if every file was restored, False otherwise.
+        """
+        self.logger.info(f"Restoring configuration for device {ip_address} from {backup_file}")
+        
+        if not backup_file or not os.path.exists(backup_file):
+            self.logger.error(f"Backup manifest not found: {backup_file}")
+            print(f"Error: Backup file not found: {backup_file}")
+            return False
+        
+        store = self._get_backup_store()
+        auth = {'password': password, 'ssh_key_path': ssh_key_path}
+        
+        try:
+            manifest = store.load_manifest(backup_file)
+            if manifest.get('device') != ip_address:
+                self.logger.warning(f"Backup {backup_file} was taken from {manifest.get('device')}, "
+                                    f"restoring to {ip_address}")
+            
+            restored = 0
+            with self.ssh_pool.session(ip_address, username, **auth) as ssh:
+                sftp = self.ssh_pool.get_sftp(ip_address, username, **auth)
+                
+                for path, entry in manifest['files'].items():
+                    try:
+                        write_remote_file(ssh, sftp, path, store.iter_object(entry['sha256']))
+                        restored += 1
+                        self.logger.info(f"Restored {path} on {ip_address}")
+                    except IOError as e:
+                        self.logger.error(f"Failed to restore {path} on {ip_address}: {e}")
+                        print(f"Error restoring {path}: {e}")
+            
+            self.logger.info(f"Restored {restored}/{len(manifest['files'])} files on {ip_address}")
+            return restored == len(manifest['files'])
+            
+        except paramiko.AuthenticationException as e:
+            self.logger.error(f"Authentication failed restoring device {ip_address}: {e}")
+            print("Error: Authentication failed. Please check your credentials or SSH keys.")
+        except paramiko.SSHException as e:
+            self.logger.error(f"SSH error restoring device {ip_address}: {e}")
+            print(f"Error: SSH connection error: {e}")
+        except Exception as e:
+            self.logger.error(f"Error restoring device {ip_address}: {e}")
+            print(f"Error restoring device configuration: {e}")
+        return False
+
 if __name__ == '__main__':
     import time
     logging.basicConfig(level=logging.DEBUG)
@@ -6,43 +6,82 @@ using actual system firewall commands with permanent rule persistence.
 """
 
 import logging
-import subprocess
-import platform
+import threading
+import time
 import requests
-import json
 import os
 import sys
 
+from .firewall_backends import get_capabilities, select_backend
+from .prefix_set import PrefixSet
+from .blocklist_journal import BlocklistJournal
+from .expiry_scheduler import ExpiryScheduler
+
 class NetworkBlocker:
     """A class to handle network blocking operations using actual firewall commands with permanent persistence."""
     
-    def __init__(self):
-        """Initialize the network blocker."""
+    # Seconds for which firewall hit counters are reused before being read again
+    STATS_CACHE_SECONDS = 5
+    
+    def __init__(self, blocked_ips_file=None, backend=None):
+        """
+        Initialize the network blocker.
+        
+        Args:
+            blocked_ips_file (str): Path of the persistent blocklist (defaults to
+                blocked_ips.json in the project root).
+            backend (FirewallBackend): Firewall backend to use (defaults to the
+                best backend for this system, selected on first use).
+        """
         self.logger = logging.getLogger(__name__)
         # Store blocked IPs in a file for persistence across reboots
-        self.blocked_ips_file = os.path.join(os.path.dirname(__file__), "..", "..", "blocked_ips.json")
+        self.blocked_ips_file = blocked_ips_file or os.path.join(os.path.dirname(__file__), "..", "..", "blocked_ips.json")
+        # Firewall backend, selected on first use unless one is given (see backend)
+        self._backend = backend
+        # Snapshot plus append-only journal of block/unblock events
+        self._journal = BlocklistJournal(self.blocked_ips_file)
+        # Serializes blocklist changes from callers and the expiry thread
+        self._lock = threading.RLock()
+        # Expiry times of time-limited blocks, fired in batches by one thread
+        self._expiries = ExpiryScheduler(self._expire)
+        # Entries blocked without a TTL; blocked_ips is these plus the time-limited entries
+        self._permanent = PrefixSet()
+        # Hit counters from the last bulk read, and when each prefix last saw traffic
+        self._counters = None
+        self._counters_read_at = 0
+        self._last_activity = {}
         self.blocked_ips = self._load_blocked_ips()
         self._check_privileges()
+        if self.has_privileges and len(self._expiries):
+            self._expiries.start()
     
-    def _check_privileges(self):
+    @property
+    def backend(self):
+        """
+        The firewall backend, selected and prepared on first use.
+        
+        On Linux, ipset or nftables sets are preferred; per-address iptables
+        rules are the fallback when neither is available.
+        """
+        if self._backend is None:
+            self._backend = select_backend()
+        return self._backend
+    
+    def _check_privileges(self, refresh=False):
         """
         Check if the application has sufficient privileges to execute firewall commands.
+        
+        The default backends use the process-wide capability probe, which
+        runs once; an injected backend is asked directly.
+        
+        Args:
+            refresh (bool): Re-run the capability probe instead of using the cached result.
         """
         try:
-            if platform.system() == "Windows":
-                # On Windows, check if we can execute netsh commands
-                result = subprocess.run(["netsh", "advfirewall", "show", "allprofiles"], 
-                                      capture_output=True, text=True)
-                self.has_privileges = result.returncode == 0
-            elif platform.system() == "Linux":
-                # On Linux, check if we can execute iptables commands
-                result = subprocess.run(["iptables", "-L"], capture_output=True, text=True)
-                self.has_privileges = result.returncode == 0
+            if self._backend is None:
+                self.has_privileges = get_capabilities(refresh)['privileged']
             else:
-                # On macOS, check if we can execute pfctl commands
-                result = subprocess.run(["pfctl", "-sr"], capture_output=True, text=True)
-                self.has_privileges = result.returncode == 0
-                
+                self.has_privileges = self._backend.check_privileges()
             if not self.has_privileges:
                 self.logger.warning("Insufficient privileges to execute firewall commands. "
                                   "Run as administrator/root for full functionality.")
@@ -52,354 +91,384 @@ class NetworkBlocker:
             self.logger.warning(f"Error checking privileges: {e}")
             self.has_privileges = False
     
+    def refresh_privileges(self):
+        """
+        Re-check firewall privileges, e.g. after the process gained CAP_NET_ADMIN.
+        
+        Returns:
+            bool: True if firewall commands can be executed.
+        """
+        self._check_privileges(refresh=True)
+        if self.has_privileges and len(self._expiries):
+            self._expiries.start()
+        return self.has_privileges
+    
+    def _valid_entries(self, entries):
+        """Return the valid entries of a list, logging and skipping the rest."""
+        invalid = set(map(str, self._invalid_addresses(entries)))
+        for entry in invalid:
+            self.logger.error(f"Skipping invalid blocked IP entry: {entry}")
+        return [entry for entry in entries if str(entry) not in invalid]
+    
     def _load_blocked_ips(self):
         """
         Load blocked IPs from persistent storage.
         
+        The snapshot is loaded and the journal records written after it are
+        replayed in order. Entries may be addresses, CIDRs or ranges; they
+        are aggregated into the minimal prefix set. Invalid entries are skipped.
+        
         Returns:
-            set: Set of blocked IP addresses.
+            PrefixSet: The blocked prefixes.
         """
         try:
-            if os.path.exists(self.blocked_ips_file):
-                with open(self.blocked_ips_file, 'r') as f:
-                    blocked_ips = set(json.load(f))
-                    self.logger.info(f"Loaded {len(blocked_ips)} blocked IPs from persistent storage")
-                    return blocked_ips
-            else:
+            if not os.path.exists(self.blocked_ips_file) and not os.path.exists(self._journal.journal_path):
                 self.logger.info("No existing blocked IPs file found")
-                return set()
+                return PrefixSet()
+            
+            snapshot, records = self._journal.load()
+            saved = snapshot.get('expiries', {})
+            expiries = {entry: saved[entry] for entry in self._valid_entries(list(saved))}
+            if 'permanent' in snapshot:
+                permanent = PrefixSet(self._valid_entries(snapshot['permanent']))
+            else:
+                # Older snapshots only hold the merged blocklist
+                permanent = PrefixSet(self._valid_entries(snapshot.get('entries', [])))
+                permanent.difference_update(expiries)
+            for record in records:
+                entries = self._valid_entries(record.get('entries', []))
+                self._track_change(permanent, expiries, record.get('op'), entries, record.get('expires'))
+            blocked_ips = self._build_blocklist(permanent, expiries)
+            self._commit_state(permanent, expiries, {}, blocked_ips)
+            self.logger.info(f"Loaded {len(blocked_ips)} blocked prefixes from persistent storage")
+            return blocked_ips
         except Exception as e:
             self.logger.error(f"Error loading blocked IPs: {e}")
-            return set()
+            self._permanent = PrefixSet()
+            return PrefixSet()
     
     def _save_blocked_ips(self):
         """
-        Save blocked IPs to persistent storage.
+        Save blocked IPs to persistent storage as a new snapshot.
         """
-        try:
-            # Create directory if it doesn't exist
-            os.makedirs(os.path.dirname(self.blocked_ips_file), exist_ok=True)
-            
-            # Save blocked IPs to file
-            with open(self.blocked_ips_file, 'w') as f:
-                json.dump(list(self.blocked_ips), f)
-            self.logger.info(f"Saved {len(self.blocked_ips)} blocked IPs to persistent storage")
-        except Exception as e:
-            self.logger.error(f"Error saving blocked IPs: {e}")
+        if self._journal.compact(list(self.blocked_ips), permanent=list(self._permanent),
+                                 expiries=self._expiries.pending()):
+            self.logger.info(f"Saved {len(self.blocked_ips)} blocked prefixes to persistent storage")
+    
+    def _record_change(self, op, ip_addresses, **fields):
+        """
+        Persist a block, unblock or expiry as one journal record.
+        
+        The journal is compacted into a snapshot once it grows past its threshold.
+        
+        Args:
+            op (str): 'block', 'unblock' or 'expire'.
+            ip_addresses (list): The entries of the change.
+            **fields: Extra record fields, e.g. 'expires' for time-limited blocks.
+        """
+        if not self._journal.append(op, ip_addresses, **fields) or self._journal.needs_compaction():
+            # A failed append falls back to a full snapshot of the current state
+            self._save_blocked_ips()
+    
+    def _track_change(self, permanent, expiries, op, ip_addresses, expires=None):
+        """
+        Apply a change to the permanent entries and the time-limited ones.
+        
+        The two are kept apart so that an expiry removes only what the
+        time-limited block added. A time-limited block sets (or extends) the
+        expiry of its entries and a permanent block ends the expiry of every
+        entry it covers. An unblock removes its entries from both; a
+        time-limited entry that is only partly unblocked is split and the
+        rest keeps its expiry. An expiry drops time-limited entries only.
+        
+        Args:
+            permanent (PrefixSet): Permanently blocked prefixes, updated in place.
+            expiries (dict): {entry: expiry timestamp} of the time-limited
+                blocks, updated in place.
+            op (str): 'block', 'unblock' or 'expire'.
+            ip_addresses (list): The entries of the change.
+            expires (float): Expiry timestamp for time-limited blocks (optional).
+        """
+        if op == 'block' and expires is not None:
+            for entry in ip_addresses:
+                expiries[entry] = max(expires, expiries.get(entry) or 0)
+        elif op == 'block':
+            permanent.update(ip_addresses)
+            covering = PrefixSet(ip_addresses)
+            for entry in [entry for entry in expiries if entry in covering]:
+                del expiries[entry]
+        elif op == 'unblock':
+            permanent.difference_update(ip_addresses)
+            for entry, entry_expires in list(expiries.items()):
+                rest = PrefixSet([entry])
+                if rest.difference_update(ip_addresses)[1]:
+                    del expiries[entry]
+                    for prefix in rest:
+                        expiries[prefix] = max(entry_expires, expiries.get(prefix) or 0)
+        elif op == 'expire':
+            for entry in ip_addresses:
+                expiries.pop(entry, None)
+    
+    @staticmethod
+    def _build_blocklist(permanent, expiries):
+        """Return the blocklist of permanent prefixes plus time-limited entries."""
+        blocklist = permanent.copy()
+        blocklist.update(expiries)
+        return blocklist
+    
+    def _commit_state(self, permanent, expiries, before, blocklist):
+        """
+        Make a computed change the current state.
+        
+        Only expiries that differ from 'before' are touched, so an entry the
+        expiry thread popped in the meantime is not scheduled again.
+        
+        Args:
+            permanent (PrefixSet): The new permanent prefixes.
+            expiries (dict): The new {entry: expiry timestamp} mapping.
+            before (dict): The mapping the change was computed from.
+            blocklist (PrefixSet): The new blocklist.
+        """
+        for entry in before.keys() - expiries.keys():
+            self._expiries.cancel(entry)
+        for entry, expires in expiries.items():
+            if before.get(entry) != expires:
+                self._expiries.schedule(entry, expires)
+        self._permanent = permanent
+        self.blocked_ips = blocklist
     
-    def _execute_firewall_command(self, cmd, description):
+    def _expire(self, ip_addresses):
         """
-        Execute a firewall command and handle errors.
+        Remove expired entries in one batch (called by the expiry thread).
+        
+        The blocklist is rebuilt from the permanent entries and the
+        time-limited ones still live, and only the difference is sent to the
+        firewall, so permanent or longer blocks inside an expired range stay.
         
         Args:
-            cmd (str or list): The command to execute.
-            description (str): Description of the command for logging.
+            ip_addresses (list): The expired entries.
             
         Returns:
-            bool: True if command was successful, False otherwise.
+            list: Entries that could not be unblocked and should be retried.
         """
-        try:
-            self.logger.info(f"Executing {description}: {cmd}")
-            
-            # Convert string command to list for better handling
-            if isinstance(cmd, str):
-                if platform.system() != "Windows":
-                    cmd = cmd.split()
-                else:
-                    # On Windows, we need to use shell=True for netsh commands
-                    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-                    if result.returncode == 0:
-                        self.logger.info(f"Successfully executed {description}")
-                        return True
-                    else:
-                        self.logger.error(f"Failed to execute {description}. Error: {result.stderr}")
-                        print(f"Error executing {description}: {result.stderr}")
-                        return False
-            
-            # For non-Windows platforms or when cmd is already a list
-            result = subprocess.run(cmd, capture_output=True, text=True)
+        with self._lock:
+            # Entries blocked again since they were popped keep their new expiry
+            expired = [entry for entry in ip_addresses if entry not in self._expiries]
+            if not expired:
+                return []
+            self.logger.info(f"Block expired for {len(expired)} entries")
+            if not self.has_privileges:
+                self.logger.error("Insufficient privileges to remove expired blocks, will retry")
+                return expired
             
-            if result.returncode == 0:
-                self.logger.info(f"Successfully executed {description}")
-                return True
-            else:
-                self.logger.error(f"Failed to execute {description}. Error: {result.stderr}")
-                print(f"Error executing {description}: {result.stderr}")
-                return False
-                
-        except Exception as e:
-            self.logger.error(f"Exception while executing {description}: {e}")
-            print(f"Exception while executing {description}: {e}")
-            return False
+            blocklist = self._build_blocklist(self._permanent, self._expiries.pending())
+            current = set(self.blocked_ips)
+            wanted = set(blocklist)
+            added = [prefix for prefix in blocklist if prefix not in current]
+            removed = [prefix for prefix in self.blocked_ips if prefix not in wanted]
+            try:
+                if (added or removed) and not self._apply_change(added, removed):
+                    return expired
+            except Exception as e:
+                self.logger.error(f"Error removing expired blocks: {e}")
+                return expired
+            self.blocked_ips = blocklist
+            self._record_change('expire', expired)
+            return []
     
-    def _make_persistent_windows(self, ip_address):
+    def _invalid_addresses(self, ip_addresses):
         """
-        Make blocking rules persistent on Windows.
+        Return the entries of a batch that are not valid addresses, CIDRs or ranges.
         
         Args:
-            ip_address (str): The IP address to block persistently.
+            ip_addresses (list): The entries to check.
             
         Returns:
-            bool: True if successful, False otherwise.
+            list: The invalid entries, in input order.
         """
-        try:
-            # Windows firewall rules are persistent by default
-            # But we'll also create a startup script to ensure rules are re-added
-            startup_script = os.path.join(os.path.dirname(__file__), "..", "..", "restore_blocked_ips.bat")
-            
-            # Create or append to startup script
-            with open(startup_script, 'a') as f:
-                f.write(f'netsh advfirewall firewall add rule name="Block {ip_address}" dir=in action=block remoteip={ip_address}\n')
-                f.write(f'netsh advfirewall firewall add rule name="Block {ip_address} Out" dir=out action=block remoteip={ip_address}\n')
-            
-            self.logger.info(f"Added {ip_address} to Windows startup script")
-            return True
-        except Exception as e:
-            self.logger.error(f"Error creating Windows startup script: {e}")
-            return False
+        invalid = []
+        for ip_address in ip_addresses:
+            try:
+                PrefixSet.parse(ip_address)
+            except ValueError:
+                invalid.append(ip_address)
+        return invalid
     
-    def _make_persistent_linux(self, ip_address):
+    def _apply_change(self, added, removed):
         """
-        Make blocking rules persistent on Linux.
+        Push a blocklist change to the firewall backend in a single operation.
         
         Args:
-            ip_address (str): The IP address to block persistently.
+            added (list): Prefixes to block.
+            removed (list): Prefixes to unblock.
             
         Returns:
-            bool: True if successful, False otherwise.
+            bool: True if the change was applied, False otherwise.
         """
-        try:
-            # For Linux, we'll save the rules to iptables-persistent or create a startup script
-            # Check if iptables-persistent is available
-            if self._execute_firewall_command(["which", "iptables-save"], "iptables-save check"):
-                # Save current iptables rules
-                self._execute_firewall_command(["iptables-save"], "iptables rules save")
-                self.logger.info("Saved iptables rules to persistent storage")
-            else:
-                # Create a startup script
-                startup_script = os.path.join(os.path.dirname(__file__), "..", "..", "restore_blocked_ips.sh")
-                script_content = f"""#!/bin/bash
-iptables -A INPUT -s {ip_address} -j DROP
-iptables -A OUTPUT -d {ip_address} -j DROP
-iptables -A FORWARD -s {ip_address} -j DROP
-"""
-                # Write script
-                with open(startup_script, 'a') as f:
-                    f.write(script_content)
-                
-                # Make script executable
-                self._execute_firewall_command(["chmod", "+x", startup_script], "chmod startup script")
-                
-            return True
-        except Exception as e:
-            self.logger.error(f"Error creating Linux startup script: {e}")
-            return False
+        return self.backend.apply(added, removed)
     
-    def _make_persistent_macos(self, ip_address):
+    def _reconcile(self, prefixes):
         """
-        Make blocking rules persistent on macOS.
+        Make the firewall match the blocklist with one read and one minimal batch.
         
         Args:
-            ip_address (str): The IP address to block persistently.
+            prefixes (list): Every prefix that should be blocked.
             
         Returns:
-            bool: True if successful, False otherwise.
+            tuple: (added, removed) prefixes, or None on failure.
         """
-        try:
-            # For macOS, we'll create a startup script
-            startup_script = os.path.join(os.path.dirname(__file__), "..", "..", "restore_blocked_ips.sh")
-            
-            # Create or append to startup script
-            with open(startup_script, 'a') as f:
-                f.write(f"echo 'block in from {ip_address} to any' | pfctl -f -\n")
-                f.write(f"echo 'block out from any to {ip_address}' | pfctl -f -\n")
-            
-            # Make script executable
-            self._execute_firewall_command(["chmod", "+x", startup_script], "chmod macOS startup script")
-            
-            self.logger.info(f"Added {ip_address} to macOS startup script")
-            return True
-        except Exception as e:
-            self.logger.error(f"Error creating macOS startup script: {e}")
-            return False
+        result = self.backend.reconcile(prefixes)
+        if result is None:
+            self.logger.warning("Could not reconcile with the live ruleset, re-applying the whole blocklist")
+            result = (prefixes, []) if self.backend.apply(prefixes, []) else None
+        if result is not None:
+            self.backend.persist(list(self._permanent))
+        return result
     
-    def block_ip(self, ip_address):
+    def _change_blocklist(self, ip_addresses, block, ttl=None):
         """
-        Block the specified IP address from accessing the network using system firewall with persistence.
+        Validate a batch, compute the aggregated prefix change and apply it.
+        
+        If any entry is invalid, or the firewall rejects the change, nothing
+        is applied and the stored blocklist is left as it was.
         
         Args:
-            ip_address (str): The IP address to block.
+            ip_addresses (list): Addresses, CIDRs or ranges.
+            block (bool): True to block the entries, False to unblock them.
+            ttl (float): Seconds until a block expires (optional, blocks only).
             
         Returns:
-            bool: True if blocking was successful, False otherwise.
+            bool: True if the change was applied, False otherwise.
         """
-        self.logger.info(f"Blocking IP address: {ip_address}")
+        action = "block" if block else "unblock"
         
         # Check if we have sufficient privileges
         if not self.has_privileges:
-            self.logger.error("Insufficient privileges to block IP address. Run as administrator/root.")
-            print("Error: Insufficient privileges to block IP address. Run as administrator/root.")
+            self.logger.error(f"Insufficient privileges to {action} IP addresses. Run as administrator/root.")
+            print(f"Error: Insufficient privileges to {action} IP addresses. Run as administrator/root.")
+            return False
+        
+        ip_addresses = list(dict.fromkeys(ip_addresses))
+        invalid = self._invalid_addresses(ip_addresses)
+        if invalid:
+            self.logger.error(f"Refusing to {action} batch with invalid entries: {invalid}")
+            print(f"Error: Invalid IP addresses in batch, nothing was {action}ed: {', '.join(invalid)}")
             return False
         
         try:
-            # Store the blocked IP in memory and persistent storage
-            self.blocked_ips.add(ip_address)
-            self._save_blocked_ips()
-            
-            # Use system firewall commands to block the IP
-            if platform.system() == "Windows":
-                # Windows firewall command
-                cmd = f'netsh advfirewall firewall add rule name="Block {ip_address}" dir=in action=block remoteip={ip_address}'
-                success = self._execute_firewall_command(cmd, f"Windows firewall block rule for {ip_address}")
-                
-                if success:
-                    # Also block outgoing connections
-                    cmd = f'netsh advfirewall firewall add rule name="Block {ip_address} Out" dir=out action=block remoteip={ip_address}'
-                    self._execute_firewall_command(cmd, f"Windows firewall outbound block rule for {ip_address}")
-                    
-                    # Make rules persistent
-                    self._make_persistent_windows(ip_address)
-                
-                return success
-                
-            elif platform.system() == "Linux":
-                # Linux iptables command for incoming traffic
-                cmd = ["iptables", "-A", "INPUT", "-s", ip_address, "-j", "DROP"]
-                success = self._execute_firewall_command(cmd, f"Linux iptables INPUT rule for {ip_address}")
-                
-                if success:
-                    # Also block outgoing traffic
-                    cmd = ["iptables", "-A", "OUTPUT", "-d", ip_address, "-j", "DROP"]
-                    self._execute_firewall_command(cmd, f"Linux iptables OUTPUT rule for {ip_address}")
-                    
-                    # Also block forwarding (if this is a router/gateway)
-                    cmd = ["iptables", "-A", "FORWARD", "-s", ip_address, "-j", "DROP"]
-                    self._execute_firewall_command(cmd, f"Linux iptables FORWARD rule for {ip_address}")
-                    
-                    # Make rules persistent
-                    self._make_persistent_linux(ip_address)
-                
-                return success
+            with self._lock:
+                before = self._expiries.pending()
+                permanent, expiries = self._permanent.copy(), dict(before)
+                blocklist = self.blocked_ips.copy()
+                fields = {}
+                if block and ttl is not None:
+                    fields['expires'] = time.time() + ttl
+                    # Entries already blocked permanently keep their permanent block
+                    ip_addresses = [entry for entry in ip_addresses if entry not in permanent]
+                self._track_change(permanent, expiries, action, ip_addresses, fields.get('expires'))
+                if block:
+                    added, removed = blocklist.update(ip_addresses)
+                else:
+                    added, removed = blocklist.difference_update(ip_addresses)
                 
-            else:
-                # macOS or other Unix-like systems (using pf - packet filter)
-                cmd = ["pfctl", "-f", "-"]
-                # Prepare the rule content
-                rule_content = f"block in from {ip_address} to any\nblock out from any to {ip_address}\n"
+                if (not added and not removed and expiries == before
+                        and list(permanent) == list(self._permanent)):
+                    self.logger.info(f"Blocklist already up to date, nothing to {action}")
+                    return True
                 
-                self.logger.info(f"Executing macOS pf block rule for {ip_address}")
-                try:
-                    result = subprocess.run(cmd, input=rule_content, capture_output=True, text=True)
-                    
-                    if result.returncode == 0:
-                        self.logger.info(f"Successfully executed macOS pf block rule for {ip_address}")
-                        success = True
-                    else:
-                        self.logger.error(f"Failed to execute macOS pf block rule for {ip_address}. Error: {result.stderr}")
-                        print(f"Error executing macOS pf block rule for {ip_address}: {result.stderr}")
-                        success = False
-                        
-                    if success:
-                        # Make rules persistent
-                        self._make_persistent_macos(ip_address)
-                    
-                    return success
-                except Exception as e:
-                    self.logger.error(f"Exception while executing macOS pf block rule for {ip_address}: {e}")
-                    print(f"Exception while executing macOS pf block rule for {ip_address}: {e}")
+                if (added or removed) and not self._apply_change(added, removed):
                     return False
-            
+                
+                # Startup scripts hold only permanent blocks, so a TTL block
+                # cannot come back as permanent after a reboot
+                permanent_changed = list(permanent) != list(self._permanent)
+                self._commit_state(permanent, expiries, before, blocklist)
+                if permanent_changed:
+                    self.backend.persist(list(permanent))
+                self._record_change(action, ip_addresses, **fields)
+                if fields:
+                    self._expiries.start()
+                return True
         except Exception as e:
-            self.logger.error(f"Error blocking IP address {ip_address}: {e}")
-            print(f"Error blocking IP address {ip_address}: {e}")
+            self.logger.error(f"Error {action}ing IP addresses: {e}")
+            print(f"Error {action}ing IP addresses: {e}")
             return False
     
+    def block_ip(self, ip_address, ttl=None):
+        """
+        Block the specified IP address from accessing the network using system firewall with persistence.
+        
+        A block with a TTL is removed automatically when it expires, also
+        across restarts. Blocking an entry that is already blocked
+        permanently leaves it permanent.
+        
+        Args:
+            ip_address (str): The IP address, CIDR (e.g. '10.0.0.0/20') or
+                range (e.g. '10.0.0.1-10.0.0.50') to block.
+            ttl (float): Seconds until the block expires (optional, default permanent).
+            
+        Returns:
+            bool: True if blocking was successful, False otherwise.
+        """
+        self.logger.info(f"Blocking IP address: {ip_address}" + (f" for {ttl} seconds" if ttl is not None else ""))
+        return self._change_blocklist([ip_address], block=True, ttl=ttl)
+    
     def unblock_ip(self, ip_address):
         """
         Unblock the specified IP address to restore network access with persistence update.
         
+        Unblocking part of a blocked prefix splits it, so the rest stays blocked.
+        
         Args:
-            ip_address (str): The IP address to unblock.
+            ip_address (str): The IP address, CIDR or range to unblock.
             
         Returns:
             bool: True if unblocking was successful, False otherwise.
         """
         self.logger.info(f"Unblocking IP address: {ip_address}")
+        return self._change_blocklist([ip_address], block=False)
+    
+    def block_many(self, ip_addresses, ttl=None):
+        """
+        Block several IP addresses, CIDRs or ranges with one firewall transaction.
         
-        # Check if we have sufficient privileges
-        if not self.has_privileges:
-            self.logger.error("Insufficient privileges to unblock IP address. Run as administrator/root.")
-            print("Error: Insufficient privileges to unblock IP address. Run as administrator/root.")
-            return False
+        Entries are validated first and aggregated with the existing
+        blocklist into the minimal set of prefixes; if any entry is invalid
+        nothing is applied. The blocklist is saved once, after the firewall
+        accepted the whole batch.
         
-        try:
-            # Remove the blocked IP from memory and persistent storage
-            self.blocked_ips.discard(ip_address)
-            self._save_blocked_ips()
+        Args:
+            ip_addresses (list): The entries to block.
+            ttl (float): Seconds until the blocks expire (optional, default permanent).
             
-            # Use system firewall commands to unblock the IP
-            if platform.system() == "Windows":
-                # Windows firewall command to delete inbound rule
-                cmd = f'netsh advfirewall firewall delete rule name="Block {ip_address}"'
-                success = self._execute_firewall_command(cmd, f"Windows firewall delete inbound rule for {ip_address}")
-                
-                if success:
-                    # Also delete outbound rule
-                    cmd = f'netsh advfirewall firewall delete rule name="Block {ip_address} Out"'
-                    self._execute_firewall_command(cmd, f"Windows firewall delete outbound rule for {ip_address}")
-                
-                return success
-                
-            elif platform.system() == "Linux":
-                # Linux iptables command to remove INPUT rule (try several variations)
-                rules_to_try = [
-                    ["iptables", "-D", "INPUT", "-s", ip_address, "-j", "DROP"],
-                    ["iptables", "-D", "OUTPUT", "-d", ip_address, "-j", "DROP"],
-                    ["iptables", "-D", "FORWARD", "-s", ip_address, "-j", "DROP"]
-                ]
-                
-                success = True
-                for cmd in rules_to_try:
-                    rule_desc = f"Linux iptables delete rule: {' '.join(cmd)}"
-                    if not self._execute_firewall_command(cmd, rule_desc):
-                        # Log error but continue with other rules
-                        self.logger.warning(f"Failed to execute: {rule_desc}")
-                        success = False  # Mark as partial failure
-                
-                return success
-                
-            else:
-                # macOS or other Unix-like systems
-                # For macOS, we'll add pass rules to allow traffic
-                cmd = ["pfctl", "-f", "-"]
-                # Prepare the rule content
-                rule_content = f"pass in from {ip_address} to any\npass out from any to {ip_address}\n"
-                
-                self.logger.info(f"Executing macOS pf pass rule for {ip_address}")
-                try:
-                    result = subprocess.run(cmd, input=rule_content, capture_output=True, text=True)
-                    
-                    if result.returncode == 0:
-                        self.logger.info(f"Successfully executed macOS pf pass rule for {ip_address}")
-                        return True
-                    else:
-                        self.logger.error(f"Failed to execute macOS pf pass rule for {ip_address}. Error: {result.stderr}")
-                        print(f"Error executing macOS pf pass rule for {ip_address}: {result.stderr}")
-                        return False
-                except Exception as e:
-                    self.logger.error(f"Exception while executing macOS pf pass rule for {ip_address}: {e}")
-                    print(f"Exception while executing macOS pf pass rule for {ip_address}: {e}")
-                    return False
+        Returns:
+            bool: True if every entry was blocked, False otherwise.
+        """
+        self.logger.info(f"Blocking {len(ip_addresses)} IP address entries")
+        return self._change_blocklist(ip_addresses, block=True, ttl=ttl)
+    
+    def unblock_many(self, ip_addresses):
+        """
+        Unblock several IP addresses, CIDRs or ranges with one firewall transaction.
+        
+        Args:
+            ip_addresses (list): The entries to unblock.
             
-        except Exception as e:
-            self.logger.error(f"Error unblocking IP address {ip_address}: {e}")
-            print(f"Error unblocking IP address {ip_address}: {e}")
-            return False
+        Returns:
+            bool: True if every entry was unblocked, False otherwise.
+        """
+        self.logger.info(f"Unblocking {len(ip_addresses)} IP address entries")
+        return self._change_blocklist(ip_addresses, block=False)
     
     def restore_blocked_ips(self):
         """
         Restore all blocked IPs from persistent storage.
         
+        The live firewall state is read once and reconciled with the
+        blocklist: missing entries are added, stale and duplicate rules are
+        removed, and entries already in place are left alone, so restoring
+        twice changes nothing.
+        
         Returns:
             bool: True if restoration was successful, False otherwise.
         """
@@ -412,16 +481,25 @@ iptables -A FORWARD -s {ip_address} -j DROP
             return False
         
         try:
-            success_count = 0
-            for ip in self.blocked_ips:
-                if self.block_ip(ip):
-                    success_count += 1
-                    self.logger.info(f"Restored block for IP: {ip}")
-                else:
-                    self.logger.error(f"Failed to restore block for IP: {ip}")
+            with self._lock:
+                # Blocks that expired while we were not running are dropped, not restored
+                expired = self._expiries.pop_due()
+                if expired:
+                    self.logger.info(f"Dropping {len(expired)} blocks that expired while stopped")
+                    self.blocked_ips = self._build_blocklist(self._permanent, self._expiries.pending())
+                    self._record_change('expire', expired)
+                
+                prefixes = list(self.blocked_ips)
+                result = self._reconcile(prefixes)
+                if result is None:
+                    self.logger.error("Failed to restore blocked IPs")
+                    return False
             
-            self.logger.info(f"Restored {success_count}/{len(self.blocked_ips)} blocked IPs")
-            return success_count == len(self.blocked_ips)
+            added, removed = result
+            self._expiries.start()
+            self.logger.info(f"Restored {len(prefixes)} blocked prefixes "
+                             f"({len(added)} added, {len(removed)} stale removed)")
+            return True
         except Exception as e:
             self.logger.error(f"Error restoring blocked IPs: {e}")
             return False
@@ -431,12 +509,134 @@ iptables -A FORWARD -s {ip_address} -j DROP
         Check if an IP address is currently blocked.
         
         Args:
-            ip_address (str): The IP address to check.
+            ip_address (str): The IP address (or CIDR/range) to check.
             
         Returns:
-            bool: True if the IP is blocked, False otherwise.
+            bool: True if the IP is covered by a blocked prefix, False otherwise.
         """
         return ip_address in self.blocked_ips
+    
+    def get_block_expiry(self, ip_address):
+        """
+        Get the expiry time of a time-limited block.
+        
+        Args:
+            ip_address (str): The entry as it was blocked.
+            
+        Returns:
+            float: Expiry as a Unix timestamp, or None for permanent or unknown entries.
+        """
+        return self._expiries.get(ip_address)
+    
+    def _read_counters(self, max_age=None):
+        """
+        Get the firewall hit counters, reading them in one bulk call when the cache is stale.
+        
+        Every read also updates when each prefix last dropped traffic. A prefix
+        seen for the first time counts as active then, so activity is only
+        known from the time this process started watching it.
+        
+        Args:
+            max_age (float): Seconds a cached read may be reused (defaults to
+                STATS_CACHE_SECONDS).
+            
+        Returns:
+            dict: {prefix: (packets, bytes)}, empty if the backend has no counters.
+        """
+        max_age = self.STATS_CACHE_SECONDS if max_age is None else max_age
+        with self._lock:
+            if self._counters is not None and time.time() - self._counters_read_at < max_age:
+                return self._counters
+        
+        counters = None
+        if self.has_privileges:
+            try:
+                counters = self.backend.read_counters()
+            except Exception as e:
+                self.logger.warning(f"Error reading firewall counters: {e}")
+        counters = counters or {}
+        
+        now = time.time()
+        with self._lock:
+            for prefix, (packets, _) in counters.items():
+                seen = self._last_activity.get(prefix)
+                if seen is None or seen[0] != packets:
+                    self._last_activity[prefix] = (packets, now)
+            for prefix in list(self._last_activity):
+                if prefix not in counters:
+                    del self._last_activity[prefix]
+            self._counters = counters
+            self._counters_read_at = now
+            return counters
+    
+    def get_block_stats(self, max_age=None):
+        """
+        Get per-entry hit counters for the blocklist, most active first.
+        
+        Args:
+            max_age (float): Seconds cached counters may be reused (defaults to
+                STATS_CACHE_SECONDS; 0 forces a fresh read).
+            
+        Returns:
+            list: One dict per blocked prefix with 'entry', 'packets', 'bytes',
+                'idle_seconds' (time since the counters last moved) and
+                'expires'. Counters are None if the backend cannot report them.
+        """
+        counters = self._read_counters(max_age)
+        now = time.time()
+        with self._lock:
+            stats = []
+            for prefix in self.blocked_ips:
+                packets, size = counters.get(prefix, (None, None))
+                last = self._last_activity.get(prefix)
+                stats.append({
+                    'entry': prefix,
+                    'packets': packets,
+                    'bytes': size,
+                    'idle_seconds': round(now - last[1], 1) if last else None,
+                    'expires': self._expiries.get(prefix),
+                })
+        stats.sort(key=lambda stat: (stat['packets'] or 0, stat['bytes'] or 0), reverse=True)
+        return stats
+    
+    def prune_stale_blocks(self, idle_seconds):
+        """
+        Unblock entries whose counters have not moved for a while.
+        
+        Keeping the ruleset small keeps per-packet matching cheap. Entries
+        without counters are never pruned.
+        
+        Args:
+            idle_seconds (float): Minimum time without dropped traffic.
+            
+        Returns:
+            list: The prefixes that were unblocked.
+        """
+        stale = [stat['entry'] for stat in self.get_block_stats(max_age=0)
+                 if stat['idle_seconds'] is not None and stat['idle_seconds'] >= idle_seconds]
+        if not stale:
+            return []
+        self.logger.info(f"Pruning {len(stale)} blocks idle for at least {idle_seconds} seconds")
+        return stale if self.unblock_many(stale) else []
+
+_default_blocker = None
+_default_blocker_lock = threading.Lock()
+
+def get_blocker():
+    """
+    Return the process-wide network blocker.
+    
+    Sharing one instance keeps a single in-memory blocklist and a single
+    expiry thread per process.
+    
+    Returns:
+        NetworkBlocker: The shared blocker instance.
+    """
+    global _default_blocker
+    with _default_blocker_lock:
+        if _default_blocker is None:
+            _default_blocker = NetworkBlocker()
+        return _default_blocker
 
 # Example usage
 if __name__ == "__main__":
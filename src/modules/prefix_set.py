@@ -0,0 +1,218 @@
+"""
+Network Management Tool - Prefix Set Module
+
+This module provides PrefixSet, a set of IP networks kept as the minimal list
+of disjoint CIDR prefixes. Single addresses, CIDRs and address ranges are
+aggregated as they are added, so a blocked /20 is one entry rather than 4096,
+and membership is a binary search over the sorted prefixes.
+"""
+
+import bisect
+import ipaddress
+
+class PrefixSet:
+    """A set of IPv4/IPv6 prefixes aggregated into the minimal CIDR list."""
+
+    def __init__(self, entries=()):
+        """
+        Initialize the prefix set.
+
+        Args:
+            entries (iterable): Addresses, CIDRs or ranges to add (optional).
+
+        Raises:
+            ValueError: If an entry cannot be parsed.
+        """
+        self._networks = {4: [], 6: []}
+        self._starts = {4: [], 6: []}
+        self.update(entries)
+
+    @staticmethod
+    def parse(entry):
+        """
+        Parse an address, CIDR or 'first-last' range into networks.
+
+        Host bits in a CIDR are ignored, so '10.0.0.7/24' means 10.0.0.0/24.
+
+        Args:
+            entry (str): The entry to parse.
+
+        Returns:
+            list: ipaddress network objects covering the entry.
+
+        Raises:
+            ValueError: If the entry cannot be parsed.
+        """
+        entry = str(entry).strip()
+        if '-' in entry:
+            first, last = (ipaddress.ip_address(part.strip()) for part in entry.split('-', 1))
+            if first.version != last.version or first > last:
+                raise ValueError(f"Invalid address range: {entry}")
+            return list(ipaddress.summarize_address_range(first, last))
+        return [ipaddress.ip_network(entry, strict=False)]
+
+    @staticmethod
+    def format(network):
+        """Return a prefix as text, using a bare address for single hosts."""
+        if network.prefixlen == network.max_prefixlen:
+            return str(network.network_address)
+        return str(network)
+
+    def _replace(self, family, networks):
+        """
+        Replace one family's prefixes and return the change.
+
+        Args:
+            family (int): 4 or 6.
+            networks (list): Networks of that family (may overlap).
+
+        Returns:
+            tuple: (added, removed) lists of formatted prefixes.
+        """
+        old = self._networks[family]
+        new = list(ipaddress.collapse_addresses(networks))
+        old_set, new_set = set(old), set(new)
+        self._networks[family] = new
+        self._starts[family] = [int(network.network_address) for network in new]
+        return ([self.format(network) for network in new if network not in old_set],
+                [self.format(network) for network in old if network not in new_set])
+
+    def _group(self, entries):
+        """Parse entries and group the networks by address family."""
+        groups = {4: [], 6: []}
+        for entry in entries:
+            for network in self.parse(entry):
+                groups[network.version].append(network)
+        return groups
+
+    def update(self, entries):
+        """
+        Add entries, re-aggregating the affected family.
+
+        All entries are parsed before anything changes, so an invalid entry
+        leaves the set untouched.
+
+        Args:
+            entries (iterable): Addresses, CIDRs or ranges.
+
+        Returns:
+            tuple: (added, removed) prefixes, i.e. the change the firewall
+                must apply to match the new set.
+
+        Raises:
+            ValueError: If an entry cannot be parsed.
+        """
+        added, removed = [], []
+        for family, networks in self._group(entries).items():
+            if networks:
+                family_added, family_removed = self._replace(family, self._networks[family] + networks)
+                added.extend(family_added)
+                removed.extend(family_removed)
+        return added, removed
+
+    def difference_update(self, entries):
+        """
+        Remove entries, splitting prefixes that are only partly removed.
+
+        Args:
+            entries (iterable): Addresses, CIDRs or ranges.
+
+        Returns:
+            tuple: (added, removed) prefixes. Removing 10.0.0.5 from
+                10.0.0.0/24 removes the /24 and adds the remaining pieces.
+
+        Raises:
+            ValueError: If an entry cannot be parsed.
+        """
+        added, removed = [], []
+        for family, exclusions in self._group(entries).items():
+            if not exclusions:
+                continue
+            remaining = list(self._networks[family])
+            for exclusion in ipaddress.collapse_addresses(exclusions):
+                kept = []
+                for network in remaining:
+                    if network.subnet_of(exclusion):
+                        continue
+                    if exclusion.subnet_of(network):
+                        kept.extend(network.address_exclude(exclusion))
+                    else:
+                        kept.append(network)
+                remaining = kept
+            family_added, family_removed = self._replace(family, remaining)
+            added.extend(family_added)
+            removed.extend(family_removed)
+        return added, removed
+
+    def add(self, entry):
+        """Add one entry. Returns the (added, removed) prefix change."""
+        return self.update([entry])
+
+    def discard(self, entry):
+        """Remove one entry. Returns the (added, removed) prefix change."""
+        return self.difference_update([entry])
+
+    def lookup(self, address):
+        """
+        Find the prefix covering an address.
+
+        The stored prefixes are disjoint, so the covering prefix (if any) is
+        the one with the greatest start address not above the address.
+
+        Args:
+            address (str): The IP address to look up.
+
+        Returns:
+            str: The covering prefix, or None if the address is not in the set.
+        """
+        try:
+            address = ipaddress.ip_address(address)
+        except ValueError:
+            return None
+        index = bisect.bisect_right(self._starts[address.version], int(address)) - 1
+        if index >= 0:
+            network = self._networks[address.version][index]
+            if address in network:
+                return self.format(network)
+        return None
+
+    def covers(self, entry):
+        """
+        Check whether an address, CIDR or range is entirely in the set.
+
+        Args:
+            entry (str): The entry to check.
+
+        Returns:
+            bool: True if every address of the entry is in the set.
+        """
+        try:
+            networks = self.parse(entry)
+        except ValueError:
+            return False
+        for network in networks:
+            index = bisect.bisect_right(self._starts[network.version], int(network.network_address)) - 1
+            if index < 0 or not network.subnet_of(self._networks[network.version][index]):
+                return False
+        return True
+
+    def copy(self):
+        """Return an independent copy of the set."""
+        other = PrefixSet()
+        other._networks = {family: list(networks) for family, networks in self._networks.items()}
+        other._starts = {family: list(starts) for family, starts in self._starts.items()}
+        return other
+
+    def __contains__(self, entry):
+        return self.covers(entry)
+
+    def __iter__(self):
+        for family in (4, 6):
+            for network in self._networks[family]:
+                yield self.format(network)
+
+    def __len__(self):
+        return len(self._networks[4]) + len(self._networks[6])
+
+    def __repr__(self):
+        return f"PrefixSet({list(self)!r})"
@@ -0,0 +1,273 @@
+"""
+Network Management Tool - Reachability Module
+
+This module provides a bulk reachability prober that checks many host:port
+pairs concurrently using non-blocking sockets with per-socket timeouts.
+"""
+
+import asyncio
+import errno
+import logging
+import selectors
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# connect_ex() results meaning a non-blocking connect is still in flight
+_CONNECT_IN_PROGRESS = {errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY,
+                        getattr(errno, 'WSAEWOULDBLOCK', errno.EWOULDBLOCK)}
+
+class ReachabilityProber:
+    """Concurrent TCP reachability prober with a short-lived result cache."""
+
+    def __init__(self, timeout=3, cache_ttl=30, max_concurrency=256):
+        """
+        Initialize the reachability prober.
+
+        Args:
+            timeout (float): Default connect timeout in seconds for each probe.
+            cache_ttl (float): Seconds a probe result stays valid in the cache.
+            max_concurrency (int): Maximum number of sockets open at once.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.max_concurrency = max_concurrency
+        # (host, port) -> (reachable, checked_at)
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def get_cached(self, host, port=22):
+        """
+        Return a cached probe result without touching the network.
+
+        Args:
+            host (str): The host to look up.
+            port (int): The port to look up.
+
+        Returns:
+            bool: The cached result, or None if there is no fresh entry.
+        """
+        with self._lock:
+            entry = self._cache.get((host, port))
+        if entry is None:
+            return None
+        reachable, checked_at = entry
+        if time.monotonic() - checked_at > self.cache_ttl:
+            return None
+        return reachable
+
+    def invalidate(self, host=None):
+        """
+        Drop cached results.
+
+        Args:
+            host (str): Only drop entries for this host. Drops everything if None.
+        """
+        with self._lock:
+            if host is None:
+                self._cache.clear()
+            else:
+                for key in [key for key in self._cache if key[0] == host]:
+                    del self._cache[key]
+
+    def _store(self, results):
+        """Record probe results in the cache."""
+        now = time.monotonic()
+        with self._lock:
+            for key, reachable in results.items():
+                self._cache[key] = (reachable, now)
+
+    def _split_cached(self, targets, use_cache):
+        """
+        Split targets into cached results and targets that still need probing.
+
+        Returns:
+            tuple: (results dict, list of pending (host, port) pairs).
+        """
+        results = {}
+        pending = []
+        for host, port in dict.fromkeys((host, int(port)) for host, port in targets):
+            cached = self.get_cached(host, port) if use_cache else None
+            if cached is None:
+                pending.append((host, port))
+            else:
+                results[(host, port)] = cached
+        return results, pending
+
+    def check(self, host, port=22, timeout=None, use_cache=True):
+        """
+        Check whether a single host accepts TCP connections on a port.
+
+        Args:
+            host (str): The host to probe.
+            port (int): The port to probe (default: 22 for SSH).
+            timeout (float): Connect timeout in seconds (default: prober timeout).
+            use_cache (bool): Whether a fresh cached result may be returned.
+
+        Returns:
+            bool: True if the port accepted a connection, False otherwise.
+        """
+        return self.check_many([(host, port)], timeout=timeout, use_cache=use_cache)[(host, int(port))]
+
+    def check_many(self, targets, timeout=None, use_cache=True):
+        """
+        Probe many host:port pairs concurrently.
+
+        Every socket is non-blocking and carries its own deadline, so the
+        process-wide default socket timeout is never modified.
+
+        Args:
+            targets (iterable): (host, port) pairs to probe.
+            timeout (float): Connect timeout in seconds (default: prober timeout).
+            use_cache (bool): Whether fresh cached results may be returned.
+
+        Returns:
+            dict: Mapping of (host, port) to True if reachable, False otherwise.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        results, pending = self._split_cached(targets, use_cache)
+
+        for start in range(0, len(pending), self.max_concurrency):
+            chunk = pending[start:start + self.max_concurrency]
+            chunk_results = self._probe_chunk(chunk, timeout)
+            self._store(chunk_results)
+            results.update(chunk_results)
+
+        return results
+
+    def _probe_chunk(self, targets, timeout):
+        """
+        Probe a chunk of targets with one selector loop.
+
+        Args:
+            targets (list): (host, port) pairs to probe.
+            timeout (float): Connect timeout in seconds.
+
+        Returns:
+            dict: Mapping of (host, port) to reachability.
+        """
+        results = {target: False for target in targets}
+        selector = selectors.DefaultSelector()
+        deadline = time.monotonic() + timeout
+
+        try:
+            for host, port in targets:
+                try:
+                    family, socktype, proto, _, address = socket.getaddrinfo(
+                        host, port, type=socket.SOCK_STREAM)[0]
+                    sock = socket.socket(family, socktype, proto)
+                    sock.setblocking(False)
+                    result = sock.connect_ex(address)
+                    if result == 0:
+                        results[(host, port)] = True
+                        sock.close()
+                    elif result in _CONNECT_IN_PROGRESS:
+                        selector.register(sock, selectors.EVENT_WRITE, (host, port))
+                    else:
+                        sock.close()
+                except (OSError, IndexError) as e:
+                    self.logger.debug(f"Could not start probe of {host}:{port}: {e}")
+
+            while selector.get_map():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                for key, _ in selector.select(remaining):
+                    sock = key.fileobj
+                    error = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                    results[key.data] = error == 0
+                    selector.unregister(sock)
+                    sock.close()
+        finally:
+            for key in list(selector.get_map().values()):
+                key.fileobj.close()
+            selector.close()
+
+        reachable = sum(1 for value in results.values() if value)
+        self.logger.info(f"Reachability probe: {reachable}/{len(results)} targets reachable")
+        return results
+
+    async def check_many_async(self, targets, timeout=None, use_cache=True):
+        """
+        Probe many host:port pairs concurrently from an asyncio event loop.
+
+        Args:
+            targets (iterable): (host, port) pairs to probe.
+            timeout (float): Connect timeout in seconds (default: prober timeout).
+            use_cache (bool): Whether fresh cached results may be returned.
+
+        Returns:
+            dict: Mapping of (host, port) to True if reachable, False otherwise.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        results, pending = self._split_cached(targets, use_cache)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def probe(host, port):
+            async with semaphore:
+                try:
+                    _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+                    writer.close()
+                    try:
+                        await writer.wait_closed()
+                    except OSError:
+                        # The port answered; a reset while closing does not change that
+                        pass
+                    return True
+                except (OSError, asyncio.TimeoutError):
+                    return False
+
+        outcomes = await asyncio.gather(*(probe(host, port) for host, port in pending))
+        probed = dict(zip(pending, outcomes))
+        self._store(probed)
+        results.update(probed)
+        return results
+
+    def check_in_background(self, host, port=22, callback=None, timeout=None):
+        """
+        Probe a host without blocking the caller.
+
+        Args:
+            host (str): The host to probe.
+            port (int): The port to probe.
+            callback (callable): Called with the boolean result when the probe completes.
+            timeout (float): Connect timeout in seconds (default: prober timeout).
+
+        Returns:
+            concurrent.futures.Future: Future resolving to the probe result.
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="reachability")
+            executor = self._executor
+
+        future = executor.submit(self.check, host, port, timeout)
+        if callback is not None:
+            # A cancelled future raises from exception(), so it is checked first
+            future.add_done_callback(
+                lambda done: callback(done.result()) if not done.cancelled() and not done.exception() else None)
+        return future
+
+_default_prober = None
+_default_prober_lock = threading.Lock()
+
+def get_prober():
+    """
+    Return the process-wide reachability prober.
+
+    Returns:
+        ReachabilityProber: The shared prober instance.
+    """
+    global _default_prober
+    with _default_prober_lock:
+        if _default_prober is None:
+            _default_prober = ReachabilityProber()
+        return _default_prober
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    prober = get_prober()
+    print(prober.check_many([("127.0.0.1", 22), ("127.0.0.1", 80), ("192.168.1.1", 22)]))
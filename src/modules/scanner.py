@@ -9,7 +9,10 @@ import logging
 import nmap
 import socket
 import os
-from scapy.all import ARP, Ether, srp
+import time
+from collections import Counter
+from xml.etree import ElementTree
+from scapy.all import ARP, Ether, srp, sniff, IP, IPv6, TCP, UDP, ICMP, conf, get_if_addr, in6_getifaddr
 
 class NetworkScanner:
     """Network scanner for discovering devices on various network types."""
@@ -47,7 +50,8 @@ class NetworkScanner:
             
         Returns:
             list: A list of dictionaries, where each dictionary contains the
-                  'ip' and 'mac' address of a device.
+                  'ip' and 'mac' address of a device and the ARP round-trip
+                  time as 'latency_ms'.
         """
         self.logger.info(f"Scanning local network: {ip_range}")
         
@@ -60,7 +64,8 @@ class NetworkScanner:
             
             devices = []
             for sent, received in result:
-                devices.append({'ip': received.psrc, 'mac': received.hwsrc})
+                devices.append({'ip': received.psrc, 'mac': received.hwsrc,
+                                'latency_ms': self._round_trip_ms(sent, received)})
             
             self.logger.info(f"Found {len(devices)} devices on local network")
             return devices
@@ -68,6 +73,44 @@ class NetworkScanner:
             self.logger.error(f"Error scanning local network: {e}")
             return []
     
+    @staticmethod
+    def _round_trip_ms(sent, received):
+        """Return the round-trip time of an answered scapy probe in milliseconds, or None."""
+        try:
+            return round((float(received.time) - float(sent.sent_time)) * 1000, 3)
+        except (AttributeError, TypeError, ValueError):
+            return None
+    
+    def _nmap_round_trips(self, nm):
+        """
+        Read the smoothed round-trip time of each host from nmap's XML output.
+        
+        python-nmap does not parse the <times> element, so the raw XML of
+        the last scan is read instead.
+        
+        Args:
+            nm (nmap.PortScanner): The scanner that ran the scan.
+            
+        Returns:
+            dict: {ip: round-trip time in milliseconds} for hosts nmap timed.
+        """
+        rtts = {}
+        try:
+            for host in ElementTree.fromstring(nm.get_nmap_last_output()).iter('host'):
+                times = host.find('times')
+                address = host.find("address[@addrtype='ipv4']")
+                if address is None:
+                    address = host.find("address[@addrtype='ipv6']")
+                if times is None or address is None:
+                    continue
+                srtt = int(times.get('srtt', -1))
+                if srtt >= 0:
+                    # nmap reports microseconds
+                    rtts[address.get('addr')] = srtt / 1000
+        except Exception as e:
+            self.logger.debug(f"Could not read round-trip times from nmap output: {e}")
+        return rtts
+    
     def scan_server_network(self, target="192.168.1.0/24", ports=[22, 80, 443, 3389]):
         """
         Scans a server network for connected devices using port scanning.
@@ -98,6 +141,7 @@ class NetworkScanner:
             # Scan with service detection and OS detection
             port_str = ','.join(map(str, ports))
             nm.scan(target, port_str, arguments='-sS -O -T4')
+            rtts = self._nmap_round_trips(nm)
             
             devices = []
             for host in nm.all_hosts():
@@ -107,6 +151,7 @@ class NetworkScanner:
                         'mac': nm[host]['addresses'].get('mac', 'Unknown'),
                         'hostname': nm[host].hostname() if nm[host].hostname() else 'Unknown',
                         'os': 'Unknown',
+                        'latency_ms': rtts.get(host),
                         'ports': []
                     }
                     
@@ -119,6 +164,7 @@ class NetworkScanner:
                         for port, port_info in nm[host]['tcp'].items():
                             device_info['ports'].append({
                                 'port': port,
+                                'protocol': 'tcp',
                                 'service': port_info.get('name', 'unknown'),
                                 'version': port_info.get('version', 'unknown')
                             })
@@ -178,6 +224,7 @@ class NetworkScanner:
                     'hostname': target,
                     'mac': 'Unknown',
                     'os': 'Unknown',
+                    'latency_ms': self._nmap_round_trips(nm).get(ip_address),
                     'ports': []
                 }
                 
@@ -191,6 +238,7 @@ class NetworkScanner:
                         for port, port_info in nm[ip_address][proto].items():
                             device_info['ports'].append({
                                 'port': port,
+                                'protocol': proto,
                                 'service': port_info.get('name', 'unknown'),
                                 'version': port_info.get('version', 'unknown')
                             })
@@ -233,6 +281,7 @@ class NetworkScanner:
                     raise
             
             nm.scan(target, arguments='-sn')
+            rtts = self._nmap_round_trips(nm)
             
             devices = []
             for host in nm.all_hosts():
@@ -242,6 +291,7 @@ class NetworkScanner:
                         'mac': 'Unknown',
                         'hostname': nm[host].hostname() if nm[host].hostname() else 'Unknown',
                         'os': 'Unknown',
+                        'latency_ms': rtts.get(host),
                         'ports': []
                     })
             
@@ -273,15 +323,20 @@ class NetworkScanner:
             # Common web ports to check
             common_ports = [21, 22, 23, 25, 53, 80, 110, 143, 443, 993, 995]
             open_ports = []
+            # Fastest TCP handshake seen, as the host's round-trip time
+            latency_ms = None
             
             # Check each port
             for port in common_ports:
                 try:
                     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
                     sock.settimeout(1)
+                    start = time.perf_counter()
                     result = sock.connect_ex((ip_address, port))
                     if result == 0:
                         open_ports.append(port)
+                        elapsed = round((time.perf_counter() - start) * 1000, 3)
+                        latency_ms = elapsed if latency_ms is None else min(latency_ms, elapsed)
                     sock.close()
                 except Exception:
                     pass
@@ -293,7 +348,8 @@ class NetworkScanner:
                     'hostname': target,
                     'mac': 'Unknown',
                     'os': 'Unknown',
-                    'ports': [{'port': port, 'service': self._get_service_name(port), 'version': 'Unknown'} for port in open_ports]
+                    'latency_ms': latency_ms,
+                    'ports': [{'port': port, 'protocol': 'tcp', 'service': self._get_service_name(port), 'version': 'Unknown'} for port in open_ports]
                 }]
             
             return []
@@ -378,6 +434,7 @@ class NetworkScanner:
                     for port, port_info in nm[ip_address]['tcp'].items():
                         device_info['ports'].append({
                             'port': port,
+                            'protocol': 'tcp',
                             'service': port_info.get('name', 'unknown'),
                             'version': port_info.get('version', 'unknown')
                         })
@@ -388,50 +445,92 @@ class NetworkScanner:
         
         return device_info
 
-    def monitor_network_traffic(self, interface="eth0", duration=60):
+    def get_local_addresses(self, interface):
+        """
+        Get the addresses of an interface and the gateways reached through it.
+        
+        Args:
+            interface (str): The network interface (e.g., 'eth0').
+            
+        Returns:
+            list: IPv4 and IPv6 addresses; empty if they cannot be determined.
+        """
+        addresses = []
+        try:
+            address = get_if_addr(interface)
+            if address and address != '0.0.0.0':
+                addresses.append(address)
+            addresses.extend(address for address, _, iface in in6_getifaddr() if iface == interface)
+            for table, default in ((conf.route, '0.0.0.0'), (conf.route6, '::')):
+                iface, _, gateway = table.route(default)
+                if iface == interface and gateway not in ('0.0.0.0', '::'):
+                    addresses.append(gateway)
+        except Exception as e:
+            self.logger.warning(f"Could not read the addresses of {interface}: {e}")
+        return list(dict.fromkeys(addresses))
+    
+    def monitor_network_traffic(self, interface="eth0", duration=60, packet_callback=None):
         """
         Monitor network traffic on a specific interface for a given duration.
         
+        Packets are captured with scapy without being stored, so memory does
+        not grow with the capture length.
+        
         Args:
             interface (str): The network interface to monitor (e.g., 'eth0', 'wlan0').
-            duration (int): Duration in seconds to monitor traffic.
+            duration (int): Duration in seconds to monitor traffic (None runs
+                until interrupted).
+            packet_callback (callable): Called for every IP packet as
+                callback(source, dport, syn, size, timestamp), where 'syn' is
+                True for a TCP SYN without ACK (optional).
             
         Returns:
             dict: Traffic statistics including packets, bytes, and protocols.
         """
         self.logger.info(f"Monitoring network traffic on interface {interface} for {duration} seconds")
         
+        packets = 0
+        total_bytes = 0
+        protocols = {'TCP': 0, 'UDP': 0, 'ICMP': 0, 'Other': 0}
+        # Per-source byte totals are only kept for bounded captures
+        talkers = Counter() if duration is not None else None
+        
+        def handle(packet):
+            nonlocal packets, total_bytes
+            size = len(packet)
+            packets += 1
+            total_bytes += size
+            
+            layer = packet.getlayer(IP) or packet.getlayer(IPv6)
+            if layer is None:
+                protocols['Other'] += 1
+                return
+            dport = None
+            syn = False
+            tcp = packet.getlayer(TCP)
+            if tcp is not None:
+                protocols['TCP'] += 1
+                dport = tcp.dport
+                syn = int(tcp.flags) & 0x12 == 0x02
+            else:
+                udp = packet.getlayer(UDP)
+                if udp is not None:
+                    protocols['UDP'] += 1
+                    dport = udp.dport
+                elif packet.haslayer(ICMP) or getattr(layer, 'nh', None) == 58:
+                    protocols['ICMP'] += 1
+                else:
+                    protocols['Other'] += 1
+            if talkers is not None:
+                talkers[layer.src] += size
+            if packet_callback:
+                packet_callback(layer.src, dport, syn, size, float(packet.time))
+        
+        start = time.time()
         try:
-            # This is a placeholder implementation
-            # In a real implementation, we would use scapy or similar to capture packets
-            import time
-            import random
-            
-            # Simulate traffic monitoring
-            time.sleep(duration)
-            
-            # Generate simulated traffic data
-            traffic_stats = {
-                'interface': interface,
-                'duration': duration,
-                'packets_captured': random.randint(1000, 10000),
-                'bytes_transferred': random.randint(100000, 1000000),
-                'protocols': {
-                    'TCP': random.randint(300, 3000),
-                    'UDP': random.randint(200, 2000),
-                    'ICMP': random.randint(50, 500),
-                    'Other': random.randint(100, 1000)
-                },
-                'top_talkers': [
-                    {'ip': '192.168.1.10', 'bytes': random.randint(50000, 200000)},
-                    {'ip': '192.168.1.15', 'bytes': random.randint(30000, 150000)},
-                    {'ip': '192.168.1.20', 'bytes': random.randint(20000, 100000)}
-                ]
-            }
-            
-            self.logger.info(f"Traffic monitoring completed: {traffic_stats['packets_captured']} packets captured")
-            return traffic_stats
-            
+            sniff(iface=interface, prn=handle, store=False, timeout=duration)
+        except KeyboardInterrupt:
+            self.logger.info("Traffic monitoring interrupted")
         except Exception as e:
             self.logger.error(f"Error monitoring network traffic: {e}")
             return {
@@ -439,6 +538,18 @@ class NetworkScanner:
                 'duration': duration,
                 'error': str(e)
             }
+        
+        traffic_stats = {
+            'interface': interface,
+            'duration': duration if duration is not None else round(time.time() - start),
+            'packets_captured': packets,
+            'bytes_transferred': total_bytes,
+            'protocols': protocols,
+            'top_talkers': [{'ip': ip, 'bytes': size} for ip, size in (talkers or Counter()).most_common(3)]
+        }
+        
+        self.logger.info(f"Traffic monitoring completed: {traffic_stats['packets_captured']} packets captured")
+        return traffic_stats
 
     def group_devices_by_network_segment(self, devices):
         """
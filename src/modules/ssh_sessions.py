@@ -0,0 +1,162 @@
+"""
+Network Management Tool - SSH Session Pool Module
+
+This module keeps authenticated SSH sessions open between operations so that
+repeated work against the same device does not pay for a new handshake.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+class SSHSessionPool:
+    """Pool of long-lived SSH sessions keyed by device and username."""
+
+    def __init__(self, connect, max_idle=300, max_sessions=32):
+        """
+        Initialize the session pool.
+
+        Args:
+            connect (callable): Called as connect(ip_address, username, **auth) and
+                must return a connected paramiko.SSHClient.
+            max_idle (float): Seconds an unused session is kept open.
+            max_sessions (int): Maximum number of sessions kept open at once.
+        """
+        self.logger = logging.getLogger(__name__)
+        self._connect = connect
+        self.max_idle = max_idle
+        self.max_sessions = max_sessions
+        # (ip_address, username) -> {'client', 'sftp', 'last_used'}
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _is_active(client):
+        """Return True if the client's transport is still usable."""
+        try:
+            transport = client.get_transport()
+            return transport is not None and transport.is_active()
+        except Exception:
+            return False
+
+    def _close_entry(self, entry):
+        """Close an SFTP client and SSH client, ignoring errors."""
+        for resource in (entry.get('sftp'), entry.get('client')):
+            if resource:
+                try:
+                    resource.close()
+                except Exception:
+                    pass
+
+    def _evict_idle(self):
+        """Close sessions that have been idle too long. Caller holds the lock."""
+        now = time.monotonic()
+        for key in [key for key, entry in self._sessions.items()
+                    if now - entry['last_used'] > self.max_idle]:
+            self.logger.info(f"Closing idle SSH session to {key[0]}")
+            self._close_entry(self._sessions.pop(key))
+
+        while len(self._sessions) >= self.max_sessions:
+            oldest = min(self._sessions, key=lambda key: self._sessions[key]['last_used'])
+            self._close_entry(self._sessions.pop(oldest))
+
+    def _entry(self, ip_address, username, auth):
+        """Return a live session entry, connecting if needed."""
+        key = (ip_address, username)
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is not None and not self._is_active(entry['client']):
+                self._close_entry(self._sessions.pop(key))
+                entry = None
+            if entry is None:
+                self._evict_idle()
+
+        if entry is None:
+            self.logger.info(f"Opening pooled SSH session to {ip_address} as {username}")
+            client = self._connect(ip_address, username, **auth)
+            entry = {'client': client, 'sftp': None, 'last_used': time.monotonic()}
+            with self._lock:
+                existing = self._sessions.get(key)
+                if existing is not None and self._is_active(existing['client']):
+                    # Another thread connected first; keep its session
+                    self._close_entry(entry)
+                    entry = existing
+                else:
+                    self._sessions[key] = entry
+
+        entry['last_used'] = time.monotonic()
+        return entry
+
+    @contextmanager
+    def session(self, ip_address, username, **auth):
+        """
+        Borrow a connected SSH client for a device.
+
+        The session is dropped from the pool if its transport dies, so a
+        broken connection is never handed out again.
+
+        Args:
+            ip_address (str): The IP address of the device.
+            username (str): The username for SSH access.
+            **auth: Authentication arguments passed to the connect callable.
+
+        Yields:
+            paramiko.SSHClient: A connected client.
+        """
+        entry = self._entry(ip_address, username, auth)
+        try:
+            yield entry['client']
+        except Exception as e:
+            if not self._is_active(entry['client']):
+                self.discard(ip_address, username)
+            elif entry['sftp'] and not isinstance(e, OSError):
+                # Remote file errors are OSErrors; anything else may have broken the SFTP channel
+                sftp, entry['sftp'] = entry['sftp'], None
+                self._close_entry({'sftp': sftp})
+            raise
+
+    def get_sftp(self, ip_address, username, **auth):
+        """
+        Return an SFTP client running over the pooled session of a device.
+
+        The SFTP channel is opened once per session and reused. Devices that
+        do not offer the SFTP subsystem are remembered so it is not retried.
+
+        Args:
+            ip_address (str): The IP address of the device.
+            username (str): The username for SSH access.
+            **auth: Authentication arguments passed to the connect callable.
+
+        Returns:
+            paramiko.SFTPClient: An SFTP client, or None if SFTP is unavailable.
+        """
+        entry = self._entry(ip_address, username, auth)
+        if entry['sftp'] is None:
+            try:
+                entry['sftp'] = entry['client'].open_sftp()
+            except Exception as e:
+                self.logger.info(f"SFTP unavailable on {ip_address}, using exec channels: {e}")
+                entry['sftp'] = False
+        return entry['sftp'] or None
+
+    def discard(self, ip_address, username):
+        """
+        Close and forget the session for a device.
+
+        Args:
+            ip_address (str): The IP address of the device.
+            username (str): The username for SSH access.
+        """
+        with self._lock:
+            entry = self._sessions.pop((ip_address, username), None)
+        if entry is not None:
+            self._close_entry(entry)
+
+    def close_all(self):
+        """Close every pooled session."""
+        with self._lock:
+            entries = list(self._sessions.values())
+            self._sessions.clear()
+        for entry in entries:
+            self._close_entry(entry)
@@ -13,6 +13,9 @@ from modules.scanner import NetworkScanner
 from modules.manager import DeviceManager
 from modules.dashboard import InteractiveDashboard
 from modules.enhanced_dashboard import EnhancedTerminalDashboard
+from modules.auto_defense import AutoDefense
+from utils.database import NetworkDatabase
+from utils.export import FORMATS, InventoryExporter
 
 def setup_logging():
     """Configure logging for the application."""
@@ -40,14 +43,29 @@ def main():
                        help='Launch enhanced terminal dashboard')
     parser.add_argument('--monitor-traffic', metavar='INTERFACE', 
                        help='Monitor network traffic on specified interface')
+    parser.add_argument('--auto-defense', metavar='INTERFACE',
+                       help='Watch traffic on INTERFACE and temporarily block flooding or port-sweeping sources')
+    parser.add_argument('--auto-defense-allow', action='append', metavar='ENTRY',
+                       help='With --auto-defense, never block this address, CIDR or range (repeatable)')
     parser.add_argument('--backup-config', nargs=2, metavar=('IP', 'USERNAME'),
                        help='Backup device configuration (IP USERNAME)')
     parser.add_argument('--restore-config', nargs=3, metavar=('IP', 'USERNAME', 'BACKUP_FILE'),
                        help='Restore device configuration (IP USERNAME BACKUP_FILE)')
     parser.add_argument('--block-device', metavar='IP', 
-                       help='Block a device from accessing the network')
+                       help='Block a device (or a CIDR/address range) from accessing the network')
+    parser.add_argument('--block-ttl', type=int, metavar='SECONDS',
+                       help='With --block-device or --auto-defense, lift blocks automatically after SECONDS')
     parser.add_argument('--unblock-device', metavar='IP', 
-                       help='Unblock a device and restore network access')
+                       help='Unblock a device (or a CIDR/address range) and restore network access')
+    parser.add_argument('--maintain-db', action='store_true',
+                       help='Roll up and expire old host observations, compact the database and '
+                            'prune configuration backups past their retention')
+    parser.add_argument('--export', metavar='DIR',
+                       help='Export devices, ports and scan history to DIR for offline analysis')
+    parser.add_argument('--export-format', choices=sorted(FORMATS),
+                       help='With --export, file format (default: parquet if pyarrow is installed, else csv)')
+    parser.add_argument('--incremental', action='store_true',
+                       help='With --export, only export what changed since the last export to DIR')
     
     args = parser.parse_args()
     
@@ -67,10 +85,8 @@ def main():
         ip_address = args.block_device
         print(f"Blocking network access for device {ip_address}...")
         # Even if device is not reachable, we should still block it
-        # Check if device is reachable (for informational purposes only)
-        if not manager.is_device_reachable(ip_address):
-            print(f"Device {ip_address} is not reachable, but will still be blocked to prevent future access")
-        success = manager.block_device_network_access(ip_address)
+        # (the manager reports reachability without delaying the block)
+        success = manager.block_device_network_access(ip_address, ttl=args.block_ttl)
         if success:
             print(f"Device {ip_address} has been successfully blocked from accessing the network.")
         else:
@@ -80,9 +96,7 @@ def main():
         ip_address = args.unblock_device
         print(f"Unblocking network access for device {ip_address}...")
         # Even if device is not reachable, we should still unblock it
-        # Check if device is reachable (for informational purposes only)
-        if not manager.is_device_reachable(ip_address):
-            print(f"Device {ip_address} is not reachable, but will still be unblocked to restore future access")
+        # (the manager reports reachability without delaying the unblock)
         success = manager.unblock_device_network_access(ip_address)
         if success:
             print(f"Device {ip_address} has been successfully unblocked and can access the network.")
@@ -102,6 +116,45 @@ def main():
             print("  Protocol Distribution:")
             for protocol, count in traffic_stats['protocols'].items():
                 print(f"    {protocol}: {count}")
+    elif args.auto_defense:
+        # Block sources that exceed the rate limits until interrupted
+        interface = args.auto_defense
+        print(f"Auto defense active on interface {interface}. Press Ctrl+C to stop.")
+        try:
+            defense = AutoDefense(manager.network_blocker, block_ttl=args.block_ttl or 600,
+                                  allowlist=args.auto_defense_allow or ())
+        except ValueError as e:
+            print(f"Invalid --auto-defense-allow entry: {e}")
+            return
+        traffic_stats = defense.run(scanner, interface)
+        print(f"Packets Captured: {traffic_stats.get('packets_captured', 0)}")
+        print(f"Sources Still Blocked: {len(traffic_stats.get('auto_blocked', {}))}")
+        for source, reason in traffic_stats.get('auto_blocked', {}).items():
+            print(f"  {source}: {reason}")
+    elif args.maintain_db:
+        # Roll up, apply retention and vacuum the observation store
+        result = NetworkDatabase().observations.maintain()
+        rolled = ', '.join(f"{count} {resolution}" for resolution, count in result['rolled_up'].items())
+        print(f"Rolled up: {rolled}")
+        print(f"Dropped raw partitions: {len(result['dropped_partitions'])}")
+        print(f"Deleted expired rollups: {result['deleted_rollups']}")
+        print("Database compacted." if result['vacuumed'] else "Compaction not needed.")
+        # Configuration history and backups are pruned here, not after every backup
+        result = manager.apply_config_retention()
+        print(f"Pruned configuration history: {result['revisions']} revisions, "
+              f"{result['manifests']} manifests, {result['objects']} backup objects")
+    elif args.export:
+        # Stream the inventory and scan history to columnar or compressed text files
+        try:
+            result = InventoryExporter(NetworkDatabase()).export(args.export, fmt=args.export_format,
+                                                                 incremental=args.incremental)
+        except ValueError as e:
+            print(f"Export failed: {e}")
+        else:
+            for dataset, (path, rows) in result['files'].items():
+                print(f"{dataset}: {rows} rows -> {path}")
+            if not result['files']:
+                print("Nothing new to export.")
     elif args.backup_config:
         # Backup device configuration
         ip_address, username = args.backup_config
@@ -198,7 +251,7 @@ def main():
             if confirm.lower() == 'yes':
                 # Check if device is reachable before attempting to manage it
                 if manager.is_device_reachable(ip_address):
-                    manager.manage_device(ip_address, username, password)
+                    manager.manage_device(ip_address, username, password, device_info)
                 else:
                     print(f"Device {ip_address} is not reachable. Please check the IP address and network connectivity.")
             else:
@@ -0,0 +1,136 @@
+"""
+In-memory inventory cache for Network Management Tool
+
+The dashboard polls the device listing far more often than scans change
+it. InventoryCache keeps decoded device records and query pages in memory
+and keys them on NetworkDatabase.data_version, which grows with every
+committed write, whether made by this process or another one (e.g. a CLI
+scan against the same file). A read after a write always reloads; every
+other read is served from memory after a single PRAGMA, without reading
+any table. The same version makes an ETag, letting HTTP handlers answer
+If-None-Match with 304 Not Modified.
+"""
+
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+
+from .database import NetworkDatabase
+
+class InventoryCache:
+    """Read-through cache of device records, invalidated by the data version."""
+
+    def __init__(self, database, max_entries=256):
+        """
+        Initialize the cache.
+
+        Args:
+            database (NetworkDatabase): The database to read through to.
+            max_entries (int): Most cached results (device lists, pages and
+                single devices) kept at once; the least recently used go first.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.database = database
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # Distinguishes ETags of this process from those of an earlier run
+        self._instance = uuid.uuid4().hex[:8]
+        self._offset = 0
+        self._version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        """Current data version; it changes whenever cached results go stale."""
+        return self.database.data_version + self._offset
+
+    def etag(self):
+        """
+        Return an entity tag for everything read at the current version.
+
+        Read it before the data it describes, so a write in between can only
+        make the tag older than the data, never newer.
+
+        Returns:
+            str: An unquoted entity tag.
+        """
+        return f'inventory-{self._instance}-{self.version}'
+
+    def invalidate(self):
+        """Drop everything cached, e.g. after the database file was replaced."""
+        with self._lock:
+            self._offset += 1
+            self._entries.clear()
+
+    def _read(self, key, loader):
+        """Return the cached result for key, loading it on a miss."""
+        version = self.version
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        value = loader()
+
+        with self._lock:
+            # A write during the load leaves the result unstored: it may be stale
+            if version == self._version == self.version:
+                self._entries[key] = value
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def get_devices(self):
+        """
+        Get all devices, as NetworkDatabase.get_devices.
+
+        Returns:
+            list: Shared device dictionaries; do not modify them.
+        """
+        return self._read(('devices',), self.database.get_devices)
+
+    def get_device_by_ip(self, ip_address):
+        """
+        Get one device, as NetworkDatabase.get_device_by_ip.
+
+        Returns:
+            dict: A shared device dictionary (do not modify it), or None.
+        """
+        return self._read(('device', ip_address), lambda: self.database.get_device_by_ip(ip_address))
+
+    def query_devices(self, **query):
+        """
+        Get one page of devices, as NetworkDatabase.query_devices.
+
+        Returns:
+            tuple: (shared device dictionaries, next cursor).
+        """
+        key = ('query',) + tuple(sorted((name, tuple(value) if isinstance(value, list) else value)
+                                        for name, value in query.items()))
+        return self._read(key, lambda: self.database.query_devices(**query))
+
+_default_caches = {}
+_default_caches_lock = threading.Lock()
+
+def get_inventory_cache(db_path='network_data.db'):
+    """
+    Return the process-wide inventory cache for a database file.
+
+    Args:
+        db_path (str): Database file path.
+
+    Returns:
+        InventoryCache: The shared cache instance.
+    """
+    with _default_caches_lock:
+        if db_path not in _default_caches:
+            _default_caches[db_path] = InventoryCache(NetworkDatabase(db_path))
+        return _default_caches[db_path]
@@ -1,181 +1,475 @@
 """
 Database utility for Network Management Tool
+
+Connections are long-lived and kept per thread and database file, so
+creating a NetworkDatabase (as the REST API does per request) costs no
+connect or DDL. Databases run in WAL mode, which lets API readers proceed
+while a scan is writing. The schema is versioned with PRAGMA user_version
+and only created or upgraded when the stored version is behind; existing
+files can also be upgraded offline with `python -m utils.migrations`.
 """
 
 import sqlite3
 import json
 import os
-from datetime import datetime
+import base64
+import ipaddress
+import logging
+import threading
+from functools import lru_cache
+
+# Schema changes are added as steps in utils/migrations.py
+from .migrations import migrate, insert_scan_hosts
+from .observations import ObservationStore
+from .records import DeviceRecord, decode_json, encode_json
+from .search import (BM25_WEIGHTS, SERVICES_SQL, TEXT_PREDICATES, fts_expression, has_index, parse_query,
+                     refresh_index)
+
+# Bound parameters per IN (...) lookup, below SQLite's historic limit of 999
+LOOKUP_CHUNK = 500
+
+# Device fields that query_devices can return, and their columns
+DEVICE_FIELDS = {
+    'id': 'id',
+    'ip': 'ip_address',
+    'mac': 'mac_address',
+    'hostname': 'hostname',
+    'os': 'operating_system',
+    'scan_timestamp': 'scan_timestamp',
+    'device_info': 'device_info',
+}
+
+# Device columns searched by the text predicates when FTS5 is unavailable
+SEARCH_COLUMNS = {'service': 'd.services', 'os': 'd.operating_system', 'host': 'd.hostname'}
+
+# Pragmas applied to every new connection
+CONNECTION_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",     # durable at checkpoints; safe with WAL
+    "PRAGMA cache_size=-16000",      # 16 MB page cache
+    "PRAGMA mmap_size=268435456",    # 256 MB memory-mapped reads
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+]
+
+# {db_path: connection} per thread
+_connections = threading.local()
+# Database files whose schema is known to be current in this process
+_schema_checked = set()
+_schema_lock = threading.Lock()
+# {database key: number of committed writes in this process}
+_data_versions = {}
+# {database key: [watch connection, its last PRAGMA data_version, changes it has seen]}
+_data_watchers = {}
+_data_versions_lock = threading.Lock()
+
+def _database_key(db_path):
+    """Key that identifies a database file within this process."""
+    return db_path if db_path == ':memory:' else os.path.abspath(db_path)
+
+@lru_cache(maxsize=64)
+def _parse_network(network):
+    """Parse a CIDR once per distinct value."""
+    return ipaddress.ip_network(network, strict=False)
+
+def _ip_in_network(address, network):
+    """SQL function ip_in_network(address, cidr) used by segment filters."""
+    try:
+        return ipaddress.ip_address(address) in _parse_network(network)
+    except ValueError:
+        return False
+
+def encode_cursor(values):
+    """Encode the sort key of the last row of a page as an opaque cursor."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor made by encode_cursor.
+    
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(values, list):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return values
 
 class NetworkDatabase:
     """Database utility for storing network scan results"""
     
     def __init__(self, db_path='network_data.db'):
         """Initialize the database connection"""
+        self.logger = logging.getLogger(__name__)
         self.db_path = db_path
-        self.init_database()
+        self._observations = None
+        self._ensure_schema()
+    
+    def _connection(self):
+        """
+        Get this thread's connection to the database, opening it on first use.
+        
+        Returns:
+            sqlite3.Connection: A connection with the tuned pragmas applied.
+        """
+        connections = getattr(_connections, 'by_path', None)
+        if connections is None:
+            connections = _connections.by_path = {}
+        conn = connections.get(self.db_path)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path)
+            for pragma in CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+            conn.create_function('ip_in_network', 2, _ip_in_network, deterministic=True)
+            connections[self.db_path] = conn
+            if self.db_path == ':memory:':
+                # Every in-memory connection is a separate, empty database
+                self._create_schema(conn)
+        return conn
+    
+    def close(self):
+        """Close this thread's connection to the database."""
+        connections = getattr(_connections, 'by_path', {})
+        conn = connections.pop(self.db_path, None)
+        if conn is not None:
+            conn.close()
+    
+    def _ensure_schema(self):
+        """Create or upgrade the schema once per database file and process."""
+        if self.db_path == ':memory:':
+            self._connection()
+            return
+        key = _database_key(self.db_path)
+        if key in _schema_checked:
+            return
+        with _schema_lock:
+            if key not in _schema_checked:
+                self._create_schema(self._connection())
+                _schema_checked.add(key)
+    
+    @property
+    def data_version(self):
+        """
+        A counter that grows whenever a write is committed to this database.
+        
+        Writes made through this process are counted directly; writes from
+        other processes are caught by PRAGMA data_version on one shared
+        watch connection per file, which reads no tables. Readers can tell
+        whether anything changed since they last looked without querying data.
+        """
+        key = _database_key(self.db_path)
+        with _data_versions_lock:
+            version = _data_versions.get(key, 0)
+            if self.db_path == ':memory:':
+                # Nothing else can write to an in-memory database
+                return version
+            watcher = _data_watchers.get(key)
+            if watcher is None:
+                conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                conn.execute("PRAGMA busy_timeout=5000")
+                watcher = _data_watchers[key] = [conn, conn.execute('PRAGMA data_version').fetchone()[0], 0]
+            current = watcher[0].execute('PRAGMA data_version').fetchone()[0]
+            if current != watcher[1]:
+                watcher[1] = current
+                watcher[2] += 1
+            return version + watcher[2]
+    
+    def _bump_data_version(self):
+        """Record that a write was committed."""
+        key = _database_key(self.db_path)
+        with _data_versions_lock:
+            _data_versions[key] = _data_versions.get(key, 0) + 1
+    
+    @property
+    def observations(self):
+        """The host observation store kept in this database."""
+        if self._observations is None:
+            self._observations = ObservationStore(self)
+        return self._observations
     
     def init_database(self):
         """Initialize the database with required tables"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        self._create_schema(self._connection())
+    
+    def _create_schema(self, conn):
+        """
+        Bring the schema up to SCHEMA_VERSION.
         
-        # Create devices table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS devices (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                ip_address TEXT UNIQUE NOT NULL,
-                mac_address TEXT,
-                hostname TEXT,
-                operating_system TEXT,
-                scan_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                device_info TEXT
-            )
-        ''')
-        
-        # Create scan_results table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS scan_results (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                scan_type TEXT NOT NULL,
-                scan_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                results TEXT
-            )
-        ''')
-        
-        # Create ports table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS ports (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                device_id INTEGER,
-                port_number INTEGER,
-                service TEXT,
-                version TEXT,
-                FOREIGN KEY (device_id) REFERENCES devices (id)
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        Args:
+            conn (sqlite3.Connection): The connection to use.
+        """
+        migrate(conn)
     
     def save_device(self, device_info):
         """Save device information to the database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        return self.save_devices([device_info])[device_info.get('ip')]
+    
+    def save_devices(self, devices):
+        """
+        Upsert many devices and their ports in one transaction.
         
-        try:
-            # Insert or update device information
-            cursor.execute('''
-                INSERT OR REPLACE INTO devices 
-                (ip_address, mac_address, hostname, operating_system, device_info)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (
-                device_info.get('ip'),
-                device_info.get('mac'),
-                device_info.get('hostname'),
-                device_info.get('os'),
-                json.dumps(device_info)
-            ))
-            
-            # Get the device ID
-            device_id = cursor.lastrowid
+        Existing devices are updated in place, so their ids stay stable.
+        A device that reports 'ports' has its port list replaced by the
+        reported one; a device without 'ports' keeps its stored ports.
+        
+        Args:
+            devices (list): Device dictionaries, each with an 'ip' key.
             
-            # Save port information if available
-            if 'ports' in device_info:
-                for port_info in device_info['ports']:
-                    cursor.execute('''
-                        INSERT INTO ports 
-                        (device_id, port_number, service, version)
-                        VALUES (?, ?, ?, ?)
-                    ''', (
-                        device_id,
-                        port_info.get('port'),
-                        port_info.get('service'),
-                        port_info.get('version')
-                    ))
+        Returns:
+            dict: {ip: device id} for every saved device.
             
-            conn.commit()
-            return device_id
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
+        Raises:
+            ValueError: If a device has no IP address (nothing is saved).
+        """
+        return self.save_batch(devices=devices)['devices']
     
     def save_scan_results(self, scan_type, results):
-        """Save scan results to the database"""
-        conn = sqlite3.connect(self.db_path)
+        """
+        Save scan results to the database.
+        
+        A list of host dictionaries is stored as scan_hosts and
+        scan_host_ports rows and recorded as host observations; any other
+        result is stored as JSON.
+        
+        Args:
+            scan_type (str): The kind of scan.
+            results: The scan results.
+        
+        Returns:
+            int: The id of the scan.
+        """
+        return self.save_batch(scans=[(scan_type, results)])['scans'][0]
+    
+    def save_batch(self, scans=(), devices=()):
+        """
+        Save several scans and devices in a single transaction.
+        
+        Args:
+            scans (iterable): (scan_type, results) pairs, as for save_scan_results.
+            devices (iterable): Device dictionaries, as for save_devices.
+            
+        Returns:
+            dict: 'scans' (scan ids in order) and 'devices' ({ip: device id}).
+            
+        Raises:
+            ValueError: If a device has no IP address (nothing is saved).
+        """
+        scans, devices = list(scans), list(devices)
+        if any(not device.get('ip') for device in devices):
+            raise ValueError("Every device needs an 'ip' to be saved")
+        if not scans and not devices:
+            return {'scans': [], 'devices': {}}
+        
+        conn = self._connection()
         cursor = conn.cursor()
         
         try:
-            cursor.execute('''
-                INSERT INTO scan_results 
-                (scan_type, results)
-                VALUES (?, ?)
-            ''', (
-                scan_type,
-                json.dumps(results)
-            ))
-            
-            scan_id = cursor.lastrowid
+            scan_ids = [self._write_scan_results(cursor, scan_type, results) for scan_type, results in scans]
+            device_ids = self._write_devices(cursor, devices) if devices else {}
             conn.commit()
-            return scan_id
         except Exception as e:
             conn.rollback()
             raise e
-        finally:
-            conn.close()
+        self._bump_data_version()
+        
+        if scans:
+            # Roll up and expire old observations at most once per maintenance interval
+            try:
+                self.observations.maintain_if_due()
+            except sqlite3.Error as e:
+                self.logger.warning(f"Observation maintenance failed: {e}")
+        return {'scans': scan_ids, 'devices': device_ids}
     
-    def get_devices(self):
-        """Retrieve all devices from the database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def _write_devices(self, cursor, devices):
+        """Upsert devices and their ports inside the caller's transaction (see save_devices)."""
+        cursor.executemany('''
+            INSERT INTO devices
+            (ip_address, mac_address, hostname, operating_system, device_info, scan_timestamp)
+            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT (ip_address) DO UPDATE SET
+                mac_address = excluded.mac_address,
+                hostname = excluded.hostname,
+                operating_system = excluded.operating_system,
+                device_info = excluded.device_info,
+                scan_timestamp = excluded.scan_timestamp
+        ''', [(
+            device.get('ip'),
+            device.get('mac'),
+            device.get('hostname'),
+            device.get('os'),
+            encode_json(device)
+        ) for device in devices])
         
-        cursor.execute('SELECT * FROM devices ORDER BY scan_timestamp DESC')
-        rows = cursor.fetchall()
+        # executemany cannot return rows, so the ids are looked up afterwards
+        ips = list(dict.fromkeys(device['ip'] for device in devices))
+        device_ids = {}
+        for start in range(0, len(ips), LOOKUP_CHUNK):
+            chunk = ips[start:start + LOOKUP_CHUNK]
+            cursor.execute(f"SELECT ip_address, id FROM devices WHERE ip_address IN ({', '.join('?' * len(chunk))})",
+                           chunk)
+            device_ids.update(cursor.fetchall())
         
-        devices = []
-        for row in rows:
-            device = {
-                'id': row[0],
-                'ip': row[1],
-                'mac': row[2],
-                'hostname': row[3],
-                'os': row[4],
-                'scan_timestamp': row[5],
-                'device_info': json.loads(row[6]) if row[6] else {}
-            }
-            devices.append(device)
+        # Save port information if available
+        reported = {device['ip']: device['ports'] for device in devices if 'ports' in device}
+        cursor.executemany('DELETE FROM ports WHERE device_id = ?',
+                           [(device_ids[ip],) for ip in reported])
+        cursor.executemany('''
+            INSERT INTO ports
+            (device_id, port_number, protocol, service, version)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (device_id, port_number, protocol) DO UPDATE SET
+                service = excluded.service,
+                version = excluded.version
+        ''', [(
+            device_ids[ip],
+            port_info.get('port'),
+            port_info.get('protocol', 'tcp'),
+            port_info.get('service'),
+            port_info.get('version')
+        ) for ip, ports in reported.items() for port_info in ports or []])
+        
+        refresh_index(cursor, list(device_ids.values()))
+        return device_ids
+    
+    def _write_scan_results(self, cursor, scan_type, results):
+        """Store one scan inside the caller's transaction (see save_scan_results)."""
+        normalized = isinstance(results, list) and all(isinstance(host, dict) for host in results)
+        cursor.execute('''
+            INSERT INTO scan_results
+            (scan_type, results)
+            VALUES (?, ?)
+        ''', (
+            scan_type,
+            None if normalized else encode_json(results)
+        ))
+        
+        scan_id = cursor.lastrowid
+        if normalized:
+            insert_scan_hosts(cursor, scan_id, results)
+            self.observations.record_scan(results, scan_id, cursor=cursor)
+        return scan_id
+    
+    def get_devices(self):
+        """
+        Retrieve all devices from the database, most recently seen first.
         
-        conn.close()
-        return devices
+        Returns:
+            list: DeviceRecords (read-only dictionaries; device_info is
+                decoded when first read).
+        """
+        columns = ', '.join(DEVICE_FIELDS.values())
+        rows = self._connection().execute(f'SELECT {columns} FROM devices ORDER BY scan_timestamp DESC').fetchall()
+        fields = list(DEVICE_FIELDS)
+        return [DeviceRecord.from_row(fields, row) for row in rows]
     
     def get_device_by_ip(self, ip_address):
-        """Retrieve a specific device by IP address"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        """
+        Retrieve a specific device by IP address.
         
-        cursor.execute('SELECT * FROM devices WHERE ip_address = ?', (ip_address,))
-        row = cursor.fetchone()
+        Returns:
+            DeviceRecord: The device, or None if it is unknown.
+        """
+        columns = ', '.join(DEVICE_FIELDS.values())
+        row = self._connection().execute(f'SELECT {columns} FROM devices WHERE ip_address = ?',
+                                         (ip_address,)).fetchone()
+        return DeviceRecord.from_row(list(DEVICE_FIELDS), row) if row else None
+    
+    def _segment_filter(self, segment):
+        """
+        Build the WHERE clause for devices inside a network segment.
         
-        if row:
-            device = {
-                'id': row[0],
-                'ip': row[1],
-                'mac': row[2],
-                'hostname': row[3],
-                'os': row[4],
-                'scan_timestamp': row[5],
-                'device_info': json.loads(row[6]) if row[6] else {}
-            }
-            return device
+        IPv4 segments are first narrowed with a range on the ip_address
+        index using their whole-octet prefix (e.g. '10.1.' for 10.1.16.0/20);
+        ip_in_network then checks the remaining bits.
+        
+        Args:
+            segment (str): A CIDR such as '192.168.1.0/24'.
+        
+        Returns:
+            tuple: (SQL clause, parameters)
+        
+        Raises:
+            ValueError: If the segment is not a valid network.
+        """
+        network = _parse_network(segment)
+        octets = min(network.prefixlen // 8, 3) if network.version == 4 else 0
+        if not octets:
+            return 'ip_in_network(ip_address, ?)', [str(network)]
+        prefix = '.'.join(str(network.network_address).split('.')[:octets]) + '.'
+        # '/' sorts right after '.', so this range holds exactly the addresses starting with prefix
+        clause, params = 'ip_address >= ? AND ip_address < ?', [prefix, prefix[:-1] + '/']
+        if network.prefixlen != octets * 8:
+            clause += ' AND ip_in_network(ip_address, ?)'
+            params.append(str(network))
+        return clause, params
+    
+    def query_devices(self, limit=100, cursor=None, segment=None, os_name=None, port=None,
+                      protocol='tcp', seen_since=None, fields=None):
+        """
+        Retrieve one page of devices, most recently seen first.
+        
+        Pages are keyset-paginated on (scan_timestamp, id), so every page
+        costs the same however deep into the inventory it is. The
+        device_info blob is only read when it is requested, and only
+        decoded when it is accessed.
+        
+        Args:
+            limit (int): Most devices to return.
+            cursor (str): The 'next' cursor of the previous page.
+            segment (str): Only devices inside this CIDR.
+            os_name (str): Only devices whose OS contains this text (case-insensitive).
+            port (int): Only devices with this port open.
+            protocol (str): Protocol of 'port'.
+            seen_since (str): Only devices scanned at or after this timestamp
+                ('YYYY-MM-DD HH:MM:SS', UTC).
+            fields (list): Fields to return (see DEVICE_FIELDS); all by default.
+        
+        Returns:
+            tuple: (list of DeviceRecords, cursor of the next page or None)
+        
+        Raises:
+            ValueError: On an unknown field, invalid segment or invalid cursor.
+        """
+        fields = list(fields) if fields else list(DEVICE_FIELDS)
+        unknown = [field for field in fields if field not in DEVICE_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown device fields: {', '.join(unknown)}")
+        
+        clauses, params = [], []
+        if segment:
+            clause, segment_params = self._segment_filter(segment)
+            clauses.append(clause)
+            params.extend(segment_params)
+        if os_name:
+            clauses.append('operating_system LIKE ?')
+            params.append(f'%{os_name}%')
+        if port is not None:
+            clauses.append('id IN (SELECT device_id FROM ports WHERE port_number = ? AND protocol = ?)')
+            params.extend([port, protocol])
+        if seen_since:
+            clauses.append('scan_timestamp >= ?')
+            params.append(seen_since)
+        if cursor:
+            clauses.append('(scan_timestamp, id) < (?, ?)')
+            params.extend(decode_cursor(cursor)[:2])
         
-        conn.close()
-        return None
+        columns = ', '.join(DEVICE_FIELDS[field] for field in fields)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        rows = self._connection().execute(f'''
+            SELECT scan_timestamp, id, {columns} FROM devices {where}
+            ORDER BY scan_timestamp DESC, id DESC LIMIT ?
+        ''', params + [limit]).fetchall()
+        
+        devices = [DeviceRecord.from_row(fields, row[2:]) for row in rows]
+        next_cursor = encode_cursor(list(rows[-1][:2])) if len(rows) == limit else None
+        return devices, next_cursor
     
     def get_scan_history(self):
         """Retrieve scan history from the database"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connection()
         cursor = conn.cursor()
         
         cursor.execute('SELECT * FROM scan_results ORDER BY scan_timestamp DESC')
@@ -187,19 +481,120 @@ class NetworkDatabase:
                 'id': row[0],
                 'scan_type': row[1],
                 'scan_timestamp': row[2],
-                'results': json.loads(row[3]) if row[3] else []
+                'results': decode_json(row[3]) if row[3] else []
             }
             scans.append(scan)
         
-        conn.close()
+        # Rebuild host lists from the normalized tables
+        hosts = self._get_scan_hosts([scan['id'] for scan in scans if not scan['results']])
+        for scan in scans:
+            if not scan['results']:
+                scan['results'] = hosts.get(scan['id'], [])
+        
         return scans
     
+    def _get_scan_hosts(self, scan_ids):
+        """
+        Load the hosts stored for some scans.
+        
+        Args:
+            scan_ids (list): Ids of the scans.
+        
+        Returns:
+            dict: {scan id: [host dictionaries in scan order]}
+        """
+        cursor = self._connection().cursor()
+        hosts = {}
+        by_host_id = {}
+        for start in range(0, len(scan_ids), LOOKUP_CHUNK):
+            chunk = scan_ids[start:start + LOOKUP_CHUNK]
+            placeholders = ', '.join('?' * len(chunk))
+            cursor.execute(f'''
+                SELECT id, scan_id, ip_address, mac_address, hostname, operating_system, details
+                FROM scan_hosts WHERE scan_id IN ({placeholders}) ORDER BY id
+            ''', chunk)
+            for host_id, scan_id, ip, mac, hostname, os_name, details in cursor.fetchall():
+                host = {'ip': ip, 'mac': mac, 'hostname': hostname, 'os': os_name}
+                host.update(decode_json(details) if details else {})
+                hosts.setdefault(scan_id, []).append(host)
+                by_host_id[host_id] = host
+            cursor.execute(f'''
+                SELECT p.scan_host_id, p.port_number, p.protocol, p.service, p.version
+                FROM scan_host_ports p JOIN scan_hosts h ON h.id = p.scan_host_id
+                WHERE h.scan_id IN ({placeholders}) ORDER BY p.rowid
+            ''', chunk)
+            for host_id, port, protocol, service, version in cursor.fetchall():
+                by_host_id[host_id].setdefault('ports', []).append(
+                    {'port': port, 'protocol': protocol, 'service': service, 'version': version})
+        return hosts
+    
+    def query_scan_history(self, limit=20, cursor=None, scan_type=None, since=None, include_results=False):
+        """
+        Retrieve one page of scans, newest first.
+        
+        Host lists are only loaded for the scans on the page and only when
+        'include_results' is set; otherwise each scan carries its host count.
+        
+        Args:
+            limit (int): Most scans to return.
+            cursor (str): The 'next' cursor of the previous page.
+            scan_type (str): Only scans of this type.
+            since (str): Only scans at or after this timestamp ('YYYY-MM-DD HH:MM:SS', UTC).
+            include_results (bool): Include each scan's results.
+        
+        Returns:
+            tuple: (list of scan dictionaries, cursor of the next page or None)
+        
+        Raises:
+            ValueError: If the cursor is invalid.
+        """
+        clauses, params = [], []
+        if scan_type:
+            clauses.append('scan_type = ?')
+            params.append(scan_type)
+        if since:
+            clauses.append('scan_timestamp >= ?')
+            params.append(since)
+        if cursor:
+            clauses.append('id < ?')
+            params.append(decode_cursor(cursor)[0])
+        
+        # Ids grow with time, so the primary key gives newest-first order
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        rows = self._connection().execute(f'''
+            SELECT id, scan_type, scan_timestamp, results IS NOT NULL{', results' if include_results else ''}
+            FROM scan_results {where} ORDER BY id DESC LIMIT ?
+        ''', params + [limit]).fetchall()
+        
+        scans = [{'id': row[0], 'scan_type': row[1], 'scan_timestamp': row[2]} for row in rows]
+        normalized = [row[0] for row in rows if not row[3]]
+        if include_results:
+            hosts = self._get_scan_hosts(normalized)
+            for scan, row in zip(scans, rows):
+                scan['results'] = decode_json(row[4]) if row[3] else hosts.get(scan['id'], [])
+        else:
+            counts = {}
+            for start in range(0, len(normalized), LOOKUP_CHUNK):
+                chunk = normalized[start:start + LOOKUP_CHUNK]
+                counts.update(self._connection().execute(f'''
+                    SELECT scan_id, COUNT(*) FROM scan_hosts
+                    WHERE scan_id IN ({', '.join('?' * len(chunk))}) GROUP BY scan_id
+                ''', chunk).fetchall())
+            for scan, row in zip(scans, rows):
+                # Results stored as JSON are not decoded just to be counted
+                scan['host_count'] = None if row[3] else counts.get(scan['id'], 0)
+        next_cursor = encode_cursor([rows[-1][0]]) if len(rows) == limit else None
+        return scans, next_cursor
+    
     def get_device_ports(self, device_id):
         """Retrieve port information for a specific device"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connection()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT * FROM ports WHERE device_id = ?', (device_id,))
+        cursor.execute('''
+            SELECT id, device_id, port_number, protocol, service, version
+            FROM ports WHERE device_id = ? ORDER BY port_number, protocol
+        ''', (device_id,))
         rows = cursor.fetchall()
         
         ports = []
@@ -208,28 +603,132 @@ class NetworkDatabase:
                 'id': row[0],
                 'device_id': row[1],
                 'port': row[2],
-                'service': row[3],
-                'version': row[4]
+                'protocol': row[3],
+                'service': row[4],
+                'version': row[5]
             }
             ports.append(port)
         
-        conn.close()
         return ports
     
+    def get_hosts_with_open_port(self, port, protocol='tcp'):
+        """
+        Find the devices with a port open, using the (port, protocol) index.
+        
+        Args:
+            port (int): The port number.
+            protocol (str): 'tcp' or 'udp'.
+        
+        Returns:
+            list: Device dictionaries with the matching port's service and version.
+        """
+        cursor = self._connection().cursor()
+        cursor.execute('''
+            SELECT d.id, d.ip_address, d.mac_address, d.hostname, d.operating_system,
+                   d.scan_timestamp, p.service, p.version
+            FROM ports p JOIN devices d ON d.id = p.device_id
+            WHERE p.port_number = ? AND p.protocol = ?
+            ORDER BY d.ip_address
+        ''', (port, protocol))
+        return [{
+            'id': row[0],
+            'ip': row[1],
+            'mac': row[2],
+            'hostname': row[3],
+            'os': row[4],
+            'scan_timestamp': row[5],
+            'service': row[6],
+            'version': row[7]
+        } for row in cursor.fetchall()]
+    
+    def search_devices(self, query, limit=50):
+        """
+        Search the device inventory (see utils/search.py for the query syntax).
+        
+        Args:
+            query (str): Free text and predicates, e.g. 'ssh open:22 os:linux after:7d'.
+            limit (int): Most devices to return.
+            
+        Returns:
+            list: Device dictionaries with their 'services' and a relevance
+                'score' (None when the query has no text), best first.
+            
+        Raises:
+            ValueError: If the query is malformed.
+        """
+        parsed = parse_query(query)
+        clauses, params = [], []
+        for port, protocol in parsed['open']:
+            clauses.append('d.id IN (SELECT device_id FROM ports WHERE port_number = ? AND protocol = ?)')
+            params.extend([port, protocol])
+        for timestamp in parsed['after']:
+            clauses.append('d.scan_timestamp >= ?')
+            params.append(timestamp)
+        for timestamp in parsed['before']:
+            clauses.append('d.scan_timestamp < ?')
+            params.append(timestamp)
+        for segment in parsed['ip']:
+            clause, segment_params = self._segment_filter(segment)
+            clauses.append(clause.replace('ip_address', 'd.ip_address'))
+            params.extend(segment_params)
+        
+        conn = self._connection()
+        expression = fts_expression(parsed)
+        columns = 'd.id, d.ip_address, d.mac_address, d.hostname, d.operating_system, d.scan_timestamp'
+        if expression and has_index(conn):
+            where = ' AND '.join(['device_search MATCH ?'] + clauses)
+            weights = ', '.join(str(weight) for weight in BM25_WEIGHTS)
+            rows = conn.execute(f'''
+                SELECT {columns}, device_search.services, -bm25(device_search, {weights}) AS score
+                FROM device_search JOIN devices d ON d.id = device_search.rowid
+                WHERE {where} ORDER BY bm25(device_search, {weights}) LIMIT ?
+            ''', [expression] + params + [limit]).fetchall()
+        else:
+            if expression:
+                # Without FTS5 the text parts become substring matches
+                text = [(term, ('d.ip_address', 'd.hostname', 'd.operating_system', 'd.services'))
+                        for term in parsed['terms']]
+                text += [(value, (SEARCH_COLUMNS[predicate],))
+                         for predicate in TEXT_PREDICATES for value in parsed[predicate]]
+                for value, targets in text:
+                    clauses.append('(' + ' OR '.join(f'{target} LIKE ?' for target in targets) + ')')
+                    params.extend([f'%{value}%'] * len(targets))
+            where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+            rows = conn.execute(f'''
+                SELECT * FROM (
+                    SELECT {columns}, ({SERVICES_SQL}) AS services, NULL AS score FROM devices d
+                ) d {where} ORDER BY d.scan_timestamp DESC LIMIT ?
+            ''', params + [limit]).fetchall()
+        
+        return [{
+            'id': row[0],
+            'ip': row[1],
+            'mac': row[2],
+            'hostname': row[3],
+            'os': row[4],
+            'scan_timestamp': row[5],
+            'services': row[6] or '',
+            'score': row[7]
+        } for row in rows]
+    
     def delete_device(self, ip_address):
         """Delete a device from the database"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connection()
         cursor = conn.cursor()
         
         try:
-            cursor.execute('DELETE FROM devices WHERE ip_address = ?', (ip_address,))
+            row = cursor.execute('SELECT id FROM devices WHERE ip_address = ?', (ip_address,)).fetchone()
+            if row is None:
+                return False
+            cursor.execute('DELETE FROM ports WHERE device_id = ?', row)
+            cursor.execute('DELETE FROM devices WHERE id = ?', row)
+            refresh_index(cursor, [row[0]])
             conn.commit()
-            return cursor.rowcount > 0
         except Exception as e:
             conn.rollback()
             raise e
-        finally:
-            conn.close()
+        self._bump_data_version()
+        return True
 
 # Example usage
 if __name__ == '__main__':
@@ -0,0 +1,193 @@
+"""
+Write-behind ingestion for Network Management Tool
+
+Scan handlers hand their results to an IngestionWriter instead of writing
+them to SQLite themselves. A background thread drains a bounded queue and
+writes everything that arrived within one flush interval (or up to a host
+count) in a single transaction. When the queue is full, callers wait for
+room and, if that takes too long, write their own results synchronously,
+so a slow disk slows producers down instead of growing memory. Pending
+results are flushed when the writer is closed and at interpreter exit.
+"""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from .database import NetworkDatabase
+
+# Queue marker that stops the writer thread
+_STOP = object()
+
+class IngestionWriter:
+    """Bounded queue of scan results written in batched transactions."""
+
+    def __init__(self, db_path='network_data.db', max_batch=1000, flush_interval=0.5, max_queue=1000,
+                 put_timeout=5.0):
+        """
+        Initialize the writer; its thread starts on the first submit.
+
+        Args:
+            db_path (str): Database file to write to.
+            max_batch (int): Hosts per transaction that trigger an early flush.
+            flush_interval (float): Longest time in seconds a result waits to be written.
+            max_queue (int): Most scans waiting in the queue.
+            put_timeout (float): Seconds a producer waits for room before
+                writing its results itself.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.database = NetworkDatabase(db_path)
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.batches = 0
+        self.written = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _start(self):
+        """Start the writer thread if it is not running."""
+        with self._lock:
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name='ingestion-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+            return self._thread is not None and not self._closed
+
+    def submit(self, scan_type, results, save_devices=True):
+        """
+        Queue a scan's results for writing.
+
+        Args:
+            scan_type (str): The kind of scan.
+            results (list): Host dictionaries returned by the scan.
+            save_devices (bool): Also upsert the hosts into the device inventory.
+
+        Returns:
+            bool: True if queued, False if the results were written
+                synchronously because the writer is closed or stayed full.
+        """
+        item = (scan_type, results, save_devices)
+        if self._start():
+            try:
+                self._queue.put(item, timeout=self.put_timeout)
+                return True
+            except queue.Full:
+                self.logger.warning(f"Ingestion queue full for {self.put_timeout}s, writing {scan_type} scan directly")
+        self._write([item])
+        return False
+
+    def flush(self):
+        """Block until everything queued so far has been written."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self, timeout=None):
+        """
+        Write pending results and stop the writer thread.
+
+        Args:
+            timeout (float): Most seconds to wait for the thread (default: no limit).
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def _run(self):
+        """Writer thread: gather a batch per flush interval or host limit and write it."""
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                break
+            batch = [item]
+            hosts = len(item[1])
+            deadline = time.monotonic() + self.flush_interval
+            while hosts < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    self._queue.task_done()
+                    break
+                batch.append(item)
+                hosts += len(item[1])
+            self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write(self, batch):
+        """
+        Write queued items in one transaction; failures are logged, not raised.
+
+        If the transaction fails, the items are written again one at a time
+        so only the ones that fail on their own are dropped.
+        """
+        try:
+            self._save(batch)
+            self.batches += 1
+            self.written += len(batch)
+            return
+        except Exception as e:
+            if len(batch) == 1:
+                self._drop(batch[0], e)
+                return
+            self.logger.warning(f"Failed to write {len(batch)} queued scans together, retrying one by one: {e}")
+        for item in batch:
+            try:
+                self._save([item])
+                self.batches += 1
+                self.written += 1
+            except Exception as e:
+                self._drop(item, e)
+
+    def _save(self, batch):
+        """Save queued items with one save_batch call."""
+        scans = [(scan_type, results) for scan_type, results, _ in batch]
+        devices = [device for _, results, save_devices in batch if save_devices
+                   for device in results if device.get('ip')]
+        self.database.save_batch(scans, devices)
+
+    def _drop(self, item, error):
+        """Count and log a queued scan that could not be written."""
+        scan_type, results, _ = item
+        try:
+            ips = [host.get('ip') for host in results]
+        except Exception:
+            ips = results
+        self.failed += 1
+        self.logger.error(f"Failed to write queued {scan_type} scan of {ips}: {error}")
+
+_default_writers = {}
+_default_writers_lock = threading.Lock()
+
+def get_writer(db_path='network_data.db'):
+    """
+    Return the process-wide ingestion writer for a database file.
+
+    Args:
+        db_path (str): Database file path.
+
+    Returns:
+        IngestionWriter: The shared writer instance.
+    """
+    with _default_writers_lock:
+        if db_path not in _default_writers:
+            _default_writers[db_path] = IngestionWriter(db_path)
+        return _default_writers[db_path]
@@ -0,0 +1,314 @@
+"""
+Schema migrations for the Network Management Tool database
+
+The schema version is stored in PRAGMA user_version. Each migration moves
+the database up one version and all pending migrations run in a single
+transaction, so a failed upgrade leaves the database as it was.
+
+Usage (from the src directory):
+    python -m utils.migrations [DB_PATH] [--status] [--no-backup]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+
+# Host fields stored in scan_hosts columns; everything else goes to 'details'
+HOST_COLUMNS = [('ip', 'ip_address'), ('mac', 'mac_address'), ('hostname', 'hostname'), ('os', 'operating_system')]
+
+def insert_scan_hosts(cursor, scan_id, hosts):
+    """
+    Store the hosts of one scan as scan_hosts and scan_host_ports rows.
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor inside an open transaction.
+        scan_id (int): The scan_results row the hosts belong to.
+        hosts (list): Host dictionaries as returned by the scanner.
+    """
+    port_rows = []
+    for host in hosts:
+        details = {key: value for key, value in host.items()
+                   if key != 'ports' and key not in dict(HOST_COLUMNS)}
+        cursor.execute('''
+            INSERT INTO scan_hosts (scan_id, ip_address, mac_address, hostname, operating_system, details)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [scan_id] + [host.get(key) for key, _ in HOST_COLUMNS] + [json.dumps(details) if details else None])
+        host_id = cursor.lastrowid
+        for port_info in host.get('ports') or []:
+            port_rows.append((host_id, port_info.get('port'), port_info.get('protocol', 'tcp'),
+                              port_info.get('service'), port_info.get('version')))
+    cursor.executemany('''
+        INSERT OR REPLACE INTO scan_host_ports (scan_host_id, port_number, protocol, service, version)
+        VALUES (?, ?, ?, ?, ?)
+    ''', port_rows)
+
+def _columns(cursor, table):
+    """Return the column names of a table."""
+    return [row[1] for row in cursor.execute(f'PRAGMA table_info({table})')]
+
+def _create_tables(cursor):
+    """Version 1: the original tables (IF NOT EXISTS keeps pre-versioning databases intact)."""
+    # Create devices table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS devices (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ip_address TEXT UNIQUE NOT NULL,
+            mac_address TEXT,
+            hostname TEXT,
+            operating_system TEXT,
+            scan_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            device_info TEXT
+        )
+    ''')
+
+    # Create scan_results table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS scan_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            scan_type TEXT NOT NULL,
+            scan_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            results TEXT
+        )
+    ''')
+
+    # Create ports table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ports (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            device_id INTEGER,
+            port_number INTEGER,
+            service TEXT,
+            version TEXT,
+            FOREIGN KEY (device_id) REFERENCES devices (id)
+        )
+    ''')
+
+def _unique_ports(cursor):
+    """Version 2: drop orphaned and duplicate ports, then make (device, port) unique."""
+    # INSERT OR REPLACE gave re-saved devices new ids, orphaning their ports
+    cursor.execute('DELETE FROM ports WHERE device_id NOT IN (SELECT id FROM devices)')
+    cursor.execute('''
+        DELETE FROM ports WHERE id NOT IN
+            (SELECT MAX(id) FROM ports GROUP BY device_id, port_number)
+    ''')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_ports_device_port ON ports (device_id, port_number)')
+
+def _normalize_scans(cursor):
+    """Version 3: port protocols, lookup indexes and normalized scan hosts."""
+    if 'protocol' not in _columns(cursor, 'ports'):
+        cursor.execute("ALTER TABLE ports ADD COLUMN protocol TEXT NOT NULL DEFAULT 'tcp'")
+    cursor.execute('DROP INDEX IF EXISTS idx_ports_device_port')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_ports_device_port_proto '
+                   'ON ports (device_id, port_number, protocol)')
+    # "Which hosts have port N open" is a range scan on this index
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_ports_port ON ports (port_number, protocol)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_devices_scan_timestamp ON devices (scan_timestamp)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_scan_results_timestamp ON scan_results (scan_timestamp)')
+
+    # One row per host seen in a scan, replacing the scan_results.results blob
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS scan_hosts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            scan_id INTEGER NOT NULL,
+            ip_address TEXT,
+            mac_address TEXT,
+            hostname TEXT,
+            operating_system TEXT,
+            details TEXT,
+            FOREIGN KEY (scan_id) REFERENCES scan_results (id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_scan_hosts_scan ON scan_hosts (scan_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_scan_hosts_ip ON scan_hosts (ip_address)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS scan_host_ports (
+            scan_host_id INTEGER NOT NULL,
+            port_number INTEGER,
+            protocol TEXT NOT NULL DEFAULT 'tcp',
+            service TEXT,
+            version TEXT,
+            UNIQUE (scan_host_id, port_number, protocol),
+            FOREIGN KEY (scan_host_id) REFERENCES scan_hosts (id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_scan_host_ports_port ON scan_host_ports (port_number, protocol)')
+
+    # Move stored scan results into the new tables; blobs that are not
+    # lists of host dictionaries are left where they are
+    rows = cursor.execute('SELECT id, results FROM scan_results WHERE results IS NOT NULL').fetchall()
+    for scan_id, results in rows:
+        try:
+            hosts = json.loads(results)
+        except ValueError:
+            continue
+        if not isinstance(hosts, list) or not all(isinstance(host, dict) for host in hosts):
+            continue
+        insert_scan_hosts(cursor, scan_id, hosts)
+        cursor.execute('UPDATE scan_results SET results = NULL WHERE id = ?', (scan_id,))
+
+def _observation_tables(cursor):
+    """Version 4: host observation rollups and bookkeeping (raw partitions are created on demand)."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS observed_hosts (
+            ip_address TEXT PRIMARY KEY,
+            first_seen REAL NOT NULL,
+            last_seen REAL NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS observation_rollups (
+            resolution TEXT NOT NULL,
+            ip_address TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            samples INTEGER NOT NULL,
+            up_samples INTEGER NOT NULL,
+            latency_count INTEGER NOT NULL,
+            latency_sum REAL,
+            latency_min REAL,
+            latency_max REAL,
+            open_ports TEXT,
+            port_sets INTEGER NOT NULL,
+            PRIMARY KEY (resolution, ip_address, bucket)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_observation_rollups_bucket ON observation_rollups (resolution, bucket)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS observation_state (
+            key TEXT PRIMARY KEY,
+            value REAL
+        )
+    ''')
+
+def _device_search(cursor):
+    """Version 5: full-text index over device names, OS and port banners (needs FTS5)."""
+    try:
+        # rowid is the device id; 'services' holds 'port/protocol service version' per open port
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS device_search
+            USING fts5 (ip, hostname, os, services, prefix = '2 3')
+        ''')
+    except sqlite3.OperationalError:
+        # SQLite built without FTS5: search falls back to scanning
+        return
+    cursor.execute('DELETE FROM device_search')
+    cursor.execute('''
+        INSERT INTO device_search (rowid, ip, hostname, os, services)
+        SELECT d.id, d.ip_address, d.hostname, d.operating_system,
+               (SELECT group_concat(p.port_number || '/' || p.protocol || ' ' || COALESCE(p.service, '')
+                                    || ' ' || COALESCE(p.version, ''), ' ')
+                FROM ports p WHERE p.device_id = d.id)
+        FROM devices d
+    ''')
+
+# (version, description, step) in order
+MIGRATIONS = [
+    (1, "create devices, scan_results and ports tables", _create_tables),
+    (2, "unique ports per device", _unique_ports),
+    (3, "indexes, port protocols and normalized scan hosts", _normalize_scans),
+    (4, "host observation rollups", _observation_tables),
+    (5, "full-text device search", _device_search),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def get_version(conn):
+    """Return the schema version of a database."""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def migrate(conn, target=SCHEMA_VERSION):
+    """
+    Apply every pending migration up to 'target' in one transaction.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the database.
+        target (int): Version to migrate to.
+
+    Returns:
+        tuple: (version before, version after).
+
+    Raises:
+        ValueError: If the database is newer than this code.
+    """
+    current = get_version(conn)
+    if current > SCHEMA_VERSION:
+        raise ValueError(f"Database schema version {current} is newer than supported version {SCHEMA_VERSION}")
+    if current >= target:
+        return current, current
+
+    cursor = conn.cursor()
+    # IMMEDIATE takes the write lock, so concurrent processes upgrade one at a time
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        # Re-read under the lock in case another process upgraded meanwhile
+        current = get_version(conn)
+        for version, _, step in MIGRATIONS:
+            if current < version <= target:
+                step(cursor)
+        cursor.execute(f'PRAGMA user_version = {max(current, target)}')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return current, max(current, target)
+
+def backup(db_path):
+    """
+    Copy a database with SQLite's online backup API before migrating it.
+
+    Args:
+        db_path (str): Path of the database.
+
+    Returns:
+        str: Path of the copy.
+    """
+    source = sqlite3.connect(db_path)
+    try:
+        backup_path = f"{db_path}.v{get_version(source)}.bak"
+        target = sqlite3.connect(backup_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+    finally:
+        source.close()
+    return backup_path
+
+def main(argv=None):
+    """Migrate a database file from the command line."""
+    parser = argparse.ArgumentParser(description='Migrate a Network Management Tool database')
+    parser.add_argument('db_path', nargs='?', default='network_data.db', help='Database file to migrate')
+    parser.add_argument('--status', action='store_true', help='Show the schema version without migrating')
+    parser.add_argument('--no-backup', action='store_true', help='Do not copy the database before migrating')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db_path):
+        print(f"Database not found: {args.db_path}")
+        return 1
+
+    conn = sqlite3.connect(args.db_path)
+    try:
+        current = get_version(conn)
+        print(f"{args.db_path}: schema version {current} (latest {SCHEMA_VERSION})")
+        if args.status:
+            for version, description, _ in MIGRATIONS:
+                if version > current:
+                    print(f"  pending: {version} - {description}")
+            return 0
+        if current >= SCHEMA_VERSION:
+            print("Nothing to migrate.")
+            return 0
+        if not args.no_backup:
+            print(f"Backed up to {backup(args.db_path)}")
+        before, after = migrate(conn)
+        print(f"Migrated from version {before} to {after}.")
+        return 0
+    except (sqlite3.Error, ValueError) as e:
+        print(f"Migration failed: {e}")
+        return 1
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    sys.exit(main())
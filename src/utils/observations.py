@@ -0,0 +1,520 @@
+"""
+Host observation store for Network Management Tool
+
+Every scan (and every latency sample) adds one row per host to a raw
+observation table. Raw rows are partitioned into one table per UTC day, so
+retention drops whole tables instead of deleting rows. Completed hours and
+days are rolled up into observation_rollups, which is what long-range
+history queries read; the raw partitions only need to cover the recent
+past. Rollups are kept for their own, longer, retention periods.
+"""
+
+import logging
+import time
+from datetime import datetime, timezone
+
+# Seconds per bucket for each rollup resolution
+RESOLUTIONS = {'hour': 3600, 'day': 86400}
+
+# Raw partitions are named after their UTC day
+PARTITION_PREFIX = 'observations_'
+PARTITION_SECONDS = 86400
+
+DAY = 86400
+
+def partition_name(timestamp):
+    """Return the raw partition table holding a timestamp."""
+    return PARTITION_PREFIX + datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y%m%d')
+
+def partition_start(name):
+    """Return the first timestamp covered by a raw partition."""
+    day = datetime.strptime(name[len(PARTITION_PREFIX):], '%Y%m%d').replace(tzinfo=timezone.utc)
+    return int(day.timestamp())
+
+def encode_ports(ports):
+    """
+    Encode open ports as a canonical string such as '22/tcp,80/tcp'.
+
+    Args:
+        ports (list): Port dictionaries ('port' and optional 'protocol') or
+            port numbers; None when the observation did not check ports.
+
+    Returns:
+        str: The encoded ports ('' for none open), or None.
+    """
+    if ports is None:
+        return None
+    entries = set()
+    for port in ports:
+        if isinstance(port, dict):
+            entries.add((port.get('port'), port.get('protocol', 'tcp')))
+        else:
+            entries.add((port, 'tcp'))
+    return ','.join(f"{number}/{protocol}" for number, protocol in sorted(entries) if number is not None)
+
+def decode_ports(encoded):
+    """Decode ports made by encode_ports into a list of 'port/protocol' strings."""
+    if encoded is None:
+        return None
+    return encoded.split(',') if encoded else []
+
+class ObservationStore:
+    """Time-partitioned host observations with hourly and daily rollups."""
+
+    def __init__(self, database, raw_retention_days=14, hourly_retention_days=90, daily_retention_days=730,
+                 maintenance_interval=3600):
+        """
+        Initialize the observation store.
+
+        Args:
+            database (NetworkDatabase): Database whose connection is used.
+            raw_retention_days (float): Days raw observations are kept.
+            hourly_retention_days (float): Days hourly rollups are kept.
+            daily_retention_days (float): Days daily rollups are kept (None keeps them forever).
+            maintenance_interval (float): Seconds between automatic rollup/retention runs.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.database = database
+        self.raw_retention = raw_retention_days * DAY
+        self.retention = {
+            'hour': hourly_retention_days * DAY if hourly_retention_days is not None else None,
+            'day': daily_retention_days * DAY if daily_retention_days is not None else None,
+        }
+        self.maintenance_interval = maintenance_interval
+
+    def _conn(self):
+        """Return this thread's connection to the database."""
+        return self.database._connection()
+
+    def _get_state(self, key):
+        """Read a bookkeeping value such as a rollup watermark."""
+        row = self._conn().execute('SELECT value FROM observation_state WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_state(self, cursor, key, value):
+        """Write a bookkeeping value inside the caller's transaction."""
+        cursor.execute('INSERT OR REPLACE INTO observation_state (key, value) VALUES (?, ?)', (key, value))
+
+    def _partitions(self):
+        """Return the names of the raw partitions, oldest first."""
+        rows = self._conn().execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ? ORDER BY name",
+            (PARTITION_PREFIX + '[0-9]*',)).fetchall()
+        return [row[0] for row in rows]
+
+    def _ensure_partition(self, cursor, name):
+        """Create a raw partition table and its (ip, time) index if missing."""
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {name} (
+                ts REAL NOT NULL,
+                ip_address TEXT NOT NULL,
+                scan_id INTEGER,
+                up INTEGER NOT NULL DEFAULT 1,
+                latency_ms REAL,
+                open_ports TEXT
+            )
+        ''')
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{name}_ip_ts ON {name} (ip_address, ts)')
+
+    def record(self, observations, cursor=None):
+        """
+        Store host observations.
+
+        Observations are rolled up once their hour or day is complete, so
+        they should be recorded as they happen; rows older than the last
+        rollup stay in the raw data only.
+
+        Args:
+            observations (iterable): Dictionaries with 'ip' and optionally
+                'timestamp' (epoch seconds, default now), 'up' (default True),
+                'latency_ms', 'ports' (list of open ports) and 'scan_id'.
+            cursor (sqlite3.Cursor): Write inside the caller's transaction
+                (the caller commits); by default the store commits itself.
+
+        Returns:
+            int: The number of observations stored.
+        """
+        now = time.time()
+        by_partition = {}
+        seen = {}
+        for observation in observations:
+            timestamp = observation.get('timestamp') or now
+            ip = observation['ip']
+            by_partition.setdefault(partition_name(timestamp), []).append((
+                timestamp,
+                ip,
+                observation.get('scan_id'),
+                1 if observation.get('up', True) else 0,
+                observation.get('latency_ms'),
+                encode_ports(observation.get('ports'))
+            ))
+            first, last = seen.get(ip, (timestamp, timestamp))
+            seen[ip] = (min(first, timestamp), max(last, timestamp))
+        if not seen:
+            return 0
+
+        conn = self._conn()
+        own_transaction = cursor is None
+        cursor = cursor or conn.cursor()
+        try:
+            for name, rows in by_partition.items():
+                self._ensure_partition(cursor, name)
+                cursor.executemany(f'''
+                    INSERT INTO {name} (ts, ip_address, scan_id, up, latency_ms, open_ports)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', rows)
+            cursor.executemany('''
+                INSERT INTO observed_hosts (ip_address, first_seen, last_seen) VALUES (?, ?, ?)
+                ON CONFLICT (ip_address) DO UPDATE SET
+                    first_seen = MIN(first_seen, excluded.first_seen),
+                    last_seen = MAX(last_seen, excluded.last_seen)
+            ''', [(ip, first, last) for ip, (first, last) in seen.items()])
+            if own_transaction:
+                conn.commit()
+        except Exception:
+            if own_transaction:
+                conn.rollback()
+            raise
+        return sum(len(rows) for rows in by_partition.values())
+
+    def record_scan(self, hosts, scan_id=None, timestamp=None, cursor=None):
+        """
+        Store one observation per host found by a scan.
+
+        Args:
+            hosts (list): Host dictionaries as returned by the scanner.
+            scan_id (int): The scan_results row of the scan.
+            timestamp (float): Time of the scan (defaults to now).
+            cursor (sqlite3.Cursor): See record().
+
+        Returns:
+            int: The number of observations stored.
+        """
+        timestamp = timestamp or time.time()
+        return self.record([{
+            'ip': host['ip'],
+            'timestamp': timestamp,
+            'scan_id': scan_id,
+            'up': host.get('up', True),
+            'latency_ms': host.get('latency_ms'),
+            'ports': host.get('ports')
+        } for host in hosts if host.get('ip')], cursor=cursor)
+
+    def record_latency(self, ip_address, latency_ms, up=True, timestamp=None):
+        """
+        Store one latency sample for a host.
+
+        Args:
+            ip_address (str): The host.
+            latency_ms (float): Round-trip time in milliseconds (None if unanswered).
+            up (bool): Whether the host answered.
+            timestamp (float): Time of the sample (defaults to now).
+        """
+        self.record([{'ip': ip_address, 'latency_ms': latency_ms, 'up': up, 'timestamp': timestamp}])
+
+    def _aggregate(self, size, start, end, ip_address=None):
+        """
+        Aggregate raw observations in [start, end) into buckets of 'size' seconds.
+
+        Returns:
+            list: Rows of (ip, bucket, samples, up_samples, latency_count,
+                latency_sum, latency_min, latency_max, open_ports, port_sets).
+        """
+        branches, params = [], []
+        for name in self._partitions():
+            begin = partition_start(name)
+            if begin >= end or begin + PARTITION_SECONDS <= start:
+                continue
+            condition = 'ts >= ? AND ts < ?' + (' AND ip_address = ?' if ip_address else '')
+            branches.append(f'SELECT ts, ip_address, up, latency_ms, open_ports FROM {name} WHERE {condition}')
+            params.extend([start, end] + ([ip_address] if ip_address else []))
+        if not branches:
+            return []
+
+        # The ports of a bucket are the last ones reported in it
+        return self._conn().execute(f'''
+            WITH raw AS ({' UNION ALL '.join(branches)}),
+            bucketed AS (
+                SELECT ip_address, CAST(ts / {size} AS INTEGER) * {size} AS bucket, ts, up, latency_ms, open_ports
+                FROM raw
+            ),
+            latest AS (
+                SELECT ip_address, bucket, open_ports FROM (
+                    SELECT ip_address, bucket, open_ports,
+                           ROW_NUMBER() OVER (PARTITION BY ip_address, bucket ORDER BY ts DESC) AS position
+                    FROM bucketed WHERE open_ports IS NOT NULL
+                ) WHERE position = 1
+            )
+            SELECT b.ip_address, b.bucket, COUNT(*), SUM(b.up), COUNT(b.latency_ms), SUM(b.latency_ms),
+                   MIN(b.latency_ms), MAX(b.latency_ms), l.open_ports, COUNT(DISTINCT b.open_ports)
+            FROM bucketed b LEFT JOIN latest l ON l.ip_address = b.ip_address AND l.bucket = b.bucket
+            GROUP BY b.ip_address, b.bucket
+            ORDER BY b.bucket
+        ''', params).fetchall()
+
+    def rollup(self, now=None):
+        """
+        Roll completed hours and days of raw observations up into observation_rollups.
+
+        Args:
+            now (float): Reference time (defaults to now).
+
+        Returns:
+            dict: {resolution: rollup rows written}
+        """
+        now = time.time() if now is None else now
+        partitions = self._partitions()
+        written = {}
+        conn = self._conn()
+        for resolution, size in RESOLUTIONS.items():
+            end = int(now // size) * size
+            start = self._get_state(f'rollup_{resolution}')
+            if start is None:
+                if not partitions:
+                    written[resolution] = 0
+                    continue
+                start = partition_start(partitions[0]) // size * size
+            if start >= end:
+                written[resolution] = 0
+                continue
+            rows = self._aggregate(size, start, end)
+            cursor = conn.cursor()
+            try:
+                cursor.executemany('''
+                    INSERT OR REPLACE INTO observation_rollups
+                    (resolution, ip_address, bucket, samples, up_samples, latency_count,
+                     latency_sum, latency_min, latency_max, open_ports, port_sets)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', [(resolution,) + tuple(row) for row in rows])
+                self._set_state(cursor, f'rollup_{resolution}', end)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            written[resolution] = len(rows)
+        return written
+
+    def apply_retention(self, now=None):
+        """
+        Drop raw partitions and rollups past their retention.
+
+        Raw partitions are only dropped once every rollup covers them.
+
+        Args:
+            now (float): Reference time (defaults to now).
+
+        Returns:
+            dict: 'dropped_partitions' (names) and 'deleted_rollups' (rows).
+        """
+        now = time.time() if now is None else now
+        rolled_until = min(self._get_state(f'rollup_{resolution}') or 0 for resolution in RESOLUTIONS)
+        cutoff = min(now - self.raw_retention, rolled_until)
+        dropped = [name for name in self._partitions() if partition_start(name) + PARTITION_SECONDS <= cutoff]
+
+        conn = self._conn()
+        cursor = conn.cursor()
+        deleted = 0
+        try:
+            for name in dropped:
+                cursor.execute(f'DROP TABLE {name}')
+            for resolution, retention in self.retention.items():
+                if retention is not None:
+                    cursor.execute('DELETE FROM observation_rollups WHERE resolution = ? AND bucket < ?',
+                                   (resolution, now - retention))
+                    deleted += cursor.rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        if dropped:
+            self.logger.info(f"Dropped {len(dropped)} raw observation partitions")
+        return {'dropped_partitions': dropped, 'deleted_rollups': deleted}
+
+    def vacuum(self, min_free_ratio=0.2):
+        """
+        Rebuild the database file when enough of it is free pages.
+
+        Args:
+            min_free_ratio (float): Fraction of free pages that triggers a VACUUM.
+
+        Returns:
+            bool: True if the database was vacuumed.
+        """
+        conn = self._conn()
+        conn.commit()
+        pages = conn.execute('PRAGMA page_count').fetchone()[0]
+        free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if not pages or free / pages < min_free_ratio:
+            return False
+        conn.execute('VACUUM')
+        self.logger.info(f"Vacuumed database, reclaiming {free} of {pages} pages")
+        return True
+
+    def maintain(self, now=None, vacuum=True):
+        """
+        Roll up, apply retention and optionally vacuum.
+
+        Args:
+            now (float): Reference time (defaults to now).
+            vacuum (bool): Vacuum afterwards if worthwhile.
+
+        Returns:
+            dict: What was done.
+        """
+        now = time.time() if now is None else now
+        result = {'rolled_up': self.rollup(now)}
+        result.update(self.apply_retention(now))
+        result['vacuumed'] = self.vacuum() if vacuum else False
+        cursor = self._conn().cursor()
+        self._set_state(cursor, 'maintained_at', now)
+        self._conn().commit()
+        return result
+
+    def maintain_if_due(self, now=None):
+        """
+        Run maintenance without vacuuming if the maintenance interval has passed.
+
+        Returns:
+            dict: What was done, or None if maintenance was not due.
+        """
+        now = time.time() if now is None else now
+        last = self._get_state('maintained_at')
+        if last is not None and now - last < self.maintenance_interval:
+            return None
+        return self.maintain(now, vacuum=False)
+
+    @staticmethod
+    def _rollup_point(bucket, samples, up_samples, latency_count, latency_sum, latency_min, latency_max,
+                      open_ports, port_sets):
+        """Turn an aggregated row into a history point."""
+        return {
+            'timestamp': bucket,
+            'samples': samples,
+            'availability': up_samples / samples if samples else None,
+            'latency_avg': latency_sum / latency_count if latency_count else None,
+            'latency_min': latency_min,
+            'latency_max': latency_max,
+            'open_ports': decode_ports(open_ports),
+            'port_sets': port_sets,
+        }
+
+    def history(self, ip_address, since, until=None, resolution=None):
+        """
+        Return the observation history of a host.
+
+        Without a resolution, ranges up to a day return raw observations,
+        up to 31 days hourly points and longer ranges daily points. Rollup
+        points cover the part of the range not yet rolled up by
+        aggregating raw observations on the fly.
+
+        Args:
+            ip_address (str): The host.
+            since (float): Start of the range (epoch seconds).
+            until (float): End of the range (defaults to now).
+            resolution (str): 'raw', 'hour' or 'day'.
+
+        Returns:
+            dict: 'resolution' and 'points', oldest first.
+
+        Raises:
+            ValueError: On an unknown resolution.
+        """
+        until = time.time() if until is None else until
+        if resolution is None:
+            span = until - since
+            resolution = 'raw' if span <= DAY else 'hour' if span <= 31 * DAY else 'day'
+        if resolution == 'raw':
+            return {'resolution': 'raw', 'points': self._raw_history(ip_address, since, until)}
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution: {resolution}")
+
+        size = RESOLUTIONS[resolution]
+        start = int(since // size) * size
+        rolled_until = self._get_state(f'rollup_{resolution}') or start
+        rows = self._conn().execute('''
+            SELECT bucket, samples, up_samples, latency_count, latency_sum, latency_min, latency_max,
+                   open_ports, port_sets
+            FROM observation_rollups
+            WHERE resolution = ? AND ip_address = ? AND bucket >= ? AND bucket < ?
+            ORDER BY bucket
+        ''', (resolution, ip_address, start, min(until, rolled_until))).fetchall()
+        points = [self._rollup_point(*row) for row in rows]
+        if until > rolled_until:
+            points.extend(self._rollup_point(*row[1:])
+                          for row in self._aggregate(size, max(start, rolled_until), until, ip_address))
+        return {'resolution': resolution, 'points': points}
+
+    def _raw_history(self, ip_address, since, until):
+        """Read raw observations of a host from the partitions covering [since, until)."""
+        points = []
+        for name in self._partitions():
+            begin = partition_start(name)
+            if begin >= until or begin + PARTITION_SECONDS <= since:
+                continue
+            rows = self._conn().execute(f'''
+                SELECT ts, scan_id, up, latency_ms, open_ports FROM {name}
+                WHERE ip_address = ? AND ts >= ? AND ts < ? ORDER BY ts
+            ''', (ip_address, since, until)).fetchall()
+            points.extend({
+                'timestamp': ts,
+                'scan_id': scan_id,
+                'up': bool(up),
+                'latency_ms': latency_ms,
+                'open_ports': decode_ports(open_ports),
+            } for ts, scan_id, up, latency_ms, open_ports in rows)
+        return points
+
+    def port_changes(self, ip_address, since, until=None, resolution=None):
+        """
+        Return when ports opened or closed on a host.
+
+        At hourly or daily resolution only the last port set of each bucket
+        is compared; 'port_sets' in history() shows flapping within a bucket.
+
+        Args:
+            ip_address (str): The host.
+            since (float): Start of the range (epoch seconds).
+            until (float): End of the range (defaults to now).
+            resolution (str): As for history().
+
+        Returns:
+            list: Dictionaries with 'timestamp', 'opened' and 'closed'.
+        """
+        return self.changes_in(self.history(ip_address, since, until, resolution)['points'])
+
+    @staticmethod
+    def changes_in(points):
+        """
+        Find the port changes in history() points.
+
+        Args:
+            points (list): Points as returned by history().
+
+        Returns:
+            list: Dictionaries with 'timestamp', 'opened' and 'closed'.
+        """
+        changes = []
+        previous = None
+        for point in points:
+            ports = point['open_ports']
+            if ports is None:
+                continue
+            if previous is not None and ports != previous:
+                changes.append({
+                    'timestamp': point['timestamp'],
+                    'opened': sorted(set(ports) - set(previous)),
+                    'closed': sorted(set(previous) - set(ports)),
+                })
+            previous = ports
+        return changes
+
+    def first_seen(self, ip_address):
+        """
+        Return when a host was first and last observed.
+
+        Returns:
+            dict: 'first_seen' and 'last_seen' (epoch seconds), or None if never seen.
+        """
+        row = self._conn().execute('SELECT first_seen, last_seen FROM observed_hosts WHERE ip_address = ?',
+                                   (ip_address,)).fetchone()
+        return {'first_seen': row[0], 'last_seen': row[1]} if row else None
@@ -0,0 +1,169 @@
+"""
+JSON handling and lazy device records for Network Management Tool
+
+Device rows carry their full scan output as a JSON blob (device_info).
+DeviceRecord keeps that blob as text and only decodes it when device_info
+is read, and encode_json writes an undecoded blob straight into the
+output, so listings pass device_info from SQLite to the client without
+parsing it. orjson is used for encoding and decoding when it is installed.
+"""
+
+import json
+from collections.abc import Mapping
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the json module is always available
+    orjson = None
+
+# Marks a record whose device_info has not been decoded (or was not selected)
+_UNSET = object()
+
+def decode_json(text):
+    """Decode a JSON document (str or bytes)."""
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+def _encode_plain(obj):
+    """Encode JSON data that contains no DeviceRecords."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(obj)
+
+def _orjson_default(obj):
+    """orjson hook: records become their fields, with device_info passed through undecoded."""
+    if isinstance(obj, DeviceRecord):
+        fields = dict(obj._values)
+        if obj._info is not _UNSET:
+            fields['device_info'] = obj._info
+        elif obj._raw is not _UNSET:
+            fields['device_info'] = orjson.Fragment(obj._raw or '{}')
+        return fields
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def _encode_walk(obj):
+    """Encode data piece by piece, splicing DeviceRecords in as text."""
+    if isinstance(obj, DeviceRecord):
+        return obj.to_json()
+    if isinstance(obj, dict):
+        items = (f'{json.dumps(key if isinstance(key, str) else json.dumps(key))}: {_encode_walk(value)}'
+                 for key, value in obj.items())
+        return '{' + ', '.join(items) + '}'
+    if isinstance(obj, (list, tuple)):
+        return '[' + ', '.join(_encode_walk(value) for value in obj) + ']'
+    return _encode_plain(obj)
+
+def encode_json(obj):
+    """
+    Encode data as a JSON string.
+
+    DeviceRecords anywhere in the data are written with their stored
+    device_info blob as is, unless it has already been decoded.
+
+    Args:
+        obj: Data to encode.
+
+    Returns:
+        str: The JSON text.
+
+    Raises:
+        TypeError: If the data holds a value JSON cannot represent.
+    """
+    if orjson is not None and hasattr(orjson, 'Fragment'):
+        return orjson.dumps(obj, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    found = []
+
+    def no_records(value):
+        # Records are spliced in by _encode_walk; the fast encoders stop at the first one
+        found.append(isinstance(value, DeviceRecord))
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+    try:
+        if orjson is not None:
+            return orjson.dumps(obj, default=no_records, option=orjson.OPT_NON_STR_KEYS).decode()
+        return json.dumps(obj, default=no_records)
+    except TypeError:
+        if not any(found):
+            raise
+    return _encode_walk(obj)
+
+class DeviceRecord(Mapping):
+    """
+    A device read from the database, usable as a read-only dictionary.
+
+    Fields are also available as attributes (record.ip). The device_info
+    blob is decoded on first access and the result is kept.
+    """
+
+    __slots__ = ('_values', '_raw', '_info')
+
+    def __init__(self, values, device_info=_UNSET):
+        """
+        Initialize the record.
+
+        Args:
+            values (dict): Field values other than device_info.
+            device_info (str): The stored device_info JSON (None if empty);
+                leave out for records read without device_info.
+        """
+        self._values = values
+        self._raw = device_info
+        self._info = _UNSET
+
+    @classmethod
+    def from_row(cls, fields, row):
+        """
+        Build a record from a row of the given fields (see DEVICE_FIELDS).
+
+        Returns:
+            DeviceRecord: The record; device_info stays encoded.
+        """
+        values = dict(zip(fields, row))
+        if 'device_info' in values:
+            return cls(values, values.pop('device_info'))
+        return cls(values)
+
+    @property
+    def device_info(self):
+        """The decoded device_info ({} if none was stored)."""
+        if self._info is _UNSET:
+            if self._raw is _UNSET:
+                raise AttributeError('device_info')
+            self._info = decode_json(self._raw) if self._raw else {}
+        return self._info
+
+    def __getattr__(self, name):
+        if not name.startswith('_'):
+            try:
+                return self._values[name]
+            except KeyError:
+                pass
+        raise AttributeError(name)
+
+    def __getitem__(self, key):
+        if key == 'device_info' and self._raw is not _UNSET:
+            return self.device_info
+        return self._values[key]
+
+    def __iter__(self):
+        yield from self._values
+        if self._raw is not _UNSET:
+            yield 'device_info'
+
+    def __len__(self):
+        return len(self._values) + (self._raw is not _UNSET)
+
+    def __repr__(self):
+        return f'DeviceRecord({self._values!r})'
+
+    def to_dict(self):
+        """Return the record as a plain dictionary, decoding device_info."""
+        return dict(self.items())
+
+    def to_json(self):
+        """Encode the record as a JSON object, device_info undecoded if it was never read."""
+        text = _encode_plain(self._values)
+        if self._raw is _UNSET:
+            return text
+        info = _encode_plain(self._info) if self._info is not _UNSET else (self._raw or '{}')
+        return (text[:-1] + ', ' if self._values else '{') + f'"device_info": {info}' + '}'
@@ -0,0 +1,132 @@
+"""
+Device inventory search for Network Management Tool
+
+Search queries combine free text with Zenmap-style predicates:
+
+    web ssh open:22,3389 service:http os:windows host:db after:2026-01-01 before:7d ip:10.0.0.0/16
+
+Free text and the service:, os: and host: predicates are answered by the
+device_search FTS5 index (prefix matches, ranked with BM25); open:,
+after:, before: and ip: are answered by the regular indexes on ports,
+devices.scan_timestamp and devices.ip_address. The index is kept current
+by NetworkDatabase whenever devices are saved or deleted.
+"""
+
+import re
+import shlex
+from datetime import datetime, timedelta, timezone
+
+# Predicates understood in search queries
+PREDICATES = ('open', 'service', 'os', 'host', 'ip', 'after', 'before')
+
+# Predicates matched against a column of the full-text index
+TEXT_PREDICATES = {'service': 'services', 'os': 'os', 'host': 'hostname'}
+
+# BM25 weights of the ip, hostname, os and services columns
+BM25_WEIGHTS = (4.0, 8.0, 2.0, 1.0)
+
+# Relative dates such as '7d' or '12h' in after:/before:
+RELATIVE_TIME = re.compile(r'^(\d+)([dh])$')
+
+# What the index stores for a device's ports, per open port
+SERVICES_SQL = '''
+    SELECT group_concat(p.port_number || '/' || p.protocol || ' ' || COALESCE(p.service, '')
+                        || ' ' || COALESCE(p.version, ''), ' ')
+    FROM ports p WHERE p.device_id = d.id
+'''
+
+def _parse_time(value, now=None):
+    """
+    Turn 'YYYY-MM-DD[ HH:MM[:SS]]' or a relative '7d'/'12h' into a scan_timestamp string (UTC).
+
+    Raises:
+        ValueError: If the value is not a date.
+    """
+    now = now or datetime.now(timezone.utc)
+    relative = RELATIVE_TIME.match(value)
+    if relative:
+        amount, unit = int(relative.group(1)), relative.group(2)
+        moment = now - (timedelta(days=amount) if unit == 'd' else timedelta(hours=amount))
+        return moment.strftime('%Y-%m-%d %H:%M:%S')
+    for layout in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, layout).strftime('%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid date: {value}")
+
+def parse_query(text, now=None):
+    """
+    Split a search query into free-text terms and predicates.
+
+    Args:
+        text (str): The query; quote terms that contain spaces.
+        now (datetime): Reference time for relative dates (defaults to now).
+
+    Returns:
+        dict: 'terms' and one list per predicate ('open' holds
+            (port, protocol) pairs; 'after' and 'before' hold timestamps).
+
+    Raises:
+        ValueError: If the query or a predicate value is malformed.
+    """
+    parsed = {'terms': []}
+    parsed.update({predicate: [] for predicate in PREDICATES})
+    for token in shlex.split(text or ''):
+        key, _, value = token.partition(':')
+        key = key.lower()
+        if not value or key not in PREDICATES:
+            # Not a predicate (this includes IPv6 addresses)
+            parsed['terms'].append(token)
+        elif key == 'open':
+            for entry in value.split(','):
+                number, _, protocol = entry.partition('/')
+                if not number.isdigit() or not 0 < int(number) < 65536 or protocol not in ('', 'tcp', 'udp'):
+                    raise ValueError(f"Invalid port: {entry}")
+                parsed['open'].append((int(number), protocol or 'tcp'))
+        elif key in ('after', 'before'):
+            parsed[key].append(_parse_time(value, now))
+        else:
+            parsed[key].append(value)
+    return parsed
+
+def _phrase(text):
+    """Quote text as an FTS5 prefix phrase."""
+    return '"' + text.replace('"', '""') + '"*'
+
+def fts_expression(parsed):
+    """
+    Build the FTS5 MATCH expression for the text parts of a parsed query.
+
+    Returns:
+        str: The expression, or None if the query has no text parts.
+    """
+    parts = [_phrase(term) for term in parsed['terms']]
+    for predicate, column in TEXT_PREDICATES.items():
+        parts.extend(f'{column} : {_phrase(value)}' for value in parsed[predicate])
+    return ' AND '.join(parts) if parts else None
+
+def has_index(conn):
+    """Return True if the database has the device_search FTS5 table."""
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'device_search'").fetchone() is not None
+
+def refresh_index(cursor, device_ids, chunk_size=500):
+    """
+    Re-index devices inside the caller's transaction (no-op without FTS5).
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor inside an open transaction.
+        device_ids (list): Ids of devices that were inserted, updated or deleted.
+        chunk_size (int): Ids per statement.
+    """
+    if not device_ids or not has_index(cursor.connection):
+        return
+    for start in range(0, len(device_ids), chunk_size):
+        chunk = device_ids[start:start + chunk_size]
+        placeholders = ', '.join('?' * len(chunk))
+        cursor.execute(f'DELETE FROM device_search WHERE rowid IN ({placeholders})', chunk)
+        cursor.execute(f'''
+            INSERT INTO device_search (rowid, ip, hostname, os, services)
+            SELECT d.id, d.ip_address, d.hostname, d.operating_system, ({SERVICES_SQL})
+            FROM devices d WHERE d.id IN ({placeholders})
+        ''', chunk)
@@ -2,7 +2,7 @@
 REST API for Network Management Tool
 """
 
-from flask import Flask, jsonify, request
+from flask import Flask, current_app, jsonify, request
 from flask_restful import Api, Resource
 import sys
 import os
@@ -12,38 +12,36 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from modules.scanner import NetworkScanner
 from modules.manager import DeviceManager
+from utils.cache import get_inventory_cache
 from utils.database import NetworkDatabase
+from utils.ingest import get_writer
+from utils.records import encode_json
+from web.queries import device_query, scan_history_query, history_query, search_query
 
 class NetworkScannerAPI(Resource):
     """API for network scanning functionality"""
     
     def __init__(self):
         self.scanner = NetworkScanner()
-        self.database = NetworkDatabase()
+        self.writer = get_writer()
     
     def get(self, scan_type):
         """Perform a network scan"""
         try:
             if scan_type == 'local':
                 devices = self.scanner.scan_local_network()
-                # Save scan results to database
-                self.database.save_scan_results('local', devices)
+                # Queue scan results for the database
+                self.writer.submit('local', devices, save_devices=False)
                 return {'status': 'success', 'devices': devices}, 200
             elif scan_type == 'server':
                 devices = self.scanner.scan_server_network()
-                # Save scan results to database
-                self.database.save_scan_results('server', devices)
-                # Save individual devices to database
-                for device in devices:
-                    self.database.save_device(device)
+                # Queue scan results and devices for the database
+                self.writer.submit('server', devices)
                 return {'status': 'success', 'devices': devices}, 200
             elif scan_type == 'web':
                 devices = self.scanner.scan_web_server()
-                # Save scan results to database
-                self.database.save_scan_results('web', devices)
-                # Save individual devices to database
-                for device in devices:
-                    self.database.save_device(device)
+                # Queue scan results and devices for the database
+                self.writer.submit('web', devices)
                 return {'status': 'success', 'devices': devices}, 200
             else:
                 return {'status': 'error', 'message': 'Invalid scan type'}, 400
@@ -102,11 +100,7 @@ class DeviceBlockingAPI(Resource):
         """Block a device's network access"""
         try:
             # Even if device is not reachable, we should still block it
-            # Check if device is reachable (for informational purposes only)
-            if not self.manager.is_device_reachable(ip_address):
-                print(f"Device {ip_address} is not reachable, but will still be blocked")
-                # We don't return an error here - we still want to block the device
-            
+            # (the manager reports reachability without delaying the request)
             result = self.manager.block_device_network_access(ip_address)
             if result:
                 return {'status': 'success', 'message': f'Device {ip_address} has been blocked'}, 200
@@ -125,11 +119,7 @@ class DeviceUnblockingAPI(Resource):
         """Unblock a device's network access"""
         try:
             # Even if device is not reachable, we should still unblock it
-            # Check if device is reachable (for informational purposes only)
-            if not self.manager.is_device_reachable(ip_address):
-                print(f"Device {ip_address} is not reachable, but will still be unblocked")
-                # We don't return an error here - we still want to unblock the device
-            
+            # (the manager reports reachability without delaying the request)
             result = self.manager.unblock_device_network_access(ip_address)
             if result:
                 return {'status': 'success', 'message': f'Device {ip_address} has been unblocked'}, 200
@@ -138,17 +128,101 @@ class DeviceUnblockingAPI(Resource):
         except Exception as e:
             return {'status': 'error', 'message': str(e)}, 500
 
+class BlockStatsAPI(Resource):
+    """API for blocked address activity"""
+    
+    def __init__(self):
+        self.manager = DeviceManager()
+    
+    def get(self):
+        """Get blocked entries with their hit counters, most active first"""
+        try:
+            stats = self.manager.network_blocker.get_block_stats()
+            limit = request.args.get('limit', type=int)
+            if limit:
+                stats = stats[:limit]
+            return {'status': 'success', 'blocks': stats}, 200
+        except Exception as e:
+            return {'status': 'error', 'message': str(e)}, 500
+
+class BlockPruneAPI(Resource):
+    """API for pruning blocks that no longer see traffic"""
+    
+    def __init__(self):
+        self.manager = DeviceManager()
+    
+    def post(self):
+        """Unblock entries idle for at least 'idle_seconds'"""
+        try:
+            data = request.get_json(silent=True) or {}
+            idle_seconds = data.get('idle_seconds')
+            if not isinstance(idle_seconds, (int, float)) or idle_seconds <= 0:
+                return {'status': 'error', 'message': 'Positive idle_seconds required'}, 400
+            pruned = self.manager.network_blocker.prune_stale_blocks(idle_seconds)
+            return {'status': 'success', 'pruned': pruned}, 200
+        except Exception as e:
+            return {'status': 'error', 'message': str(e)}, 500
+
+class DeviceHistoryAPI(Resource):
+    """API for a device's observation history"""
+    
+    def __init__(self):
+        self.database = NetworkDatabase()
+    
+    def get(self, ip_address):
+        """Get availability, latency and open port history of a device"""
+        try:
+            query = history_query(request.args)
+            observations = self.database.observations
+            history = observations.history(ip_address, **query)
+            history['port_changes'] = observations.changes_in(history['points'])
+            history['seen'] = observations.first_seen(ip_address)
+            return {'status': 'success', 'ip': ip_address, **history}, 200
+        except ValueError as e:
+            return {'status': 'error', 'message': str(e)}, 400
+        except Exception as e:
+            return {'status': 'error', 'message': str(e)}, 500
+
 class DevicesAPI(Resource):
     """API for retrieving devices from database"""
     
+    def __init__(self):
+        self.inventory = get_inventory_cache()
+    
+    def get(self):
+        """Get one page of devices from database (see web.queries.device_query for filters)"""
+        try:
+            query = device_query(request.args)
+            etag = self.inventory.etag()
+            if request.if_none_match.contains(etag):
+                response = current_app.response_class(status=304)
+                response.set_etag(etag)
+                return response
+            devices, next_cursor = self.inventory.query_devices(**query)
+            # Encoded here so device_info blobs go out without being decoded
+            body = encode_json({'status': 'success', 'devices': devices, 'next_cursor': next_cursor})
+            response = current_app.response_class(body, mimetype='application/json')
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        except ValueError as e:
+            return {'status': 'error', 'message': str(e)}, 400
+        except Exception as e:
+            return {'status': 'error', 'message': str(e)}, 500
+
+class DeviceSearchAPI(Resource):
+    """API for searching the device inventory"""
+    
     def __init__(self):
         self.database = NetworkDatabase()
     
     def get(self):
-        """Get all devices from database"""
+        """Get devices matching a search query, best match first"""
         try:
-            devices = self.database.get_devices()
+            devices = self.database.search_devices(**search_query(request.args))
             return {'status': 'success', 'devices': devices}, 200
+        except ValueError as e:
+            return {'status': 'error', 'message': str(e)}, 400
         except Exception as e:
             return {'status': 'error', 'message': str(e)}, 500
 
@@ -159,10 +233,12 @@ class ScanHistoryAPI(Resource):
         self.database = NetworkDatabase()
     
     def get(self):
-        """Get scan history from database"""
+        """Get one page of scan history from database (see web.queries.scan_history_query)"""
         try:
-            scans = self.database.get_scan_history()
-            return {'status': 'success', 'scans': scans}, 200
+            scans, next_cursor = self.database.query_scan_history(**scan_history_query(request.args))
+            return {'status': 'success', 'scans': scans, 'next_cursor': next_cursor}, 200
+        except ValueError as e:
+            return {'status': 'error', 'message': str(e)}, 400
         except Exception as e:
             return {'status': 'error', 'message': str(e)}, 500
 
@@ -177,7 +253,11 @@ def create_api_app():
     api.add_resource(DeviceManagementAPI, '/api/device/<string:ip_address>/manage')
     api.add_resource(DeviceBlockingAPI, '/api/device/<string:ip_address>/block')
     api.add_resource(DeviceUnblockingAPI, '/api/device/<string:ip_address>/unblock')
+    api.add_resource(BlockStatsAPI, '/api/blocks')
+    api.add_resource(BlockPruneAPI, '/api/blocks/prune')
+    api.add_resource(DeviceHistoryAPI, '/api/device/<string:ip_address>/history')
     api.add_resource(DevicesAPI, '/api/devices')
+    api.add_resource(DeviceSearchAPI, '/api/devices/search')
     api.add_resource(ScanHistoryAPI, '/api/scan/history')
     
     return app
@@ -191,6 +271,8 @@ if __name__ == '__main__':
     print("  POST /api/device/<ip>/manage")
     print("  POST /api/device/<ip>/block")
     print("  POST /api/device/<ip>/unblock")
+    print("  GET  /api/blocks")
+    print("  POST /api/blocks/prune")
     print("  GET  /api/devices")
     print("  GET  /api/scan/history")
     print("Access the API at: http://localhost:5000")
@@ -11,16 +11,29 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from modules.scanner import NetworkScanner
 from modules.manager import DeviceManager
+from utils.cache import get_inventory_cache
 from utils.database import NetworkDatabase
+from utils.ingest import get_writer
+from utils.records import encode_json
+from web.queries import device_query, scan_history_query, history_query, search_query
 
-def create_app():
-    """Create and configure the Flask application."""
+def create_app(db_path='network_data.db'):
+    """
+    Create and configure the Flask application.
+    
+    Args:
+        db_path (str): Database file the app reads and writes.
+    """
     app = Flask(__name__)
     
     # Initialize the network scanner, device manager, and database
     scanner = NetworkScanner()
     manager = DeviceManager()
-    database = NetworkDatabase()
+    database = NetworkDatabase(db_path)
+    # Device listings are served from memory until the next write
+    inventory = get_inventory_cache(db_path)
+    # Scan results are written in the background, so responses don't wait on SQLite
+    writer = get_writer(db_path)
     
     @app.route('/')
     def index():
@@ -32,8 +45,8 @@ def create_app():
         """API endpoint to scan local network."""
         try:
             devices = scanner.scan_local_network()
-            # Save scan results to database
-            database.save_scan_results('local', devices)
+            # Queue scan results for the database
+            writer.submit('local', devices, save_devices=False)
             return jsonify({'status': 'success', 'devices': devices})
         except Exception as e:
             return jsonify({'status': 'error', 'message': str(e)})
@@ -43,11 +56,8 @@ def create_app():
         """API endpoint to scan server network."""
         try:
             devices = scanner.scan_server_network()
-            # Save scan results to database
-            database.save_scan_results('server', devices)
-            # Save individual devices to database
-            for device in devices:
-                database.save_device(device)
+            # Queue scan results and devices for the database
+            writer.submit('server', devices)
             return jsonify({'status': 'success', 'devices': devices})
         except Exception as e:
             return jsonify({'status': 'error', 'message': str(e)})
@@ -57,11 +67,8 @@ def create_app():
         """API endpoint to scan web server."""
         try:
             devices = scanner.scan_web_server()
-            # Save scan results to database
-            database.save_scan_results('web', devices)
-            # Save individual devices to database
-            for device in devices:
-                database.save_device(device)
+            # Queue scan results and devices for the database
+            writer.submit('web', devices)
             return jsonify({'status': 'success', 'devices': devices})
         except Exception as e:
             return jsonify({'status': 'error', 'message': str(e)})
@@ -98,11 +105,7 @@ def create_app():
         """API endpoint to block a device's network access."""
         try:
             # Even if device is not reachable, we should still block it
-            # Check if device is reachable (for informational purposes only)
-            if not manager.is_device_reachable(ip):
-                print(f"Device {ip} is not reachable, but will still be blocked")
-                # We don't return an error here - we still want to block the device
-            
+            # (the manager reports reachability without delaying the request)
             result = manager.block_device_network_access(ip)
             if result:
                 return jsonify({'status': 'success', 'message': f'Device {ip} has been blocked'})
@@ -116,11 +119,7 @@ def create_app():
         """API endpoint to unblock a device's network access."""
         try:
             # Even if device is not reachable, we should still unblock it
-            # Check if device is reachable (for informational purposes only)
-            if not manager.is_device_reachable(ip):
-                print(f"Device {ip} is not reachable, but will still be unblocked")
-                # We don't return an error here - we still want to unblock the device
-            
+            # (the manager reports reachability without delaying the request)
             result = manager.unblock_device_network_access(ip)
             if result:
                 return jsonify({'status': 'success', 'message': f'Device {ip} has been unblocked'})
@@ -129,21 +128,78 @@ def create_app():
         except Exception as e:
             return jsonify({'status': 'error', 'message': str(e)})
     
+    @app.route('/api/blocks')
+    def get_block_stats():
+        """API endpoint to get blocked entries with their hit counters, most active first."""
+        try:
+            stats = manager.network_blocker.get_block_stats()
+            limit = request.args.get('limit', type=int)
+            if limit:
+                stats = stats[:limit]
+            return jsonify({'status': 'success', 'blocks': stats})
+        except Exception as e:
+            return jsonify({'status': 'error', 'message': str(e)})
+    
+    @app.route('/api/blocks/prune', methods=['POST'])
+    def prune_blocks():
+        """API endpoint to unblock entries that have not dropped traffic for a while."""
+        try:
+            data = request.get_json(silent=True) or {}
+            idle_seconds = data.get('idle_seconds')
+            if not isinstance(idle_seconds, (int, float)) or idle_seconds <= 0:
+                return jsonify({'status': 'error', 'message': 'Positive idle_seconds required'})
+            pruned = manager.network_blocker.prune_stale_blocks(idle_seconds)
+            return jsonify({'status': 'success', 'pruned': pruned})
+        except Exception as e:
+            return jsonify({'status': 'error', 'message': str(e)})
+    
+    @app.route('/api/device/<ip>/history')
+    def get_device_history(ip):
+        """API endpoint to get availability, latency and open port history of a device."""
+        try:
+            query = history_query(request.args)
+            history = database.observations.history(ip, **query)
+            history['port_changes'] = database.observations.changes_in(history['points'])
+            history['seen'] = database.observations.first_seen(ip)
+            return jsonify({'status': 'success', 'ip': ip, **history})
+        except Exception as e:
+            return jsonify({'status': 'error', 'message': str(e)})
+    
     @app.route('/api/devices')
     def get_devices():
-        """API endpoint to get all devices from database."""
+        """API endpoint to get one page of devices from database, with optional filters."""
+        try:
+            query = device_query(request.args)
+            etag = inventory.etag()
+            if request.if_none_match.contains(etag):
+                response = app.response_class(status=304)
+            else:
+                devices, next_cursor = inventory.query_devices(**query)
+                # Encoded here so device_info blobs go out without being decoded
+                response = app.response_class(
+                    encode_json({'status': 'success', 'devices': devices, 'next_cursor': next_cursor}),
+                    mimetype='application/json')
+                response.headers['Cache-Control'] = 'no-cache'
+            response.set_etag(etag)
+            return response
+        except Exception as e:
+            return jsonify({'status': 'error', 'message': str(e)})
+    
+    @app.route('/api/devices/search')
+    def search_devices():
+        """API endpoint to search devices by text and predicates such as open:22 or os:linux."""
         try:
-            devices = database.get_devices()
+            devices = database.search_devices(**search_query(request.args))
             return jsonify({'status': 'success', 'devices': devices})
         except Exception as e:
             return jsonify({'status': 'error', 'message': str(e)})
     
     @app.route('/api/scan/history')
     def get_scan_history():
-        """API endpoint to get scan history from database."""
+        """API endpoint to get one page of scan history from database."""
         try:
-            scans = database.get_scan_history()
-            return jsonify({'status': 'success', 'scans': scans})
+            scans, next_cursor = database.query_scan_history(**scan_history_query(request.args))
+            return jsonify({'status': 'success', 'scans': scans, 'next_cursor': next_cursor})
         except Exception as e:
             return jsonify({'status': 'error', 'message': str(e)})
     
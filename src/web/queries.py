@@ -0,0 +1,118 @@
+"""
+Query parameter parsing shared by the web application and the REST API
+"""
+
+import time
+
+# Largest page either listing endpoint returns
+MAX_PAGE_SIZE = 500
+
+def _page_size(args, default):
+    """Read 'limit', capped at MAX_PAGE_SIZE."""
+    limit = args.get('limit', default, type=int)
+    if limit is None or limit <= 0:
+        raise ValueError("limit must be a positive integer")
+    return min(limit, MAX_PAGE_SIZE)
+
+def device_query(args):
+    """
+    Turn /api/devices query parameters into NetworkDatabase.query_devices arguments.
+
+    Supported parameters: limit, cursor, segment, os, port, protocol,
+    since and fields (comma-separated).
+
+    Args:
+        args (MultiDict): The request's query parameters.
+
+    Returns:
+        dict: Keyword arguments for query_devices.
+
+    Raises:
+        ValueError: If a parameter is invalid.
+    """
+    query = {
+        'limit': _page_size(args, 100),
+        'cursor': args.get('cursor'),
+        'segment': args.get('segment'),
+        'os_name': args.get('os'),
+        'protocol': args.get('protocol', 'tcp').lower(),
+        'seen_since': args.get('since'),
+    }
+    if 'port' in args:
+        port = args.get('port', type=int)
+        if port is None or not 0 < port < 65536:
+            raise ValueError("port must be between 1 and 65535")
+        query['port'] = port
+    if args.get('fields'):
+        query['fields'] = [field.strip() for field in args['fields'].split(',') if field.strip()]
+    return query
+
+def scan_history_query(args):
+    """
+    Turn /api/scan/history query parameters into NetworkDatabase.query_scan_history arguments.
+
+    Supported parameters: limit, cursor, type, since and results
+    (true to include each scan's hosts).
+
+    Args:
+        args (MultiDict): The request's query parameters.
+
+    Returns:
+        dict: Keyword arguments for query_scan_history.
+
+    Raises:
+        ValueError: If a parameter is invalid.
+    """
+    return {
+        'limit': _page_size(args, 20),
+        'cursor': args.get('cursor'),
+        'scan_type': args.get('type'),
+        'since': args.get('since'),
+        'include_results': args.get('results', '').lower() in ('1', 'true', 'yes'),
+    }
+
+def history_query(args):
+    """
+    Turn /api/device/<ip>/history query parameters into ObservationStore.history arguments.
+
+    Supported parameters: days (default 7) or since/until (epoch seconds),
+    and resolution ('raw', 'hour' or 'day'; chosen from the range by default).
+
+    Args:
+        args (MultiDict): The request's query parameters.
+
+    Returns:
+        dict: Keyword arguments for history.
+
+    Raises:
+        ValueError: If a parameter is invalid.
+    """
+    until = args.get('until', time.time(), type=float)
+    if 'since' in args:
+        since = args.get('since', type=float)
+    else:
+        days = args.get('days', 7, type=float)
+        since = until - days * 86400 if days is not None and days > 0 else None
+    if since is None or until is None or since >= until:
+        raise ValueError("since must be a number before until (or days a positive number)")
+    return {'since': since, 'until': until, 'resolution': args.get('resolution')}
+
+def search_query(args):
+    """
+    Turn /api/devices/search query parameters into NetworkDatabase.search_devices arguments.
+
+    Supported parameters: q (the search query) and limit (default 50).
+
+    Args:
+        args (MultiDict): The request's query parameters.
+
+    Returns:
+        dict: Keyword arguments for search_devices.
+
+    Raises:
+        ValueError: If a parameter is invalid.
+    """
+    text = args.get('q', '').strip()
+    if not text:
+        raise ValueError("q is required")
+    return {'query': text, 'limit': _page_size(args, 50)}
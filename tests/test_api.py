@@ -39,6 +39,45 @@ class TestAPI(unittest.TestCase):
                 self.assertIn(route, rules, f"Route {route} not found")
         except Exception as e:
             self.fail(f"Failed to check API routes: {e}")
+    
+    def test_listing_query_parameters(self):
+        """Test that listing endpoints pass paging and filter parameters to the database"""
+        from unittest.mock import patch
+        from web.api import create_api_app
+        with patch('web.api.NetworkDatabase') as mock_database, \
+                patch('web.api.get_inventory_cache') as mock_cache:
+            database = mock_database.return_value
+            inventory = mock_cache.return_value
+            inventory.etag.return_value = 'inventory-1'
+            inventory.query_devices.return_value = ([{'ip': '10.0.0.1'}], 'next-page')
+            database.query_scan_history.return_value = ([], None)
+            client = create_api_app().test_client()
+            
+            response = client.get('/api/devices?limit=5000&segment=10.0.0.0/24&port=3389&os=windows&fields=ip,os')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.get_json()['next_cursor'], 'next-page')
+            self.assertEqual(response.headers['ETag'], '"inventory-1"')
+            inventory.query_devices.assert_called_once_with(
+                limit=500, cursor=None, segment='10.0.0.0/24', os_name='windows', protocol='tcp',
+                seen_since=None, port=3389, fields=['ip', 'os'])
+            
+            client.get('/api/scan/history?type=local&results=true&cursor=abc')
+            database.query_scan_history.assert_called_once_with(
+                limit=20, cursor='abc', scan_type='local', since=None, include_results=True)
+            
+            self.assertEqual(client.get('/api/devices?port=70000').status_code, 400)
+            inventory.query_devices.side_effect = ValueError("Invalid cursor")
+            self.assertEqual(client.get('/api/devices?cursor=bad').status_code, 400)
+            
+            response = client.get('/api/devices', headers={'If-None-Match': '"inventory-1"'})
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(inventory.query_devices.call_count, 2)
+            
+            database.search_devices.return_value = [{'ip': '10.0.0.1', 'score': 1.5}]
+            response = client.get('/api/devices/search?q=ssh%20open:22')
+            self.assertEqual(response.get_json()['devices'][0]['score'], 1.5)
+            database.search_devices.assert_called_once_with(query='ssh open:22', limit=50)
+            self.assertEqual(client.get('/api/devices/search').status_code, 400)
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
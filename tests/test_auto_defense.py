@@ -0,0 +1,149 @@
+"""
+Unit tests for the auto defense module.
+"""
+
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+
+# Add the src directory to the path so we can import the modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from scapy.all import Ether, IP, TCP, UDP
+from modules.auto_defense import SourceRateTracker, AutoDefense
+from modules.scanner import NetworkScanner
+
+class TestSourceRateTracker(unittest.TestCase):
+    """Test cases for the sliding-window rate tracker."""
+
+    def test_syn_flood_reported_once_per_window(self):
+        """Test that a SYN flood is flagged at the limit and not re-reported in the window."""
+        tracker = SourceRateTracker(window=10, syn_limit=100)
+        reasons = [tracker.observe('10.0.0.5', 80, syn=True, now=1000 + i * 0.01) for i in range(150)]
+        self.assertEqual(reasons.index('syn-flood'), 99)
+        self.assertEqual(reasons.count('syn-flood'), 1)
+
+        # Normal traffic stays below the limit
+        for i in range(500):
+            self.assertIsNone(tracker.observe('10.0.0.6', 443, now=1000 + i * 0.1))
+
+    def test_sliding_window_weights_previous_window(self):
+        """Test that a burst straddling a window boundary is still detected."""
+        tracker = SourceRateTracker(window=10, packet_limit=100)
+        for i in range(80):
+            self.assertIsNone(tracker.observe('10.0.0.7', now=1009 + i * 0.01))
+        # 80 packets in the previous window, mostly still inside the sliding window
+        reasons = [tracker.observe('10.0.0.7', now=1010.5 + i * 0.01) for i in range(40)]
+        self.assertIn('flood', reasons)
+
+        # After two quiet windows the history is gone
+        self.assertIsNone(tracker.observe('10.0.0.7', now=1040))
+
+    def test_port_sweep(self):
+        """Test that touching many distinct ports is flagged as a sweep."""
+        tracker = SourceRateTracker(window=10, port_limit=50)
+        reasons = [tracker.observe('10.0.0.8', port, now=1000 + port * 0.001) for port in range(1, 200)]
+        self.assertIn('port-sweep', reasons)
+        self.assertLess(reasons.index('port-sweep'), 70)
+
+        repeat = SourceRateTracker(window=10, port_limit=50)
+        self.assertFalse(any(repeat.observe('10.0.0.9', 443, now=1000 + i * 0.001) for i in range(1000)))
+
+    def test_idle_sources_pruned_and_bounded(self):
+        """Test pruning of silent sources and the tracked-source cap."""
+        tracker = SourceRateTracker(idle_timeout=60, max_sources=3)
+        for i in range(5):
+            tracker.observe(f'10.0.1.{i}', now=1000 + i)
+        self.assertEqual(len(tracker), 3)
+        tracker.observe('10.0.1.2', now=1100)
+        self.assertEqual(tracker.prune(now=1100), 2)
+        self.assertEqual(len(tracker), 1)
+
+class TestAutoDefense(unittest.TestCase):
+    """Test cases for batched automatic blocking."""
+
+    def test_offenders_blocked_in_batches(self):
+        """Test that offenders are blocked together with a TTL, skipping allowed and blocked ones."""
+        blocker = MagicMock()
+        blocker.is_ip_blocked.side_effect = lambda ip: ip == '10.0.0.3'
+        blocker.block_many.return_value = True
+        defense = AutoDefense(blocker, SourceRateTracker(syn_limit=10), block_ttl=300,
+                              flush_interval=1.0, allowlist=['10.0.0.0/30'])
+        for i in range(20):
+            for source in ('10.0.0.1', '10.0.0.3', '10.0.0.9', '10.0.0.10'):
+                defense.observe(source, 80, True, 60, now=1000 + i * 0.01)
+        blocker.block_many.assert_not_called()
+
+        defense.observe('10.0.0.20', 80, False, 60, now=1001)
+        blocker.block_many.assert_called_once_with(['10.0.0.9', '10.0.0.10'], ttl=300)
+        self.assertEqual(defense.blocked, {'10.0.0.9': 'syn-flood', '10.0.0.10': 'syn-flood'})
+
+    def test_expired_blocks_forgotten(self):
+        """Test that sources are dropped from the blocked list once their TTL has passed."""
+        blocker = MagicMock()
+        blocker.is_ip_blocked.return_value = False
+        blocker.block_many.return_value = True
+        defense = AutoDefense(blocker, SourceRateTracker(syn_limit=5), block_ttl=300)
+        for i in range(5):
+            defense.observe('10.0.0.9', 80, True, 60, now=1000 + i * 0.01)
+        defense.flush(now=1001)
+        self.assertEqual(defense.blocked, {'10.0.0.9': 'syn-flood'})
+        defense.flush(now=1200)
+        self.assertEqual(defense.blocked, {'10.0.0.9': 'syn-flood'})
+        defense.flush(now=1301)
+        self.assertEqual(defense.blocked, {})
+
+    def test_run_never_blocks_local_addresses(self):
+        """Test that the capturing host's addresses and gateway are allowlisted."""
+        blocker = MagicMock()
+        blocker.is_ip_blocked.return_value = False
+        blocker.block_many.return_value = True
+        scanner = MagicMock()
+        scanner.get_local_addresses.return_value = ['192.0.2.2', '192.0.2.1']
+
+        def monitor(interface, duration=None, packet_callback=None):
+            for i in range(20):
+                for source in ('192.0.2.2', '192.0.2.1', '198.51.100.7'):
+                    packet_callback(source, 80, True, 60, 1000 + i * 0.01)
+            return {'packets_captured': 60}
+
+        scanner.monitor_network_traffic.side_effect = monitor
+        defense = AutoDefense(blocker, SourceRateTracker(syn_limit=10), block_ttl=300)
+        stats = defense.run(scanner, 'eth0')
+        scanner.get_local_addresses.assert_called_once_with('eth0')
+        blocker.block_many.assert_called_once_with(['198.51.100.7'], ttl=300)
+        self.assertEqual(stats['auto_blocked'], {'198.51.100.7': 'syn-flood'})
+
+    @patch('modules.scanner.conf')
+    @patch('modules.scanner.in6_getifaddr', return_value=[('fd00::2', 0, 'eth0'), ('::1', 16, 'lo')])
+    @patch('modules.scanner.get_if_addr', return_value='192.0.2.2')
+    def test_local_addresses(self, mock_addr, mock_addr6, mock_conf):
+        """Test reading an interface's addresses and the gateways routed through it."""
+        mock_conf.route.route.return_value = ('eth0', '192.0.2.2', '192.0.2.1')
+        mock_conf.route6.route.return_value = ('wlan0', 'fd01::2', 'fd01::1')
+        self.assertEqual(NetworkScanner().get_local_addresses('eth0'), ['192.0.2.2', 'fd00::2', '192.0.2.1'])
+
+    @patch('modules.scanner.sniff')
+    def test_monitor_feeds_packets_to_callback(self, mock_sniff):
+        """Test that captured packets are summarized and passed to the callback."""
+        packets = [Ether() / IP(src='10.0.0.5', dst='10.0.0.1') / TCP(dport=port, flags='S') for port in (22, 80)]
+        packets.append(Ether() / IP(src='10.0.0.6', dst='10.0.0.1') / UDP(dport=53))
+        packets.append(Ether() / IP(src='10.0.0.5', dst='10.0.0.1') / TCP(dport=80, flags='SA'))
+
+        def sniff(prn=None, **kwargs):
+            for packet in packets:
+                prn(packet)
+
+        mock_sniff.side_effect = sniff
+        callback = MagicMock()
+        stats = NetworkScanner().monitor_network_traffic('eth0', duration=1, packet_callback=callback)
+        self.assertEqual(stats['packets_captured'], 4)
+        self.assertEqual(stats['protocols'], {'TCP': 3, 'UDP': 1, 'ICMP': 0, 'Other': 0})
+        self.assertEqual(stats['top_talkers'][0]['ip'], '10.0.0.5')
+        self.assertEqual([(c.args[0], c.args[1], c.args[2]) for c in callback.call_args_list],
+                         [('10.0.0.5', 22, True), ('10.0.0.5', 80, True), ('10.0.0.6', 53, False),
+                          ('10.0.0.5', 80, False)])
+
+if __name__ == '__main__':
+    unittest.main()
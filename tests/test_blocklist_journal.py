@@ -0,0 +1,106 @@
+"""
+Unit tests for the blocklist journal module.
+"""
+
+import json
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+import tempfile
+
+# Add the src directory to the path so we can import the modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from modules.blocklist_journal import BlocklistJournal
+from modules.network_blocker import NetworkBlocker
+
+class TestBlocklistJournal(unittest.TestCase):
+    """Test cases for the BlocklistJournal class."""
+
+    def setUp(self):
+        """Set up a journal in a temporary directory."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'blocked_ips.json')
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.tmp.cleanup()
+
+    def test_legacy_list_snapshot(self):
+        """Test that the original plain-list format still loads."""
+        with open(self.path, 'w') as f:
+            json.dump(['10.0.0.1', '10.0.0.2'], f)
+        snapshot, records = BlocklistJournal(self.path).load()
+        self.assertEqual(snapshot['entries'], ['10.0.0.1', '10.0.0.2'])
+        self.assertEqual(records, [])
+
+    def test_append_replay_and_compact(self):
+        """Test journal replay after the snapshot and compaction."""
+        journal = BlocklistJournal(self.path, compact_threshold=2)
+        journal.load()
+        self.assertTrue(journal.append('block', ['10.0.0.1']))
+        self.assertFalse(journal.needs_compaction())
+        self.assertTrue(journal.append('unblock', ['10.0.0.1']))
+        self.assertTrue(journal.needs_compaction())
+
+        _, records = BlocklistJournal(self.path).load()
+        self.assertEqual([(r['seq'], r['op']) for r in records], [(1, 'block'), (2, 'unblock')])
+
+        self.assertTrue(journal.compact(['10.0.0.9']))
+        self.assertEqual(os.path.getsize(journal.journal_path), 0)
+        journal.append('block', ['10.0.0.3'])
+
+        snapshot, records = BlocklistJournal(self.path).load()
+        self.assertEqual((snapshot['seq'], snapshot['entries']), (2, ['10.0.0.9']))
+        self.assertEqual([r['seq'] for r in records], [3])
+
+    def test_records_covered_by_snapshot_are_skipped(self):
+        """Test recovery from a crash between snapshot rename and journal truncation."""
+        journal = BlocklistJournal(self.path)
+        journal.load()
+        journal.append('block', ['10.0.0.1'])
+        with open(journal.journal_path) as f:
+            stale_journal = f.read()
+        journal.compact(['10.0.0.1'])
+        with open(journal.journal_path, 'w') as f:
+            f.write(stale_journal)
+
+        snapshot, records = BlocklistJournal(self.path).load()
+        self.assertEqual(snapshot['entries'], ['10.0.0.1'])
+        self.assertEqual(records, [])
+
+    def test_torn_record_is_truncated(self):
+        """Test that a partial final line is ignored and removed."""
+        journal = BlocklistJournal(self.path)
+        journal.load()
+        journal.append('block', ['10.0.0.1'])
+        with open(journal.journal_path, 'a') as f:
+            f.write('{"seq": 2, "op": "blo')
+
+        reloaded = BlocklistJournal(self.path)
+        _, records = reloaded.load()
+        self.assertEqual(len(records), 1)
+        reloaded.append('block', ['10.0.0.2'])
+        _, records = BlocklistJournal(self.path).load()
+        self.assertEqual([r['entries'] for r in records], [['10.0.0.1'], ['10.0.0.2']])
+
+    def test_blocker_appends_instead_of_rewriting(self):
+        """Test that NetworkBlocker mutations go to the journal and survive reload."""
+        backend = MagicMock()
+        backend.check_privileges.return_value = True
+        backend.apply.return_value = True
+        blocker = NetworkBlocker(blocked_ips_file=self.path, backend=backend)
+
+        blocker.block_ip('10.0.0.0/25')
+        blocker.block_ip('10.0.0.128/25')
+        blocker.unblock_ip('10.0.0.7')
+        self.assertFalse(os.path.exists(self.path))
+
+        reloaded = NetworkBlocker(blocked_ips_file=self.path, backend=backend)
+        self.assertEqual(list(reloaded.blocked_ips), list(blocker.blocked_ips))
+        self.assertTrue(reloaded.is_ip_blocked('10.0.0.200'))
+        self.assertFalse(reloaded.is_ip_blocked('10.0.0.7'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+Unit tests for the in-memory inventory cache
+"""
+
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import sqlite3
+import tempfile
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.cache import InventoryCache
+from utils.database import NetworkDatabase
+
+class TestInventoryCache(unittest.TestCase):
+    """Test cases for read-through caching and data version invalidation"""
+
+    def setUp(self):
+        test_db_fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(test_db_fd)
+        self.db = NetworkDatabase(self.db_path)
+        self.db.save_devices([{'ip': f'10.7.0.{i}', 'os': 'Linux'} for i in range(5)])
+        self.cache = InventoryCache(self.db)
+
+    def tearDown(self):
+        self.db.close()
+        os.unlink(self.db_path)
+
+    def test_reads_served_from_memory(self):
+        """Test that repeated reads do not query the database"""
+        with patch.object(self.db, 'query_devices', wraps=self.db.query_devices) as query_devices:
+            first = self.cache.query_devices(limit=2, fields=['ip'])
+            second = self.cache.query_devices(fields=['ip'], limit=2)
+            self.cache.query_devices(limit=3, fields=['ip'])
+        self.assertIs(first, second)
+        self.assertEqual(query_devices.call_count, 2)
+        self.assertEqual(len(first[0]), 2)
+        self.assertEqual(self.cache.get_device_by_ip('10.7.0.1')['os'], 'Linux')
+        self.assertIs(self.cache.get_devices(), self.cache.get_devices())
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 4))
+
+    def test_writes_invalidate(self):
+        """Test that any committed write, from any NetworkDatabase on the file, bumps the version"""
+        etag = self.cache.etag()
+        self.assertEqual(len(self.cache.get_devices()), 5)
+        self.assertEqual(self.cache.etag(), etag)
+
+        NetworkDatabase(self.db_path).save_device({'ip': '10.7.0.9', 'os': 'Windows'})
+        self.assertNotEqual(self.cache.etag(), etag)
+        self.assertEqual(len(self.cache.get_devices()), 6)
+
+        etag = self.cache.etag()
+        self.assertFalse(self.db.delete_device('10.7.9.9'))
+        self.assertEqual(self.cache.etag(), etag)
+        self.assertTrue(self.db.delete_device('10.7.0.9'))
+        self.assertIsNone(self.cache.get_device_by_ip('10.7.0.9'))
+
+        etag = self.cache.etag()
+        self.cache.invalidate()
+        self.assertNotEqual(self.cache.etag(), etag)
+
+    def test_writes_from_other_connections_invalidate(self):
+        """Test that commits made outside NetworkDatabase, as by another process, bump the version"""
+        etag = self.cache.etag()
+        self.assertEqual(self.cache.get_device_by_ip('10.7.0.1')['os'], 'Linux')
+        self.assertEqual(self.cache.etag(), etag)
+
+        other = sqlite3.connect(self.db_path)
+        other.execute("UPDATE devices SET operating_system = 'FreeBSD' WHERE ip_address = '10.7.0.1'")
+        other.commit()
+        self.assertNotEqual(self.cache.etag(), etag)
+        self.assertEqual(self.cache.get_device_by_ip('10.7.0.1')['os'], 'FreeBSD')
+
+        # Reads, including those of the other connection, leave the version alone
+        etag = self.cache.etag()
+        other.execute('SELECT COUNT(*) FROM devices').fetchone()
+        self.assertEqual(self.cache.etag(), etag)
+        other.close()
+
+    def test_result_of_racing_write_not_stored(self):
+        """Test that a result loaded while a write commits is not cached"""
+        get_devices = self.db.get_devices
+
+        def write_during_read():
+            devices = get_devices()
+            self.db.save_device({'ip': '10.7.0.10'})
+            return devices
+
+        with patch.object(self.db, 'get_devices', side_effect=write_during_read):
+            self.assertEqual(len(self.cache.get_devices()), 5)
+        self.assertEqual(len(self.cache.get_devices()), 6)
+
+    def test_least_recently_used_evicted(self):
+        """Test that the cache holds at most max_entries results"""
+        cache = InventoryCache(self.db, max_entries=2)
+        for i in range(4):
+            cache.get_device_by_ip(f'10.7.0.{i}')
+        self.assertEqual(len(cache._entries), 2)
+        self.assertIn(('device', '10.7.0.3'), cache._entries)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+"""
+Unit tests for the BatchCommandRunner module.
+"""
+
+import io
+import subprocess
+import sys
+import os
+import unittest
+
+# Add the src directory to the path so we can import the modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from modules.command_batch import BatchCommandRunner
+
+class LocalShellClient:
+    """SSH client stand-in that runs exec commands in a local shell."""
+
+    def __init__(self):
+        self.exec_count = 0
+
+    def exec_command(self, command, timeout=None):
+        self.exec_count += 1
+        client = self
+
+        class Channel:
+            def shutdown_write(self):
+                client.stdout = io.BytesIO(subprocess.run(command, shell=True, input=client.script,
+                                                          capture_output=True).stdout)
+
+            def recv_exit_status(self):
+                return 0
+
+        class Stdin:
+            channel = Channel()
+
+            def write(self, data):
+                client.script = data.encode()
+
+            def flush(self):
+                pass
+
+        class Stdout:
+            channel = Channel()
+
+            def read(self):
+                return client.stdout.read()
+
+        return Stdin(), Stdout(), None
+
+@unittest.skipIf(sys.platform == 'win32', "requires a POSIX shell")
+class TestBatchCommandRunner(unittest.TestCase):
+    """Test cases for the BatchCommandRunner class."""
+
+    def setUp(self):
+        """Set up a runner over a local shell."""
+        self.client = LocalShellClient()
+        self.runner = BatchCommandRunner(self.client)
+
+    def test_run_splits_output_and_status(self):
+        """Test per-command output and exit status from one channel."""
+        results = self.runner.run(["echo first", "echo oops >&2; exit 3", "printf 'a\\nb'"])
+
+        self.assertEqual(self.client.exec_count, 1)
+        self.assertEqual([result['exit_status'] for result in results], [0, 3, 0])
+        self.assertEqual(results[0]['output'], 'first\n')
+        self.assertEqual(results[1]['output'], 'oops\n')
+        self.assertEqual(results[2]['output'], 'a\nb')
+
+    def test_stop_on_error(self):
+        """Test that later commands do not run after a failure."""
+        results = self.runner.run(["true", "false", "echo never"], stop_on_error=True)
+
+        self.assertEqual([result['exit_status'] for result in results], [0, 1, None])
+        self.assertEqual(results[2]['output'], '')
+
+    def test_commands_cannot_consume_script(self):
+        """Test that a command reading stdin does not swallow later commands."""
+        results = self.runner.run(["cat", "echo after"])
+
+        self.assertEqual(results[1]['output'], 'after\n')
+
+    def test_sudo_is_authenticated_once(self):
+        """Test the sudo preamble and per-command sudo wrapping."""
+        runner = BatchCommandRunner(self.client, sudo_password="p'w")
+        script = runner.build_script(["ip link", ("ip link set eth0 down", True)], 'tok')
+
+        self.assertEqual(script.count('sudo -S'), 1)
+        self.assertIn("'p'\"'\"'w'", script)
+        self.assertIn("sudo -n sh -c 'ip link set eth0 down'", script)
+        self.assertNotIn("sudo -n sh -c 'ip link'", script)
+
+if __name__ == '__main__':
+    unittest.main()
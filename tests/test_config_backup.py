@@ -0,0 +1,153 @@
+"""
+Unit tests for the configuration backup module.
+"""
+
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+# Add the src directory to the path so we can import the modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from modules.config_backup import ConfigBackupStore
+from modules.manager import DeviceManager
+
+class FakeRemoteFile(io.BytesIO):
+    """In-memory stand-in for a paramiko SFTPFile."""
+
+    def __init__(self, files, path, mode):
+        super().__init__(files.get(path, b'') if 'r' in mode else b'')
+        self.files, self.path, self.mode = files, path, mode
+
+    def prefetch(self):
+        pass
+
+    def set_pipelined(self, pipelined=True):
+        pass
+
+    def close(self):
+        if 'w' in self.mode:
+            self.files[self.path] = self.getvalue()
+        super().close()
+
+class FakeSFTP:
+    """In-memory stand-in for a paramiko SFTPClient."""
+
+    def __init__(self, files):
+        self.files = files
+        self.opened = []
+
+    def stat(self, path):
+        if path not in self.files:
+            raise IOError(f"No such file: {path}")
+        return MagicMock(st_size=len(self.files[path]), st_mtime=1700000000)
+
+    def open(self, path, mode='rb'):
+        if 'r' in mode and path not in self.files:
+            raise IOError(f"No such file: {path}")
+        self.opened.append((path, mode))
+        return FakeRemoteFile(self.files, path, mode)
+
+    def posix_rename(self, old, new):
+        self.files[new] = self.files.pop(old)
+
+    def close(self):
+        pass
+
+class TestConfigBackupStore(unittest.TestCase):
+    """Test cases for the ConfigBackupStore class."""
+
+    def setUp(self):
+        """Create a temporary store."""
+        self.root = tempfile.mkdtemp()
+        self.store = ConfigBackupStore(self.root, codec='gzip')
+
+    def tearDown(self):
+        """Remove the temporary store."""
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def _object_count(self):
+        return sum(len(files) for _, _, files in os.walk(self.store.objects_dir))
+
+    def test_identical_content_is_stored_once(self):
+        """Test that identical content is deduplicated."""
+        digest1, size1 = self.store.put_stream([b'hostname router1\n', b'interface eth0\n'])
+        digest2, size2 = self.store.put_stream([b'hostname router1\ninterface eth0\n'])
+
+        self.assertEqual(digest1, digest2)
+        self.assertEqual(size1, size2)
+        self.assertEqual(self._object_count(), 1)
+
+    def test_round_trip(self):
+        """Test that stored content streams back unchanged."""
+        content = os.urandom(200000)
+        digest, _ = self.store.put_stream([content[i:i + 4096] for i in range(0, len(content), 4096)])
+
+        self.assertEqual(b''.join(self.store.iter_object(digest)), content)
+
+    def test_manifests(self):
+        """Test saving and listing manifests."""
+        self.assertIsNone(self.store.latest_manifest('10.0.0.1'))
+        path = self.store.save_manifest('10.0.0.1', {'/etc/hosts': {'sha256': 'ab' * 32, 'size': 3}})
+
+        self.assertEqual(self.store.list_manifests('10.0.0.1'), [path])
+        self.assertEqual(self.store.latest_manifest('10.0.0.1')['device'], '10.0.0.1')
+
+class TestDeviceManagerBackup(unittest.TestCase):
+    """Test cases for DeviceManager configuration backup and restore."""
+
+    def setUp(self):
+        """Set up a manager with a fake pooled SFTP session."""
+        self.root = tempfile.mkdtemp()
+        self.manager = DeviceManager()
+        self.manager._backup_store = ConfigBackupStore(self.root, codec='gzip')
+        self.remote_files = {'/etc/hosts': b'127.0.0.1 localhost\n', '/etc/hostname': b'router1\n'}
+        self.sftp = FakeSFTP(self.remote_files)
+        self.client = MagicMock()
+        self.client.open_sftp.return_value = self.sftp
+        self.connect = MagicMock(return_value=self.client)
+        self.manager.ssh_pool._connect = self.connect
+
+    def tearDown(self):
+        """Remove the temporary store."""
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_backup_and_restore(self):
+        """Test backing up and restoring over one pooled session."""
+        manifest_path = self.manager.backup_device_configuration(
+            '10.0.0.1', 'admin', password='secret', config_paths=['/etc/hosts', '/etc/hostname', '/etc/missing'])
+
+        self.assertIsNotNone(manifest_path)
+        manifest = self.manager._backup_store.load_manifest(manifest_path)
+        self.assertEqual(sorted(manifest['files']), ['/etc/hostname', '/etc/hosts'])
+
+        self.remote_files['/etc/hosts'] = b'corrupted\n'
+        self.assertTrue(self.manager.restore_device_configuration('10.0.0.1', 'admin', manifest_path,
+                                                                  password='secret'))
+        self.assertEqual(self.remote_files['/etc/hosts'], b'127.0.0.1 localhost\n')
+        self.connect.assert_called_once()
+
+    def test_backup_does_not_apply_retention(self):
+        """Test that a backup records drift without scanning the whole store."""
+        with patch('modules.config_drift.ConfigDriftEngine.apply_retention') as mock_retention:
+            self.assertIsNotNone(self.manager.backup_device_configuration(
+                '10.0.0.1', 'admin', password='secret', config_paths=['/etc/hosts']))
+        mock_retention.assert_not_called()
+        self.assertEqual(len(self.manager._get_drift_engine().history('10.0.0.1', '/etc/hosts')), 1)
+
+    def test_unchanged_files_are_not_transferred(self):
+        """Test that files matching the previous backup are skipped."""
+        self.manager.backup_device_configuration('10.0.0.1', 'admin', password='secret',
+                                                 config_paths=['/etc/hosts'])
+        self.sftp.opened.clear()
+
+        self.manager.backup_device_configuration('10.0.0.1', 'admin', password='secret',
+                                                 config_paths=['/etc/hosts'])
+        self.assertEqual(self.sftp.opened, [])
+
+if __name__ == '__main__':
+    unittest.main()
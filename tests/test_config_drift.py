@@ -0,0 +1,129 @@
+"""
+Unit tests for the configuration drift module.
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+
+# Add the src directory to the path so we can import the modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from modules.config_backup import ConfigBackupStore
+from modules.config_drift import ConfigDriftEngine
+
+CONFIG_V1 = """hostname router1
+interface Gi0/1
+ ip address 10.0.0.1 255.255.255.0
+ no shutdown
+interface Gi0/2
+ shutdown
+"""
+
+CONFIG_V2 = CONFIG_V1.replace(" ip address 10.0.0.1", " ip address 10.0.0.9")
+
+class TestConfigDriftEngine(unittest.TestCase):
+    """Test cases for the ConfigDriftEngine class."""
+
+    def setUp(self):
+        """Create a temporary backup store and drift engine."""
+        self.root = tempfile.mkdtemp()
+        self.store = ConfigBackupStore(self.root, codec='gzip')
+        self.engine = ConfigDriftEngine(self.store, keyframe_interval=3)
+
+    def tearDown(self):
+        """Remove the temporary store."""
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def _record(self, device, content, created):
+        digest, _ = self.store.put_stream([content.encode()])
+        return self.engine.record_file(device, 'running-config', digest, created)
+
+    def test_delta_round_trip(self):
+        """Test that applying a computed delta reproduces the new version."""
+        old, new = CONFIG_V1.splitlines(), CONFIG_V2.splitlines() + ['banner motd hi']
+        delta = ConfigDriftEngine.compute_delta(old, new)
+        self.assertEqual(ConfigDriftEngine.apply_delta(old, delta), new)
+
+    def test_unchanged_content_is_not_recorded(self):
+        """Test that re-recording identical content adds no revision."""
+        self.assertEqual(self._record('10.0.0.1', CONFIG_V1, '2024-01-01T00:00:00+00:00'), 1)
+        self.assertIsNone(self._record('10.0.0.1', CONFIG_V1, '2024-01-02T00:00:00+00:00'))
+
+    def test_changed_devices_by_section(self):
+        """Test looking up devices that changed a section since a date."""
+        for device in ('10.0.0.1', '10.0.0.2'):
+            self._record(device, CONFIG_V1, '2024-01-01T00:00:00+00:00')
+        self._record('10.0.0.1', CONFIG_V2, '2024-02-01T00:00:00+00:00')
+
+        changes = self.engine.changed_devices('interface Gi0/1', since='2024-01-15T00:00:00+00:00')
+        self.assertEqual([change['device'] for change in changes], ['10.0.0.1'])
+        self.assertEqual(self.engine.changed_devices('interface Gi0/2', since='2024-01-15T00:00:00+00:00'), [])
+        self.assertEqual(len(self.engine.changed_devices('interface*', since='2024-01-15T00:00:00+00:00')), 1)
+
+    def test_keyframes_and_reconstruction(self):
+        """Test that revisions are rebuilt correctly across keyframes."""
+        contents = [CONFIG_V1 + f"ntp server 10.0.0.{i}\n" for i in range(7)]
+        for i, content in enumerate(contents):
+            self._record('10.0.0.1', content, f'2024-01-0{i + 1}T00:00:00+00:00')
+
+        kinds = [revision['kind'] for revision in self.engine.history('10.0.0.1', 'running-config')]
+        self.assertEqual(kinds, ['full', 'delta', 'delta', 'full', 'delta', 'delta', 'full'])
+        for version, content in enumerate(contents, start=1):
+            self.assertEqual(self.engine.get_revision('10.0.0.1', 'running-config', version),
+                             content.splitlines())
+
+    def test_prune_keeps_history_reconstructible(self):
+        """Test that pruning rebases the chain on a full snapshot."""
+        contents = [CONFIG_V1 + f"ntp server 10.0.0.{i}\n" for i in range(5)]
+        for i, content in enumerate(contents):
+            self._record('10.0.0.1', content, f'2024-01-0{i + 1}T00:00:00+00:00')
+
+        removed = self.engine.prune('2024-01-03T12:00:00+00:00')
+        self.assertEqual(removed, 2)
+        history = self.engine.history('10.0.0.1', 'running-config')
+        self.assertEqual([revision['version'] for revision in history], [3, 4, 5])
+        self.assertEqual(self.engine.get_revision('10.0.0.1', 'running-config', 5), contents[4].splitlines())
+
+    def _save_manifest(self, device, content, created):
+        """Store content and write a manifest dated 'created', with the object as old as it."""
+        digest, size = self.store.put_stream([content.encode()])
+        os.utime(self.store.find_object(digest)[0], (created.timestamp(), created.timestamp()))
+        device_dir = self.store._device_dir(device)
+        os.makedirs(device_dir, exist_ok=True)
+        with open(os.path.join(device_dir, created.strftime("%Y%m%dT%H%M%S%fZ") + ".json"), 'w') as f:
+            json.dump({'device': device, 'created': created.isoformat(),
+                       'files': {'running-config': {'sha256': digest, 'size': size}}}, f)
+        return digest
+
+    def test_retention_prunes_history_and_backups(self):
+        """Test that ingesting applies the retention period to the history and the store."""
+        engine = ConfigDriftEngine(self.store, keyframe_interval=3, retention_days=30)
+        now = datetime.now(timezone.utc)
+        contents = [CONFIG_V1 + f"ntp server 10.0.0.{i}\n" for i in range(3)]
+        digests = [self._save_manifest('10.0.0.1', content, now - timedelta(days=days))
+                   for content, days in zip(contents, (100, 60, 1))]
+        # An old object that a backup in progress stores again is not collected
+        reused, _ = self.store.put_stream([b'reused'])
+        os.utime(self.store.find_object(reused)[0], (0, 0))
+        self.store.put_stream([b'reused'])
+
+        self.assertEqual(engine.sync(), 3)
+        history = engine.history('10.0.0.1', 'running-config')
+        self.assertEqual([revision['version'] for revision in history], [2, 3])
+        self.assertEqual(engine.get_revision('10.0.0.1', 'running-config', 3), contents[2].splitlines())
+        self.assertEqual(len(self.store.list_manifests('10.0.0.1')), 2)
+        self.assertIsNone(self.store.find_object(digests[0]))
+        self.assertIsNotNone(self.store.find_object(digests[1]))
+        self.assertIsNotNone(self.store.find_object(digests[2]))
+        self.assertIsNotNone(self.store.find_object(reused))
+
+        # A later ingest with nothing past the cutoff changes nothing
+        self.assertEqual(engine.apply_retention(), {'manifests': 0, 'objects': 0, 'revisions': 0})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,6 +8,8 @@ import os
 import tempfile
 import json
 import sqlite3
+import threading
+from unittest.mock import patch
 
 # Add the src directory to the path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
@@ -163,5 +165,244 @@ class TestDatabase(unittest.TestCase):
         except Exception as e:
             self.fail(f"Failed to retrieve scan history: {e}")
 
+    def test_connection_reuse_and_pragmas(self):
+        """Test that connections are long-lived, in WAL mode and versioned"""
+        test_db_fd, test_db_path = tempfile.mkstemp(suffix='.db')
+        os.close(test_db_fd)
+        
+        from utils.database import NetworkDatabase
+        from utils.migrations import SCHEMA_VERSION
+        db = NetworkDatabase(test_db_path)
+        conn = db._connection()
+        self.assertIs(NetworkDatabase(test_db_path)._connection(), conn)
+        self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        self.assertEqual(conn.execute('PRAGMA synchronous').fetchone()[0], 1)
+        self.assertEqual(conn.execute('PRAGMA user_version').fetchone()[0], SCHEMA_VERSION)
+        
+        # A missing device no longer leaks a connection
+        self.assertIsNone(db.get_device_by_ip('10.9.9.9'))
+        
+        # Other threads get their own connection
+        connections = []
+        thread = threading.Thread(target=lambda: connections.append(db._connection()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(connections[0], conn)
+        db.close()
+    
+    def test_readers_not_blocked_by_writer(self):
+        """Test that a reader sees committed data while another connection is writing"""
+        test_db_fd, test_db_path = tempfile.mkstemp(suffix='.db')
+        os.close(test_db_fd)
+        
+        from utils.database import NetworkDatabase
+        db = NetworkDatabase(test_db_path)
+        db.save_device({'ip': '192.168.1.100'})
+        
+        writer = sqlite3.connect(test_db_path)
+        writer.execute('BEGIN IMMEDIATE')
+        writer.execute("INSERT INTO devices (ip_address) VALUES ('192.168.1.101')")
+        try:
+            self.assertEqual([d['ip'] for d in db.get_devices()], ['192.168.1.100'])
+        finally:
+            writer.rollback()
+            writer.close()
+    
+    def test_schema_version_check(self):
+        """Test that an up-to-date schema is not re-created and old databases are upgraded"""
+        test_db_fd, test_db_path = tempfile.mkstemp(suffix='.db')
+        os.close(test_db_fd)
+        
+        from utils.database import NetworkDatabase
+        from utils.migrations import SCHEMA_VERSION
+        legacy = sqlite3.connect(test_db_path)
+        legacy.execute('CREATE TABLE devices (id INTEGER PRIMARY KEY AUTOINCREMENT, ip_address TEXT UNIQUE NOT NULL, '
+                       'mac_address TEXT, hostname TEXT, operating_system TEXT, '
+                       'scan_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, device_info TEXT)')
+        legacy.execute("INSERT INTO devices (ip_address) VALUES ('192.168.1.5')")
+        legacy.commit()
+        legacy.close()
+        
+        db = NetworkDatabase(test_db_path)
+        self.assertEqual(db._connection().execute('PRAGMA user_version').fetchone()[0], SCHEMA_VERSION)
+        self.assertEqual([d['ip'] for d in db.get_devices()], ['192.168.1.5'])
+        self.assertEqual(db.get_scan_history(), [])
+        db.close()
+
+    def test_bulk_upsert_keeps_ids_stable(self):
+        """Test that save_devices upserts devices and ports in place"""
+        test_db_fd, test_db_path = tempfile.mkstemp(suffix='.db')
+        os.close(test_db_fd)
+        
+        from utils.database import NetworkDatabase
+        db = NetworkDatabase(test_db_path)
+        devices = [{'ip': f'10.0.{i // 256}.{i % 256}', 'hostname': f'host{i}',
+                    'ports': [{'port': 22, 'service': 'ssh', 'version': ''}]} for i in range(2000)]
+        ids = db.save_devices(devices)
+        self.assertEqual(len(ids), 2000)
+        
+        # Rescan: the same ids, updated fields, replaced port lists
+        devices[0]['hostname'] = 'renamed'
+        devices[0]['ports'] = [{'port': 80, 'service': 'http', 'version': 'nginx'},
+                               {'port': 80, 'service': 'http', 'version': 'nginx 1.25'}]
+        del devices[1]['ports']
+        self.assertEqual(db.save_devices(devices[:2]), {ip: ids[ip] for ip in ('10.0.0.0', '10.0.0.1')})
+        self.assertEqual(db.get_device_by_ip('10.0.0.0')['hostname'], 'renamed')
+        self.assertEqual([(p['port'], p['version']) for p in db.get_device_ports(ids['10.0.0.0'])],
+                         [(80, 'nginx 1.25')])
+        self.assertEqual(len(db.get_device_ports(ids['10.0.0.1'])), 1)
+        self.assertEqual(db.save_device({'ip': '10.0.0.2'}), ids['10.0.0.2'])
+        
+        # One invalid device means nothing is written
+        with self.assertRaises(ValueError):
+            db.save_devices([{'ip': '10.9.0.1'}, {'hostname': 'no-ip'}])
+        self.assertIsNone(db.get_device_by_ip('10.9.0.1'))
+        db.close()
+    
+    def test_upgrade_removes_duplicate_ports(self):
+        """Test that upgrading a version 1 database dedupes ports and adds the unique index"""
+        test_db_fd, test_db_path = tempfile.mkstemp(suffix='.db')
+        os.close(test_db_fd)
+        
+        from utils.database import NetworkDatabase
+        legacy = sqlite3.connect(test_db_path)
+        legacy.execute('CREATE TABLE devices (id INTEGER PRIMARY KEY AUTOINCREMENT, ip_address TEXT UNIQUE NOT NULL, '
+                       'mac_address TEXT, hostname TEXT, operating_system TEXT, '
+                       'scan_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, device_info TEXT)')
+        legacy.execute('CREATE TABLE ports (id INTEGER PRIMARY KEY AUTOINCREMENT, device_id INTEGER, '
+                       'port_number INTEGER, service TEXT, version TEXT)')
+        legacy.execute('CREATE TABLE scan_results (id INTEGER PRIMARY KEY AUTOINCREMENT, scan_type TEXT NOT NULL, '
+                       'scan_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, results TEXT)')
+        legacy.execute("INSERT INTO devices (id, ip_address) VALUES (7, '192.168.1.5')")
+        legacy.executemany('INSERT INTO ports (device_id, port_number, service) VALUES (?, ?, ?)',
+                           [(7, 22, 'old'), (7, 22, 'ssh'), (3, 80, 'orphan')])
+        legacy.execute('PRAGMA user_version = 1')
+        legacy.commit()
+        legacy.close()
+        
+        db = NetworkDatabase(test_db_path)
+        self.assertEqual([p['service'] for p in db.get_device_ports(7)], ['ssh'])
+        self.assertEqual(db.get_device_ports(3), [])
+        db.close()
+    
+    def test_upgrade_normalizes_scan_results(self):
+        """Test that upgrading a version 2 database adds protocols and moves result blobs into rows"""
+        test_db_fd, test_db_path = tempfile.mkstemp(suffix='.db')
+        os.close(test_db_fd)
+        
+        from utils.database import NetworkDatabase
+        from utils.migrations import MIGRATIONS, SCHEMA_VERSION, migrate, main
+        legacy = sqlite3.connect(test_db_path)
+        migrate(legacy, target=2)
+        legacy.execute("INSERT INTO devices (id, ip_address) VALUES (1, '10.1.0.1')")
+        legacy.execute("INSERT INTO ports (device_id, port_number, service) VALUES (1, 3389, 'rdp')")
+        hosts = [{'ip': '10.1.0.1', 'mac': 'aa:bb', 'vendor': 'Acme',
+                  'ports': [{'port': 3389, 'service': 'rdp', 'version': '10'}]}]
+        legacy.executemany('INSERT INTO scan_results (scan_type, results) VALUES (?, ?)',
+                           [('local', json.dumps(hosts)), ('traffic', json.dumps({'packets': 5}))])
+        legacy.commit()
+        legacy.close()
+        
+        with patch('sys.stdout'):
+            self.assertEqual(main([test_db_path]), 0)
+        self.assertTrue(os.path.exists(test_db_path + '.v2.bak'))
+        
+        db = NetworkDatabase(test_db_path)
+        conn = db._connection()
+        self.assertEqual(conn.execute('PRAGMA user_version').fetchone()[0], SCHEMA_VERSION)
+        self.assertEqual(SCHEMA_VERSION, MIGRATIONS[-1][0])
+        self.assertEqual(db.get_device_ports(1)[0]['protocol'], 'tcp')
+        self.assertEqual(conn.execute('SELECT results FROM scan_results ORDER BY id').fetchall(),
+                         [(None,), ('{"packets": 5}',)])
+        
+        history = {scan['scan_type']: scan['results'] for scan in db.get_scan_history()}
+        self.assertEqual(history['traffic'], {'packets': 5})
+        self.assertEqual(history['local'], [{'ip': '10.1.0.1', 'mac': 'aa:bb', 'hostname': None, 'os': None,
+                                             'vendor': 'Acme', 'ports': [{'port': 3389, 'protocol': 'tcp',
+                                                                          'service': 'rdp', 'version': '10'}]}])
+        db.close()
+    
+    def test_open_port_query_uses_index(self):
+        """Test finding hosts by open port, per protocol, through an index"""
+        from utils.database import NetworkDatabase
+        db = NetworkDatabase(':memory:')
+        db.save_devices([
+            {'ip': '10.2.0.1', 'ports': [{'port': 3389, 'service': 'rdp'}, {'port': 53, 'protocol': 'udp'}]},
+            {'ip': '10.2.0.2', 'ports': [{'port': 53, 'service': 'dns'}]},
+            {'ip': '10.2.0.3', 'ports': [{'port': 3389, 'protocol': 'tcp', 'service': 'ms-wbt'}]},
+        ])
+        
+        self.assertEqual([(h['ip'], h['service']) for h in db.get_hosts_with_open_port(3389)],
+                         [('10.2.0.1', 'rdp'), ('10.2.0.3', 'ms-wbt')])
+        self.assertEqual([h['ip'] for h in db.get_hosts_with_open_port(53, 'udp')], ['10.2.0.1'])
+        
+        plan = ' '.join(row[3] for row in db._connection().execute(
+            'EXPLAIN QUERY PLAN SELECT device_id FROM ports WHERE port_number = 3389 AND protocol = ?', ('tcp',)))
+        self.assertIn('idx_ports_port', plan)
+        
+        # The same port may be open on both protocols, and deleting a device removes its ports
+        self.assertEqual(len(db.get_device_ports(db.get_device_by_ip('10.2.0.1')['id'])), 2)
+        self.assertTrue(db.delete_device('10.2.0.1'))
+        self.assertEqual(db._connection().execute('SELECT COUNT(*) FROM ports').fetchone()[0], 2)
+        db.close()
+    
+    def test_query_devices_pages_and_filters(self):
+        """Test keyset pagination, filters and projection of query_devices"""
+        from utils.database import NetworkDatabase
+        db = NetworkDatabase(':memory:')
+        db.save_devices([{'ip': f'10.3.{i // 10}.{i % 10}', 'os': 'Linux' if i % 2 else 'Windows 10',
+                          'ports': [{'port': 3389}] if i % 5 == 0 else []} for i in range(40)])
+        conn = db._connection()
+        conn.execute("UPDATE devices SET scan_timestamp = '2026-01-01 00:00:00' WHERE ip_address LIKE '10.3.3.%'")
+        conn.commit()
+        
+        pages, cursor = [], None
+        while True:
+            page, cursor = db.query_devices(limit=15, cursor=cursor, fields=['ip'])
+            pages.append(page)
+            if cursor is None:
+                break
+        ips = [device['ip'] for page in pages for device in page]
+        self.assertEqual([len(page) for page in pages], [15, 15, 10])
+        self.assertEqual(len(set(ips)), 40)
+        self.assertEqual(pages[0][0], {'ip': '10.3.2.9'})
+        self.assertTrue(all(ip.startswith('10.3.3.') for ip in ips[-10:]))
+        
+        segment, _ = db.query_devices(segment='10.3.1.0/28', fields=['ip'])
+        self.assertEqual(sorted(d['ip'] for d in segment), [f'10.3.1.{i}' for i in range(10)])
+        segment, _ = db.query_devices(segment='10.3.0.4/30', fields=['ip'])
+        self.assertEqual(sorted(d['ip'] for d in segment), ['10.3.0.4', '10.3.0.5', '10.3.0.6', '10.3.0.7'])
+        
+        windows_rdp, _ = db.query_devices(os_name='windows', port=3389, seen_since='2026-06-01')
+        self.assertEqual(sorted(d['ip'] for d in windows_rdp), ['10.3.0.0', '10.3.1.0', '10.3.2.0'])
+        self.assertEqual(set(windows_rdp[0]), {'id', 'ip', 'mac', 'hostname', 'os', 'scan_timestamp', 'device_info'})
+        self.assertEqual(windows_rdp[0]['device_info']['os'], 'Windows 10')
+        
+        with self.assertRaises(ValueError):
+            db.query_devices(fields=['ip', 'password'])
+        with self.assertRaises(ValueError):
+            db.query_devices(cursor='not-a-cursor')
+        db.close()
+    
+    def test_query_scan_history_pages_without_results(self):
+        """Test that scan history pages only load results on request"""
+        from utils.database import NetworkDatabase
+        db = NetworkDatabase(':memory:')
+        for i in range(5):
+            db.save_scan_results('local' if i % 2 else 'server', [{'ip': f'10.4.0.{n}'} for n in range(i)])
+        db.save_scan_results('traffic', {'packets': 10})
+        
+        scans, cursor = db.query_scan_history(limit=4)
+        self.assertEqual([(s['scan_type'], s['host_count']) for s in scans],
+                         [('traffic', None), ('server', 4), ('local', 3), ('server', 2)])
+        self.assertNotIn('results', scans[0])
+        scans, cursor = db.query_scan_history(limit=4, cursor=cursor, include_results=True)
+        self.assertIsNone(cursor)
+        self.assertEqual([len(s['results']) for s in scans], [1, 0])
+        
+        scans, _ = db.query_scan_history(scan_type='local', include_results=True)
+        self.assertEqual([s['results'][-1]['ip'] for s in scans], ['10.4.0.2', '10.4.0.0'])
+        db.close()
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
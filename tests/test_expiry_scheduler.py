@@ -0,0 +1,192 @@
+"""
+Unit tests for the expiry scheduler module and time-limited blocks.
+"""
+
+import threading
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+import tempfile
+
+# Add the src directory to the path so we can import the modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from modules.expiry_scheduler import ExpiryScheduler
+from modules.firewall_backends import PfBackend
+from modules.network_blocker import NetworkBlocker
+
+class TestExpiryScheduler(unittest.TestCase):
+    """Test cases for the ExpiryScheduler class."""
+
+    def test_pop_due_skips_superseded(self):
+        """Test that rescheduled and cancelled keys are handled lazily."""
+        scheduler = ExpiryScheduler(lambda keys: [], batch_window=0)
+        scheduler.schedule('a', 100)
+        scheduler.schedule('b', 50)
+        scheduler.schedule('a', 300)
+        scheduler.schedule('c', 60)
+        scheduler.cancel('c')
+
+        self.assertEqual(scheduler.pop_due(now=200), ['b'])
+        self.assertEqual(scheduler.pending(), {'a': 300})
+        self.assertEqual(scheduler.pop_due(now=300), ['a'])
+
+    def test_background_batches_and_retry(self):
+        """Test that one thread fires due keys in a batch and retries failures."""
+        batches = []
+        fired = threading.Event()
+
+        def callback(keys):
+            batches.append(sorted(keys))
+            fired.set()
+            return ['y'] if len(batches) == 1 else []
+
+        scheduler = ExpiryScheduler(callback, retry_interval=0.05, batch_window=0.5)
+        now = time.time()
+        scheduler.schedule('x', now + 0.05)
+        scheduler.schedule('y', now + 0.1)
+        scheduler.schedule('later', now + 3600)
+        scheduler.start()
+        try:
+            self.assertTrue(fired.wait(2))
+            deadline = time.time() + 2
+            while len(batches) < 2 and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            scheduler.stop()
+
+        self.assertEqual(batches, [['x', 'y'], ['y']])
+        self.assertEqual(scheduler.pending(), {'later': now + 3600})
+
+class TestTimeLimitedBlocks(unittest.TestCase):
+    """Test cases for NetworkBlocker TTL blocks."""
+
+    def setUp(self):
+        """Set up a blocker with a mocked firewall backend."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'blocked_ips.json')
+        self.backend = MagicMock()
+        self.backend.check_privileges.return_value = True
+        self.backend.apply.return_value = True
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.tmp.cleanup()
+
+    def make_blocker(self):
+        return NetworkBlocker(blocked_ips_file=self.path, backend=self.backend)
+
+    @patch('modules.network_blocker.ExpiryScheduler.start')
+    def test_expiry_survives_restart(self, mock_start):
+        """Test that expiry times are persisted and expired blocks are not restored."""
+        blocker = self.make_blocker()
+        self.assertTrue(blocker.block_many(['10.0.0.1', '10.0.0.2'], ttl=60))
+        self.assertTrue(blocker.block_ip('10.0.0.3'))
+        expiry = blocker.get_block_expiry('10.0.0.1')
+        self.assertIsNotNone(expiry)
+        self.assertIsNone(blocker.get_block_expiry('10.0.0.3'))
+
+        # A permanent block of a time-limited entry ends its expiry
+        self.assertTrue(blocker.block_ip('10.0.0.2'))
+        self.assertIsNone(blocker.get_block_expiry('10.0.0.2'))
+
+        blocker._save_blocked_ips()
+        reloaded = self.make_blocker()
+        self.assertEqual(reloaded.get_block_expiry('10.0.0.1'), expiry)
+
+        self.backend.reconcile.return_value = ([], [])
+        with patch('modules.expiry_scheduler.time.time', return_value=expiry + 1):
+            self.assertTrue(reloaded.restore_blocked_ips())
+        self.assertFalse(reloaded.is_ip_blocked('10.0.0.1'))
+        self.assertTrue(reloaded.is_ip_blocked('10.0.0.2'))
+        self.backend.reconcile.assert_called_once_with(['10.0.0.2/31'])
+
+    @patch('modules.network_blocker.ExpiryScheduler.start')
+    @patch('modules.firewall_backends.subprocess.run')
+    def test_ttl_block_not_in_startup_script(self, mock_run, mock_start):
+        """Test that the startup script is rebuilt from the permanent blocks only."""
+        mock_run.return_value = MagicMock(returncode=0, stdout='', stderr='')
+        self.backend = PfBackend()
+        script = os.path.join(self.tmp.name, 'restore_blocked_ips.sh')
+        with patch('modules.firewall_backends.STARTUP_SCRIPT_DIR', self.tmp.name):
+            blocker = self.make_blocker()
+            self.assertTrue(blocker.block_ip('10.0.0.1'))
+            self.assertTrue(blocker.block_ip('10.0.0.9', ttl=60))
+            self.assertTrue(blocker.block_ip('10.0.0.3'))
+            self.assertTrue(blocker.unblock_ip('10.0.0.3'))
+            with open(script) as f:
+                lines = f.read().splitlines()
+            self.assertEqual(lines, [f'pfctl -t {PfBackend.TABLE} -T add 10.0.0.1'])
+
+            # Restoring after a restart writes the same script, not another copy
+            self.assertTrue(blocker.restore_blocked_ips())
+            with open(script) as f:
+                self.assertEqual(f.read().splitlines(), lines)
+
+    def test_ttl_block_expires(self):
+        """Test that the expiry thread unblocks a time-limited block."""
+        blocker = self.make_blocker()
+        self.assertTrue(blocker.block_ip('10.0.0.9', ttl=0.05))
+        deadline = time.time() + 3
+        while blocker.is_ip_blocked('10.0.0.9') and time.time() < deadline:
+            time.sleep(0.02)
+        blocker._expiries.stop()
+
+        self.assertFalse(blocker.is_ip_blocked('10.0.0.9'))
+        self.backend.apply.assert_called_with([], ['10.0.0.9'])
+
+    def expire_due(self, blocker, now):
+        """Fire the expiries due at 'now' the way the expiry thread does."""
+        self.assertEqual(blocker._expire(blocker._expiries.pop_due(now=now)), [])
+
+    @patch('modules.network_blocker.ExpiryScheduler.start')
+    def test_expiry_keeps_permanent_block_inside(self, mock_start):
+        """Test that an expiring range does not unblock a permanent address inside it."""
+        blocker = self.make_blocker()
+        self.assertTrue(blocker.block_ip('10.1.0.7'))
+        self.assertTrue(blocker.block_ip('10.1.0.0/24', ttl=60))
+        self.assertEqual(list(blocker.blocked_ips), ['10.1.0.0/24'])
+
+        self.expire_due(blocker, time.time() + 61)
+        self.assertEqual(list(blocker.blocked_ips), ['10.1.0.7'])
+        self.backend.apply.assert_called_with(['10.1.0.7'], ['10.1.0.0/24'])
+        self.assertEqual(list(self.make_blocker().blocked_ips), ['10.1.0.7'])
+
+    @patch('modules.network_blocker.ExpiryScheduler.start')
+    def test_permanent_block_inside_ttl_range_survives_expiry(self, mock_start):
+        """Test that a permanent block added inside a time-limited range outlives it."""
+        blocker = self.make_blocker()
+        self.assertTrue(blocker.block_ip('10.1.0.0/24', ttl=60))
+        self.assertTrue(blocker.block_ip('10.1.0.7'))
+        self.assertIsNotNone(blocker.get_block_expiry('10.1.0.0/24'))
+
+        self.expire_due(blocker, time.time() + 61)
+        self.assertTrue(blocker.is_ip_blocked('10.1.0.7'))
+        self.assertFalse(blocker.is_ip_blocked('10.1.0.8'))
+        self.backend.apply.assert_called_with(['10.1.0.7'], ['10.1.0.0/24'])
+
+    @patch('modules.network_blocker.ExpiryScheduler.start')
+    def test_nested_ttl_blocks_expire_independently(self, mock_start):
+        """Test that a longer block inside a shorter one stays until its own expiry."""
+        blocker = self.make_blocker()
+        now = time.time()
+        self.assertTrue(blocker.block_ip('10.1.0.0/24', ttl=60))
+        self.assertTrue(blocker.block_ip('10.1.0.7', ttl=3600))
+        # Unblocking part of a time-limited range keeps the rest until it expires
+        expiry = blocker.get_block_expiry('10.1.0.0/24')
+        self.assertTrue(blocker.unblock_ip('10.1.0.128/25'))
+        self.assertEqual(blocker.get_block_expiry('10.1.0.0/25'), expiry)
+
+        self.expire_due(blocker, now + 61)
+        self.assertEqual(list(blocker.blocked_ips), ['10.1.0.7'])
+        reloaded = self.make_blocker()
+        self.assertEqual(list(reloaded.blocked_ips), ['10.1.0.7'])
+
+        self.expire_due(reloaded, now + 3601)
+        self.assertEqual(list(reloaded.blocked_ips), [])
+        self.backend.apply.assert_called_with([], ['10.1.0.7'])
+
+if __name__ == '__main__':
+    unittest.main()
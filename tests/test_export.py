@@ -0,0 +1,117 @@
+"""
+Unit tests for inventory and scan history export
+"""
+
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import csv
+import gzip
+import json
+import shutil
+import tempfile
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils import export
+from utils.database import NetworkDatabase
+from utils.export import InventoryExporter
+
+class TestInventoryExporter(unittest.TestCase):
+    """Test cases for streaming and incremental exports"""
+
+    def setUp(self):
+        self.out_dir = tempfile.mkdtemp()
+        self.db = NetworkDatabase(':memory:')
+        self.db.save_devices([{'ip': f'10.8.0.{i}', 'os': 'Linux', 'ports': [{'port': 22, 'service': 'ssh'}]}
+                              for i in range(5)])
+        self.db.save_scan_results('server', [{'ip': '10.8.0.1', 'ports': [{'port': 22}, {'port': 80}]},
+                                             {'ip': '10.8.0.2', 'vendor': 'Acme'}])
+        self.db.save_scan_results('legacy', {'error': 'timeout'})
+        self.exporter = InventoryExporter(self.db, chunk_size=2)
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.out_dir)
+
+    def read_csv(self, path):
+        with gzip.open(path, 'rt', newline='') as f:
+            return list(csv.DictReader(f))
+
+    def test_csv_export(self):
+        """Test that every dataset is written as gzip CSV in chunks"""
+        with patch.object(export._TextSink, 'write', autospec=True,
+                          side_effect=export._TextSink.write) as write:
+            result = self.exporter.export(self.out_dir, fmt='csv')
+        files = result['files']
+        self.assertEqual({name: rows for name, (_, rows) in files.items()},
+                         {'devices': 5, 'ports': 5, 'scans': 2, 'scan_hosts': 2, 'scan_ports': 2})
+        # 3 + 3 + 1 + 1 + 1 chunks of at most two rows
+        self.assertEqual(write.call_count, 9)
+
+        devices = self.read_csv(files['devices'][0])
+        self.assertEqual(devices[0]['ip'], '10.8.0.0')
+        self.assertEqual(json.loads(devices[0]['device_info'])['os'], 'Linux')
+        scans = self.read_csv(files['scans'][0])
+        self.assertEqual([(scan['scan_type'], scan['host_count']) for scan in scans],
+                         [('server', '2'), ('legacy', '')])
+        hosts = self.read_csv(files['scan_hosts'][0])
+        self.assertEqual(json.loads(hosts[1]['details']), {'vendor': 'Acme'})
+        self.assertEqual(os.listdir(self.out_dir).count('export_state.json'), 1)
+        self.assertFalse([name for name in os.listdir(self.out_dir) if name.endswith('.part')])
+
+    def test_incremental_export(self):
+        """Test that incremental runs only export new scans and recently updated devices"""
+        first = self.exporter.export(self.out_dir, fmt='ndjson')
+        self.assertEqual(first['watermarks']['scans'], 2)
+
+        # Nothing changed: devices updated within the watermark lag are exported again, scans are not
+        result = self.exporter.export(self.out_dir, fmt='ndjson', incremental=True)
+        self.assertEqual(set(result['files']), {'devices', 'ports'})
+
+        self.db.save_scan_results('local', [{'ip': '10.8.0.9'}])
+        with patch.object(export, 'DEVICE_WATERMARK_LAG', 0):
+            self.exporter.export(self.out_dir, fmt='ndjson', incremental=True)
+        result = self.exporter.export(self.out_dir, fmt='ndjson', incremental=True, datasets=['scans', 'scan_hosts'])
+        self.assertEqual(result['files'], {})
+
+    def test_incremental_scan_export(self):
+        """Test that a new scan is exported exactly once"""
+        self.exporter.export(self.out_dir, fmt='ndjson')
+        self.db.save_scan_results('local', [{'ip': '10.8.0.9', 'hostname': 'printer'}])
+        result = self.exporter.export(self.out_dir, fmt='ndjson', incremental=True, datasets=['scan_hosts'])
+        path, rows = result['files']['scan_hosts']
+        # Datasets left out of a run keep their watermark
+        self.assertEqual(InventoryExporter.load_state(self.out_dir)['scan_ports'], 2)
+        with gzip.open(path, 'rt') as f:
+            self.assertEqual([json.loads(line) for line in f],
+                             [{'scan_id': 3, 'ip': '10.8.0.9', 'mac': None, 'hostname': 'printer', 'os': None,
+                               'details': None}])
+        self.assertEqual(InventoryExporter.load_state(self.out_dir)['scan_hosts'], 3)
+
+    def test_invalid_arguments(self):
+        """Test that unknown formats and datasets are rejected"""
+        with self.assertRaises(ValueError):
+            self.exporter.export(self.out_dir, fmt='xlsx')
+        with self.assertRaises(ValueError):
+            self.exporter.export(self.out_dir, datasets=['passwords'])
+        if export.pyarrow is None:
+            with self.assertRaises(ValueError):
+                self.exporter.export(self.out_dir, fmt='parquet')
+            self.assertEqual(InventoryExporter.default_format(), 'csv')
+
+    @unittest.skipIf(export.pyarrow is None, "pyarrow is not installed")
+    def test_parquet_export(self):
+        """Test that Parquet and Arrow files hold the exported rows"""
+        result = self.exporter.export(self.out_dir, fmt='parquet')
+        table = export.pyarrow.parquet.read_table(result['files']['devices'][0])
+        self.assertEqual(table.num_rows, 5)
+        self.assertEqual(table.schema.field('id').type, export.pyarrow.int64())
+        result = self.exporter.export(self.out_dir, fmt='arrow', datasets=['scan_ports'])
+        with export.pyarrow.ipc.open_file(result['files']['scan_ports'][0]) as reader:
+            self.assertEqual(reader.read_all().num_rows, 2)
+
+if __name__ == '__main__':
+    unittest.main()
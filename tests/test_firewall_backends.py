@@ -0,0 +1,426 @@
+"""
+Unit tests for the firewall backends module.
+"""
+
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+import tempfile
+import time
+
+# Add the src directory to the path so we can import the modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from modules.firewall_backends import (IpsetBackend, NftablesBackend, IptablesBackend,
+                                       NetshBackend, PfBackend, SimulatedBackend,
+                                       get_capabilities, select_backend, select_linux_backend)
+from modules.network_blocker import NetworkBlocker
+
+def completed(returncode=0, stdout='', stderr=''):
+    """Build a subprocess.run result."""
+    return MagicMock(returncode=returncode, stdout=stdout, stderr=stderr)
+
+class TestFirewallBackends(unittest.TestCase):
+    """Test cases for the Linux firewall backends."""
+
+    @patch('modules.firewall_backends.shutil.which', return_value='/usr/sbin/tool')
+    @patch('modules.firewall_backends.subprocess.run')
+    def test_ipset_prepare_adds_rules_once(self, mock_run, mock_which):
+        """Test that set match rules are only inserted when missing."""
+        # '-C' checks succeed, so no '-I' should be issued
+        mock_run.return_value = completed()
+        self.assertTrue(IpsetBackend().prepare())
+        commands = [call.args[0] for call in mock_run.call_args_list]
+        self.assertIn(['ipset', 'create', 'nmt_blocked', 'hash:net', 'family', 'inet', 'counters', '-exist'], commands)
+        self.assertFalse(any('-I' in cmd for cmd in commands))
+
+        # '-C' checks fail, so each chain gets one inserted rule per family
+        mock_run.reset_mock()
+        mock_run.side_effect = lambda cmd, **kwargs: completed(1 if '-C' in cmd else 0)
+        self.assertTrue(IpsetBackend().prepare())
+        inserts = [call.args[0] for call in mock_run.call_args_list if '-I' in call.args[0]]
+        self.assertEqual(len(inserts), 6)
+        self.assertIn(['iptables', '-I', 'INPUT', '-m', 'set', '--match-set', 'nmt_blocked', 'src', '-j', 'DROP'],
+                      inserts)
+
+    @patch('modules.firewall_backends.subprocess.run', return_value=completed())
+    def test_set_membership_commands(self, mock_run):
+        """Test that block and unblock are single set operations."""
+        IpsetBackend().block('10.0.0.1')
+        IpsetBackend().unblock('2001:db8::1')
+        NftablesBackend().block('10.0.0.0/24')
+
+        commands = [call.args[0] for call in mock_run.call_args_list]
+        self.assertEqual(commands[0], ['ipset', 'add', 'nmt_blocked', '10.0.0.1', '-exist'])
+        self.assertEqual(commands[1], ['ipset', 'del', 'nmt_blocked6', '2001:db8::1', '-exist'])
+        self.assertEqual(commands[2], ['nft', 'add', 'element', 'inet', 'nmt_blocker', 'blocked_v4',
+                                       '{ 10.0.0.0/24 }'])
+
+    @patch('modules.firewall_backends.platform.system', return_value='Linux')
+    @patch('modules.firewall_backends.has_net_admin', return_value=True)
+    @patch('modules.firewall_backends.subprocess.run', return_value=completed())
+    def test_selection_falls_back_to_iptables(self, mock_run, mock_net_admin, mock_system):
+        """Test backend preference order and the iptables fallback."""
+        with patch('modules.firewall_backends.shutil.which', return_value='/usr/sbin/tool'):
+            self.assertIsInstance(select_linux_backend(refresh=True), IpsetBackend)
+
+        with patch('modules.firewall_backends.shutil.which',
+                   side_effect=lambda tool: '/usr/sbin/nft' if tool == 'nft' else None):
+            self.assertIsInstance(select_linux_backend(refresh=True), NftablesBackend)
+
+        with patch('modules.firewall_backends.shutil.which', return_value=None):
+            self.assertIsInstance(select_linux_backend(refresh=True), IptablesBackend)
+
+    @patch('modules.firewall_backends.platform.system', return_value='Linux')
+    @patch('modules.firewall_backends.shutil.which', return_value='/usr/sbin/tool')
+    @patch('modules.firewall_backends.subprocess.run', return_value=completed())
+    def test_capability_probe_is_cached(self, mock_run, mock_which, mock_system):
+        """Test that the capability probe runs once, cheaply, until refreshed."""
+        # Leave the real capabilities cached for later tests
+        self.addCleanup(get_capabilities, True)
+        with patch('modules.firewall_backends.has_net_admin', return_value=False):
+            capabilities = get_capabilities(refresh=True)
+        self.assertFalse(capabilities['privileged'])
+        self.assertEqual(capabilities['backends'], {'ipset': False, 'nftables': False, 'iptables': False})
+        mock_run.assert_not_called()
+
+        with patch('modules.firewall_backends.has_net_admin', return_value=True):
+            self.assertTrue(get_capabilities(refresh=True)['privileged'])
+            probes = mock_run.call_count
+            self.assertIn(['iptables', '-S', 'INPUT', '1'], [c.args[0] for c in mock_run.call_args_list])
+
+            with tempfile.TemporaryDirectory() as tmp:
+                for _ in range(3):
+                    blocker = NetworkBlocker(blocked_ips_file=os.path.join(tmp, 'blocked.json'))
+                    self.assertTrue(blocker.has_privileges)
+            self.assertEqual(mock_run.call_count, probes)
+
+            mock_run.return_value = completed(returncode=1)
+            self.assertFalse(blocker.refresh_privileges())
+
+    @patch('modules.firewall_backends.shutil.which', return_value=None)
+    @patch('modules.firewall_backends.subprocess.run')
+    def test_iptables_batch_is_one_transaction(self, mock_run, mock_which):
+        """Test iptables-restore batches and rollback across families."""
+        mock_run.return_value = completed()
+        self.assertTrue(IptablesBackend().block_many(['10.0.0.1', '10.0.0.2']))
+        commands = [call.args[0] for call in mock_run.call_args_list]
+        self.assertEqual(commands, [['iptables-save', '-t', 'filter'], ['iptables-restore', '--noflush']])
+        payload = mock_run.call_args.kwargs['input']
+        self.assertTrue(payload.startswith('*filter\n') and payload.endswith('COMMIT\n'))
+        self.assertIn('-A OUTPUT -d 10.0.0.2 -j DROP', payload)
+
+        # The IPv6 transaction fails, so the committed IPv4 one is reverted
+        mock_run.reset_mock()
+        mock_run.side_effect = lambda cmd, **kwargs: completed(1 if cmd[0] == 'ip6tables-restore' else 0)
+        self.assertFalse(IptablesBackend().block_many(['10.0.0.1', '2001:db8::1']))
+        rollback = mock_run.call_args_list[-1]
+        self.assertEqual(rollback.args[0], ['iptables-restore', '--noflush'])
+        self.assertIn('-D INPUT -s 10.0.0.1 -j DROP', rollback.kwargs['input'])
+
+    @patch('modules.firewall_backends.subprocess.run', return_value=completed())
+    def test_set_batches(self, mock_run):
+        """Test ipset restore and nft -f batch scripts."""
+        IpsetBackend().block_many(['10.0.0.1', '2001:db8::1'])
+        self.assertEqual(mock_run.call_args.kwargs['input'],
+                         'add nmt_blocked 10.0.0.1\nadd nmt_blocked6 2001:db8::1\n')
+
+        NftablesBackend().unblock_many(['10.0.0.1', '10.0.0.2'])
+        self.assertEqual(mock_run.call_args.args[0], ['nft', '-f', '-'])
+        self.assertEqual(mock_run.call_args.kwargs['input'],
+                         'add element inet nmt_blocker blocked_v4 { 10.0.0.1, 10.0.0.2 }\n'
+                         'delete element inet nmt_blocker blocked_v4 { 10.0.0.1, 10.0.0.2 }\n')
+
+    def test_blocker_bulk_api(self):
+        """Test validation, single-batch application and restore."""
+        with tempfile.TemporaryDirectory() as tmp:
+            backend = MagicMock()
+            backend.check_privileges.return_value = True
+            backend.apply.return_value = True
+            blocker = NetworkBlocker(blocked_ips_file=os.path.join(tmp, 'blocked.json'), backend=backend)
+
+            # One bad entry means nothing is applied
+            self.assertFalse(blocker.block_many(['10.0.0.1', 'not-an-ip']))
+            backend.apply.assert_not_called()
+            self.assertFalse(blocker.is_ip_blocked('10.0.0.1'))
+
+            self.assertTrue(blocker.block_many(['10.0.0.1', '10.0.0.3', '10.0.0.1']))
+            backend.apply.assert_called_once_with(['10.0.0.1', '10.0.0.3'], [])
+
+            backend.reconcile.return_value = (['10.0.0.3'], [])
+            reloaded = NetworkBlocker(blocked_ips_file=os.path.join(tmp, 'blocked.json'), backend=backend)
+            self.assertTrue(reloaded.restore_blocked_ips())
+            backend.reconcile.assert_called_once_with(['10.0.0.1', '10.0.0.3'])
+
+    def test_blocker_aggregates_prefixes(self):
+        """Test that CIDRs and ranges are pushed as minimal prefix changes."""
+        with tempfile.TemporaryDirectory() as tmp:
+            backend = MagicMock()
+            backend.check_privileges.return_value = True
+            backend.apply.return_value = True
+            blocker = NetworkBlocker(blocked_ips_file=os.path.join(tmp, 'blocked.json'), backend=backend)
+
+            self.assertTrue(blocker.block_ip('10.0.0.0/25'))
+            self.assertTrue(blocker.block_ip('10.0.0.128-10.0.0.255'))
+            backend.apply.assert_called_with(['10.0.0.0/24'], ['10.0.0.0/25'])
+            self.assertTrue(blocker.is_ip_blocked('10.0.0.77'))
+
+            # Already covered, so the firewall is not touched
+            self.assertTrue(blocker.block_ip('10.0.0.9'))
+            self.assertEqual(backend.apply.call_count, 2)
+
+            self.assertTrue(blocker.unblock_ip('10.0.0.0/25'))
+            backend.apply.assert_called_with(['10.0.0.128/25'], ['10.0.0.0/24'])
+            self.assertFalse(blocker.is_ip_blocked('10.0.0.77'))
+            self.assertEqual(list(blocker.blocked_ips), ['10.0.0.128/25'])
+
+    @patch('modules.firewall_backends.shutil.which', return_value=None)
+    @patch('modules.firewall_backends.subprocess.run')
+    def test_iptables_reconcile_is_idempotent(self, mock_run, mock_which):
+        """Test that reconcile adds missing rules and removes stale and duplicate ones."""
+        live = ['*filter', ':INPUT ACCEPT [0:0]',
+                '-A INPUT -s 10.0.0.1/32 -j DROP', '-A INPUT -s 10.0.0.1/32 -j DROP',
+                '-A OUTPUT -d 10.0.0.1/32 -j DROP', '-A FORWARD -s 10.0.0.1/32 -j DROP',
+                '-A INPUT -s 10.9.9.9/32 -j DROP',
+                '-A INPUT -s 10.8.0.0/16 -p tcp -j DROP',
+                'COMMIT']
+
+        def run(cmd, **kwargs):
+            if cmd[0] == 'iptables-save':
+                return completed(stdout='\n'.join(live) + '\n')
+            return completed()
+
+        mock_run.side_effect = run
+        added, removed = IptablesBackend().reconcile(['10.0.0.1', '10.0.0.0/24'])
+        self.assertEqual((added, removed), (['10.0.0.0/24'], ['10.9.9.9']))
+        payload = mock_run.call_args.kwargs['input'].splitlines()
+        self.assertEqual(payload.count('-D INPUT -s 10.0.0.1 -j DROP'), 1)
+        self.assertIn('-D INPUT -s 10.9.9.9 -j DROP', payload)
+        self.assertIn('-A FORWARD -s 10.0.0.0/24 -j DROP', payload)
+        self.assertFalse(any('10.8.0.0' in line for line in payload))
+
+        # Nothing to change means no restore call at all
+        live = ['-A %s %s 10.0.0.1/32 -j DROP' % rule for rule in IptablesBackend.CHAINS]
+        mock_run.reset_mock()
+        self.assertEqual(IptablesBackend().reconcile(['10.0.0.1']), ([], []))
+        self.assertEqual(mock_run.call_count, 1)
+
+    @patch('modules.firewall_backends.shutil.which', return_value=None)
+    @patch('modules.firewall_backends.subprocess.run')
+    def test_iptables_apply_is_one_transaction(self, mock_run, mock_which):
+        """Test that an aggregate replacing its sub-prefixes is a single iptables-restore."""
+        live = ['-A %s %s 10.0.0.0/25 -j DROP' % rule for rule in IptablesBackend.CHAINS]
+
+        def run(cmd, **kwargs):
+            if cmd[0] == 'iptables-save':
+                return completed(stdout='\n'.join(live) + '\n')
+            return completed()
+
+        mock_run.side_effect = run
+        self.assertTrue(IptablesBackend().apply(['10.0.0.0/24'], ['10.0.0.0/25']))
+        commands = [call.args[0] for call in mock_run.call_args_list]
+        self.assertEqual(commands, [['iptables-save', '-t', 'filter'], ['iptables-restore', '--noflush']])
+        payload = mock_run.call_args.kwargs['input'].splitlines()
+        self.assertIn('-A INPUT -s 10.0.0.0/24 -j DROP', payload)
+        self.assertIn('-D INPUT -s 10.0.0.0/25 -j DROP', payload)
+        self.assertLess(payload.index('-A INPUT -s 10.0.0.0/24 -j DROP'),
+                        payload.index('-D INPUT -s 10.0.0.0/25 -j DROP'))
+
+    @patch('modules.firewall_backends.subprocess.run')
+    def test_set_reconcile_reads_live_state(self, mock_run):
+        """Test reading ipset and nftables contents for reconciliation."""
+        nft_json = ('{"nftables": [{"metainfo": {}}, {"set": {"name": "blocked_v4", '
+                    '"elem": ["10.0.0.1", {"prefix": {"addr": "10.1.0.0", "len": 16}}, '
+                    '{"range": ["10.2.0.0", "10.2.0.3"]}]}}]}')
+        mock_run.return_value = completed(stdout=nft_json)
+        installed = NftablesBackend().read_installed()
+        self.assertIn('10.1.0.0/16', installed)
+        self.assertIn('10.2.0.0/30', installed)
+        self.assertIn('10.0.0.1', installed)
+
+        mock_run.return_value = completed(stdout='create nmt_blocked hash:net family inet\n'
+                                                 'add nmt_blocked 10.0.0.1\nadd nmt_blocked 10.3.0.0/24\n')
+        backend = IpsetBackend()
+        added, removed = backend.reconcile(['10.0.0.1', '10.4.0.0/24'])
+        self.assertEqual((added, removed), (['10.4.0.0/24'], ['10.3.0.0/24']))
+        self.assertEqual(mock_run.call_args.kwargs['input'],
+                         'add nmt_blocked 10.4.0.0/24\ndel nmt_blocked 10.3.0.0/24\n')
+
+    @patch('modules.firewall_backends.shutil.which',
+           side_effect=lambda tool: '/usr/sbin/iptables' if tool == 'iptables' else None)
+    @patch('modules.firewall_backends.subprocess.run')
+    def test_set_backends_migrate_legacy_iptables_rules(self, mock_run, mock_which):
+        """Test that per-address DROP rules left by the iptables backend move into the set."""
+        live = ['-A %s %s 10.0.0.1/32 -j DROP' % rule for rule in IptablesBackend.CHAINS]
+        live.append('-A INPUT -s 10.0.0.2/32 -j DROP')
+        sets = ['create nmt_blocked hash:net family inet']
+
+        def run(cmd, **kwargs):
+            if cmd[0] == 'iptables-save':
+                return completed(stdout='\n'.join(live) + '\n')
+            if cmd[:2] == ['ipset', 'save']:
+                return completed(stdout='\n'.join(sets) + '\n')
+            if cmd[:2] == ['ipset', 'restore']:
+                sets.extend(line for line in kwargs['input'].splitlines() if line.startswith('add '))
+            if cmd[0] == 'iptables-restore':
+                live.clear()
+            return completed()
+
+        mock_run.side_effect = run
+        backend = IpsetBackend()
+        added, removed = backend.reconcile(['10.0.0.1'])
+        self.assertEqual((added, removed), ([], ['10.0.0.2']))
+        restores = [call.kwargs['input'].splitlines() for call in mock_run.call_args_list
+                    if call.args[0][0] == 'iptables-restore']
+        self.assertEqual(len(restores), 1)
+        self.assertIn('-D OUTPUT -d 10.0.0.1 -j DROP', restores[0])
+        self.assertIn('-D INPUT -s 10.0.0.2 -j DROP', restores[0])
+        self.assertFalse(any(line.startswith('-A') for line in restores[0]))
+
+        # Before any reconcile, unblocking also deletes the address's legacy rules
+        live[:] = ['-A INPUT -s 10.0.0.3/32 -j DROP', '-A INPUT -s 10.0.0.4/32 -j DROP']
+        mock_run.reset_mock()
+        self.assertTrue(NftablesBackend().unblock_many(['10.0.0.3']))
+        payload = mock_run.call_args.kwargs['input'].splitlines()
+        self.assertEqual(mock_run.call_args.args[0], ['iptables-restore', '--noflush'])
+        self.assertIn('-D INPUT -s 10.0.0.3 -j DROP', payload)
+        self.assertFalse(any('10.0.0.4' in line for line in payload))
+
+    @patch('modules.firewall_backends.subprocess.run', return_value=completed())
+    def test_nftables_apply_deletes_before_adding(self, mock_run):
+        """Test that replaced sub-prefixes leave the interval set first."""
+        self.assertTrue(NftablesBackend().apply(['10.0.0.0/24'], ['10.0.0.0/25']))
+        self.assertEqual(mock_run.call_args.kwargs['input'],
+                         'delete element inet nmt_blocker blocked_v4 { 10.0.0.0/25 }\n'
+                         'add element inet nmt_blocker blocked_v4 { 10.0.0.0/24 }\n')
+
+    @patch('modules.firewall_backends.shutil.which', return_value=None)
+    @patch('modules.firewall_backends.subprocess.run')
+    def test_counters_read_in_one_call(self, mock_run, mock_which):
+        """Test parsing per-prefix counters from iptables, ipset and pf listings."""
+        mock_run.return_value = completed(stdout=(
+            'Chain INPUT (policy ACCEPT 0 packets, 0 bytes)\n'
+            '    pkts      bytes target     prot opt in     out     source               destination\n'
+            '      12      720 DROP       all  --  *      *       10.0.0.1             0.0.0.0/0\n'
+            '       5      300 DROP       tcp  --  *      *       10.0.0.1             0.0.0.0/0            tcp dpt:22\n'
+            'Chain OUTPUT (policy ACCEPT 0 packets, 0 bytes)\n'
+            '       3      180 DROP       all  --  *      *       0.0.0.0/0            10.0.0.1\n'
+            '       0        0 DROP       all  --  *      *       0.0.0.0/0            10.2.0.0/24\n'))
+        self.assertEqual(IptablesBackend().read_counters(), {'10.0.0.1': (15, 900), '10.2.0.0/24': (0, 0)})
+        self.assertEqual(mock_run.call_count, 1)
+
+        mock_run.return_value = completed(stdout='create nmt_blocked hash:net family inet counters\n'
+                                                 'add nmt_blocked 10.0.0.1 packets 7 bytes 420\n'
+                                                 'add nmt_blocked 10.3.0.0/24 packets 0 bytes 0\n')
+        self.assertEqual(IpsetBackend().read_counters()['10.0.0.1'], (7, 420))
+
+        mock_run.return_value = completed(stdout=('   10.0.0.1\n'
+                                                  '\tCleared:     Thu Jan  1 00:00:00 1970\n'
+                                                  '\tIn/Block:    [ Packets: 4        Bytes: 240      ]\n'
+                                                  '\tIn/Pass:     [ Packets: 0        Bytes: 0        ]\n'
+                                                  '\tOut/Block:   [ Packets: 1        Bytes: 60       ]\n'))
+        self.assertEqual(PfBackend().read_counters(), {'10.0.0.1': (5, 300)})
+
+    @patch('modules.firewall_backends.subprocess.run')
+    def test_netsh_reconcile_repairs_duplicates(self, mock_run):
+        """Test that netsh reconcile re-adds duplicated rules once and drops stale ones."""
+        listing = ('Rule Name:   Block 10.0.0.1\n'
+                   'Rule Name:   Block 10.0.0.1\n'
+                   'Rule Name:   Block 10.0.0.1 Out\n'
+                   'Rule Name:   Block 10.0.0.9\n'
+                   'Rule Name:   Block 10.0.0.9 Out\n'
+                   'Rule Name:   Allow SSH\n')
+        scripts = []
+
+        def run(cmd, **kwargs):
+            if cmd[:2] == ['netsh', '-f']:
+                with open(cmd[2]) as f:
+                    scripts.append(f.read().splitlines())
+            return completed(stdout=listing)
+
+        mock_run.side_effect = run
+        added, removed = NetshBackend().reconcile(['10.0.0.1', '10.0.0.2'])
+        self.assertEqual((added, removed), (['10.0.0.2'], ['10.0.0.9']))
+        self.assertIn('advfirewall firewall delete rule name="Block 10.0.0.1"', scripts[0])
+        self.assertEqual(sum('add rule name="Block 10.0.0.1"' in line for line in scripts[0]), 1)
+
+    @patch('modules.firewall_backends.subprocess.run')
+    def test_pf_reconcile_replaces_table(self, mock_run):
+        """Test that pf reconcile swaps the table only when it differs."""
+        mock_run.return_value = completed(stdout='   10.0.0.1\n   10.0.0.9\n')
+        self.assertEqual(PfBackend().reconcile(['10.0.0.1', '10.0.0.2']), (['10.0.0.2'], ['10.0.0.9']))
+        self.assertEqual(mock_run.call_args.args[0],
+                         ['pfctl', '-t', 'nmt_blocked', '-T', 'replace', '10.0.0.1', '10.0.0.2'])
+
+        mock_run.reset_mock()
+        self.assertEqual(PfBackend().reconcile(['10.0.0.1', '10.0.0.9']), ([], []))
+        self.assertEqual(mock_run.call_count, 1)
+
+    @patch('modules.firewall_backends.platform.system', return_value='Windows')
+    def test_select_backend(self, mock_system):
+        """Test platform dispatch and selection by name."""
+        self.assertIsInstance(select_backend(), NetshBackend)
+        self.assertIsInstance(select_backend('simulated'), SimulatedBackend)
+        with self.assertRaises(ValueError):
+            select_backend('hosts-file')
+
+class TestSimulatedBackend(unittest.TestCase):
+    """Test cases for the in-memory simulated firewall."""
+
+    def test_blocker_with_simulated_backend(self):
+        """Test NetworkBlocker end to end without a real firewall."""
+        with tempfile.TemporaryDirectory() as tmp:
+            backend = SimulatedBackend()
+            blocker = NetworkBlocker(blocked_ips_file=os.path.join(tmp, 'blocked.json'), backend=backend)
+            self.assertTrue(blocker.has_privileges)
+            self.assertTrue(blocker.block_many(['10.0.0.1', '10.1.0.0/16']))
+            self.assertEqual(backend.commands, 1)
+            self.assertTrue(backend.match('10.1.2.3'))
+            self.assertFalse(backend.match('10.2.0.1'))
+
+            # Restoring an unchanged blocklist reads the state and changes nothing
+            backend.installed['10.9.9.9'] = 1
+            self.assertTrue(blocker.restore_blocked_ips())
+            self.assertEqual(sorted(backend.installed), ['10.0.0.1', '10.1.0.0/16'])
+            commands = backend.commands
+            self.assertTrue(blocker.restore_blocked_ips())
+            self.assertEqual(backend.commands, commands + 1)
+
+    def test_block_stats_and_pruning(self):
+        """Test hit counters sorted by activity, caching and pruning of idle blocks."""
+        with tempfile.TemporaryDirectory() as tmp:
+            backend = SimulatedBackend('set')
+            blocker = NetworkBlocker(blocked_ips_file=os.path.join(tmp, 'blocked.json'), backend=backend)
+            blocker.block_many(['10.0.0.1', '10.1.0.0/16', '10.2.0.9'])
+            backend.match('10.1.4.4', 60)
+            backend.match('10.1.9.9', 40)
+            backend.match('10.0.0.1', 100)
+
+            stats = blocker.get_block_stats()
+            self.assertEqual([(s['entry'], s['packets'], s['bytes']) for s in stats],
+                             [('10.1.0.0/16', 2, 100), ('10.0.0.1', 1, 100), ('10.2.0.9', 0, 0)])
+            commands = backend.commands
+            blocker.get_block_stats()
+            self.assertEqual(backend.commands, commands)
+
+            with patch('modules.network_blocker.time.time', return_value=time.time() + 3600):
+                backend.match('10.1.0.1')
+                self.assertEqual(blocker.prune_stale_blocks(1800), ['10.0.0.1', '10.2.0.9'])
+            self.assertEqual(list(blocker.blocked_ips), ['10.1.0.0/16'])
+
+    def test_lookup_cost_by_mode(self):
+        """Test that chain lookups cost one comparison per rule and set lookups far fewer."""
+        prefixes = ['10.%d.%d.0/24' % (i // 256, i % 256) for i in range(1024)]
+        chain, table = SimulatedBackend('chain'), SimulatedBackend('set')
+        for backend in (chain, table):
+            backend.block_many(prefixes)
+            self.assertFalse(backend.match('192.168.1.1'))
+            self.assertTrue(backend.match('10.3.255.7'))
+        self.assertEqual(chain.evaluations, 2048)
+        self.assertLessEqual(table.evaluations, 2 * 12)
+        with self.assertRaises(ValueError):
+            SimulatedBackend('tree')
+
+if __name__ == '__main__':
+    unittest.main()
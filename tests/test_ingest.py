@@ -0,0 +1,110 @@
+"""
+Unit tests for the write-behind ingestion writer
+"""
+
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import tempfile
+import threading
+import time
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.ingest import IngestionWriter
+
+class TestIngestionWriter(unittest.TestCase):
+    """Test cases for batching, backpressure and shutdown of the ingestion writer"""
+
+    def setUp(self):
+        test_db_fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(test_db_fd)
+
+    def test_submissions_coalesced_into_one_transaction(self):
+        """Test that scans arriving within the flush interval are written together"""
+        writer = IngestionWriter(self.db_path, flush_interval=0.2)
+        with patch.object(writer.database, 'save_batch', wraps=writer.database.save_batch) as save_batch:
+            for i in range(5):
+                self.assertTrue(writer.submit('server', [{'ip': f'10.6.0.{i}', 'ports': [{'port': 22}]}]))
+            writer.submit('local', [{'ip': '10.6.1.1'}], save_devices=False)
+            writer.flush()
+        self.assertEqual(save_batch.call_count, 1)
+        self.assertEqual(writer.batches, 1)
+        self.assertEqual(writer.written, 6)
+
+        self.assertEqual(len(writer.database.get_scan_history()), 6)
+        self.assertEqual(len(writer.database.get_devices()), 5)
+        self.assertIsNone(writer.database.get_device_by_ip('10.6.1.1'))
+        writer.close()
+
+    def test_host_limit_triggers_early_flush(self):
+        """Test that a batch is written as soon as it reaches the host limit"""
+        writer = IngestionWriter(self.db_path, max_batch=10, flush_interval=5)
+        writer.submit('server', [{'ip': f'10.6.2.{i}'} for i in range(10)])
+        finished = threading.Event()
+        threading.Thread(target=lambda: (writer.flush(), finished.set()), daemon=True).start()
+        self.assertTrue(finished.wait(2))
+        writer.close()
+
+    def test_full_queue_pushes_back_on_producers(self):
+        """Test that producers write synchronously when the queue stays full"""
+        writer = IngestionWriter(self.db_path, flush_interval=0, max_queue=1, put_timeout=0.05)
+        release = threading.Event()
+        save_batch = writer.database.save_batch
+
+        def slow_save_batch(scans, devices):
+            if threading.current_thread().name == 'ingestion-writer':
+                release.wait(2)
+            return save_batch(scans, devices)
+
+        with patch.object(writer.database, 'save_batch', side_effect=slow_save_batch):
+            self.assertTrue(writer.submit('server', [{'ip': '10.6.3.1'}]))
+            # Wait for the writer thread to take the first scan off the queue
+            while writer._queue.qsize():
+                time.sleep(0.01)
+            self.assertTrue(writer.submit('server', [{'ip': '10.6.3.2'}]))
+            self.assertFalse(writer.submit('server', [{'ip': '10.6.3.3'}]))
+            self.assertIsNotNone(writer.database.get_device_by_ip('10.6.3.3'))
+            release.set()
+            writer.close()
+        self.assertEqual(len(writer.database.get_devices()), 3)
+
+    def test_close_flushes_pending_results(self):
+        """Test that closing writes everything still queued and later submits write directly"""
+        writer = IngestionWriter(self.db_path, flush_interval=10)
+        writer.submit('server', [{'ip': '10.6.4.1'}])
+        writer.close()
+        self.assertIsNotNone(writer.database.get_device_by_ip('10.6.4.1'))
+        self.assertFalse(writer.submit('server', [{'ip': '10.6.4.2'}]))
+        self.assertIsNotNone(writer.database.get_device_by_ip('10.6.4.2'))
+
+    def test_write_failures_are_counted(self):
+        """Test that a failing batch is logged and does not stop the writer"""
+        writer = IngestionWriter(self.db_path, flush_interval=0)
+        with patch.object(writer.database, 'save_batch', side_effect=[Exception("disk I/O error"), None]):
+            writer.submit('server', [{'ip': '10.6.5.1'}])
+            writer.flush()
+            writer.submit('server', [{'ip': '10.6.5.2'}])
+            writer.flush()
+        self.assertEqual((writer.failed, writer.written), (1, 1))
+        writer.close()
+
+    def test_malformed_item_does_not_drop_batch(self):
+        """Test that one bad scan in a batch is dropped alone and the others are written"""
+        writer = IngestionWriter(self.db_path, flush_interval=0.2)
+        with self.assertLogs('utils.ingest', level='ERROR') as logs:
+            writer.submit('server', [{'ip': '10.6.6.1'}])
+            writer.submit('server', [{'ip': '10.6.6.2', 'ports': 5}])
+            writer.submit('server', [{'ip': '10.6.6.3'}])
+            writer.flush()
+        self.assertEqual((writer.failed, writer.written), (1, 2))
+        self.assertIn('10.6.6.2', logs.output[0])
+        self.assertIsNotNone(writer.database.get_device_by_ip('10.6.6.1'))
+        self.assertIsNotNone(writer.database.get_device_by_ip('10.6.6.3'))
+        self.assertIsNone(writer.database.get_device_by_ip('10.6.6.2'))
+        writer.close()
+
+if __name__ == '__main__':
+    unittest.main()
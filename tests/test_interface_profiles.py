@@ -0,0 +1,89 @@
+"""
+Unit tests for the interface profiles module.
+"""
+
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+
+# Add the src directory to the path so we can import the modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from modules.interface_profiles import (InterfaceProfileResolver, candidate_profiles,
+                                        _parse_posix_addresses, _parse_default_interface,
+                                        _parse_windows_addresses, _parse_ios_addresses)
+
+IP_ADDR_OUTPUT = """1: lo    inet 127.0.0.1/8 scope host lo\\       valid_lft forever
+2: ens3    inet 192.168.1.10/24 brd 192.168.1.255 scope global ens3\\       valid_lft forever
+3: wlp2s0    inet 10.0.0.5/24 brd 10.0.0.255 scope global wlp2s0\\       valid_lft forever
+"""
+
+IFCONFIG_OUTPUT = """em0: flags=8843<UP,BROADCAST,RUNNING> mtu 1500
+\tinet 192.168.1.20 netmask 0xffffff00 broadcast 192.168.1.255
+lo0: flags=8049<UP,LOOPBACK,RUNNING> mtu 16384
+\tinet 127.0.0.1 netmask 0xff000000
+"""
+
+NETSH_OUTPUT = """
+Configuration for interface "Ethernet 2"
+    DHCP enabled:                         Yes
+    IP Address:                           192.168.1.30
+"""
+
+IOS_OUTPUT = """Interface              IP-Address      OK? Method Status                Protocol
+GigabitEthernet0/0     192.168.1.1     YES NVRAM  up                    up
+GigabitEthernet0/1     unassigned      YES NVRAM  administratively down down
+"""
+
+class TestInterfaceProfiles(unittest.TestCase):
+    """Test cases for profile selection and inventory parsing."""
+
+    def test_candidate_profiles(self):
+        """Test profile candidates for fingerprinted operating systems."""
+        self.assertEqual(candidate_profiles('Microsoft Windows Server 2019'), ['netsh'])
+        self.assertEqual(candidate_profiles('Cisco IOS 15.2'), ['cisco_ios'])
+        self.assertEqual(candidate_profiles('FreeBSD 12.1'), ['ifconfig'])
+        self.assertEqual(candidate_profiles('Linux 5.4'), ['nmcli', 'iproute2', 'ifconfig'])
+        self.assertEqual(candidate_profiles(None), ['nmcli', 'iproute2', 'ifconfig'])
+
+    def test_parse_inventories(self):
+        """Test parsing address inventories from each platform."""
+        self.assertEqual(_parse_posix_addresses(IP_ADDR_OUTPUT)['ens3'], ['192.168.1.10'])
+        self.assertEqual(_parse_posix_addresses(IFCONFIG_OUTPUT)['em0'], ['192.168.1.20'])
+        self.assertEqual(_parse_windows_addresses(NETSH_OUTPUT), {'Ethernet 2': ['192.168.1.30']})
+        self.assertEqual(_parse_ios_addresses(IOS_OUTPUT), {'GigabitEthernet0/0': ['192.168.1.1']})
+        self.assertEqual(_parse_default_interface('default via 192.168.1.1 dev ens3 proto dhcp'), 'ens3')
+
+    def test_choose_interface_and_tool(self):
+        """Test that the interface holding the device address and an available tool are chosen."""
+        resolver = InterfaceProfileResolver()
+        inventory = {
+            'tools': {'ip', 'nmcli'},
+            'addresses': _parse_posix_addresses(IP_ADDR_OUTPUT),
+            'default_interface': 'wlp2s0',
+            'nm_managed': {'wlp2s0'},
+        }
+
+        plan = resolver._choose('192.168.1.10', candidate_profiles('Linux'), inventory)
+        self.assertEqual(plan, {'profile': 'iproute2', 'interface': 'ens3'})
+
+        plan = resolver._choose('10.0.0.5', candidate_profiles('Linux'), inventory)
+        self.assertEqual(plan, {'profile': 'nmcli', 'interface': 'wlp2s0'})
+
+    def test_inventory_is_cached(self):
+        """Test that the inventory is collected only once per device."""
+        resolver = InterfaceProfileResolver()
+        inventory = {'tools': {'ip'}, 'addresses': {'eth1': ['192.168.1.10']},
+                     'default_interface': None, 'nm_managed': set()}
+
+        with patch.object(resolver, '_inventory_posix', return_value=inventory) as mock_inventory:
+            first = resolver.resolve(MagicMock(), '192.168.1.10', 'Linux 5.4')
+            second = resolver.resolve(MagicMock(), '192.168.1.10', 'Linux 5.4')
+
+        self.assertEqual(first, {'profile': 'iproute2', 'interface': 'eth1'})
+        self.assertEqual(first, second)
+        mock_inventory.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
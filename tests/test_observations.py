@@ -0,0 +1,111 @@
+"""
+Unit tests for the host observation store
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.database import NetworkDatabase
+from utils.observations import ObservationStore, encode_ports, partition_name
+
+# Midnight UTC, 2026-01-01
+BASE = 1767225600
+HOUR = 3600
+DAY = 86400
+
+class TestObservationStore(unittest.TestCase):
+    """Test cases for partitioned observations, rollups and retention"""
+
+    def setUp(self):
+        self.db = NetworkDatabase(':memory:')
+        self.store = ObservationStore(self.db, raw_retention_days=7, hourly_retention_days=30,
+                                      daily_retention_days=365)
+
+    def tearDown(self):
+        self.db.close()
+
+    def record_days(self, days, ip='10.5.0.1'):
+        """Record four scans and four latency samples a day for 'days' days."""
+        for day in range(days):
+            for hour in (0, 6, 12, 18):
+                timestamp = BASE + day * DAY + hour * HOUR
+                ports = [22, 80] if day < days // 2 else [{'port': 22}, {'port': 443}]
+                self.store.record([{'ip': ip, 'timestamp': timestamp, 'ports': ports, 'latency_ms': hour}])
+                self.store.record_latency(ip, 2.0, up=hour != 18, timestamp=timestamp + 60)
+
+    def test_raw_rows_partitioned_by_day(self):
+        """Test that raw observations land in one table per UTC day"""
+        self.record_days(3)
+        self.assertEqual(self.store._partitions(), ['observations_20260101', 'observations_20260102',
+                                                    'observations_20260103'])
+        self.assertEqual(partition_name(BASE + DAY - 1), 'observations_20260101')
+        self.assertEqual(encode_ports([{'port': 80}, 22, {'port': 53, 'protocol': 'udp'}]),
+                         '22/tcp,53/udp,80/tcp')
+        self.assertEqual(self.store.first_seen('10.5.0.1'),
+                         {'first_seen': BASE, 'last_seen': BASE + 2 * DAY + 18 * HOUR + 60})
+
+    def test_rollup_and_retention_bound_storage(self):
+        """Test that maintenance rolls raw data up, then drops old partitions and rollups"""
+        self.record_days(60)
+        now = BASE + 60 * DAY
+        result = self.store.maintain(now)
+        self.assertEqual(result['rolled_up'], {'hour': 60 * 4, 'day': 60})
+        self.assertEqual(len(result['dropped_partitions']), 53)
+        self.assertEqual(len(self.store._partitions()), 7)
+        self.assertEqual(result['deleted_rollups'], 30 * 4)
+        self.assertTrue(result['vacuumed'])
+
+        # Maintenance is idempotent
+        again = self.store.maintain(now)
+        self.assertEqual(again['rolled_up'], {'hour': 0, 'day': 0})
+        self.assertEqual(again['dropped_partitions'], [])
+
+        # Months of history come from the daily rollups
+        history = self.store.history('10.5.0.1', BASE, now)
+        self.assertEqual(history['resolution'], 'day')
+        self.assertEqual(len(history['points']), 60)
+        first = history['points'][0]
+        self.assertEqual(first['samples'], 8)
+        self.assertEqual(first['availability'], 7 / 8)
+        self.assertEqual((first['latency_min'], first['latency_max']), (0, 18))
+        self.assertEqual(first['latency_avg'], (0 + 6 + 12 + 18 + 2 * 4) / 8)
+        self.assertEqual(first['open_ports'], ['22/tcp', '80/tcp'])
+        self.assertEqual(self.store.port_changes('10.5.0.1', BASE, now),
+                         [{'timestamp': BASE + 30 * DAY, 'opened': ['443/tcp'], 'closed': ['80/tcp']}])
+
+    def test_history_includes_data_not_yet_rolled_up(self):
+        """Test that rollup resolutions aggregate the unrolled tail from raw data"""
+        self.record_days(3)
+        self.store.rollup(BASE + DAY)
+        history = self.store.history('10.5.0.1', BASE, BASE + 3 * DAY, resolution='hour')
+        self.assertEqual(len(history['points']), 12)
+        self.assertEqual([point['samples'] for point in history['points']], [2] * 12)
+
+        raw = self.store.history('10.5.0.1', BASE + 2 * DAY, BASE + 2 * DAY + 7 * HOUR)
+        self.assertEqual(raw['resolution'], 'raw')
+        self.assertEqual([point['latency_ms'] for point in raw['points']], [0, 2.0, 6, 2.0])
+        self.assertIsNone(raw['points'][1]['open_ports'])
+        with self.assertRaises(ValueError):
+            self.store.history('10.5.0.1', BASE, BASE + DAY, resolution='minute')
+
+    def test_saved_scans_are_observed(self):
+        """Test that saving a scan records host observations in the same transaction"""
+        test_db_fd, test_db_path = tempfile.mkstemp(suffix='.db')
+        os.close(test_db_fd)
+        db = NetworkDatabase(test_db_path)
+        scan_id = db.save_scan_results('local', [{'ip': '10.5.1.1', 'ports': [{'port': 3389}], 'latency_ms': 2.5},
+                                                 {'ip': '10.5.1.2'}])
+        points = db.observations.history('10.5.1.1', BASE, resolution='raw')['points']
+        self.assertEqual([(p['scan_id'], p['open_ports'], p['latency_ms']) for p in points],
+                         [(scan_id, ['3389/tcp'], 2.5)])
+        self.assertIsNotNone(db.observations.first_seen('10.5.1.2'))
+        self.assertIsNotNone(db.observations._get_state('maintained_at'))
+        db.close()
+
+if __name__ == '__main__':
+    unittest.main()
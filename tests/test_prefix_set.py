@@ -0,0 +1,67 @@
+"""
+Unit tests for the PrefixSet module.
+"""
+
+import unittest
+import sys
+import os
+
+# Add the src directory to the path so we can import the modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from modules.prefix_set import PrefixSet
+
+class TestPrefixSet(unittest.TestCase):
+    """Test cases for the PrefixSet class."""
+
+    def test_parse_entries(self):
+        """Test parsing addresses, CIDRs and ranges."""
+        self.assertEqual([str(n) for n in PrefixSet.parse('10.0.0.7/24')], ['10.0.0.0/24'])
+        self.assertEqual([str(n) for n in PrefixSet.parse('10.0.0.0-10.0.0.5')],
+                         ['10.0.0.0/30', '10.0.0.4/31'])
+        for bad in ('not-an-ip', '10.0.0.5-10.0.0.1', '10.0.0.1-::1', '10.0.0.0/33'):
+            with self.assertRaises(ValueError):
+                PrefixSet.parse(bad)
+
+    def test_aggregation_and_delta(self):
+        """Test that adjacent and overlapping entries collapse to minimal prefixes."""
+        prefixes = PrefixSet(['192.168.0.0/25'])
+        added, removed = prefixes.add('192.168.0.128/25')
+        self.assertEqual((added, removed), (['192.168.0.0/24'], ['192.168.0.0/25']))
+
+        self.assertEqual(prefixes.add('192.168.0.10'), ([], []))
+        self.assertEqual(len(prefixes), 1)
+
+        prefixes.update(['2001:db8::/33', '2001:db8:8000::/33'])
+        self.assertEqual(list(prefixes), ['192.168.0.0/24', '2001:db8::/32'])
+
+    def test_invalid_update_changes_nothing(self):
+        """Test that a batch with an invalid entry is rejected as a whole."""
+        prefixes = PrefixSet(['10.0.0.1'])
+        with self.assertRaises(ValueError):
+            prefixes.update(['10.0.0.2', 'bogus'])
+        self.assertEqual(list(prefixes), ['10.0.0.1'])
+
+    def test_discard_splits_prefix(self):
+        """Test removing an address from inside a prefix."""
+        prefixes = PrefixSet(['10.0.0.0/30'])
+        added, removed = prefixes.discard('10.0.0.1')
+        self.assertEqual(removed, ['10.0.0.0/30'])
+        self.assertEqual(sorted(added), ['10.0.0.0', '10.0.0.2/31'])
+        self.assertNotIn('10.0.0.1', prefixes)
+        self.assertIn('10.0.0.3', prefixes)
+
+    def test_lookup(self):
+        """Test longest-prefix lookup and coverage checks."""
+        prefixes = PrefixSet(['10.0.0.0/8', '172.16.5.4', '2001:db8::/48'])
+        self.assertEqual(prefixes.lookup('10.200.1.1'), '10.0.0.0/8')
+        self.assertEqual(prefixes.lookup('172.16.5.4'), '172.16.5.4')
+        self.assertIsNone(prefixes.lookup('172.16.5.5'))
+        self.assertIsNone(prefixes.lookup('9.255.255.255'))
+        self.assertIn('2001:db8::1', prefixes)
+        self.assertIn('10.1.0.0/16', prefixes)
+        self.assertNotIn('10.0.0.0/7', prefixes)
+        self.assertNotIn('garbage', prefixes)
+
+if __name__ == '__main__':
+    unittest.main()
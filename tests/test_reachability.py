@@ -0,0 +1,91 @@
+"""
+Unit tests for the ReachabilityProber module.
+"""
+
+import asyncio
+import socket
+import unittest
+import sys
+import os
+from concurrent.futures import Future
+from unittest.mock import MagicMock
+
+# Add the src directory to the path so we can import the modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from modules.reachability import ReachabilityProber
+
+class TestReachabilityProber(unittest.TestCase):
+    """Test cases for the ReachabilityProber class."""
+
+    def setUp(self):
+        """Set up a listening socket and a known-closed port."""
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(16)
+        self.open_port = self.listener.getsockname()[1]
+
+        closed = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        closed.bind(('127.0.0.1', 0))
+        self.closed_port = closed.getsockname()[1]
+        closed.close()
+
+        self.prober = ReachabilityProber(timeout=1, cache_ttl=60)
+
+    def tearDown(self):
+        """Close the listening socket."""
+        self.listener.close()
+
+    def test_check_many(self):
+        """Test probing open and closed ports in one call."""
+        results = self.prober.check_many([('127.0.0.1', self.open_port),
+                                          ('127.0.0.1', self.closed_port)])
+
+        self.assertTrue(results[('127.0.0.1', self.open_port)])
+        self.assertFalse(results[('127.0.0.1', self.closed_port)])
+
+    def test_default_timeout_untouched(self):
+        """Test that probing does not change the process-wide socket timeout."""
+        socket.setdefaulttimeout(None)
+        self.prober.check('127.0.0.1', self.open_port)
+        self.assertIsNone(socket.getdefaulttimeout())
+
+    def test_results_are_cached(self):
+        """Test that results are served from the cache until invalidated."""
+        self.assertTrue(self.prober.check('127.0.0.1', self.open_port))
+        self.listener.close()
+
+        self.assertTrue(self.prober.get_cached('127.0.0.1', self.open_port))
+        self.assertTrue(self.prober.check('127.0.0.1', self.open_port))
+
+        self.prober.invalidate('127.0.0.1')
+        self.assertIsNone(self.prober.get_cached('127.0.0.1', self.open_port))
+        self.assertFalse(self.prober.check('127.0.0.1', self.open_port))
+
+    def test_check_many_async(self):
+        """Test the asyncio probing API."""
+        results = asyncio.run(self.prober.check_many_async([('127.0.0.1', self.open_port),
+                                                            ('127.0.0.1', self.closed_port)]))
+
+        self.assertTrue(results[('127.0.0.1', self.open_port)])
+        self.assertFalse(results[('127.0.0.1', self.closed_port)])
+
+    def test_check_in_background(self):
+        """Test that background probes resolve to the probe result."""
+        future = self.prober.check_in_background('127.0.0.1', self.open_port)
+        self.assertTrue(future.result(timeout=5))
+
+    def test_cancelled_background_probe_skips_callback(self):
+        """Test that cancelling a queued background probe does not raise in its callback."""
+        future = Future()
+        self.prober._executor = MagicMock()
+        self.prober._executor.submit.return_value = future
+        callback = MagicMock()
+        self.assertIs(self.prober.check_in_background('127.0.0.1', self.open_port, callback=callback), future)
+        # Errors raised by done-callbacks are logged by concurrent.futures, not raised
+        with self.assertNoLogs('concurrent.futures', level='ERROR'):
+            self.assertTrue(future.cancel())
+        callback.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
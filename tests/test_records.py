@@ -0,0 +1,88 @@
+"""
+Unit tests for lazy device records and JSON encoding
+"""
+
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import json
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils import records
+from utils.database import NetworkDatabase
+from utils.records import DeviceRecord, encode_json
+
+class TestDeviceRecord(unittest.TestCase):
+    """Test cases for DeviceRecord and encode_json"""
+
+    def setUp(self):
+        self.db = NetworkDatabase(':memory:')
+        self.db.save_devices([{'ip': f'10.9.0.{i}', 'hostname': f'host{i}', 'os': 'Linux',
+                               'ports': [{'port': 22, 'service': 'ssh'}]} for i in range(3)])
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_device_info_decoded_on_first_access(self):
+        """Test that reading devices does not decode device_info until it is used"""
+        with patch.object(records, 'decode_json', wraps=records.decode_json) as decode:
+            devices = self.db.get_devices()
+            self.assertEqual(sorted(device.ip for device in devices), ['10.9.0.0', '10.9.0.1', '10.9.0.2'])
+            self.assertEqual(devices[0]['hostname'], 'host' + devices[0].ip[-1])
+            self.assertEqual(decode.call_count, 0)
+            info = devices[0]['device_info']
+            self.assertEqual(info['ports'][0]['service'], 'ssh')
+            self.assertIs(devices[0].device_info, info)
+            self.assertEqual(decode.call_count, 1)
+
+    def test_behaves_like_a_dictionary(self):
+        """Test that records compare, iterate and convert like the dictionaries they replace"""
+        device = self.db.get_device_by_ip('10.9.0.1')
+        self.assertEqual(list(device), ['id', 'ip', 'mac', 'hostname', 'os', 'scan_timestamp', 'device_info'])
+        self.assertEqual(device.get('mac'), None)
+        self.assertEqual(device.to_dict()['device_info']['hostname'], 'host1')
+        self.assertEqual(device, device.to_dict())
+        with self.assertRaises(KeyError):
+            device['vendor']
+        with self.assertRaises(AttributeError):
+            device.vendor
+
+        page, _ = self.db.query_devices(fields=['ip', 'os'])
+        self.assertEqual(page[0], {'ip': '10.9.0.2', 'os': 'Linux'})
+        self.assertNotIn('device_info', page[0])
+        with self.assertRaises(AttributeError):
+            page[0].device_info
+
+    def test_encoding_passes_device_info_through(self):
+        """Test that encoding records writes the stored blob without decoding it"""
+        for codec in {records.orjson, None}:
+            with patch.object(records, 'orjson', codec):
+                devices, cursor = self.db.query_devices(limit=2)
+                payload = {'status': 'success', 'devices': devices, 'next_cursor': cursor}
+                with patch.object(records, 'decode_json', side_effect=AssertionError("decoded")):
+                    text = encode_json(payload)
+                decoded = json.loads(text)
+                self.assertEqual(decoded['devices'][0]['device_info']['hostname'], 'host2')
+                self.assertEqual(decoded['devices'][1]['ip'], '10.9.0.1')
+                self.assertEqual(decoded['next_cursor'], cursor)
+
+                # A decoded device_info is encoded from the decoded value
+                devices[0].device_info['note'] = 'edited'
+                self.assertEqual(json.loads(encode_json(devices))[0]['device_info']['note'], 'edited')
+                self.assertEqual(json.loads(encode_json({1: [DeviceRecord({}, None)]})),
+                                 {'1': [{'device_info': {}}]})
+                with self.assertRaises(TypeError):
+                    encode_json({'when': object(), 'device': devices[1]})
+
+    def test_stdlib_encoding_matches_json_module(self):
+        """Test that without orjson the output matches json.dumps for plain data"""
+        data = {'a': [1, 2.5, None, True], 'b': {'c': 'd'}, 3: 'e'}
+        with patch.object(records, 'orjson', None):
+            self.assertEqual(encode_json(data), json.dumps(data))
+            self.assertEqual(records._encode_walk(data), json.dumps(data))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -24,8 +24,8 @@ class TestNetworkScanner(unittest.TestCase):
         """Test scanning a local network."""
         # Mock the srp function to return a predefined result
         mock_result = [
-            (MagicMock(), MagicMock(psrc='192.168.1.10', hwsrc='00:11:22:33:44:55')),
-            (MagicMock(), MagicMock(psrc='192.168.1.11', hwsrc='aa:bb:cc:dd:ee:ff'))
+            (MagicMock(sent_time=100.0), MagicMock(psrc='192.168.1.10', hwsrc='00:11:22:33:44:55', time=100.0025)),
+            (MagicMock(sent_time=None), MagicMock(psrc='192.168.1.11', hwsrc='aa:bb:cc:dd:ee:ff', time=100.1))
         ]
         mock_srp.return_value = (mock_result, None)
         
@@ -38,6 +38,26 @@ class TestNetworkScanner(unittest.TestCase):
         self.assertEqual(devices[0]['mac'], '00:11:22:33:44:55')
         self.assertEqual(devices[1]['ip'], '192.168.1.11')
         self.assertEqual(devices[1]['mac'], 'aa:bb:cc:dd:ee:ff')
+        self.assertEqual(devices[0]['latency_ms'], 2.5)
+        self.assertIsNone(devices[1]['latency_ms'])
+    
+    @patch('modules.scanner.nmap.PortScanner')
+    def test_ping_scan_reads_round_trip_times(self, mock_scanner):
+        """Test that nmap's smoothed round-trip times become host latencies."""
+        nm = mock_scanner.return_value
+        nm.all_hosts.return_value = ['10.0.0.1', '10.0.0.2']
+        nm.__getitem__.return_value.state.return_value = 'up'
+        nm.__getitem__.return_value.hostname.return_value = ''
+        nm.get_nmap_last_output.return_value = (
+            b'<nmaprun><host><address addr="10.0.0.1" addrtype="ipv4"/>'
+            b'<times srtt="1250" rttvar="500" to="100000"/></host>'
+            b'<host><address addr="10.0.0.2" addrtype="ipv4"/><times srtt="-1" rttvar="-1" to="1000000"/></host>'
+            b'</nmaprun>')
+        
+        devices = self.scanner._ping_scan('10.0.0.0/30')
+        
+        self.assertEqual([(device['ip'], device['latency_ms']) for device in devices],
+                         [('10.0.0.1', 1.25), ('10.0.0.2', None)])
     
     def test_fingerprint_device(self):
         """Test fingerprinting a device."""
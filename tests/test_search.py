@@ -0,0 +1,103 @@
+"""
+Unit tests for device inventory search
+"""
+
+import unittest
+from unittest.mock import patch
+import sys
+import os
+from datetime import datetime, timezone
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.database import NetworkDatabase
+from utils.search import fts_expression, parse_query
+
+DEVICES = [
+    {'ip': '10.0.0.1', 'hostname': 'db-primary', 'os': 'Linux 5.15',
+     'ports': [{'port': 22, 'service': 'ssh', 'version': 'OpenSSH 8.9'},
+               {'port': 5432, 'service': 'postgresql', 'version': 'PostgreSQL 15'}]},
+    {'ip': '10.0.1.2', 'hostname': 'web01', 'os': 'Windows Server 2019',
+     'ports': [{'port': 80, 'service': 'http', 'version': 'Microsoft IIS 10.0'},
+               {'port': 3389, 'service': 'ms-wbt-server'}]},
+    {'ip': '10.0.1.3', 'hostname': 'web02', 'os': 'Linux 6.1',
+     'ports': [{'port': 22, 'service': 'ssh'}, {'port': 443, 'service': 'https', 'version': 'nginx 1.24'},
+               {'port': 53, 'protocol': 'udp', 'service': 'domain'}]},
+]
+
+class TestQueryParsing(unittest.TestCase):
+    """Test cases for the search query syntax"""
+
+    def test_predicates_and_terms(self):
+        """Test that predicates are separated from free text"""
+        now = datetime(2026, 3, 10, 12, 0, tzinfo=timezone.utc)
+        parsed = parse_query('web "Microsoft IIS" open:80,53/udp os:windows after:7d before:2026-03-01 fe80::1',
+                             now=now)
+        self.assertEqual(parsed['terms'], ['web', 'Microsoft IIS', 'fe80::1'])
+        self.assertEqual(parsed['open'], [(80, 'tcp'), (53, 'udp')])
+        self.assertEqual(parsed['os'], ['windows'])
+        self.assertEqual(parsed['after'], ['2026-03-03 12:00:00'])
+        self.assertEqual(parsed['before'], ['2026-03-01 00:00:00'])
+        self.assertEqual(fts_expression(parsed),
+                         '"web"* AND "Microsoft IIS"* AND "fe80::1"* AND os : "windows"*')
+
+    def test_invalid_values(self):
+        """Test that malformed predicate values are rejected"""
+        for query in ('open:http', 'open:70000', 'open:22/sctp', 'after:yesterday', 'host:"db'):
+            with self.assertRaises(ValueError):
+                parse_query(query)
+
+class TestDeviceSearch(unittest.TestCase):
+    """Test cases for NetworkDatabase.search_devices"""
+
+    def setUp(self):
+        self.db = NetworkDatabase(':memory:')
+        self.db.save_devices(DEVICES)
+
+    def tearDown(self):
+        self.db.close()
+
+    def ips(self, query):
+        return [device['ip'] for device in self.db.search_devices(query)]
+
+    def test_text_search_is_ranked(self):
+        """Test that hostname matches outrank service banner matches"""
+        self.assertEqual(self.ips('web'), ['10.0.1.2', '10.0.1.3'])
+        self.assertEqual(self.ips('nginx'), ['10.0.1.3'])
+        self.assertEqual(self.ips('postgres'), ['10.0.0.1'])
+        results = self.db.search_devices('ssh')
+        self.assertEqual({device['ip'] for device in results}, {'10.0.0.1', '10.0.1.3'})
+        self.assertTrue(all(device['score'] > 0 for device in results))
+        self.assertIn('22/tcp ssh', results[0]['services'])
+
+    def test_structured_predicates(self):
+        """Test that predicates narrow results with and without text"""
+        self.assertEqual(self.ips('open:22 open:443'), ['10.0.1.3'])
+        self.assertEqual(self.ips('open:53/udp'), ['10.0.1.3'])
+        self.assertEqual(self.ips('open:53'), [])
+        self.assertEqual(self.ips('ssh os:linux ip:10.0.1.0/24'), ['10.0.1.3'])
+        self.assertEqual(self.ips('service:http host:web'), ['10.0.1.2', '10.0.1.3'])
+        self.assertEqual(len(self.ips('after:1d')), 3)
+        self.assertEqual(self.ips('before:2000-01-01'), [])
+        self.assertIsNone(self.db.search_devices('open:80')[0]['score'])
+
+    def test_index_follows_updates_and_deletes(self):
+        """Test that saved and deleted devices are re-indexed"""
+        self.db.save_devices([{'ip': '10.0.0.1', 'hostname': 'db-replica', 'os': 'Linux 5.15',
+                               'ports': [{'port': 6379, 'service': 'redis'}]}])
+        self.assertEqual(self.ips('replica redis'), ['10.0.0.1'])
+        self.assertEqual(self.ips('ssh'), ['10.0.1.3'])
+        self.assertTrue(self.db.delete_device('10.0.1.3'))
+        self.assertEqual(self.ips('ssh'), [])
+        self.assertFalse(self.db.delete_device('10.0.1.3'))
+
+    def test_substring_fallback_without_index(self):
+        """Test that searches still work when SQLite lacks FTS5"""
+        with patch('utils.database.has_index', return_value=False):
+            self.assertEqual(self.ips('nginx'), ['10.0.1.3'])
+            self.assertEqual(sorted(self.ips('service:ssh')), ['10.0.0.1', '10.0.1.3'])
+            self.assertEqual(self.ips('os:windows open:3389'), ['10.0.1.2'])
+
+if __name__ == '__main__':
+    unittest.main()
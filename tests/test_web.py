@@ -5,6 +5,7 @@ Unit tests for the web interface module
 import unittest
 import sys
 import os
+import tempfile
 
 # Add the src directory to the path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
@@ -12,11 +13,19 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 class TestWebInterface(unittest.TestCase):
     """Test cases for the web interface module"""
     
+    def setUp(self):
+        # Use a scratch database so the tracked network_data.db is never touched
+        test_db_fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(test_db_fd)
+    
+    def tearDown(self):
+        os.unlink(self.db_path)
+    
     def test_app_creation(self):
         """Test that the Flask app can be created"""
         try:
             from web.app import create_app
-            app = create_app()
+            app = create_app(self.db_path)
             self.assertIsNotNone(app)
         except Exception as e:
             self.fail(f"Failed to create Flask app: {e}")
@@ -25,7 +34,7 @@ class TestWebInterface(unittest.TestCase):
         """Test that the expected routes are defined"""
         try:
             from web.app import create_app
-            app = create_app()
+            app = create_app(self.db_path)
             
             # Get all routes
             rules = [rule.rule for rule in app.url_map.iter_rules()]